@@ -0,0 +1,419 @@
+"""
+Enriquecimiento de enlaces con metadatos (título / descripción), fuera de la exportación.
+
+Flujo:
+ 1. La exportación guarda en cada mensaje sus URLs originales ('links') sin tocar la red.
+ 2. Después, este paso reúne las URLs únicas y las resuelve con fetchers enchufables
+    (asyncio, con un límite de concurrencia), guardando el resultado en un caché clave-valor
+    persistente en disco (SQLite) con TTL.
+ 3. LinkProcessor / clean_message_text solo LEEN ese caché (en memoria): nunca hacen E/S de red
+    ni de disco. El caché se carga explícitamente (load / reload) antes de exportar, fuera
+    del event loop; mientras no esté cargado, get() devuelve None.
+
+Uso:
+    python -m link_processor.enrichment chat_export.json [...] --fetcher http --concurrency 8
+"""
+import asyncio
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from html.parser import HTMLParser
+from typing import Any, Dict, Iterable, List, Optional
+
+from .main import normalize_url
+
+DEFAULT_CACHE_PATH = os.path.join("_cache", "link_metadata.sqlite3")
+DEFAULT_TTL = 7 * 24 * 3600        # metadatos válidos una semana
+ERROR_TTL = 6 * 3600               # fallos: no reintentar hasta dentro de 6 horas
+DEFAULT_CONCURRENCY = 8
+
+URL_RE = re.compile(r'https?://[^\s]+')
+
+
+# ================================================================
+#  CACHÉ PERSISTENTE
+# ================================================================
+
+class LinkMetadataCache:
+    """
+    Caché URL normalizada -> metadatos ({'title', 'description', ...}) con expiración.
+
+    Las lecturas (get) son solo en memoria y no cargan nada: el archivo se lee con load() o
+    reload() (si no existe no se crea). Las escrituras van a memoria y a disco (SQLite).
+    Un fallo de resolución se guarda como {} para no reintentarlo antes de su TTL.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, ttl: float = DEFAULT_TTL):
+        self.path = path
+        self.ttl = ttl
+        self._entries: Optional[Dict[str, tuple]] = None   # url -> (metadatos, expira_en)
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        conn = sqlite3.connect(self.path)
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS link_metadata ("
+            "url TEXT PRIMARY KEY, data TEXT NOT NULL, fetched_at REAL NOT NULL, expires_at REAL NOT NULL)"
+        )
+        return conn
+
+    def _load(self) -> Dict[str, tuple]:
+        entries = self._entries
+        if entries is not None:
+            return entries
+        with self._lock:
+            if self._entries is None:
+                self._entries = self._read_all()
+            return self._entries
+
+    def _read_all(self) -> Dict[str, tuple]:
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            conn = sqlite3.connect(f"file:{os.path.abspath(self.path)}?mode=ro", uri=True)
+            try:
+                rows = conn.execute(
+                    "SELECT url, data, expires_at FROM link_metadata WHERE expires_at > ?", (time.time(),)
+                ).fetchall()
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            print(f"⚠️  No se pudo leer el caché de metadatos {self.path}: {e}")
+            return {}
+        return {url: (json.loads(data), expires_at) for url, data, expires_at in rows}
+
+    @property
+    def loaded(self) -> bool:
+        return self._entries is not None
+
+    def load(self) -> "LinkMetadataCache":
+        """Lee el archivo si todavía no se leyó (hacerlo fuera del event loop)"""
+        self._load()
+        return self
+
+    def reload(self):
+        """Vuelve a leer el archivo (p. ej. tras enriquecer desde otro proceso)"""
+        with self._lock:
+            self._entries = self._read_all()
+
+    def get(self, url: str) -> Optional[Dict[str, Any]]:
+        """Metadatos vigentes de la URL (None si no hay, expiraron o el caché no está cargado). Sin E/S."""
+        entries = self._entries
+        if entries is None:
+            return None
+        entry = entries.get(url)
+        if entry is None or entry[1] <= time.time():
+            return None
+        return entry[0]
+
+    def __contains__(self, url: str) -> bool:
+        return self.get(url) is not None
+
+    def set_many(self, items: Dict[str, Dict[str, Any]], ttl: Optional[float] = None):
+        """Guarda {url: metadatos} en memoria y en disco (una transacción)"""
+        if not items:
+            return
+        now = time.time()
+        expires_at = now + (self.ttl if ttl is None else ttl)
+        entries = self._load()
+        with self._lock:
+            conn = self._connect()
+            try:
+                with conn:
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO link_metadata (url, data, fetched_at, expires_at) VALUES (?, ?, ?, ?)",
+                        [(url, json.dumps(data, ensure_ascii=False), now, expires_at) for url, data in items.items()],
+                    )
+            finally:
+                conn.close()
+            for url, data in items.items():
+                entries[url] = (data, expires_at)
+
+    def set(self, url: str, data: Dict[str, Any], ttl: Optional[float] = None):
+        self.set_many({url: data}, ttl)
+
+    def purge_expired(self) -> int:
+        """Borra del disco y de memoria las entradas expiradas; devuelve cuántas"""
+        now = time.time()
+        entries = self._load()
+        with self._lock:
+            for url in [u for u, (_, expires_at) in entries.items() if expires_at <= now]:
+                del entries[url]
+            if not os.path.exists(self.path):
+                return 0
+            conn = self._connect()
+            try:
+                with conn:
+                    return conn.execute("DELETE FROM link_metadata WHERE expires_at <= ?", (now,)).rowcount
+            finally:
+                conn.close()
+
+    def __len__(self):
+        return len(self._load())
+
+
+_CACHES: Dict[str, LinkMetadataCache] = {}
+_CACHES_LOCK = threading.Lock()
+
+
+def get_metadata_cache(path: str = DEFAULT_CACHE_PATH) -> LinkMetadataCache:
+    """Caché compartido (uno por archivo y proceso); no lee el disco hasta load() / reload()"""
+    key = os.path.abspath(path)
+    with _CACHES_LOCK:
+        cache = _CACHES.get(key)
+        if cache is None:
+            cache = _CACHES[key] = LinkMetadataCache(path)
+        return cache
+
+
+# ================================================================
+#  FETCHERS
+# ================================================================
+
+class BaseFetcher(ABC):
+    """Resuelve los metadatos de una URL. Devuelve un dict (title/description) o None."""
+
+    NAME: str = "base"
+
+    def can_handle(self, url: str) -> bool:
+        return True
+
+    @abstractmethod
+    async def fetch(self, url: str) -> Optional[Dict[str, Any]]:
+        """Metadatos de la URL - DEBE SER IMPLEMENTADO"""
+        pass
+
+
+# nombre -> clase de fetcher
+FETCHERS: Dict[str, type] = {}
+
+
+def register_fetcher(fetcher_class):
+    """Decorador para registrar fetchers por su NAME"""
+    FETCHERS[fetcher_class.NAME] = fetcher_class
+    return fetcher_class
+
+
+@register_fetcher
+class StubFetcher(BaseFetcher):
+    """
+    Fetcher local sin red (tests y corridas en seco).
+    Responde desde `responses` ({url: metadatos}); con `default=True` inventa un título
+    determinista para las demás URLs. Registra las llamadas y la concurrencia máxima.
+    """
+
+    NAME = "stub"
+
+    def __init__(self, responses: Optional[Dict[str, Dict[str, Any]]] = None,
+                 default: bool = True, delay: float = 0.0):
+        self.responses = responses or {}
+        self.default = default
+        self.delay = delay
+        self.calls: List[str] = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def fetch(self, url: str) -> Optional[Dict[str, Any]]:
+        self.calls.append(url)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            if self.delay:
+                await asyncio.sleep(self.delay)
+            if url in self.responses:
+                return self.responses[url]
+            if self.default:
+                return {"title": f"Título de {url.split('://')[-1]}", "description": ""}
+            return None
+        finally:
+            self.in_flight -= 1
+
+
+class _MetaParser(HTMLParser):
+    """Extrae <title> y las etiquetas meta de título/descripción (Open Graph y estándar)"""
+
+    def __init__(self):
+        super().__init__()
+        self.meta: Dict[str, str] = {}
+        self.title = ""
+        self._in_title = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "title":
+            self._in_title = True
+        elif tag == "meta":
+            attrs = dict(attrs)
+            key = (attrs.get("property") or attrs.get("name") or "").lower()
+            if key in ("og:title", "og:description", "description", "twitter:title") and attrs.get("content"):
+                self.meta.setdefault(key, attrs["content"].strip())
+
+    def handle_endtag(self, tag):
+        if tag == "title":
+            self._in_title = False
+
+    def handle_data(self, data):
+        if self._in_title:
+            self.title += data
+
+
+@register_fetcher
+class HTTPMetaFetcher(BaseFetcher):
+    """Descarga el inicio del HTML (urllib en un hilo) y lee título y descripción"""
+
+    NAME = "http"
+    USER_AGENT = "Mozilla/5.0 (compatible; NLP-Project link enrichment)"
+
+    def __init__(self, timeout: float = 10.0, max_bytes: int = 256 * 1024):
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+
+    def _fetch_sync(self, url: str) -> Optional[Dict[str, Any]]:
+        from urllib.request import Request, urlopen
+
+        request = Request(url, headers={"User-Agent": self.USER_AGENT, "Accept": "text/html"})
+        with urlopen(request, timeout=self.timeout) as response:
+            if "html" not in (response.headers.get("Content-Type") or ""):
+                return None
+            charset = response.headers.get_content_charset() or "utf-8"
+            html = response.read(self.max_bytes).decode(charset, errors="replace")
+
+        parser = _MetaParser()
+        parser.feed(html)
+        title = parser.meta.get("og:title") or parser.meta.get("twitter:title") or " ".join(parser.title.split())
+        description = parser.meta.get("og:description") or parser.meta.get("description", "")
+        if not title and not description:
+            return None
+        return {"title": title, "description": description}
+
+    async def fetch(self, url: str) -> Optional[Dict[str, Any]]:
+        return await asyncio.to_thread(self._fetch_sync, url)
+
+
+def make_fetchers(names: Iterable[str]) -> List[BaseFetcher]:
+    unknown = [n for n in names if n not in FETCHERS]
+    if unknown:
+        raise ValueError(f"Fetchers no registrados: {unknown} (disponibles: {sorted(FETCHERS)})")
+    return [FETCHERS[n]() for n in names]
+
+
+# ================================================================
+#  ETAPA DE ENRIQUECIMIENTO
+# ================================================================
+
+def collect_urls(messages: Iterable[Dict[str, Any]]) -> List[str]:
+    """URLs únicas (normalizadas, en orden de aparición) de los mensajes exportados"""
+    seen = {}
+    for msg in messages:
+        if not isinstance(msg, dict):
+            continue
+        for url in msg.get("links") or URL_RE.findall(msg.get("text") or ""):
+            seen.setdefault(normalize_url(url), None)
+    return list(seen)
+
+
+async def _resolve(url: str, fetchers: List[BaseFetcher]) -> Optional[Dict[str, Any]]:
+    for fetcher in fetchers:
+        if not fetcher.can_handle(url):
+            continue
+        try:
+            data = await fetcher.fetch(url)
+        except Exception as e:
+            print(f"⚠️  {fetcher.NAME}: no se pudo resolver {url}: {e}")
+            continue
+        if data:
+            return data
+    return None
+
+
+async def enrich_urls(
+    urls: Iterable[str],
+    fetchers: List[BaseFetcher],
+    cache: Optional[LinkMetadataCache] = None,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    ttl: Optional[float] = None,
+    error_ttl: float = ERROR_TTL,
+) -> Dict[str, int]:
+    """
+    Resuelve las URLs que no están en el caché (como mucho `concurrency` a la vez) y
+    guarda los resultados. Cada fetcher se prueba en orden hasta que uno responde.
+    """
+    cache = cache if cache is not None else get_metadata_cache()
+    if not cache.loaded:
+        await asyncio.to_thread(cache.load)
+    unique = list(dict.fromkeys(normalize_url(u) for u in urls))
+    pending = [u for u in unique if u not in cache]
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def worker(url):
+        async with semaphore:
+            return url, await _resolve(url, fetchers)
+
+    results = await asyncio.gather(*(worker(u) for u in pending))
+    found = {url: data for url, data in results if data}
+    failed = {url: {} for url, data in results if not data}
+    cache.set_many(found, ttl)
+    cache.set_many(failed, error_ttl)
+
+    stats = {"urls": len(unique), "cached": len(unique) - len(pending),
+             "fetched": len(found), "failed": len(failed)}
+    print(f"🔗 Metadatos de enlaces: {stats['urls']} URLs | {stats['cached']} en caché | "
+          f"{stats['fetched']} resueltas | {stats['failed']} sin datos")
+    return stats
+
+
+async def enrich_export(
+    json_path: str,
+    fetchers: List[BaseFetcher],
+    cache: Optional[LinkMetadataCache] = None,
+    concurrency: int = DEFAULT_CONCURRENCY,
+) -> Dict[str, int]:
+    """
+    Enriquece un chat exportado: resuelve sus URLs y agrega a cada mensaje
+    'link_metadata' ([{url, title, description}]) con lo que haya en el caché.
+    """
+    cache = cache if cache is not None else get_metadata_cache()
+    with open(json_path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    messages = data.get("messages", []) if isinstance(data, dict) else data
+
+    stats = await enrich_urls(collect_urls(messages), fetchers, cache, concurrency)
+
+    for msg in messages:
+        if not isinstance(msg, dict) or not msg.get("links"):
+            continue
+        metadata = []
+        for url in msg["links"]:
+            meta = cache.get(normalize_url(url))
+            if meta:
+                metadata.append({"url": url, "title": meta.get("title", ""),
+                                 "description": meta.get("description", "")})
+        if metadata:
+            msg["link_metadata"] = metadata
+
+    tmp = f"{json_path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, json_path)
+    return stats
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Enriquece chats exportados con metadatos de sus enlaces")
+    parser.add_argument("paths", nargs="+", help="Chats exportados (JSON)")
+    parser.add_argument("--fetcher", action="append", choices=sorted(FETCHERS),
+                        help="Fetchers en orden de prioridad (por defecto: http)")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument("--cache", default=DEFAULT_CACHE_PATH)
+    args = parser.parse_args()
+
+    fetchers = make_fetchers(args.fetcher or ["http"])
+    cache = get_metadata_cache(args.cache)
+    for path in args.paths:
+        asyncio.run(enrich_export(path, fetchers, cache, args.concurrency))
@@ -165,15 +165,15 @@ class AmazonExtractor(BaseExtractor):
             return content_type, product_id, category, search_query
         
         # Verificar búsquedas (porque usan query parameters)
-        if any(re.search(pattern, path) for pattern in self.PATTERNS['search']):
+        if any(pattern.search(path) for pattern in self.compiled_patterns()['search']):
             content_type = "search"
             search_query = query_params.get('k', [''])[0] or query_params.get('field-keywords', [''])[0]
             return content_type, product_id, category, search_query
         
         # Verificar todos los patrones en orden de prioridad
-        for content_type_name, patterns in self.PATTERNS.items():
+        for content_type_name, patterns in self.compiled_patterns().items():
             for pattern in patterns:
-                match = re.search(pattern, path)
+                match = pattern.search(path)
                 if match:
                     content_type = content_type_name
                     
@@ -1,11 +1,76 @@
+import re
 from abc import ABC, abstractmethod
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Iterator, Optional, List, Tuple
+
+
+class RouteTable:
+    """
+    Rutas (tipo, regex) de un extractor compiladas en una sola alternancia:
+
+        (?P<_r0>(?:patrón0))|(?P<_r1>(?:patrón1))|...
+
+    Un solo re.match prueba las alternativas en orden, igual que recorrer la lista con
+    re.match: gana la primera que coincide. El grupo envolvente que cerró (lastindex)
+    identifica la ruta y sus propios grupos se recortan de match.groups().
+    """
+
+    def __init__(self, patterns):
+        self.routes: List[Tuple[str, Any]] = []
+        for name, pattern in patterns:
+            try:
+                self.routes.append((name, re.compile(pattern)))
+            except re.error:
+                continue   # igual que antes: un patrón inválido nunca coincide
+        # inicio -> (regex combinada de routes[inicio:], {grupo envolvente: (ruta, offset, n)})
+        self._combined: Dict[int, Tuple[Any, Dict[int, Tuple[int, int, int]]]] = {}
+
+    def _table(self, start: int):
+        table = self._combined.get(start)
+        if table is not None:
+            return table
+        parts, slots, group = [], {}, 0
+        for i in range(start, len(self.routes)):
+            compiled = self.routes[i][1]
+            group += 1
+            slots[group] = (i, group, compiled.groups)
+            parts.append(f"(?P<_r{i}>(?:{compiled.pattern}))")
+            group += compiled.groups
+        try:
+            table = (re.compile("|".join(parts)), slots)
+        except re.error:
+            table = (None, slots)   # p. ej. grupos con nombre repetidos: rutas una a una
+        self._combined[start] = table
+        return table
+
+    def iter_matches(self, path: str) -> Iterator[Tuple[str, tuple]]:
+        """(tipo, grupos) de cada ruta que coincide con path, en orden de definición"""
+        start = 0
+        while start < len(self.routes):
+            combined, slots = self._table(start)
+            if combined is None:
+                for name, compiled in self.routes[start:]:
+                    match = compiled.match(path)
+                    if match:
+                        yield name, match.groups()
+                return
+            match = combined.match(path)
+            if not match:
+                return
+            index, offset, count = slots[match.lastindex]
+            yield self.routes[index][0], match.groups()[offset:offset + count]
+            # Si el llamador sigue iterando, se busca solo entre las rutas siguientes
+            start = index + 1
+
 
 class BaseExtractor(ABC):
     """Clase base para todos los extractores de redes sociales"""
     
     DOMAINS: List[str] = []
+    # Dominios cuyos subdominios (cualquier *.dominio) también maneja el extractor
+    WILDCARD_DOMAINS: List[str] = []
     SITE_NAME: str = "Sitio"
+    # Lista de (tipo, regex) probada en orden con iter_routes (algunos extractores usan un dict)
+    PATTERNS: Any = []
     
     @abstractmethod
     def extract(self, parsed_url, domain: str) -> Optional[Dict[str, Any]]:
@@ -22,14 +87,37 @@ class BaseExtractor(ABC):
         if domain.startswith('www.') and domain[4:] in self.DOMAINS:
             return True
         
-        # Manejo especial para Tumblr - subdominios dinámicos
-        if 'tumblr.com' in self.DOMAINS:
-            # Cualquier subdominio que termine con .tumblr.com
-            if domain.endswith('.tumblr.com'):
+        # Subdominios dinámicos (ej. Tumblr: cualquier *.tumblr.com)
+        for wildcard in self.WILDCARD_DOMAINS:
+            if domain.endswith('.' + wildcard):
                 return True
         
         return False
     
+    def iter_routes(self, path: str) -> Iterator[Tuple[str, tuple]]:
+        """
+        Recorre las rutas de PATTERNS que coinciden con path (re.match), en orden:
+        genera (tipo, grupos). Las regex se compilan una vez por clase.
+        """
+        cls = type(self)
+        table = cls.__dict__.get('_ROUTE_TABLE')
+        if table is None:
+            table = RouteTable(cls.PATTERNS)
+            cls._ROUTE_TABLE = table
+        return table.iter_matches(path)
+    
+    def compiled_patterns(self) -> Dict[str, List[Any]]:
+        """
+        PATTERNS en forma de dict {tipo: [regex, ...]} (extractores que usan re.search),
+        compilados una vez por clase y en el mismo orden
+        """
+        cls = type(self)
+        compiled = cls.__dict__.get('_COMPILED_PATTERNS')
+        if compiled is None:
+            compiled = {name: [re.compile(p) for p in patterns] for name, patterns in cls.PATTERNS.items()}
+            cls._COMPILED_PATTERNS = compiled
+        return compiled
+    
     def format_output(self, data: Dict[str, Any]) -> str:
         """
         Formatea la salida final
@@ -48,18 +136,68 @@ class BaseExtractor(ABC):
         
         return f"[{emoji} {site_name}{username_display}{type_display}{id_display}]"
 
-# Registro global de extractores
+# Registro global de extractores (en orden de registro: ante varios candidatos gana el primero)
 _EXTRACTORS_REGISTRY: List[BaseExtractor] = []
 
+
+class DomainIndex:
+    """
+    Índice de dominios construido al registrar extractores:
+     - mapa hash dominio exacto -> posición del extractor (incluye variantes 'www.')
+     - trie de sufijos por etiquetas invertidas ('com' -> 'tumblr') para subdominios comodín
+
+    Da el mismo resultado que recorrer el registro llamando a can_handle, en
+    O(etiquetas del dominio).
+    """
+
+    def __init__(self):
+        self.exact: Dict[str, int] = {}
+        self.trie: Dict[str, Any] = {}
+
+    def add(self, position: int, extractor: BaseExtractor):
+        for domain in extractor.DOMAINS:
+            for key in (domain, 'www.' + domain):
+                if key not in self.exact:
+                    self.exact[key] = position
+        for wildcard in extractor.WILDCARD_DOMAINS:
+            node = self.trie
+            for label in reversed(wildcard.split('.')):
+                node = node.setdefault(label, {})
+            node.setdefault(None, position)   # la clave None marca "comodín termina aquí"
+
+    def lookup(self, domain: str) -> Optional[int]:
+        best = self.exact.get(domain)
+        labels = domain.split('.')
+        node = self.trie
+        # Solo subdominios estrictos: debe quedar al menos una etiqueta antes del comodín
+        for depth in range(len(labels) - 1, 0, -1):
+            node = node.get(labels[depth])
+            if node is None:
+                break
+            position = node.get(None)
+            if position is not None and (best is None or position < best):
+                best = position
+        return best
+
+
+_DOMAIN_INDEX = DomainIndex()
+
+
 def register_extractor(extractor_class):
     """Decorador para registrar extractores"""
     instance = extractor_class()
     _EXTRACTORS_REGISTRY.append(instance)
+    _DOMAIN_INDEX.add(len(_EXTRACTORS_REGISTRY) - 1, instance)
     return extractor_class
 
 def get_extractor(domain: str) -> Optional[BaseExtractor]:
     """Obtiene el extractor apropiado para el dominio"""
+    position = _DOMAIN_INDEX.lookup(domain)
+    return None if position is None else _EXTRACTORS_REGISTRY[position]
+
+def get_extractor_linear(domain: str) -> Optional[BaseExtractor]:
+    """Búsqueda lineal con can_handle (referencia para verificar y medir el índice)"""
     for extractor in _EXTRACTORS_REGISTRY:
         if extractor.can_handle(domain):
             return extractor
-    return None
\ No newline at end of file
+    return None
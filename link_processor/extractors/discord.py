@@ -110,8 +110,8 @@ class DiscordExtractor(BaseExtractor):
         if 'media.discordapp.net' in domain or 'cdn.discordapp.com' in domain:
             content_type = "media"
             # Buscar patrones específicos primero
-            for pattern in self.PATTERNS['media']:
-                match = re.search(pattern, path)
+            for pattern in self.compiled_patterns()['media']:
+                match = pattern.search(path)
                 if match:
                     server_id = match.group(1) if match.groups() else path.strip('/')
                     return content_type, server_id, channel_id
@@ -120,13 +120,13 @@ class DiscordExtractor(BaseExtractor):
             return content_type, server_id, channel_id
         
         # Verificar todos los patrones regex en orden
-        for content_type_name, patterns in self.PATTERNS.items():
+        for content_type_name, patterns in self.compiled_patterns().items():
             # Saltar patrones de media ya que los manejamos arriba
             if content_type_name == 'media':
                 continue
                 
             for pattern in patterns:
-                match = re.search(pattern, path)
+                match = pattern.search(path)
                 if match:
                     content_type = content_type_name
                     
@@ -98,12 +98,12 @@ class FacebookExtractor(BaseExtractor):
         sub_type = ""
         
         # Verificar todos los patrones regex en orden de especificidad
-        for page_type_name, patterns in self.PATTERNS.items():
+        for page_type_name, patterns in self.compiled_patterns().items():
             for pattern in patterns:
                 # Para patrones que incluyen query parameters, buscar en full_path
                 # Para otros, buscar solo en path
-                search_text = full_path if '?' in pattern else path
-                match = re.search(pattern, search_text)
+                search_text = full_path if '?' in pattern.pattern else path
+                match = pattern.search(search_text)
                 if match:
                     page_type = page_type_name
                     
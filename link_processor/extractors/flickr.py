@@ -85,9 +85,9 @@ class FlickrExtractor(BaseExtractor):
         album_id = ""
 
         # Verificar todos los patrones regex en orden de especificidad
-        for content_type_name, patterns in self.PATTERNS.items():
+        for content_type_name, patterns in self.compiled_patterns().items():
             for pattern in patterns:
-                match = re.search(pattern, path)
+                match = pattern.search(path)
                 if not match:
                     continue
 
@@ -99,114 +99,110 @@ class GitHubExtractor(BaseExtractor):
         is_raw = 'raw.githubusercontent.com' in netloc
 
         # Verificar todos los patrones en orden
-        for pattern_type, pattern in self.PATTERNS:
+        for pattern_type, groups in self.iter_routes(path):
             # Saltar patrones que no corresponden al dominio actual
             if pattern_type.startswith('gist') and not is_gist:
                 continue
             if pattern_type == 'raw' and not is_raw:
                 continue
-                
-            match = re.match(pattern, path)
-            if match:
-                groups = match.groups()
-                
-                # Procesar según el tipo de patrón
-                if pattern_type == 'raw':
-                    username, repo, ref, filepath = groups
-                    content_type = 'file'
-                    filename = f"{ref}/{filepath}"
-                    
-                elif pattern_type == 'gist':
-                    username, gist_id = groups
-                    content_type = 'gist'
-                    filename = gist_id
-                    
-                elif pattern_type == 'gist_user':
-                    username = groups[0]
-                    content_type = 'gist_list'
-                    
-                elif pattern_type == 'file':
-                    username, repo, branch, filepath = groups
-                    content_type = 'file'
-                    filename = f"{branch}/{filepath}"
-                    
-                elif pattern_type == 'directory':
-                    username, repo, branch, dirpath = groups
-                    content_type = 'directory'
-                    filename = f"{branch}/{dirpath}"
-                    
-                elif pattern_type in ('compare', 'tags', 'branches'):
-                    username, repo = groups[0], groups[1]
-                    content_type = 'repo'   
-                    filename = ''
-                    
-                elif pattern_type == 'commit':
-                    username, repo, commit_hash = groups
-                    content_type = 'commit'
-                    filename = commit_hash
-                    
-                elif pattern_type == 'issue':
-                    username, repo, issue_num = groups
-                    content_type = 'issue'
-                    filename = issue_num
-                    
-                elif pattern_type == 'issues_list':
-                    username, repo = groups
-                    content_type = 'issue'
-                    
-                elif pattern_type == 'pull_request':
-                    username, repo, pr_num = groups
-                    content_type = 'pull_request'
-                    filename = pr_num
-                    
-                elif pattern_type == 'pulls_list':
-                    username, repo = groups
-                    content_type = 'pull_request'
-                    
-                elif pattern_type == 'release_tag':
-                    username, repo, tag = groups
-                    content_type = 'release'
-                    filename = f"tag/{tag}"
-                    
-                elif pattern_type == 'releases_list':
-                    username, repo = groups
-                    content_type = 'release'
-                    
-                elif pattern_type == 'wiki_page':
-                    username, repo, page = groups
-                    content_type = 'wiki'
-                    filename = page
-                    
-                elif pattern_type == 'wiki':
-                    username, repo = groups
-                    content_type = 'wiki'
-                    
-                elif pattern_type == 'project':
-                    username, repo, project_id = groups
-                    content_type = 'project'
-                    filename = project_id
-                    
-                elif pattern_type == 'projects':
-                    username, repo = groups
-                    content_type = 'project'
-                    
-                elif pattern_type == 'actions':
-                    username, repo = groups
-                    content_type = 'actions'
-                    
-                elif pattern_type == 'security':
-                    username, repo = groups
-                    content_type = 'security'
-                    
-                elif pattern_type == 'repo':
-                    username, repo = groups
-                    content_type = 'repo'
-                    
-                elif pattern_type == 'profile':
-                    username = groups[0]
-                    content_type = 'profile'
-                    
-                break
+
+            # Procesar según el tipo de patrón
+            if pattern_type == 'raw':
+                username, repo, ref, filepath = groups
+                content_type = 'file'
+                filename = f"{ref}/{filepath}"
+                    
+            elif pattern_type == 'gist':
+                username, gist_id = groups
+                content_type = 'gist'
+                filename = gist_id
+                    
+            elif pattern_type == 'gist_user':
+                username = groups[0]
+                content_type = 'gist_list'
+                    
+            elif pattern_type == 'file':
+                username, repo, branch, filepath = groups
+                content_type = 'file'
+                filename = f"{branch}/{filepath}"
+                    
+            elif pattern_type == 'directory':
+                username, repo, branch, dirpath = groups
+                content_type = 'directory'
+                filename = f"{branch}/{dirpath}"
+                    
+            elif pattern_type in ('compare', 'tags', 'branches'):
+                username, repo = groups[0], groups[1]
+                content_type = 'repo'   
+                filename = ''
+                    
+            elif pattern_type == 'commit':
+                username, repo, commit_hash = groups
+                content_type = 'commit'
+                filename = commit_hash
+                    
+            elif pattern_type == 'issue':
+                username, repo, issue_num = groups
+                content_type = 'issue'
+                filename = issue_num
+                    
+            elif pattern_type == 'issues_list':
+                username, repo = groups
+                content_type = 'issue'
+                    
+            elif pattern_type == 'pull_request':
+                username, repo, pr_num = groups
+                content_type = 'pull_request'
+                filename = pr_num
+                    
+            elif pattern_type == 'pulls_list':
+                username, repo = groups
+                content_type = 'pull_request'
+                    
+            elif pattern_type == 'release_tag':
+                username, repo, tag = groups
+                content_type = 'release'
+                filename = f"tag/{tag}"
+                    
+            elif pattern_type == 'releases_list':
+                username, repo = groups
+                content_type = 'release'
+                    
+            elif pattern_type == 'wiki_page':
+                username, repo, page = groups
+                content_type = 'wiki'
+                filename = page
+                    
+            elif pattern_type == 'wiki':
+                username, repo = groups
+                content_type = 'wiki'
+                    
+            elif pattern_type == 'project':
+                username, repo, project_id = groups
+                content_type = 'project'
+                filename = project_id
+                    
+            elif pattern_type == 'projects':
+                username, repo = groups
+                content_type = 'project'
+                    
+            elif pattern_type == 'actions':
+                username, repo = groups
+                content_type = 'actions'
+                    
+            elif pattern_type == 'security':
+                username, repo = groups
+                content_type = 'security'
+                    
+            elif pattern_type == 'repo':
+                username, repo = groups
+                content_type = 'repo'
+                    
+            elif pattern_type == 'profile':
+                username = groups[0]
+                content_type = 'profile'
+                    
+            break
 
         return content_type, username, repo, filename
 
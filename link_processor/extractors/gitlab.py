@@ -154,211 +154,207 @@ class GitLabExtractor(BaseExtractor):
         file_path = ""
 
         # Verificar todos los patrones en orden
-        for pattern_type, pattern in self.PATTERNS:
-            match = re.match(pattern, path)
-            if match:
-                groups = match.groups()
-                
-                # Procesar según el tipo de patrón
-                if pattern_type == 'snippet_global':
-                    snippet_id = groups[0]
-                    content_type = 'snippet'
-                    file_path = snippet_id
-                    
-                elif pattern_type == 'raw':
-                    username, project, ref, filepath = groups
-                    content_type = 'file'
-                    file_path = f"{ref}/{filepath}"
-                    
-                elif pattern_type == 'file':
-                    username, project, ref, filepath = groups
-                    content_type = 'file'
-                    file_path = f"{ref}/{filepath}"
-                    
-                elif pattern_type == 'directory':
-                    username, project, ref, dirpath = groups
-                    content_type = 'directory'
-                    file_path = f"{ref}/{dirpath}"
-                    
-                elif pattern_type == 'issue':
-                    username, project, issue_num = groups
-                    content_type = 'issue'
-                    file_path = issue_num
-                    
-                elif pattern_type == 'issues_list':
-                    username, project = groups
-                    content_type = 'issue'
-                    
-                elif pattern_type == 'merge_request':
-                    username, project, mr_num = groups
-                    content_type = 'merge_request'
-                    file_path = mr_num
-                    
-                elif pattern_type == 'merge_requests_list':
-                    username, project = groups
-                    content_type = 'merge_request'
-                    
-                elif pattern_type == 'commit':
-                    username, project, commit_hash = groups
-                    content_type = 'commit'
-                    file_path = commit_hash
-                    
-                elif pattern_type == 'tag':
-                    username, project, tag = groups
-                    content_type = 'tag'  # Cambiado de 'tags' a 'tag' para específico
-                    file_path = tag
-                    
-                elif pattern_type == 'tags_list':
-                    username, project = groups
-                    content_type = 'tags'
-                    
-                elif pattern_type == 'releases_list':
-                    username, project = groups
-                    content_type = 'releases'
-                    
-                elif pattern_type == 'wiki_page':
-                    username, project, page = groups
-                    content_type = 'wiki'
-                    file_path = page
-                    
-                elif pattern_type == 'wiki':
-                    username, project = groups
-                    content_type = 'wiki'
-                    
-                elif pattern_type == 'snippet':
-                    username, project, snippet_id = groups
-                    content_type = 'snippet'
-                    file_path = snippet_id
-                    
-                elif pattern_type == 'snippets_list':
-                    username, project = groups
-                    content_type = 'snippet'
-                    
-                elif pattern_type == 'pipeline':
-                    username, project, pipeline_id = groups
-                    content_type = 'pipeline'
-                    file_path = pipeline_id
-                    
-                elif pattern_type == 'pipelines_list':
-                    username, project = groups
-                    content_type = 'pipeline'
-                    
-                elif pattern_type == 'job':
-                    username, project, job_id = groups
-                    content_type = 'job'
-                    file_path = job_id
-                    
-                elif pattern_type == 'jobs_list':
-                    username, project = groups
-                    content_type = 'job'
-                    
-                elif pattern_type == 'settings_section':  # IMPORTANTE: Este debe ir antes de 'settings'
-                    username, project, section = groups
-                    content_type = 'settings'
-                    file_path = section
-                    
-                elif pattern_type == 'settings':
-                    username, project = groups
-                    content_type = 'settings'
-                    
-                elif pattern_type == 'activity':
-                    username, project = groups
-                    content_type = 'activity'
-                    
-                elif pattern_type == 'graphs':
-                    username, project, ref = groups
-                    content_type = 'graphs'
-                    file_path = ref
-                    
-                elif pattern_type == 'network':
-                    username, project, ref = groups
-                    content_type = 'network'
-                    file_path = ref
-                    
-                elif pattern_type == 'compare':
-                    username, project = groups
-                    content_type = 'compare'
-                    
-                elif pattern_type == 'badge':
-                    username, project, ref, badge_file = groups
-                    content_type = 'badge'
-                    file_path = f"{ref}/{badge_file}"
-                    
-                elif pattern_type == 'project_members':
-                    username, project = groups
-                    content_type = 'project_members'
-                    
-                elif pattern_type == 'milestone':
-                    username, project, milestone_id = groups
-                    content_type = 'milestone'
-                    file_path = milestone_id
-                    
-                elif pattern_type == 'milestones_list':
-                    username, project = groups
-                    content_type = 'milestone'
-                    
-                elif pattern_type == 'labels':
-                    username, project = groups
-                    content_type = 'labels'
-                    
-                elif pattern_type == 'boards':
-                    username, project = groups
-                    content_type = 'boards'
-                    
-                elif pattern_type == 'services':
-                    username, project = groups
-                    content_type = 'services'
-                    
-                elif pattern_type == 'deploy_keys':
-                    username, project = groups
-                    content_type = 'deploy_keys'
-                    
-                elif pattern_type == 'protected_branches':
-                    username, project = groups
-                    content_type = 'protected_branches'
-                    
-                elif pattern_type == 'hooks':
-                    username, project = groups
-                    content_type = 'hooks'
-                    
-                elif pattern_type == 'import':
-                    username, project = groups
-                    content_type = 'import'
-                    
-                elif pattern_type == 'analytics':
-                    username, project = groups
-                    content_type = 'analytics'
-                    
-                elif pattern_type == 'ci_lint':
-                    username, project = groups
-                    content_type = 'ci_lint'
-                    
-                elif pattern_type == 'runners':
-                    username, project = groups
-                    content_type = 'runners'
-                    
-                elif pattern_type == 'packages':
-                    username, project = groups
-                    content_type = 'packages'
-                    
-                elif pattern_type == 'container_registry':
-                    username, project = groups
-                    content_type = 'container_registry'
-                    
-                elif pattern_type == 'group':
-                    group_name = groups[0]
-                    content_type = 'group'
-                    username = group_name
-                    
-                elif pattern_type == 'project':
-                    username, project = groups
-                    content_type = 'project'
-                    
-                elif pattern_type == 'profile':
-                    username = groups[0]
-                    content_type = 'profile'
-                    
-                break
+        for pattern_type, groups in self.iter_routes(path):
+            # Procesar según el tipo de patrón
+            if pattern_type == 'snippet_global':
+                snippet_id = groups[0]
+                content_type = 'snippet'
+                file_path = snippet_id
+                    
+            elif pattern_type == 'raw':
+                username, project, ref, filepath = groups
+                content_type = 'file'
+                file_path = f"{ref}/{filepath}"
+                    
+            elif pattern_type == 'file':
+                username, project, ref, filepath = groups
+                content_type = 'file'
+                file_path = f"{ref}/{filepath}"
+                    
+            elif pattern_type == 'directory':
+                username, project, ref, dirpath = groups
+                content_type = 'directory'
+                file_path = f"{ref}/{dirpath}"
+                    
+            elif pattern_type == 'issue':
+                username, project, issue_num = groups
+                content_type = 'issue'
+                file_path = issue_num
+                    
+            elif pattern_type == 'issues_list':
+                username, project = groups
+                content_type = 'issue'
+                    
+            elif pattern_type == 'merge_request':
+                username, project, mr_num = groups
+                content_type = 'merge_request'
+                file_path = mr_num
+                    
+            elif pattern_type == 'merge_requests_list':
+                username, project = groups
+                content_type = 'merge_request'
+                    
+            elif pattern_type == 'commit':
+                username, project, commit_hash = groups
+                content_type = 'commit'
+                file_path = commit_hash
+                    
+            elif pattern_type == 'tag':
+                username, project, tag = groups
+                content_type = 'tag'  # Cambiado de 'tags' a 'tag' para específico
+                file_path = tag
+                    
+            elif pattern_type == 'tags_list':
+                username, project = groups
+                content_type = 'tags'
+                    
+            elif pattern_type == 'releases_list':
+                username, project = groups
+                content_type = 'releases'
+                    
+            elif pattern_type == 'wiki_page':
+                username, project, page = groups
+                content_type = 'wiki'
+                file_path = page
+                    
+            elif pattern_type == 'wiki':
+                username, project = groups
+                content_type = 'wiki'
+                    
+            elif pattern_type == 'snippet':
+                username, project, snippet_id = groups
+                content_type = 'snippet'
+                file_path = snippet_id
+                    
+            elif pattern_type == 'snippets_list':
+                username, project = groups
+                content_type = 'snippet'
+                    
+            elif pattern_type == 'pipeline':
+                username, project, pipeline_id = groups
+                content_type = 'pipeline'
+                file_path = pipeline_id
+                    
+            elif pattern_type == 'pipelines_list':
+                username, project = groups
+                content_type = 'pipeline'
+                    
+            elif pattern_type == 'job':
+                username, project, job_id = groups
+                content_type = 'job'
+                file_path = job_id
+                    
+            elif pattern_type == 'jobs_list':
+                username, project = groups
+                content_type = 'job'
+                    
+            elif pattern_type == 'settings_section':  # IMPORTANTE: Este debe ir antes de 'settings'
+                username, project, section = groups
+                content_type = 'settings'
+                file_path = section
+                    
+            elif pattern_type == 'settings':
+                username, project = groups
+                content_type = 'settings'
+                    
+            elif pattern_type == 'activity':
+                username, project = groups
+                content_type = 'activity'
+                    
+            elif pattern_type == 'graphs':
+                username, project, ref = groups
+                content_type = 'graphs'
+                file_path = ref
+                    
+            elif pattern_type == 'network':
+                username, project, ref = groups
+                content_type = 'network'
+                file_path = ref
+                    
+            elif pattern_type == 'compare':
+                username, project = groups
+                content_type = 'compare'
+                    
+            elif pattern_type == 'badge':
+                username, project, ref, badge_file = groups
+                content_type = 'badge'
+                file_path = f"{ref}/{badge_file}"
+                    
+            elif pattern_type == 'project_members':
+                username, project = groups
+                content_type = 'project_members'
+                    
+            elif pattern_type == 'milestone':
+                username, project, milestone_id = groups
+                content_type = 'milestone'
+                file_path = milestone_id
+                    
+            elif pattern_type == 'milestones_list':
+                username, project = groups
+                content_type = 'milestone'
+                    
+            elif pattern_type == 'labels':
+                username, project = groups
+                content_type = 'labels'
+                    
+            elif pattern_type == 'boards':
+                username, project = groups
+                content_type = 'boards'
+                    
+            elif pattern_type == 'services':
+                username, project = groups
+                content_type = 'services'
+                    
+            elif pattern_type == 'deploy_keys':
+                username, project = groups
+                content_type = 'deploy_keys'
+                    
+            elif pattern_type == 'protected_branches':
+                username, project = groups
+                content_type = 'protected_branches'
+                    
+            elif pattern_type == 'hooks':
+                username, project = groups
+                content_type = 'hooks'
+                    
+            elif pattern_type == 'import':
+                username, project = groups
+                content_type = 'import'
+                    
+            elif pattern_type == 'analytics':
+                username, project = groups
+                content_type = 'analytics'
+                    
+            elif pattern_type == 'ci_lint':
+                username, project = groups
+                content_type = 'ci_lint'
+                    
+            elif pattern_type == 'runners':
+                username, project = groups
+                content_type = 'runners'
+                    
+            elif pattern_type == 'packages':
+                username, project = groups
+                content_type = 'packages'
+                    
+            elif pattern_type == 'container_registry':
+                username, project = groups
+                content_type = 'container_registry'
+                    
+            elif pattern_type == 'group':
+                group_name = groups[0]
+                content_type = 'group'
+                username = group_name
+                    
+            elif pattern_type == 'project':
+                username, project = groups
+                content_type = 'project'
+                    
+            elif pattern_type == 'profile':
+                username = groups[0]
+                content_type = 'profile'
+                    
+            break
 
         return content_type, username, project, file_path
     
@@ -5,6 +5,10 @@ from typing import Dict, Any, Optional, Tuple
 from urllib.parse import urlparse, parse_qs
 from ..utils.constants import EMOJI_MAPS
 
+# Rutas de Maps con captura hasta el final (compiladas una vez)
+MAPS_DIR_RE = re.compile(r'/dir/(.+)$')
+MAPS_SEARCH_RE = re.compile(r'/search/(.+)$')
+
 @register_extractor
 class GoogleExtractor(BaseExtractor):
     DOMAINS = [
@@ -248,14 +252,14 @@ class GoogleExtractor(BaseExtractor):
         # maps.google.com/maps/dir/Paris/London
         if '/dir/' in path:
             # Capturar toda la ruta de direcciones
-            route_match = re.search(r'/dir/(.+)$', path)
+            route_match = MAPS_DIR_RE.search(path)
             if route_match:
                 route = route_match.group(1)
                 return "maps_directions", route
         
         # google.com/maps/search/restaurants+near+me
         if '/search/' in path:
-            search_match = re.search(r'/search/(.+)$', path)
+            search_match = MAPS_SEARCH_RE.search(path)
             if search_match:
                 search = search_match.group(1)
                 return "maps_search", search
@@ -82,13 +82,7 @@ class ImgurExtractor(BaseExtractor):
         clean_path = path.rstrip('/')
         content_type, content_id, additional_info = "home", "", {}
 
-        for pattern_type, pattern in self.PATTERNS:
-            match = re.match(pattern, clean_path)
-            if not match:
-                continue
-
-            groups = match.groups()
-
+        for pattern_type, groups in self.iter_routes(clean_path):
             if pattern_type in {"image_direct_ext", "image_direct_no_ext", "image_with_ext"}:
                 content_type = "image"
                 content_id = groups[0]
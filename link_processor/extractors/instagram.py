@@ -85,13 +85,7 @@ class InstagramExtractor(BaseExtractor):
             'business', '_u', 'reels', 'guides', 'channel', 'saved', 'tagged'
         }
 
-        for pattern_type, pattern in self.PATTERNS:
-            match = re.match(pattern, clean_path)
-            if not match:
-                continue
-
-            groups = match.groups()
-
+        for pattern_type, groups in self.iter_routes(clean_path):
             if pattern_type == "stories_highlights":
                 content_type, content_id = "highlight", groups[0]
                 
@@ -78,13 +78,7 @@ class LikeeExtractor(BaseExtractor):
         clean_path = path.rstrip('/')
         content_type, content_id, username, additional_info = "home", "", "", {}
 
-        for pattern_type, pattern in self.PATTERNS:
-            match = re.match(pattern, clean_path)
-            if not match:
-                continue
-
-            groups = match.groups()
-
+        for pattern_type, groups in self.iter_routes(clean_path):
             if pattern_type == "video_detail":
                 content_type, content_id = "video", groups[0]
                 
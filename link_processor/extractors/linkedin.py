@@ -106,13 +106,7 @@ class LinkedInExtractor(BaseExtractor):
         clean_path = path.rstrip('/')
         content_type, content_id, sub_type, additional_info = "home", "", "", {}
 
-        for pattern_type, pattern in self.PATTERNS:
-            match = re.match(pattern, clean_path)
-            if not match:
-                continue
-
-            groups = match.groups()
-
+        for pattern_type, groups in self.iter_routes(clean_path):
             if pattern_type == "profile_experience":
                 content_type, content_id, sub_type = "profile", groups[0], "experience"
             elif pattern_type == "profile_edit":
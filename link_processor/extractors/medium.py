@@ -136,13 +136,7 @@ class MediumExtractor(BaseExtractor):
             return content_type, content_id, username, publication, additional_info
 
         # **PATRONES REGULARES** (solo para medium.com/www.medium.com y cuando no es subdominio personalizado)
-        for pattern_type, pattern in self.PATTERNS:
-            match = re.match(pattern, clean_path)
-            if not match:
-                continue
-
-            groups = match.groups()
-
+        for pattern_type, groups in self.iter_routes(clean_path):
             if pattern_type == "mobile_identity":
                 content_type, content_id = "mobile", "identity"
             elif pattern_type == "mobile_signin":
@@ -89,13 +89,7 @@ class PinterestExtractor(BaseExtractor):
         query_params = parse_qs(parsed_url.query)
         content_type, content_id, username, additional_info = "home", "", "", {}
 
-        for pattern_type, pattern in self.PATTERNS:
-            match = re.match(pattern, path)
-            if not match:
-                continue
-
-            groups = match.groups()
-
+        for pattern_type, groups in self.iter_routes(path):
             if pattern_type in ["pin_with_params", "pin_direct"]:
                 content_type, content_id = "pin", groups[0]
             
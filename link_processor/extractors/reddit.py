@@ -88,13 +88,7 @@ class RedditExtractor(BaseExtractor):
         clean_path = path.rstrip('/')
         content_type, subreddit, content_id, additional_info = "home", "", "", {}
 
-        for pattern_type, pattern in self.PATTERNS:
-            match = re.match(pattern, clean_path)
-            if not match:
-                continue
-
-            groups = match.groups()
-
+        for pattern_type, groups in self.iter_routes(clean_path):
             if pattern_type == "comment":
                 content_type, subreddit, content_id = "comment", groups[0], groups[2]
                 additional_info["post_id"] = groups[1]
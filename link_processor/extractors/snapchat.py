@@ -93,13 +93,7 @@ class SnapchatExtractor(BaseExtractor):
         clean_path = path.rstrip('/')
         content_type, content_id, username, additional_info = "home", "", "", {}
 
-        for pattern_type, pattern in self.PATTERNS:
-            match = re.match(pattern, clean_path)
-            if not match:
-                continue
-
-            groups = match.groups()
-
+        for pattern_type, groups in self.iter_routes(clean_path):
             if pattern_type == "lens_try":
                 content_type, content_id = "lens_try", groups[0]
             elif pattern_type == "lens_direct":
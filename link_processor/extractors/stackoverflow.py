@@ -106,13 +106,7 @@ class StackOverflowExtractor(BaseExtractor):
         if len(domain_parts) > 2 and domain_parts[0] not in ['www', 'stackoverflow']:
             additional_info["language_site"] = domain_parts[0]
 
-        for pattern_type, pattern in self.PATTERNS:
-            match = re.match(pattern, clean_path)
-            if not match:
-                continue
-
-            groups = match.groups()
-
+        for pattern_type, groups in self.iter_routes(clean_path):
             if pattern_type == "answer_specific":
                 content_type, question_id, answer_id = "answer", groups[0], groups[1]
             elif pattern_type in ["question_with_slug", "question_short"]:
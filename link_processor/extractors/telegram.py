@@ -59,13 +59,7 @@ class TelegramExtractor(BaseExtractor):
         message_id = ""
         additional_info = {}
 
-        for pattern_type, pattern in self.PATTERNS:
-            match = re.match(pattern, clean_path)
-            if not match:
-                continue
-
-            groups = match.groups()
-
+        for pattern_type, groups in self.iter_routes(clean_path):
             if pattern_type == "invite_joinchat":
                 content_type, content_id = "invite", groups[0]
             elif pattern_type == "invite_plus":
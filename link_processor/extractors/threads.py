@@ -56,13 +56,7 @@ class ThreadsExtractor(BaseExtractor):
         content_id = ""
         additional_info = {}
 
-        for pattern_type, pattern in self.PATTERNS:
-            match = re.match(pattern, clean_path)
-            if not match:
-                continue
-
-            groups = match.groups()
-
+        for pattern_type, groups in self.iter_routes(clean_path):
             if pattern_type == "post_with_user_at":
                 content_type, content_id = "post", groups[1]
                 additional_info["username"] = groups[0]
@@ -8,6 +8,7 @@ from ..utils.constants import EMOJI_MAPS
 @register_extractor
 class TumblrExtractor(BaseExtractor):
     DOMAINS = ['tumblr.com', 'www.tumblr.com']
+    WILDCARD_DOMAINS = ['tumblr.com']
     SITE_NAME = 'Tumblr'
 
     # Patrones regex para Tumblr - REORDENADOS con los más específicos primero
@@ -109,13 +110,7 @@ class TumblrExtractor(BaseExtractor):
             additional_info["username"] = domain_parts[0]
             content_type = "blog_home"
 
-        for pattern_type, pattern in self.PATTERNS:
-            match = re.match(pattern, clean_path)
-            if not match:
-                continue
-
-            groups = match.groups()
-
+        for pattern_type, groups in self.iter_routes(clean_path):
             # Procesar posts sin subdominio primero (extraen username de la ruta)
             if pattern_type.startswith("post_no_subdomain_"):
                 if len(groups) >= 2:
@@ -79,17 +79,8 @@ class TwitterExtractor(BaseExtractor):
         if "t.co" in (parsed_url.netloc or ""):
             return "", "", "short_link"
 
-        for pattern_type, pattern in self.PATTERNS:
-            try:
-                match = re.match(pattern, clean_path)
-            except re.error:
-                match = None
-
-            if not match:
-                continue
-
-            groups = match.groups()
-
+        # Los patrones inválidos se descartan al compilar las rutas
+        for pattern_type, groups in self.iter_routes(clean_path):
             # tweet variants
             if pattern_type in ["tweet_photo", "tweet_video", "tweet_retweets", "tweet_likes"]:
                 username, content_id = groups[0], groups[1]
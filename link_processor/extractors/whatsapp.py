@@ -126,13 +126,7 @@ class WhatsAppExtractor(BaseExtractor):
             return content_type, channel_id
         
         # Para el resto de URLs de whatsapp.com
-        for pattern_type, pattern in self.PATTERNS:
-            match = re.match(pattern, clean_path)
-            if not match:
-                continue
-                
-            groups = match.groups()
-            
+        for pattern_type, groups in self.iter_routes(clean_path):
             if pattern_type in ["channel_info", "channel", "invite_with_context", "invite", 
                                "contact_with_name", "contact", "api_version", "api_endpoint",
                                "blog_dated", "blog_post", "support_section", "download_os",
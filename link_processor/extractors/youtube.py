@@ -5,6 +5,9 @@ from typing import Dict, Any, Optional, Tuple
 from urllib.parse import urlparse, parse_qs
 from ..utils.constants import EMOJI_MAPS
 
+# Ruta de youtu.be (/<id>), compilada una vez
+YOUTU_BE_RE = re.compile(r'^/([a-zA-Z0-9_-]+)$')
+
 @register_extractor
 class YouTubeExtractor(BaseExtractor):
     DOMAINS = ['youtube.com', 'youtu.be', 'music.youtube.com', 'youtubekids.com', 'studio.youtube.com', 'www.youtube.com']
@@ -112,7 +115,7 @@ class YouTubeExtractor(BaseExtractor):
 
         # Si el dominio es youtu.be, manejamos de manera especial
         if 'youtu.be' in parsed_url.netloc:
-            match = re.match(r'^/([a-zA-Z0-9_-]+)$', clean_path)
+            match = YOUTU_BE_RE.match(clean_path)
             if match:
                 content_type = "video"
                 content_id = match.group(1)
@@ -122,13 +125,7 @@ class YouTubeExtractor(BaseExtractor):
                 return content_type, content_id, additional_info
 
         # Para los demás dominios, aplicamos los patrones
-        for pattern_type, pattern in self.PATTERNS:
-            match = re.match(pattern, clean_path)
-            if not match:
-                continue
-
-            groups = match.groups()
-
+        for pattern_type, groups in self.iter_routes(clean_path):
             if pattern_type == "shorts":
                 content_type, content_id = "short", groups[0]
             elif pattern_type == "live":
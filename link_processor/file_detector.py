@@ -54,15 +54,15 @@ class FileTypeDetector:
             r'i\.imgur\.com'
         ]
         
+        # Todas las exclusiones en una sola alternancia (misma semántica que re.search de cada una)
+        self.excluded_pattern = re.compile('|'.join(self.excluded_domains))
+        
         # Patrón regex para detectar extensiones de archivo
         self.extension_pattern = re.compile(r'\.([a-zA-Z0-9]+)(?:\?.*)?$')
     
     def should_ignore_domain(self, url: str) -> bool:
         """Verifica si la URL pertenece a un dominio que debe ser ignorado"""
-        for pattern in self.excluded_domains:
-            if re.search(pattern, url):
-                return True
-        return False
+        return self.excluded_pattern.search(url) is not None
     
     def get_file_type(self, url: str) -> Dict[str, str]:
         """Detecta el tipo de archivo usando regex y retorna información"""
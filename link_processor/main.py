@@ -1,44 +1,140 @@
 import re
-from typing import Match
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Match
 from urllib.parse import urlparse
 from .file_detector import FileTypeDetector
 from .extractors import get_extractor
 
+# Tamaño por defecto del caché LRU de URLs procesadas
+DEFAULT_CACHE_SIZE = 4096
+# Largo máximo del título de la página agregado a la salida
+MAX_TITLE_LENGTH = 80
+
+
+def normalize_url(url: str) -> str:
+    """
+    Normaliza la URL para usarla como clave del caché (y como entrada del procesamiento):
+    sin espacios alrededor y con esquema y dominio en minúscula. La ruta y la query se
+    conservan tal cual (distinguen mayúsculas).
+    """
+    url = url.strip()
+    scheme, sep, rest = url.partition('://')
+    if not sep:
+        return url
+    end = len(rest)
+    for ch in '/?#':
+        i = rest.find(ch)
+        if i != -1 and i < end:
+            end = i
+    return f"{scheme.lower()}://{rest[:end].lower()}{rest[end:]}"
+
+
 class LinkProcessor:
-    def __init__(self):
+    def __init__(self, cache_size: int = DEFAULT_CACHE_SIZE, metadata_cache=None):
         self.file_detector = FileTypeDetector()
-    
+        # Caché de metadatos (link_processor.enrichment): solo se lee, nunca hay E/S de red
+        self.metadata_cache = metadata_cache
+        # URL normalizada -> salida formateada (LRU acotado; 0 desactiva el caché)
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, str]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
     def replace_link(self, match: Match) -> str:
         """Para uso con re.sub() - espera un objeto Match"""
         url = match.group(0)
         return self.process_url(url)
-    
+
     def process_url(self, url: str) -> str:
         """Procesa una URL directamente - para uso en tests y otros contextos"""
+        key = normalize_url(url)
+        result = self._process_cached(key)
+        if self.metadata_cache is not None:
+            result = self._with_metadata(key, result)
+        return result
+
+    def _process_cached(self, key: str) -> str:
+        if self.cache_size <= 0:
+            return self._process(key)
+
+        with self._cache_lock:
+            result = self._cache.get(key)
+            if result is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return result
+            self.misses += 1
+
+        result = self._process(key)
+        with self._cache_lock:
+            self._cache[key] = result
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return result
+
+    def process_many(self, urls: Iterable[str]) -> List[str]:
+        """
+        Procesa un lote de URLs (en el mismo orden). Las repetidas dentro del lote se
+        procesan una sola vez y las ya vistas salen del caché LRU.
+        """
+        seen: Dict[str, str] = {}
+        results = []
+        for url in urls:
+            key = normalize_url(url)
+            result = seen.get(key)
+            if result is None:
+                result = seen[key] = self.process_url(key)
+            results.append(result)
+        return results
+
+    def cache_info(self) -> Dict[str, int]:
+        """Estadísticas del caché (aciertos, fallos, tamaño actual y máximo)"""
+        return {'hits': self.hits, 'misses': self.misses,
+                'size': len(self._cache), 'max_size': self.cache_size}
+
+    def clear_cache(self):
+        with self._cache_lock:
+            self._cache.clear()
+            self.hits = self.misses = 0
+
+    def _with_metadata(self, key: str, result: str) -> str:
+        """Agrega el título de la página (si ya está en el caché de metadatos)"""
+        meta = self.metadata_cache.get(key)
+        title = " ".join((meta or {}).get("title", "").split())
+        if not title or not result.endswith("]"):
+            return result
+        if len(title) > MAX_TITLE_LENGTH:
+            title = title[:MAX_TITLE_LENGTH - 1].rstrip() + "…"
+        return f"{result[:-1]} - «{title}»]"
+
+    def _process(self, url: str) -> str:
         parsed = urlparse(url)
         domain = parsed.netloc.lower()
-        
+
         # 1. Verificar si es archivo - PASAR LA URL COMPLETA, no solo el path
         file_info = self.file_detector.get_file_type(url)
         if file_info['type'] != 'unknown':
             return self.file_detector.format_file_output(file_info)
-        
+
         # 2. Buscar extractor específico
         extractor = get_extractor(domain)
         if extractor:
             result = extractor.extract(parsed, domain)
             if result:
                 return extractor.format_output(result)
-        
+
         # 3. Enlace genérico
         return self._format_generic_link(domain)
-    
+
     def _format_generic_link(self, domain: str) -> str:
         """Formatea enlaces genéricos"""
         # Remover www. solo para display, no para lógica de extractores
         display_domain = re.sub(r"^www\.", "", domain)
         domain_parts = display_domain.split('.')
-        
+
         if len(domain_parts) >= 2:
             site_name = domain_parts[-2].capitalize()
             return f"[🔗 Enlace a {site_name}]"
@@ -74,6 +74,8 @@ class AlarmManager:
         self.alarm_queue = queue.Queue()
         self.message_cache = defaultdict(list)
         self.lock = threading.RLock()
+        # Procesador de enlaces compartido (su caché LRU sirve entre ejecuciones de alarmas)
+        self.link_processor = LinkProcessor() if HAS_LINK_PROCESSOR else None
 
         # Configurar API de IA si está disponible
         if HAS_AI_API:
@@ -633,10 +635,10 @@ class AlarmManager:
                 if matches and ('url' in name.lower() or 'enlace' in name.lower() or 'link' in name.lower()):
                     if HAS_LINK_PROCESSOR:
                         processed_matches = []
+                        processor = self.link_processor
                         for match in matches:
                             if isinstance(match, str):
                                 try:
-                                    processor = LinkProcessor()
                                     processed = processor.process_url(match)
                                     processed_matches.append(processed)
                                 except Exception as e:
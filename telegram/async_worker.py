@@ -16,6 +16,7 @@ from utils.cache import (
 )
 from utils.text_processing import sanitize_filename
 from telegram.message_parser import parse_message
+from link_processor.enrichment import get_metadata_cache
 
 class AsyncWorker(QThread):
     success = pyqtSignal(str)
@@ -537,6 +538,7 @@ class AsyncWorker(QThread):
 
         successful = []
         failed = []
+        saved_files = []
         total_chats = len(self.selected_chats or [])
 
         # Si no hay chats seleccionados pero es análisis de hilos, procesar archivos existentes
@@ -552,6 +554,10 @@ class AsyncWorker(QThread):
 
         start_date, end_date = self.date_range
 
+        # Títulos de enlaces ya resueltos: el caché se lee aquí, fuera del event loop,
+        # para que parse_message/clean_message_text nunca toquen el disco
+        await asyncio.to_thread(get_metadata_cache().reload)
+
         for i, chat_info in enumerate(self.selected_chats):
             try:
                 self.download_progress.emit(chat_info["name"], i + 1, total_chats)
@@ -582,7 +588,9 @@ class AsyncWorker(QThread):
                     messages.append(msg_data)
                 
                 if messages:
-                    await self._save_chat_files(chat_name, messages, start_date, end_date, self.task_args.get('path', '.'))
+                    saved_files.append(
+                        await self._save_chat_files(chat_name, messages, start_date, end_date, self.task_args.get('path', '.'))
+                    )
                     successful.append(chat_name)
                     print(f"✅ Chat {chat_name} procesado: {len(messages)} mensajes")
                 else:
@@ -595,6 +603,13 @@ class AsyncWorker(QThread):
                 failed.append(error_msg)
                 print(f"❌ Error en {chat_info.get('name', '<unknown>')}: {e}")
 
+        # Enriquecimiento de enlaces (opcional): después de exportar, nunca durante
+        if saved_files and self.task_args.get('enrich_links'):
+            try:
+                await self._enrich_links(saved_files)
+            except Exception as e:
+                print(f"⚠️ Error enriqueciendo enlaces: {e}")
+
         try:
             if self.analysis_type == "threads":
                 await self._process_conversation_threads()
@@ -628,6 +643,18 @@ class AsyncWorker(QThread):
         with open(json_filename, "w", encoding="utf-8") as f:
             json.dump(json_data, f, ensure_ascii=False, indent=2)
 
+        return json_filename
+
+    async def _enrich_links(self, json_files):
+        """Resuelve los metadatos de los enlaces de los chats exportados (caché en disco)"""
+        from link_processor.enrichment import enrich_export, make_fetchers
+
+        fetchers = make_fetchers(self.task_args.get('link_fetchers', ['http']))
+        concurrency = self.task_args.get('link_concurrency', 8)
+        for json_file in json_files:
+            print(f"🔗 Enriqueciendo enlaces de: {json_file}")
+            await enrich_export(json_file, fetchers, concurrency=concurrency)
+
     async def _preview_chat(self):
         try:
             if not self.selected_chats:
@@ -5,7 +5,7 @@ from telethon.tl.types import (
     MessageEntityMention,
     MessageEntityMentionName,
 )
-from utils.text_processing import clean_message_text
+from utils.text_processing import clean_message_text, extract_links
 
 
 async def parse_message(msg):
@@ -67,6 +67,7 @@ async def parse_message(msg):
         "sender_name": sender_name,
         "sender_username": sender_username,
         "text": clean_message_text(text),
+        "links": extract_links(text),
         "reactions": reactions,
         "mentions": mentions,
         "reply_id": reply_id,
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Benchmark del tiempo de importación de main.py (arranque de la GUI) y de los módulos de NLP.
+
+Cada módulo se importa en un proceso nuevo (python -X importtime), varias veces, y se reporta:
+ - tiempo de importación (mediana / mínimo)
+ - los módulos más costosos (tiempo acumulado según -X importtime)
+ - si quedó cargado algún módulo pesado de NLP (spacy, nltk, googletrans), que no deberían
+   importarse hasta el primer análisis
+
+Uso:
+    python tests/import_time_benchmark.py [--runs 5] [--top 10] [modulo ...]
+"""
+
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_MODULES = [
+    "main",
+    "utils.sentiments.sentiment_rules",
+    "utils.sentiments.pattern_extractor",
+    "threads_analysis.knowledge_graph",
+]
+
+HEAVY_MODULES = ("spacy", "nltk", "googletrans")
+
+PROBE = (
+    "import sys, time\n"
+    "t = time.perf_counter()\n"
+    "import {module}\n"
+    "dt = time.perf_counter() - t\n"
+    "heavy = [m for m in {heavy!r} if m in sys.modules]\n"
+    "print('RESULT', dt, ','.join(heavy))\n"
+)
+
+
+def run_once(module):
+    """(segundos, módulos pesados cargados, líneas de -X importtime) o None si falla"""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE.format(module=module, heavy=HEAVY_MODULES)],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    result = [l for l in proc.stdout.splitlines() if l.startswith("RESULT")]
+    if proc.returncode != 0 or not result:
+        err = proc.stderr.strip().splitlines()
+        print(f"   ❌ {module}: {err[-1] if err else 'error'}")
+        return None
+    _, seconds, *heavy = result[-1].split(" ")
+    heavy = [h for h in (heavy[0].split(",") if heavy else []) if h]
+    return float(seconds), heavy, proc.stderr.splitlines()
+
+
+def top_imports(importtime_lines, top):
+    """Módulos con mayor tiempo acumulado (µs) según -X importtime"""
+    rows = []
+    for line in importtime_lines:
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue   # cabecera "self [us] | cumulative | imported package"
+        rows.append((int(parts[1]), parts[2].strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def benchmark(module, runs=5, top=10):
+    times = []
+    heavy = []
+    last_lines = []
+    for _ in range(runs):
+        res = run_once(module)
+        if res is None:
+            return None
+        seconds, heavy, last_lines = res
+        times.append(seconds)
+
+    print(f"\n📦 {module}")
+    print(f"   mediana: {statistics.median(times) * 1000:.1f} ms | mínimo: {min(times) * 1000:.1f} ms ({runs} corridas)")
+    print(f"   NLP pesado cargado al importar: {', '.join(heavy) if heavy else 'ninguno'}")
+    for cumulative_us, name in top_imports(last_lines, top):
+        print(f"   {cumulative_us / 1000:9.1f} ms  {name}")
+    return {"module": module, "median_s": statistics.median(times), "min_s": min(times), "heavy": heavy}
+
+
+def main():
+    args = sys.argv[1:]
+    runs, top = 5, 10
+    if "--runs" in args:
+        i = args.index("--runs")
+        runs = int(args[i + 1])
+        del args[i:i + 2]
+    if "--top" in args:
+        i = args.index("--top")
+        top = int(args[i + 1])
+        del args[i:i + 2]
+
+    results = [benchmark(m, runs, top) for m in (args or DEFAULT_MODULES)]
+    failed = [r for r in results if r is None]
+    eager = [r["module"] for r in results if r and r["heavy"]]
+    if eager:
+        print(f"\n⚠️  Módulos que cargan NLP al importar: {', '.join(eager)}")
+    return 1 if failed or eager else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Benchmark del link_processor sobre un corpus de URLs reales.
+
+El corpus sale de los fixtures de tests/link_replacement_tests y, opcionalmente, de
+chats exportados (JSON con 'messages') pasados como argumentos.
+
+Uso:
+    python tests/link_processor_benchmark.py [--repeat 200] [chat.json ...]
+"""
+
+import json
+import os
+import re
+import sys
+import time
+from urllib.parse import urlparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from link_processor.extractors.base import get_extractor, get_extractor_linear
+from link_processor.main import LinkProcessor
+
+FIXTURES_DIR = os.path.join(ROOT, "tests", "link_replacement_tests", "extractors")
+URL_RE = re.compile(r'https?://[^\s"\'<>)\]]+')
+
+
+def load_corpus(chat_files=()):
+    """URLs de los fixtures de tests + URLs de los chats exportados"""
+    urls = []
+    for name in sorted(os.listdir(FIXTURES_DIR)):
+        if name.endswith("_tester.py"):
+            with open(os.path.join(FIXTURES_DIR, name), "r", encoding="utf-8") as f:
+                urls.extend(URL_RE.findall(f.read()))
+    for path in chat_files:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        messages = data.get("messages", []) if isinstance(data, dict) else data
+        for msg in messages:
+            text = msg.get("text") if isinstance(msg, dict) else None
+            if isinstance(text, str):
+                urls.extend(URL_RE.findall(text))
+    return urls
+
+
+def timed(fn, items, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for item in items:
+            fn(item)
+    elapsed = time.perf_counter() - start
+    return len(items) * repeat / elapsed if elapsed > 0 else float("inf")
+
+
+def bench_dispatch(urls, repeat):
+    """Índice de dominios vs. búsqueda lineal con can_handle (y verifica que coincidan)"""
+    domains = [urlparse(u).netloc.lower() for u in urls]
+    mismatches = [d for d in set(domains) if get_extractor(d) is not get_extractor_linear(d)]
+
+    indexed = timed(get_extractor, domains, repeat)
+    linear = timed(get_extractor_linear, domains, repeat)
+    print(f"\n🔎 Despacho de extractores ({len(domains)} dominios, {len(set(domains))} únicos)")
+    print(f"   índice:  {indexed:12,.0f} búsquedas/s")
+    print(f"   lineal:  {linear:12,.0f} búsquedas/s  (x{indexed / linear:.1f})")
+    print(f"   discrepancias: {len(mismatches)}" + (f" -> {mismatches[:5]}" if mismatches else ""))
+    return not mismatches
+
+
+def _first_route_linear(extractor, path):
+    for pattern_type, pattern in extractor.PATTERNS:
+        match = re.match(pattern, path)
+        if match:
+            return pattern_type, match.groups()
+    return None
+
+
+def _first_route(extractor, path):
+    return next(extractor.iter_routes(path), None)
+
+
+def bench_routes(urls, repeat):
+    """Ruteo con la alternancia compilada vs. re.match patrón por patrón (y verifica que coincidan)"""
+    cases = []
+    for url in urls:
+        parsed = urlparse(url)
+        extractor = get_extractor(parsed.netloc.lower())
+        if extractor is not None and isinstance(extractor.PATTERNS, list):
+            cases.append((extractor, parsed.path.rstrip('/')))
+    mismatches = [(type(e).__name__, p) for e, p in cases if _first_route(e, p) != _first_route_linear(e, p)]
+
+    routed = timed(lambda c: _first_route(*c), cases, repeat)
+    linear = timed(lambda c: _first_route_linear(*c), cases, repeat)
+    print(f"\n🧭 Ruteo de patrones ({len(cases)} rutas)")
+    print(f"   compilado: {routed:12,.0f} rutas/s")
+    print(f"   re.match:  {linear:12,.0f} rutas/s  (x{routed / linear:.1f})")
+    print(f"   discrepancias: {len(mismatches)}" + (f" -> {mismatches[:5]}" if mismatches else ""))
+    return not mismatches
+
+
+def bench_processing(urls, repeat):
+    """
+    Exclusiones compiladas vs. re.search una por una, y process_many (caché LRU) vs.
+    process_url sin caché sobre el corpus repetido `repeat` veces (como en un chat real)
+    """
+    detector = LinkProcessor(cache_size=0).file_detector
+
+    def excluded_linear(url):
+        return any(re.search(pattern, url) for pattern in detector.excluded_domains)
+
+    excluded_mismatches = [u for u in urls if detector.should_ignore_domain(u) != excluded_linear(u)]
+    compiled = timed(detector.should_ignore_domain, urls, repeat)
+    linear = timed(excluded_linear, urls, repeat)
+    print(f"\n🚫 Dominios excluidos ({len(detector.excluded_domains)} patrones)")
+    print(f"   alternancia: {compiled:12,.0f} URLs/s")
+    print(f"   re.search:   {linear:12,.0f} URLs/s  (x{compiled / linear:.1f})")
+    print(f"   discrepancias: {len(excluded_mismatches)}")
+
+    stream = urls * repeat
+    uncached = LinkProcessor(cache_size=0)
+    start = time.perf_counter()
+    expected = [uncached.process_url(u) for u in stream]
+    uncached_rate = len(stream) / (time.perf_counter() - start)
+
+    cached = LinkProcessor()
+    start = time.perf_counter()
+    results = cached.process_many(stream)
+    cached_rate = len(stream) / (time.perf_counter() - start)
+
+    mismatches = sum(1 for a, b in zip(results, expected) if a != b)
+    info = cached.cache_info()
+    print(f"\n⚙️  Procesamiento de URLs ({len(stream)} URLs, {len(set(urls))} únicas)")
+    print(f"   process_many: {cached_rate:12,.0f} URLs/s  (caché {info['size']}/{info['max_size']})")
+    print(f"   sin caché:    {uncached_rate:12,.0f} URLs/s  (x{cached_rate / uncached_rate:.1f})")
+    print(f"   discrepancias: {mismatches}")
+    return not excluded_mismatches and not mismatches
+
+
+def main():
+    args = sys.argv[1:]
+    repeat = 200
+    if "--repeat" in args:
+        i = args.index("--repeat")
+        repeat = int(args[i + 1])
+        del args[i:i + 2]
+
+    urls = load_corpus(args)
+    print(f"📦 Corpus: {len(urls)} URLs")
+    ok = bench_dispatch(urls, repeat)
+    ok = bench_routes(urls, repeat) and ok
+    ok = bench_processing(urls, repeat) and ok
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,91 @@
+import asyncio
+import os
+import tempfile
+import time
+
+from tests.base_tester import Tester, LinkProcessor
+from link_processor.enrichment import LinkMetadataCache, StubFetcher, enrich_urls
+
+
+class EnrichmentTester(Tester):
+    """Tester del enriquecimiento de enlaces con el fetcher local (sin red)"""
+
+    def __init__(self, verbose=False):
+        super().__init__(verbose)
+        self.tmpdir = tempfile.mkdtemp(prefix="link_metadata_")
+        self.cache_path = os.path.join(self.tmpdir, "link_metadata.sqlite3")
+
+    def _check(self, description, success, details):
+        name = f"Enriquecimiento - {description}"
+        self.add_test_result(name, success, details)
+        self.print_test_result(name, success, details)
+
+    def run_all_tests(self):
+        """Ejecuta todos los tests de enriquecimiento"""
+        print("🔗 Ejecutando tests de enriquecimiento de enlaces...")
+
+        video = "https://www.youtube.com/watch?v=dQw4w9WgXcQ"
+        repo = "https://github.com/usuario/repo"
+        missing = "https://example.com/sin-metadatos"
+        fetcher = StubFetcher({video: {"title": "Video de prueba", "description": "Descripción"},
+                               repo: {"title": "usuario/repo: un repositorio"}},
+                              default=False, delay=0.01)
+        cache = LinkMetadataCache(self.cache_path)
+        processor = LinkProcessor(metadata_cache=cache)
+
+        # Antes de enriquecer: la salida es la sintáctica de siempre
+        before = processor.process_url(video)
+        self._check("Sin metadatos no cambia la salida", before == LinkProcessor().process_url(video),
+                    {'Resultado': before})
+
+        urls = [video, repo, missing, video, "HTTPS://WWW.YOUTUBE.COM/watch?v=dQw4w9WgXcQ"] + \
+               [f"https://example.com/pagina/{i}" for i in range(10)]
+        stats = asyncio.run(enrich_urls(urls, [fetcher], cache, concurrency=3))
+        self._check("Cada URL única se resuelve una vez", len(fetcher.calls) == 13 and stats['urls'] == 13,
+                    {'Llamadas': len(fetcher.calls), 'Stats': stats})
+        self._check("Respeta el límite de concurrencia", fetcher.max_in_flight <= 3,
+                    {'Máximo en vuelo': fetcher.max_in_flight})
+
+        after = processor.process_url(video)
+        expected = before[:-1] + " - «Video de prueba»]"
+        self._check("El título sale del caché", after == expected, {'Resultado': after, 'Esperado': expected})
+        self._check("URL sin metadatos queda igual",
+                    processor.process_url(missing) == LinkProcessor().process_url(missing),
+                    {'Resultado': processor.process_url(missing)})
+
+        # Segunda corrida: todo está en caché (incluidos los fallos), no se llama al fetcher
+        calls = len(fetcher.calls)
+        stats = asyncio.run(enrich_urls(urls, [fetcher], cache, concurrency=3))
+        self._check("Segunda corrida usa el caché", len(fetcher.calls) == calls and stats['cached'] == 13,
+                    {'Stats': stats})
+
+        # Un caché sin cargar no lee el disco en get()
+        reopened = LinkMetadataCache(self.cache_path)
+        self._check("Sin cargar, get no lee el archivo", reopened.get(repo) is None and not reopened.loaded,
+                    {'Cargado': reopened.loaded})
+
+        # Persistencia en disco
+        meta = reopened.load().get(repo)
+        self._check("El caché persiste en disco", bool(meta) and meta.get("title") == "usuario/repo: un repositorio",
+                    {'Metadatos': meta})
+
+        # TTL vencido: la entrada deja de leerse
+        reopened.set(repo, {"title": "Viejo"}, ttl=-1)
+        self._check("Entradas expiradas no se leen", reopened.get(repo) is None, {'Metadatos': reopened.get(repo)})
+        purged = reopened.purge_expired()
+        self._check("purge_expired borra las expiradas", purged == 1, {'Borradas': purged})
+
+        # Lectura sin E/S: un caché cuyo archivo no existe no crea nada
+        ghost_path = os.path.join(self.tmpdir, "no_existe.sqlite3")
+        ghost = LinkProcessor(metadata_cache=LinkMetadataCache(ghost_path))
+        start = time.perf_counter()
+        ghost.process_url(video)
+        self._check("Leer no crea archivos ni bloquea", not os.path.exists(ghost_path),
+                    {'Segundos': round(time.perf_counter() - start, 4)})
+
+
+# Para ejecutar los tests individualmente
+if __name__ == "__main__":
+    tester = EnrichmentTester(verbose=True)
+    tester.run_all_tests()
+    tester.print_summary()
@@ -19,6 +19,7 @@ from tests.link_replacement_tests.extractors.gitlab_tester import GitLabTester
 from tests.link_replacement_tests.extractors.google_tester import GoogleTester
 from tests.link_replacement_tests.extractors.imgur_tester import ImgurTester
 from tests.link_replacement_tests.extractors.instagram_tester import InstagramTester
+from tests.link_replacement_tests.enrichment_tester import EnrichmentTester
 
 class PlatformTester(Tester):
     """Tester principal que ejecuta todos los testers de plataformas"""
@@ -48,7 +49,8 @@ class PlatformTester(Tester):
             GitLabTester(verbose),
             GoogleTester(verbose),
             ImgurTester(verbose),
-            InstagramTester(verbose)
+            InstagramTester(verbose),
+            EnrichmentTester(verbose)
         ]
     
     def run_all_tests(self):
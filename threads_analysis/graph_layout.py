@@ -0,0 +1,244 @@
+"""
+threads_analysis/graph_layout.py
+
+Disposición (posiciones 2D) del grafo de un chat para la vista de grafo de la UI.
+
+- Layout jerárquico: los mensajes se agrupan por hilo (los sueltos, por autor) y primero se
+  ubican los grupos y los usuarios con un force layout (Fruchterman-Reingold en NumPy) sobre
+  el grafo agregado; después cada grupo se distribuye dentro de su círculo con otro force
+  layout local. Así un chat de 10k+ mensajes no necesita un layout O(n²) sobre todo el grafo.
+- La repulsión se calcula por bloques de filas para acotar la memoria en grupos grandes.
+- Las posiciones se guardan junto al grafo (threads_analysis_results/<chat>_layout.json) y se
+  reutilizan mientras el *_graph.json no cambie.
+"""
+
+from __future__ import annotations
+import json
+import math
+import os
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from threads_analysis.results_store import RESULTS_DIR, chat_file, _mtime
+
+LAYOUT_VERSION = 1
+# Separación aproximada entre nodos vecinos (en unidades de la escena)
+NODE_SPACING = 60.0
+# Máximo de pares nodo-nodo por bloque al calcular la repulsión
+PAIR_BLOCK = 1_000_000
+# Pares nodo-nodo totales (iteraciones × n²) a partir de los que se recortan iteraciones
+PAIR_BUDGET = 50_000_000
+
+
+def force_layout(n: int, edges: Optional[np.ndarray] = None, weights: Optional[np.ndarray] = None,
+                 iterations: int = 50, seed: int = 0) -> np.ndarray:
+    """
+    Fruchterman-Reingold en NumPy. `edges` es un array (m, 2) de índices en [0, n) y `weights`
+    sus pesos (1 por defecto). Devuelve un array (n, 2) centrado en 0 y dentro del disco unidad.
+    """
+    if n == 0:
+        return np.zeros((0, 2))
+    if n == 1:
+        return np.zeros((1, 2))
+
+    rng = np.random.default_rng(seed)
+    # Inicio en espiral (girasol) con un poco de ruido: converge rápido y es determinista
+    idx = np.arange(n) + 0.5
+    radius = np.sqrt(idx / n)
+    theta = idx * math.pi * (3 - math.sqrt(5))
+    pos = np.column_stack((radius * np.cos(theta), radius * np.sin(theta)))
+    pos += rng.normal(scale=0.01, size=pos.shape)
+
+    if edges is None or len(edges) == 0:
+        edges = np.zeros((0, 2), dtype=np.int64)
+        weights = np.zeros(0)
+    elif weights is None:
+        weights = np.ones(len(edges))
+    weights = np.asarray(weights, dtype=float)
+
+    # Grupos grandes: menos iteraciones (cada una es O(n²))
+    iterations = max(10, min(iterations, PAIR_BUDGET // (n * n)))
+    k = math.sqrt(1.0 / n)
+    temperature = 0.1
+    cooling = temperature / (iterations + 1)
+    block = max(1, PAIR_BLOCK // n)
+    src, dst = edges[:, 0], edges[:, 1]
+
+    for _ in range(iterations):
+        disp = np.zeros_like(pos)
+        # Repulsión k²/d entre todos los pares, por bloques de filas
+        x, y = pos[:, 0], pos[:, 1]
+        for start in range(0, n, block):
+            dx = x[start:start + block, None] - x[None, :]
+            dy = y[start:start + block, None] - y[None, :]
+            factor = dx * dx
+            factor += dy * dy
+            np.maximum(factor, 1e-6, out=factor)
+            np.divide(k * k, factor, out=factor)
+            disp[start:start + block, 0] += (dx * factor).sum(axis=1)
+            disp[start:start + block, 1] += (dy * factor).sum(axis=1)
+
+        # Atracción d²/k a lo largo de las aristas
+        if len(src):
+            delta = pos[src] - pos[dst]
+            dist = np.sqrt(np.einsum("ij,ij->i", delta, delta))
+            force = delta * (dist * weights / k)[:, None]
+            np.subtract.at(disp, src, force)
+            np.add.at(disp, dst, force)
+
+        length = np.sqrt(np.einsum("ij,ij->i", disp, disp))
+        np.maximum(length, 1e-9, out=length)
+        pos += disp * (np.minimum(length, temperature) / length)[:, None]
+        temperature -= cooling
+
+    pos -= pos.mean(axis=0)
+    scale = np.sqrt(np.einsum("ij,ij->i", pos, pos)).max()
+    if scale > 0:
+        pos /= scale
+    return pos
+
+
+def assign_clusters(nodes_data: Dict[str, Any], threads: Optional[Dict[str, Any]] = None) -> Dict[str, str]:
+    """
+    node_id del mensaje -> grupo: el id del hilo que lo contiene o 'sueltos_<user_id>' si no
+    está en ningún hilo. Los usuarios no pertenecen a ningún grupo.
+    """
+    clusters = {}
+    for thread_id, thread in (threads or {}).items():
+        for msg in thread.get("messages", []):
+            node_id = msg.get("node_id")
+            if node_id in nodes_data:
+                clusters.setdefault(node_id, thread_id)
+
+    for node_id, node_info in nodes_data.items():
+        if node_info.get("node_type") == "message" and node_id not in clusters:
+            clusters[node_id] = f"sueltos_{node_info.get('user_id')}"
+    return clusters
+
+
+def _edge_weight(edge: Dict[str, Any]) -> float:
+    try:
+        return float(edge.get("data", {}).get("weight", 1.0))
+    except (TypeError, ValueError):
+        return 1.0
+
+
+def compute_layout(graph_data: Dict[str, Any], threads: Optional[Dict[str, Any]] = None,
+                   seed: int = 0) -> Dict[str, Any]:
+    """
+    Posiciones de todos los nodos del grafo y de los grupos de mensajes:
+        {"positions": {node_id: [x, y]},
+         "clusters": {cluster_id: {"center": [x, y], "radius": r, "members": [node_id, ...]}}}
+    """
+    nodes_data = graph_data.get("nodes", {})
+    edges_data = graph_data.get("edges", [])
+    node_cluster = assign_clusters(nodes_data, threads)
+
+    members: Dict[str, List[str]] = {}
+    for node_id, cluster_id in node_cluster.items():
+        members.setdefault(cluster_id, []).append(node_id)
+
+    # Grafo agregado: un super-nodo por grupo y uno por cada nodo sin grupo (usuarios)
+    supers = list(members) + [n for n in nodes_data if n not in node_cluster]
+    super_index = {s: i for i, s in enumerate(supers)}
+
+    def super_of(node_id):
+        return super_index.get(node_cluster.get(node_id, node_id))
+
+    coarse: Dict[tuple, float] = {}
+    local_edges: Dict[str, List[tuple]] = {}
+    for edge in edges_data:
+        src, tgt = edge.get("source"), edge.get("target")
+        if src not in nodes_data or tgt not in nodes_data or src == tgt:
+            continue
+        cs, ct = node_cluster.get(src), node_cluster.get(tgt)
+        if cs is not None and cs == ct:
+            local_edges.setdefault(cs, []).append((src, tgt, _edge_weight(edge)))
+            continue
+        key = tuple(sorted((super_of(src), super_of(tgt))))
+        coarse[key] = coarse.get(key, 0.0) + _edge_weight(edge)
+
+    radii = np.array([NODE_SPACING / 2 * math.sqrt(len(members[s])) if s in members else NODE_SPACING / 2
+                      for s in supers])
+    coarse_edges = np.array(list(coarse), dtype=np.int64).reshape(-1, 2)
+    # Pesos agregados en escala log: un grupo muy conectado no colapsa encima de los demás
+    coarse_weights = np.log1p(np.fromiter(coarse.values(), dtype=float, count=len(coarse)))
+    centers = force_layout(len(supers), coarse_edges, coarse_weights, seed=seed)
+    centers *= 2 * max(float(radii.mean()) if len(radii) else 0.0, NODE_SPACING) * math.sqrt(max(len(supers), 1))
+
+    positions: Dict[str, List[float]] = {}
+    clusters: Dict[str, Any] = {}
+    for i, super_id in enumerate(supers):
+        cx, cy = centers[i]
+        if super_id not in members:
+            positions[super_id] = [round(float(cx), 1), round(float(cy), 1)]
+            continue
+
+        nodes = members[super_id]
+        index = {n: j for j, n in enumerate(nodes)}
+        edges = local_edges.get(super_id, [])
+        local = force_layout(
+            len(nodes),
+            np.array([(index[s], index[t]) for s, t, _ in edges], dtype=np.int64).reshape(-1, 2),
+            np.array([w for _, _, w in edges], dtype=float),
+            seed=seed + i,
+        )
+        radius = float(radii[i])
+        for j, node_id in enumerate(nodes):
+            positions[node_id] = [round(float(cx + local[j, 0] * radius), 1),
+                                  round(float(cy + local[j, 1] * radius), 1)]
+        clusters[super_id] = {
+            "center": [round(float(cx), 1), round(float(cy), 1)],
+            "radius": round(radius + NODE_SPACING / 2, 1),
+            "members": nodes,
+        }
+
+    return {"positions": positions, "clusters": clusters}
+
+
+# ================================================================
+#  PERSISTENCIA JUNTO AL GRAFO
+# ================================================================
+
+def load_layout(archivo: str, graph_data: Dict[str, Any], output_dir: str = RESULTS_DIR) -> Optional[Dict[str, Any]]:
+    """Layout guardado del chat si sigue valiendo para su *_graph.json actual (si no, None)"""
+    path = chat_file(output_dir, archivo, "layout")
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            layout = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if (not isinstance(layout, dict) or layout.get("version") != LAYOUT_VERSION
+            or layout.get("graph_mtime") != _mtime(chat_file(output_dir, archivo, "graph"))):
+        return None
+    positions = layout.get("positions", {})
+    if any(node_id not in positions for node_id in graph_data.get("nodes", {})):
+        return None
+    return layout
+
+
+def save_layout(archivo: str, layout: Dict[str, Any], output_dir: str = RESULTS_DIR):
+    path = chat_file(output_dir, archivo, "layout")
+    tmp = f"{path}.tmp"
+    data = {"version": LAYOUT_VERSION, "graph_mtime": _mtime(chat_file(output_dir, archivo, "graph")), **layout}
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def get_layout(graph_data: Dict[str, Any], threads: Optional[Dict[str, Any]] = None,
+               archivo: Optional[str] = None, output_dir: str = RESULTS_DIR) -> Dict[str, Any]:
+    """Layout del grafo: el guardado si está vigente; si no, se calcula (y se guarda si hay archivo)"""
+    if archivo:
+        layout = load_layout(archivo, graph_data, output_dir)
+        if layout is not None:
+            return layout
+
+    layout = compute_layout(graph_data, threads)
+    if archivo and os.path.isdir(output_dir):
+        try:
+            save_layout(archivo, layout, output_dir)
+        except OSError as e:
+            print(f"⚠️ No se pudo guardar el layout de {archivo}: {e}")
+    return layout
@@ -0,0 +1,23 @@
+"""
+threads_analysis.inference
+
+Inferencia CPU sobre los modelos exportados a ONNX (onnx_export.py), sin torch:
+sesiones ONNX en pool, micro-batching dinámico, cache de tokenización y un endpoint
+local (HTTP / socket Unix) con embed, score_pairs y rank_parents.
+"""
+
+from threads_analysis.inference.batcher import MicroBatcher
+from threads_analysis.inference.runtime import (
+    InferenceEngine,
+    OnnxBiEncoder,
+    OnnxCrossEncoder,
+    OnnxEmbedder,
+    SessionPool,
+    TokenizerCache,
+)
+from threads_analysis.inference.server import InferenceClient, serve
+
+__all__ = [
+    "InferenceEngine", "OnnxBiEncoder", "OnnxCrossEncoder", "OnnxEmbedder", "SessionPool", "TokenizerCache",
+    "MicroBatcher", "InferenceClient", "serve",
+]
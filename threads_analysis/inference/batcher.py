@@ -0,0 +1,86 @@
+"""
+threads_analysis/inference/batcher.py
+
+Micro-batcher dinámico: junta peticiones concurrentes (listas de items) hasta max_batch_size
+items o max_wait_ms de espera, ejecuta UNA llamada al modelo y reparte los resultados.
+"""
+
+from __future__ import annotations
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, List, Any
+
+import numpy as np
+
+
+class MicroBatcher:
+    def __init__(self, fn: Callable[[List[Any]], np.ndarray], max_batch_size: int = 256,
+                 max_wait_ms: float = 5.0, name: str = "batcher"):
+        self.fn = fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue: "queue.Queue" = queue.Queue()
+        self._closed = False
+        self.batches = 0
+        self.items = 0
+        self._thread = threading.Thread(target=self._loop, name=f"microbatcher-{name}", daemon=True)
+        self._thread.start()
+
+    def submit(self, items: List[Any]) -> Future:
+        """Encola una petición; el future devuelve un array alineado con `items`"""
+        fut: Future = Future()
+        if not items:
+            fut.set_result(np.zeros(0, dtype=np.float32))
+            return fut
+        if self._closed:
+            raise RuntimeError("MicroBatcher cerrado")
+        self._queue.put((list(items), fut))
+        return fut
+
+    def _collect(self):
+        first = self._queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        total = len(first[0])
+        deadline = time.perf_counter() + self.max_wait
+        while total < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                nxt = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if nxt is None:
+                self._queue.put(None)
+                break
+            batch.append(nxt)
+            total += len(nxt[0])
+        return batch
+
+    def _loop(self):
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+            items = [it for req, _ in batch for it in req]
+            try:
+                out = self.fn(items)
+            except Exception as e:
+                for _, fut in batch:
+                    fut.set_exception(e)
+                continue
+            self.batches += 1
+            self.items += len(items)
+            start = 0
+            for req, fut in batch:
+                fut.set_result(out[start:start + len(req)])
+                start += len(req)
+
+    def close(self):
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join(timeout=5)
@@ -0,0 +1,375 @@
+"""
+threads_analysis/inference/runtime.py
+
+Runtime ONNX para los modelos exportados por onnx_export.py (sin torch ni sentence-transformers):
+ - SessionPool: N sesiones de onnxruntime por modelo con hilos intra/inter-op configurables
+ - TokenizerCache: tokenizer rápido (tokenizers / tokenizer.json) + LRU de ids por texto
+ - OnnxEmbedder: tokenizer + grafo pooled/normalizado -> embeddings, sin importar torch
+ - InferenceEngine: embed(texts), score_pairs(pairs), rank_parents(message, candidates)
+
+Estructura esperada (salida de onnx_export.export_all):
+    onnx/
+        bi_encoder_A/model.onnx  (+ mlp.onnx, tokenizer.json, embedding_config.json)
+        bi_encoder_B/model.onnx  (+ mlp.onnx, tokenizer.json, embedding_config.json)
+        cross_encoder/model.onnx (+ tokenizer.json)
+        student/model.onnx + mlp.onnx (student destilado, scorer "mlp_student")
+Si no hay tokenizer.json junto al modelo se busca en output/best/<modelo>/.
+"""
+
+from __future__ import annotations
+import os
+import json
+import queue
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import List, Dict, Any, Optional, Sequence, Union
+
+import numpy as np
+
+from threads_analysis.models.pair_features import pair_extra_features, extras_vector
+
+DEFAULT_ONNX_DIR = "threads_analysis/models/output/onnx"
+DEFAULT_BEST_DIR = "threads_analysis/models/output/best"
+CROSS_MAX_LENGTH = 256
+EMBED_MAX_LENGTH = 128
+
+Pair = Union[Dict[str, Any], Sequence[Any]]
+
+
+def _as_message(m: Any) -> Dict[str, Any]:
+    """Acepta un dict de mensaje ({'text', 'date', 'sender_id'}) o un texto suelto"""
+    if isinstance(m, dict):
+        return m
+    return {"text": m or ""}
+
+
+def _as_pair(p: Pair):
+    if isinstance(p, dict):
+        return _as_message(p.get("a")), _as_message(p.get("b"))
+    a, b = p
+    return _as_message(a), _as_message(b)
+
+
+# ------------------------------------------------------------------------
+# Sesiones ONNX
+# ------------------------------------------------------------------------
+class SessionPool:
+    """Pool de InferenceSession para un modelo; cada run toma una sesión libre"""
+
+    def __init__(self, model_path: str, size: int = 1, intra_op_threads: int = 0,
+                 inter_op_threads: int = 0, providers: Optional[List[str]] = None):
+        import onnxruntime as ort
+        opts = ort.SessionOptions()
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op_threads:
+            opts.intra_op_num_threads = intra_op_threads
+        if inter_op_threads:
+            opts.inter_op_num_threads = inter_op_threads
+        providers = providers or [p for p in ("CUDAExecutionProvider", "CPUExecutionProvider")
+                                  if p in ort.get_available_providers()]
+        self.model_path = model_path
+        self._free = queue.Queue()
+        for _ in range(max(1, size)):
+            self._free.put(ort.InferenceSession(model_path, sess_options=opts, providers=providers))
+        probe = self._free.queue[0]
+        self.input_names = [i.name for i in probe.get_inputs()]
+        self.output_names = [o.name for o in probe.get_outputs()]
+
+    @contextmanager
+    def session(self):
+        sess = self._free.get()
+        try:
+            yield sess
+        finally:
+            self._free.put(sess)
+
+    def run(self, feeds: Dict[str, np.ndarray], output_names: Optional[List[str]] = None):
+        with self.session() as sess:
+            return sess.run(output_names, feeds)
+
+
+# ------------------------------------------------------------------------
+# Tokenizer con cache
+# ------------------------------------------------------------------------
+def find_tokenizer_file(*dirs: Optional[str]) -> Optional[str]:
+    for d in dirs:
+        if d and os.path.exists(os.path.join(d, "tokenizer.json")):
+            return os.path.join(d, "tokenizer.json")
+    return None
+
+
+class TokenizerCache:
+    """Tokenizer rápido (tokenizers) con LRU texto -> ids y padding dinámico por lote"""
+
+    def __init__(self, tokenizer_file: str, max_length: int = EMBED_MAX_LENGTH, cache_size: int = 100_000,
+                 pad_id: Optional[int] = None):
+        from tokenizers import Tokenizer
+        self.tokenizer = Tokenizer.from_file(tokenizer_file)
+        self.tokenizer.no_padding()
+        self.tokenizer.enable_truncation(max_length=max_length)
+        self.max_length = max_length
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, List[int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        if pad_id is None:
+            pad = self.tokenizer.token_to_id("<pad>")
+            pad_id = pad if pad is not None else (self.tokenizer.token_to_id("[PAD]") or 0)
+        self.pad_id = pad_id
+        self.hits = 0
+        self.misses = 0
+
+    def ids(self, texts: List[str]) -> List[List[int]]:
+        out: List[Optional[List[int]]] = [None] * len(texts)
+        missing = {}
+        with self._lock:
+            for i, t in enumerate(texts):
+                cached = self._cache.get(t)
+                if cached is not None:
+                    self._cache.move_to_end(t)
+                    out[i] = cached
+                    self.hits += 1
+                else:
+                    missing.setdefault(t, []).append(i)
+        if missing:
+            uniq = list(missing)
+            encs = self.tokenizer.encode_batch(uniq)
+            with self._lock:
+                for t, enc in zip(uniq, encs):
+                    self.misses += 1
+                    self._cache[t] = enc.ids
+                    for i in missing[t]:
+                        out[i] = enc.ids
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return out
+
+    def encode(self, texts: List[str]):
+        """input_ids / attention_mask (int64) con padding solo hasta la secuencia más larga"""
+        seqs = self.ids(texts)
+        max_len = max((len(s) for s in seqs), default=1) or 1
+        input_ids = np.full((len(seqs), max_len), self.pad_id, dtype=np.int64)
+        attention_mask = np.zeros((len(seqs), max_len), dtype=np.int64)
+        for i, s in enumerate(seqs):
+            input_ids[i, :len(s)] = s
+            attention_mask[i, :len(s)] = 1
+        return input_ids, attention_mask
+
+
+def build_feeds(input_names: List[str], input_ids: np.ndarray, attention_mask: np.ndarray) -> Dict[str, np.ndarray]:
+    """Mapea ids/máscara a los nombres de entrada del grafo (o por posición si no coinciden)"""
+    by_name = {"input_ids": input_ids, "attention_mask": attention_mask,
+               "token_type_ids": np.zeros_like(input_ids)}
+    if all(name in by_name for name in input_names):
+        return {name: by_name[name] for name in input_names}
+    return dict(zip(input_names, (input_ids, attention_mask)))
+
+
+def select_embeddings(outputs: List[np.ndarray], output_names: List[str], attention_mask: np.ndarray) -> np.ndarray:
+    """Sentence embeddings de la salida del grafo (mean pooling si son embeddings por token)"""
+    out = outputs[output_names.index("sentence_embedding")] if "sentence_embedding" in output_names else outputs[0]
+    emb = mean_pool(out, attention_mask) if out.ndim == 3 else out
+    return emb.astype(np.float32, copy=False)
+
+
+def mean_pool(token_embeddings: np.ndarray, attention_mask: np.ndarray) -> np.ndarray:
+    mask = attention_mask[..., None].astype(np.float32)
+    return (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+
+
+def l2_normalize(x: np.ndarray) -> np.ndarray:
+    return x / np.clip(np.linalg.norm(x, axis=-1, keepdims=True), 1e-12, None)
+
+
+# ------------------------------------------------------------------------
+# Modelos
+# ------------------------------------------------------------------------
+def load_embedding_config(model_dir: str) -> Dict[str, Any]:
+    """embedding_config.json que escribe onnx_export junto al grafo del bi-encoder (si existe)"""
+    path = os.path.join(model_dir, "embedding_config.json")
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+class OnnxEmbedder:
+    """
+    Embeddings por lotes con solo onnxruntime + tokenizers (sin torch ni sentence-transformers),
+    para procesos que necesitan arrancar rápido (alarmas, UI):
+
+        embedder = OnnxEmbedder("threads_analysis/models/output/onnx/bi_encoder_A")
+        vectors = embedder.embed(["hola", "¿alguien vende una laptop?"])
+    """
+
+    def __init__(self, model_dir: str, tokenizer_dirs: Sequence[Optional[str]] = (), pool_size: int = 1,
+                 intra_op_threads: int = 0, inter_op_threads: int = 0, model_file: str = "model.onnx"):
+        config = load_embedding_config(model_dir)
+        tok_file = find_tokenizer_file(model_dir, *tokenizer_dirs)
+        if tok_file is None:
+            raise FileNotFoundError(f"No se encontró tokenizer.json para {model_dir}")
+        self.tokenizer = TokenizerCache(tok_file, max_length=config.get("max_seq_length", EMBED_MAX_LENGTH),
+                                        pad_id=config.get("pad_token_id"))
+        self.session = SessionPool(os.path.join(model_dir, model_file), pool_size, intra_op_threads, inter_op_threads)
+        self.dim = config.get("dim")
+
+    def embed(self, texts: List[str], normalize: bool = False, batch_size: int = 256) -> np.ndarray:
+        """Sentence embeddings; con normalize=True usa la salida ya normalizada del grafo si existe"""
+        names = self.session.output_names
+        out = []
+        for i in range(0, len(texts), batch_size):
+            input_ids, attention_mask = self.tokenizer.encode([t or "" for t in texts[i:i + batch_size]])
+            outputs = self.session.run(build_feeds(self.session.input_names, input_ids, attention_mask))
+            if normalize and "embeddings" in names and "sentence_embedding" in names:
+                out.append(outputs[names.index("embeddings")].astype(np.float32, copy=False))
+            else:
+                emb = select_embeddings(outputs, names, attention_mask)
+                out.append(l2_normalize(emb) if normalize else emb)
+        return np.concatenate(out) if out else np.zeros((0, self.dim or 0), dtype=np.float32)
+
+
+class OnnxBiEncoder:
+    """Bi-encoder ONNX (+ MLP opcional sobre [a, b, |a-b|, a*b, extras])"""
+
+    def __init__(self, model_dir: str, tokenizer_dirs: Sequence[Optional[str]] = (), pool_size: int = 1,
+                 intra_op_threads: int = 0, inter_op_threads: int = 0, vocab: Optional[set] = None):
+        self.embedder = OnnxEmbedder(model_dir, tokenizer_dirs, pool_size, intra_op_threads, inter_op_threads)
+        mlp_path = os.path.join(model_dir, "mlp.onnx")
+        self.mlp = SessionPool(mlp_path, pool_size, intra_op_threads, inter_op_threads) if os.path.exists(mlp_path) else None
+        self.vocab = vocab
+
+    def embed(self, texts: List[str], normalize: bool = False) -> np.ndarray:
+        """Sentence embeddings sin normalizar por defecto (= SentenceTransformer.encode(), lo que usan las features del MLP)"""
+        return self.embedder.embed(texts, normalize=normalize)
+
+    def score_pairs(self, pairs: List[Pair], embed_fn=None) -> np.ndarray:
+        if self.mlp is None:
+            raise RuntimeError("Este bi-encoder no tiene mlp.onnx exportado")
+        msgs = [_as_pair(p) for p in pairs]
+        texts = [a.get("text") or "" for a, _ in msgs] + [b.get("text") or "" for _, b in msgs]
+        uniq = list(dict.fromkeys(texts))
+        emb_u = (embed_fn or self.embed)(uniq)
+        row = {t: i for i, t in enumerate(uniq)}
+        emb_a = emb_u[[row[t] for t in texts[:len(msgs)]]]
+        emb_b = emb_u[[row[t] for t in texts[len(msgs):]]]
+        extras = np.array([extras_vector(pair_extra_features(a, b, self.vocab)) for a, b in msgs], dtype=np.float32)
+        X = np.concatenate([emb_a, emb_b, np.abs(emb_a - emb_b), emb_a * emb_b, extras], axis=1).astype(np.float32)
+        return self.mlp.run({self.mlp.input_names[0]: X})[0].reshape(-1)
+
+
+class OnnxCrossEncoder:
+    """Cross-encoder ONNX: texto 'a [SEP] b' como en el entrenamiento, sigmoid sobre el logit"""
+
+    def __init__(self, model_dir: str, tokenizer_dirs: Sequence[Optional[str]] = (), pool_size: int = 1,
+                 intra_op_threads: int = 0, inter_op_threads: int = 0):
+        tok_file = find_tokenizer_file(model_dir, *tokenizer_dirs)
+        if tok_file is None:
+            raise FileNotFoundError(f"No se encontró tokenizer.json para {model_dir}")
+        self.tokenizer = TokenizerCache(tok_file, max_length=CROSS_MAX_LENGTH)
+        self.session = SessionPool(os.path.join(model_dir, "model.onnx"), pool_size, intra_op_threads, inter_op_threads)
+
+    def score_texts(self, texts: List[str], batch_size: int = 64) -> np.ndarray:
+        """Probabilidad por texto, por lotes de batch_size para acotar la memoria de cada run()"""
+        out = []
+        for i in range(0, len(texts), batch_size):
+            input_ids, attention_mask = self.tokenizer.encode(texts[i:i + batch_size])
+            logits = self.session.run(build_feeds(self.session.input_names, input_ids, attention_mask))[0].reshape(-1)
+            out.append((1.0 / (1.0 + np.exp(-logits))).astype(np.float32))
+        return np.concatenate(out) if out else np.zeros(0, dtype=np.float32)
+
+    def score_pairs(self, pairs: List[Pair]) -> np.ndarray:
+        msgs = [_as_pair(p) for p in pairs]
+        return self.score_texts([(a.get("text") or "") + " [SEP] " + (b.get("text") or "") for a, b in msgs])
+
+
+# ------------------------------------------------------------------------
+# Motor
+# ------------------------------------------------------------------------
+class InferenceEngine:
+    """
+    Carga una vez los modelos ONNX disponibles y expone embed / score_pairs / rank_parents.
+    Las llamadas pasan por micro-batchers: peticiones concurrentes (p.ej. del servidor) se
+    agrupan en un solo forward.
+    """
+
+    SCORERS = ("cross", "mlp_a", "mlp_b")
+
+    def __init__(self, onnx_dir: str = DEFAULT_ONNX_DIR, best_dir: str = DEFAULT_BEST_DIR, pool_size: int = 1,
+                 intra_op_threads: int = 0, inter_op_threads: int = 0, max_batch_size: int = 256,
+                 max_wait_ms: float = 5.0, tfidf_vocab: Optional[str] = None):
+        from threads_analysis.inference.batcher import MicroBatcher
+
+        vocab = None
+        if tfidf_vocab and os.path.exists(tfidf_vocab):
+            with open(tfidf_vocab, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            # Mismo formato que fit_tfidf_vocabulary: {"version": ..., "vocabulary": [...]}
+            if not isinstance(data, dict) or not isinstance(data.get("vocabulary"), list):
+                raise ValueError(f"Vocabulario TF-IDF inválido en {tfidf_vocab}: "
+                                 f"se esperaba {{'version', 'vocabulary': [...]}}")
+            vocab = set(data["vocabulary"])
+        kwargs = dict(pool_size=pool_size, intra_op_threads=intra_op_threads, inter_op_threads=inter_op_threads)
+
+        self.bi = {}
+        for key, sub in (("a", "bi_encoder_A"), ("b", "bi_encoder_B"), ("student", "student")):
+            model_dir = os.path.join(onnx_dir, sub)
+            if os.path.exists(os.path.join(model_dir, "model.onnx")):
+                self.bi[key] = OnnxBiEncoder(model_dir, (os.path.join(best_dir, sub),), vocab=vocab, **kwargs)
+        self.cross = None
+        cross_dir = os.path.join(onnx_dir, "cross_encoder")
+        if os.path.exists(os.path.join(cross_dir, "model.onnx")):
+            self.cross = OnnxCrossEncoder(cross_dir, (os.path.join(best_dir, "cross_encoder"),), **kwargs)
+        if not self.bi and self.cross is None:
+            raise FileNotFoundError(f"No hay modelos ONNX en {onnx_dir}")
+
+        self._embed_batchers = {k: MicroBatcher(m.embed, max_batch_size, max_wait_ms, name=f"embed_{k}")
+                                for k, m in self.bi.items()}
+        self._cross_batcher = MicroBatcher(self.cross.score_texts, max_batch_size, max_wait_ms, name="cross") \
+            if self.cross is not None else None
+
+    @property
+    def available_scorers(self) -> List[str]:
+        out = ["cross"] if self.cross is not None else []
+        out += [f"mlp_{k}" for k, m in self.bi.items() if m.mlp is not None]
+        return out
+
+    def _default_scorer(self) -> str:
+        avail = self.available_scorers
+        if not avail:
+            raise RuntimeError("No hay scorers de pares disponibles")
+        return avail[0]
+
+    def embed(self, texts: List[str], model: str = "a", normalize: bool = True) -> np.ndarray:
+        if model not in self._embed_batchers:
+            raise KeyError(f"Bi-encoder '{model}' no disponible")
+        emb = self._embed_batchers[model].submit(list(texts)).result()
+        return l2_normalize(emb) if normalize else emb
+
+    def score_pairs(self, pairs: List[Pair], scorer: Optional[str] = None) -> np.ndarray:
+        scorer = scorer or self._default_scorer()
+        if scorer == "cross":
+            if self._cross_batcher is None:
+                raise KeyError("Cross-encoder no disponible")
+            msgs = [_as_pair(p) for p in pairs]
+            texts = [(a.get("text") or "") + " [SEP] " + (b.get("text") or "") for a, b in msgs]
+            return self._cross_batcher.submit(texts).result()
+        key = scorer.replace("mlp_", "")
+        if key not in self.bi:
+            raise KeyError(f"Scorer '{scorer}' no disponible")
+        batcher = self._embed_batchers[key]
+        return self.bi[key].score_pairs(pairs, embed_fn=lambda t: batcher.submit(t).result())
+
+    def rank_parents(self, message: Any, candidates: List[Any], scorer: Optional[str] = None,
+                     top_k: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Ordena mensajes candidatos a padre de `message` por probabilidad de respuesta"""
+        if not candidates:
+            return []
+        msg = _as_message(message)
+        scores = self.score_pairs([(_as_message(c), msg) for c in candidates], scorer=scorer)
+        order = np.argsort(-scores, kind="stable")
+        ranked = [{"index": int(i), "id": _as_message(candidates[i]).get("id"), "score": float(scores[i])} for i in order]
+        return ranked[:top_k] if top_k else ranked
+
+    def close(self):
+        for b in list(self._embed_batchers.values()) + ([self._cross_batcher] if self._cross_batcher else []):
+            b.close()
@@ -0,0 +1,177 @@
+"""
+threads_analysis/inference/server.py
+
+Endpoint local (HTTP en 127.0.0.1 o socket Unix) sobre un InferenceEngine cargado una vez,
+para que el grafo, las alarmas y la evaluación compartan un proceso "caliente".
+
+Rutas (POST, JSON):
+    /embed         {"texts": [...], "model": "a", "normalize": true}      -> {"embeddings": [[...]]}
+    /score_pairs   {"pairs": [{"a": {...}, "b": {...}} | [a, b]], "scorer": "cross"} -> {"scores": [...]}
+    /rank_parents  {"message": {...}, "candidates": [...], "top_k": 5}     -> {"ranked": [...]}
+    GET /health    -> {"status": "ok", "scorers": [...]}
+
+Uso:
+python -m threads_analysis.inference.server --port 8765
+python -m threads_analysis.inference.server --unix-socket /tmp/threads_inference.sock
+"""
+
+from __future__ import annotations
+import os
+import json
+import socket
+import http.client
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Dict, Any, Optional
+
+from threads_analysis.inference.runtime import InferenceEngine, DEFAULT_ONNX_DIR, DEFAULT_BEST_DIR
+
+
+class _Handler(BaseHTTPRequestHandler):
+    engine: InferenceEngine = None
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _send(self, status: int, payload: Dict[str, Any]):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send(200, {"status": "ok", "scorers": self.engine.available_scorers,
+                             "embedders": sorted(self.engine.bi)})
+        else:
+            self._send(404, {"error": "not found"})
+
+    def do_POST(self):
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            req = json.loads(self.rfile.read(length) or b"{}")
+            if self.path == "/embed":
+                emb = self.engine.embed(req["texts"], model=req.get("model", "a"), normalize=req.get("normalize", True))
+                self._send(200, {"embeddings": emb.tolist()})
+            elif self.path == "/score_pairs":
+                scores = self.engine.score_pairs(req["pairs"], scorer=req.get("scorer"))
+                self._send(200, {"scores": scores.tolist()})
+            elif self.path == "/rank_parents":
+                ranked = self.engine.rank_parents(req["message"], req["candidates"],
+                                                  scorer=req.get("scorer"), top_k=req.get("top_k"))
+                self._send(200, {"ranked": ranked})
+            else:
+                self._send(404, {"error": "not found"})
+        except (KeyError, ValueError) as e:
+            self._send(400, {"error": str(e)})
+        except Exception as e:
+            self._send(500, {"error": str(e)})
+
+
+class UnixHTTPServer(ThreadingHTTPServer):
+    address_family = socket.AF_UNIX
+
+    def server_bind(self):
+        if os.path.exists(self.server_address):
+            os.remove(self.server_address)
+        self.socket.bind(self.server_address)
+        self.server_name = "localhost"
+        self.server_port = 0
+
+    def get_request(self):
+        request, _ = self.socket.accept()
+        return request, ("unix", 0)
+
+
+def serve(engine: InferenceEngine, host: str = "127.0.0.1", port: int = 8765, unix_socket: Optional[str] = None):
+    handler = type("InferenceHandler", (_Handler,), {"engine": engine})
+    server = UnixHTTPServer(unix_socket, handler) if unix_socket else ThreadingHTTPServer((host, port), handler)
+    where = unix_socket or f"http://{host}:{port}"
+    print(f"[INFERENCE] Sirviendo {engine.available_scorers} en {where}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        engine.close()
+        if unix_socket and os.path.exists(unix_socket):
+            os.remove(unix_socket)
+
+
+# ------------------------------------------------------------------------
+# Cliente
+# ------------------------------------------------------------------------
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path: str, timeout: float = 60.0):
+        super().__init__("localhost", timeout=timeout)
+        self.unix_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.unix_path)
+
+
+class InferenceClient:
+    """Cliente mínimo (solo stdlib) del servidor de inferencia"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 8765, unix_socket: Optional[str] = None,
+                 timeout: float = 60.0):
+        self.host, self.port, self.unix_socket, self.timeout = host, port, unix_socket, timeout
+
+    def _request(self, method: str, path: str, payload: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        conn = _UnixHTTPConnection(self.unix_socket, self.timeout) if self.unix_socket \
+            else http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        try:
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8") if payload is not None else None
+            conn.request(method, path, body=body, headers={"Content-Type": "application/json"})
+            resp = conn.getresponse()
+            data = json.loads(resp.read() or b"{}")
+            if resp.status != 200:
+                raise RuntimeError(f"{path}: {resp.status} {data.get('error')}")
+            return data
+        finally:
+            conn.close()
+
+    def health(self) -> Dict[str, Any]:
+        return self._request("GET", "/health")
+
+    def embed(self, texts: List[str], model: str = "a", normalize: bool = True) -> List[List[float]]:
+        return self._request("POST", "/embed", {"texts": texts, "model": model, "normalize": normalize})["embeddings"]
+
+    def score_pairs(self, pairs: List[Any], scorer: Optional[str] = None) -> List[float]:
+        return self._request("POST", "/score_pairs", {"pairs": pairs, "scorer": scorer})["scores"]
+
+    def rank_parents(self, message: Any, candidates: List[Any], scorer: Optional[str] = None,
+                     top_k: Optional[int] = None) -> List[Dict[str, Any]]:
+        return self._request("POST", "/rank_parents", {"message": message, "candidates": candidates,
+                                                       "scorer": scorer, "top_k": top_k})["ranked"]
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--onnx-dir", type=str, default=DEFAULT_ONNX_DIR)
+    parser.add_argument("--best-dir", type=str, default=DEFAULT_BEST_DIR, help="Fallback para tokenizer.json")
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix-socket", type=str, default=None)
+    parser.add_argument("--pool-size", type=int, default=1, help="Sesiones ONNX por modelo")
+    parser.add_argument("--intra-op-threads", type=int, default=0)
+    parser.add_argument("--inter-op-threads", type=int, default=0)
+    parser.add_argument("--max-batch-size", type=int, default=256)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    parser.add_argument("--tfidf-vocab", type=str, default=None, help="Vocabulario TF-IDF del dataset (tfidf_jaccard)")
+    args = parser.parse_args()
+
+    engine = InferenceEngine(args.onnx_dir, args.best_dir, pool_size=args.pool_size,
+                             intra_op_threads=args.intra_op_threads, inter_op_threads=args.inter_op_threads,
+                             max_batch_size=args.max_batch_size, max_wait_ms=args.max_wait_ms,
+                             tfidf_vocab=args.tfidf_vocab)
+    serve(engine, host=args.host, port=args.port, unix_socket=args.unix_socket)
+
+
+if __name__ == "__main__":
+    main()
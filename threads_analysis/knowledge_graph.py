@@ -1,13 +1,16 @@
 # threads_analysis/knowledge_graph.py
 import json
 import networkx as nx
-import spacy
 from datetime import datetime
 from typing import Dict, List, Any
+from utils.nlp_registry import get_nlp
 
 class ConversationGraphBuilder:
     def __init__(self):
-        self.nlp = spacy.load("es_core_news_md")
+        # Vistas sobre el modelo compartido (se carga en el primer uso):
+        # pipeline completo para nodos/intención y solo lemas para la similitud léxica
+        self.nlp = get_nlp("full")
+        self.nlp_lemmas = get_nlp("lemmas")
         self.graph = nx.DiGraph()
         self.message_nodes = {}
         self.user_nodes = {}
@@ -205,13 +208,44 @@ class ConversationGraphBuilder:
                             probability=probability
                         )
     
-    def _calculate_reply_probability(self, msg1: Dict, msg2: Dict) -> float:
-        """Calcula la probabilidad de que msg2 sea respuesta de msg1"""
+    def parse_texts(self, texts: List[str], batch_size: int = 256, n_process: int = 1) -> Dict[str, Dict]:
+        """
+        Pre-analiza textos únicos con nlp.pipe y guarda solo lo que usan las heurísticas
+        (lemas del texto en minúsculas, intención y patrones regex), para puntuar muchos
+        pares sin volver a parsear cada texto.
+        """
+        from regex.regex_extractor import extract_regex_patterns
+        unique = list(dict.fromkeys(t or '' for t in texts))
+        docs_lower = self.nlp_lemmas.pipe((t.lower() for t in unique), batch_size=batch_size, n_process=n_process)
+        docs = self.nlp.pipe(unique, batch_size=batch_size, n_process=n_process)
+        parsed = {}
+        for text, doc_lower, doc in zip(unique, docs_lower, docs):
+            parsed[text] = {
+                'lemmas': frozenset(token.lemma_ for token in doc_lower if not token.is_stop and not token.is_punct),
+                'intention': self._detect_intention(text, doc),
+                'patterns': extract_regex_patterns(text) if text else {}
+            }
+        return parsed
+
+    def _calculate_reply_probability(self, msg1: Dict, msg2: Dict, parsed: Dict[str, Dict] = None) -> float:
+        """
+        Calcula la probabilidad de que msg2 sea respuesta de msg1.
+        Con `parsed` (salida de parse_texts) usa los textos ya analizados en vez de llamar a spaCy.
+        """
+        if parsed is not None:
+            f1 = parsed[msg1.get('text') or '']
+            f2 = parsed[msg2.get('text') or '']
+            semantic = self._lexical_similarity(f1['lemmas'], f2['lemmas'], f1['patterns'], f2['patterns']) \
+                if msg1.get('text') and msg2.get('text') else 0.0
+            structural = self._intention_pattern_score(f1['intention'], f2['intention'])
+        else:
+            semantic = self._semantic_similarity(msg1, msg2)
+            structural = self._structural_patterns(msg1, msg2)
         factors = {
             'temporal': self._temporal_proximity(msg1, msg2),
-            'semantic': self._semantic_similarity(msg1, msg2),
+            'semantic': semantic,
             'social': self._social_connection(msg1, msg2),
-            'structural': self._structural_patterns(msg1, msg2)
+            'structural': structural
         }
         
         # Combinación de factores (media ponderada)
@@ -252,8 +286,8 @@ class ConversationGraphBuilder:
             return 0.0
         
         # Análisis básico de similitud (podría mejorarse con embeddings)
-        doc1 = self.nlp(text1.lower())
-        doc2 = self.nlp(text2.lower())
+        doc1 = self.nlp_lemmas(text1.lower())
+        doc2 = self.nlp_lemmas(text2.lower())
         
         # Similitud léxica básica
         words1 = set(token.lemma_ for token in doc1 if not token.is_stop and not token.is_punct)
@@ -262,16 +296,22 @@ class ConversationGraphBuilder:
         if not words1 or not words2:
             return 0.0
         
-        intersection = words1.intersection(words2)
-        union = words1.union(words2)
-        
-        similarity = len(intersection) / len(union) if union else 0.0
-        
         # Boost si hay patrones similares
         from regex.regex_extractor import extract_regex_patterns
         patterns1 = extract_regex_patterns(text1)
         patterns2 = extract_regex_patterns(text2)
         
+        return self._lexical_similarity(words1, words2, patterns1, patterns2)
+    
+    def _lexical_similarity(self, words1, words2, patterns1: Dict, patterns2: Dict) -> float:
+        """Jaccard de lemas más bonus por patrones regex compartidos"""
+        if not words1 or not words2:
+            return 0.0
+        
+        intersection = words1.intersection(words2)
+        union = words1.union(words2)
+        
+        similarity = len(intersection) / len(union) if union else 0.0
         pattern_similarity = self._compare_patterns(patterns1, patterns2)
         
         return min(1.0, similarity + pattern_similarity * 0.3)
@@ -318,7 +358,10 @@ class ConversationGraphBuilder:
         text1 = msg1.get('text', '')
         intention1 = self._detect_intention(text1, self.nlp(text1))
         intention2 = self._detect_intention(msg2.get('text', ''), self.nlp(msg2.get('text', '')))
-        
+        return self._intention_pattern_score(intention1, intention2)
+    
+    def _intention_pattern_score(self, intention1: str, intention2: str) -> float:
+        """Puntaje estructural a partir de las intenciones de ambos mensajes"""
         if intention1 == 'question' and intention2 != 'question':
             return 0.7
         
@@ -3,6 +3,7 @@ import json
 import os
 from threads_analysis.knowledge_graph import ConversationGraphBuilder
 from threads_analysis.thread_analyzer import ThreadAnalyzer
+from threads_analysis.results_store import summarize_chat, update_index
 from regex.pattern_analyzer import save_patterns_summary
 from regex.trend_analyzer import generate_comprehensive_report
 
@@ -89,6 +90,12 @@ def process_chat_for_knowledge_graph(chat_filename: str, output_dir: str = "thre
         with open(analysis_filename, 'w', encoding='utf-8') as f:
             json.dump(thread_analysis, f, ensure_ascii=False, indent=2, default=str)
         
+        # Actualizar el índice que usa la ventana de resultados (resumen sin leer el grafo)
+        update_index(f"{base_name}.json", summarize_chat(
+            {'metadata': graph.graph, 'nodes': dict(graph.nodes(data=True)), 'edges': list(graph.edges())},
+            len(threads), thread_analysis
+        ), output_dir)
+        
         print(f"✅ Procesamiento completado:")
         print(f"   - Grafo: {graph_filename}")
         print(f"   - Hilos: {threads_filename}")
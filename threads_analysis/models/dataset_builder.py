@@ -5,6 +5,12 @@ Construye el dataset a partir de chats en threads_analysis_results/train_chats.
 Características principales:
 - Caching de embeddings por chat + por modelo (npy + meta)
 - Caching del archivo de pairs con sidecar .meta.json (chat list, total_messages, params)
+- Reconstrucción incremental por chat: cada chat genera un shard de pairs con su propio
+  meta (hash del archivo, params, modelo de embeddings, versión de vocabulario TF-IDF).
+  Solo se recalculan los shards de chats nuevos o modificados; el dataset final es un
+  manifest sobre los shards (<output>.shards/manifest.json) que se materializa en <output>.
+- Vocabulario TF-IDF versionado (tfidf_vocab_<hash>.json): los shards sin cambios conservan
+  sus features; --refit-tfidf genera una versión nueva e invalida todos los shards.
 - Nuevas features extraídas desde los mensajes:
   * length_a, length_b
   * tfidf_jaccard (jaccard sobre tokens TF-IDF non-zero)
@@ -25,16 +31,23 @@ import os
 import json
 import math
 import random
+import shutil
+import hashlib
 from glob import glob
 from typing import List, Dict, Any, Tuple
 
 import numpy as np
 from tqdm import tqdm
 from sentence_transformers import SentenceTransformer, util
-from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.feature_extraction.text import TfidfVectorizer, CountVectorizer
 import argparse
 import re
-from difflib import SequenceMatcher
+
+from threads_analysis.models.feature_store import shared_sentence_transformer
+from threads_analysis.models.pair_features import (
+    EMOJI_RE, URL_RE, _parse_iso, _compute_time_delta_min,
+    count_emojis, has_url, is_all_caps, seq_similarity
+)
 
 RANDOM_SEED = 42
 random.seed(RANDOM_SEED)
@@ -47,47 +60,6 @@ BASE_CACHE_DIR = "threads_analysis/models/embedding_cache"
 os.makedirs(BASE_CACHE_DIR, exist_ok=True)
 os.makedirs(os.path.dirname("threads_analysis/models/output/pairs.jsonl"), exist_ok=True)
 
-# emoji regex covering common ranges
-EMOJI_RE = re.compile(
-    '['
-    '\U0001F300-\U0001F5FF'  # symbols & pictographs
-    '\U0001F600-\U0001F64F'  # emoticons
-    '\U0001F680-\U0001F6FF'  # transport & map symbols
-    '\U0001F700-\U0001F77F'  # alchemical symbols
-    '\U0001F780-\U0001F7FF'  # Geometric Shapes Extended
-    '\U0001F800-\U0001F8FF'  # Supplemental Arrows-C
-    '\U0001F900-\U0001F9FF'  # Supplemental Symbols and Pictographs
-    '\U0001FA00-\U0001FA6F'  # Chess etc
-    '\U00002702-\U000027B0'  # Dingbats
-    '\U000024C2-\U0001F251'
-    ']+', flags=re.UNICODE
-)
-
-URL_RE = re.compile(r'https?://\S+|www\.\S+', re.IGNORECASE)
-
-
-# ---------------- Helpers ----------------
-def _parse_iso(ts: str):
-    from datetime import datetime
-    if not ts:
-        return None
-    try:
-        return datetime.fromisoformat(ts.replace('Z', '+00:00'))
-    except Exception:
-        try:
-            return datetime.fromisoformat(ts)
-        except Exception:
-            return None
-
-
-def _compute_time_delta_min(t1: str, t2: str) -> float:
-    dt1 = _parse_iso(t1)
-    dt2 = _parse_iso(t2)
-    if not dt1 or not dt2:
-        return 1e6
-    return abs((dt2 - dt1).total_seconds()) / 60.0
-
-
 # ---------------- Chat loading ----------------
 def load_chats(input_dir: str) -> List[Dict[str, Any]]:
     files = sorted(glob(os.path.join(input_dir, '*.json')))
@@ -105,33 +77,6 @@ def load_chats(input_dir: str) -> List[Dict[str, Any]]:
 
 
 # ---------------- Feature extraction utilities ----------------
-def count_emojis(text: str) -> int:
-    if not text:
-        return 0
-    return len(EMOJI_RE.findall(text))
-
-
-def has_url(text: str) -> bool:
-    if not text:
-        return False
-    return bool(URL_RE.search(text))
-
-
-def is_all_caps(text: str) -> bool:
-    if not text:
-        return False
-    letters = [c for c in text if c.isalpha()]
-    if not letters:
-        return False
-    return all(c.isupper() for c in letters)
-
-
-def seq_similarity(a: str, b: str) -> float:
-    if not a or not b:
-        return 0.0
-    return SequenceMatcher(None, a, b).ratio()
-
-
 def tfidf_jaccard_batch(texts: List[str]) -> Tuple[TfidfVectorizer, np.ndarray]:
     """
     Build TF-IDF vectorizer and matrix for the list of texts.
@@ -164,7 +109,7 @@ def emb_cache_paths(chat_id: int, emb_model_name: str):
     return emb_path, meta_path
 
 
-def load_emb_cache(chat_id: int, emb_model_name: str):
+def load_emb_cache(chat_id: int, emb_model_name: str, expected_ids: List[Any] = None):
     emb_path, meta_path = emb_cache_paths(chat_id, emb_model_name)
     if not os.path.exists(emb_path) or not os.path.exists(meta_path):
         return None
@@ -172,6 +117,9 @@ def load_emb_cache(chat_id: int, emb_model_name: str):
         embeddings = np.load(emb_path, allow_pickle=False)
         with open(meta_path, 'r', encoding='utf-8') as f:
             meta = json.load(f)
+        # Si el chat cambió (mensajes nuevos/borrados) el cache ya no corresponde
+        if expected_ids is not None and meta.get("ids", []) != list(expected_ids):
+            return None
         return {
             "_embeddings": embeddings,
             "_texts": meta.get("texts", []),
@@ -253,17 +201,20 @@ def add_hard_negatives(
     emb_model_name: str = DEFAULT_EMB_MODEL,
     top_k: int = 50,
     take_k: int = 10,
-    sim_threshold: float = 0.35
+    sim_threshold: float = 0.35,
+    model: SentenceTransformer = None
 ) -> List[Dict[str, Any]]:
     """
     For each positive pair (a->b), find top-k semantically similar candidates
     within the same chat and add up to take_k as hard negatives.
     Provides very detailed progress logging.
+    An already loaded `model` can be passed to avoid reloading it per shard.
     """
 
-    print("\n[HN] Cargando modelo de embeddings...")
-    model = SentenceTransformer(emb_model_name)
-    print("[HN] ✅ Modelo listo.\n")
+    if model is None:
+        print("\n[HN] Cargando modelo de embeddings...")
+        model = shared_sentence_transformer(emb_model_name)
+        print("[HN] ✅ Modelo listo.\n")
 
     # --------------------------------------------------------
     # ETAPA 1: Embeddings por chat (con progreso detallado)
@@ -274,7 +225,7 @@ def add_hard_negatives(
         print(f"\n=== CHAT {cid} ===")
         print(f"[CHAT {cid}] Total mensajes: {len(msgs)}")
 
-        cached = load_emb_cache(cid, emb_model_name)
+        cached = load_emb_cache(cid, emb_model_name, expected_ids=[m.get("id") for m in msgs])
         if cached:
             print(f"[CHAT {cid}] ✅ Cache encontrado. Cargando embeddings...")
             chat["_texts"] = cached["_texts"]
@@ -469,77 +420,256 @@ def compute_chat_signature(chats: List[Dict[str, Any]]) -> Tuple[List[str], int]
     return sorted(chat_files), total_msgs
 
 
-# ---------------- Main (CLI) ----------------
-if __name__ == '__main__':
-    parser = argparse.ArgumentParser()
-    parser.add_argument('--input-dir', type=str, default='threads_analysis_results/train_chats')
-    parser.add_argument('--output', type=str, default='threads_analysis/models/output/pairs_mpnet_hardneg.jsonl')
-    parser.add_argument('--emb-model', type=str, default=DEFAULT_EMB_MODEL)
-    parser.add_argument('--neg-ratio', type=int, default=2)
-    parser.add_argument('--max-prev', type=int, default=10)
-    parser.add_argument('--top-k', type=int, default=50)
-    parser.add_argument('--take-k', type=int, default=10)
-    parser.add_argument('--sim-threshold', type=float, default=0.35)
-    parser.add_argument('--force', action='store_true', help='Force recompute even if cache matches')
-    args = parser.parse_args()
+# ---------------- Per-chat shards ----------------
+SHARD_VERSION = 1
 
-    # load chats
-    chats = load_chats(args.input_dir)
-    print(f"[INFO] Loaded {len(chats)} chats")
 
-    chat_files, total_messages = compute_chat_signature(chats)
-    out_meta = args.output + ".meta.json"
+def file_sha1(path: str, chunk_size: int = 1 << 20) -> str:
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(chunk_size), b''):
+            h.update(block)
+    return h.hexdigest()
 
-    params = {
-        'neg_ratio': args.neg_ratio,
-        'max_prev': args.max_prev,
-        'top_k': args.top_k,
-        'take_k': args.take_k,
-        'sim_threshold': args.sim_threshold
-    }
 
-    # check cache meta
-    existing_meta = read_meta(out_meta)
-    if existing_meta and not args.force:
-        if (existing_meta.get("chat_files") == chat_files
-                and existing_meta.get("total_messages") == total_messages
-                and existing_meta.get("embedding_model") == args.emb_model
-                and existing_meta.get("params") == params):
-            print(f"[CACHE HIT] Using cached pairs file: {args.output}")
-            raise SystemExit(0)
-        else:
-            print("[INFO] Cache mismatch or different params -> regenerating dataset")
+def assign_stable_chat_ids(chats: List[Dict[str, Any]], previous_manifest: Dict[str, Any] = None) -> Dict[str, int]:
+    """
+    Keeps chat_id stable across runs: chats already present in the previous manifest
+    keep their id, new chats get the next free id. Otherwise adding a file would shift
+    the ids (and invalidate the shards and embedding cache) of every chat after it.
+    """
+    chat_ids = dict((previous_manifest or {}).get("chat_ids", {}))
+    next_id = max(chat_ids.values(), default=-1) + 1
+    for chat in chats:
+        name = os.path.basename(chat["_file_path"])
+        if name not in chat_ids:
+            chat_ids[name] = next_id
+            next_id += 1
+        chat["_chat_id"] = chat_ids[name]
+    return chat_ids
 
-    # build base pairs
-    pairs = build_pairs(chats, neg_ratio=args.neg_ratio, max_prev=args.max_prev)
-    print(f"[INFO] Built base pairs: {len(pairs)}")
 
-    # prepare tfidf vectorizer on all texts in pairs (for tfidf_jaccard)
-    all_texts = []
-    for p in pairs:
-        all_texts.append(p['a']['text'] or "")
-        all_texts.append(p['b']['text'] or "")
-    # dedupe to reduce memory/time
-    all_texts_unique = list(dict.fromkeys(all_texts))
-    print(f"[INFO] Construyendo TF-IDF sobre {len(all_texts_unique)} textos únicos...")
-    print("[TF-IDF] Esto puede tardar varios minutos en chats grandes.")
-    tfidf_vect, tfidf_matrix = tfidf_jaccard_batch(all_texts_unique)
-    print("[TF-IDF] ✅ Vectorización completada.")
+def tfidf_vocab_path(shards_dir: str, version: str) -> str:
+    return os.path.join(shards_dir, f"tfidf_vocab_{version}.json")
 
 
-    # add hard negatives (uses embedding cache)
+def fit_tfidf_vocabulary(chats: List[Dict[str, Any]], shards_dir: str) -> Tuple[str, List[str]]:
+    """
+    Fits the TF-IDF vocabulary over every message text and stores it versioned by
+    content hash. tfidf_jaccard only looks at non-zero term indices, so a fixed
+    vocabulary is all that is needed to keep the feature stable across shards.
+    """
+    texts = list(dict.fromkeys(m.get('text', '') or '' for c in chats for m in c.get('messages', [])))
+    print(f"[TF-IDF] Ajustando vocabulario sobre {len(texts)} textos únicos...")
+    vect, _ = tfidf_jaccard_batch(texts)
+    vocab = [str(t) for t in vect.get_feature_names_out()]
+    version = hashlib.sha1("\n".join(vocab).encode('utf-8')).hexdigest()[:12]
+    os.makedirs(shards_dir, exist_ok=True)
+    with open(tfidf_vocab_path(shards_dir, version), 'w', encoding='utf-8') as f:
+        json.dump({"version": version, "vocabulary": vocab}, f, ensure_ascii=False)
+    print(f"[TF-IDF] ✅ Vocabulario v{version} ({len(vocab)} términos)")
+    return version, vocab
+
+
+def load_tfidf_vocabulary(shards_dir: str, version: str):
+    data = read_meta(tfidf_vocab_path(shards_dir, version)) if version else None
+    if not data or data.get("version") != version:
+        return None
+    return data["vocabulary"]
+
+
+def vectorizer_from_vocabulary(vocab: List[str]) -> CountVectorizer:
+    # Mismo tokenizado que tfidf_jaccard_batch; sin fit, el vocabulario queda fijo
+    return CountVectorizer(vocabulary=vocab, analyzer='word', token_pattern=r'\w+')
+
+
+def shard_paths(shards_dir: str, chat_id: int) -> Tuple[str, str]:
+    return (os.path.join(shards_dir, f"chat_{chat_id}.jsonl"),
+            os.path.join(shards_dir, f"chat_{chat_id}.meta.json"))
+
+
+def build_shard_meta(chat: Dict[str, Any], file_hash: str, emb_model: str,
+                     params: Dict[str, Any], tfidf_version: str) -> Dict[str, Any]:
+    return {
+        "chat_file": os.path.basename(chat["_file_path"]),
+        "chat_id": chat["_chat_id"],
+        "file_hash": file_hash,
+        "embedding_model": emb_model,
+        "params": params,
+        "tfidf_version": tfidf_version,
+        "version": SHARD_VERSION
+    }
+
+
+def is_shard_fresh(shards_dir: str, expected_meta: Dict[str, Any]) -> bool:
+    shard_path, meta_path = shard_paths(shards_dir, expected_meta["chat_id"])
+    existing = read_meta(meta_path)
+    if not existing or not os.path.exists(shard_path):
+        return False
+    return all(existing.get(k) == v for k, v in expected_meta.items())
+
+
+def build_chat_shard(chat: Dict[str, Any], shards_dir: str, shard_meta: Dict[str, Any],
+                     vectorizer: CountVectorizer, emb_model_name: str, model: SentenceTransformer,
+                     params: Dict[str, Any]) -> int:
+    """Builds pairs + hard negatives + features for a single chat and writes its shard."""
+    # Semilla por chat: reconstruir un shard es reproducible e independiente del resto
+    random.seed(RANDOM_SEED + int(chat["_chat_id"]))
+    pairs = build_pairs([chat], neg_ratio=params['neg_ratio'], max_prev=params['max_prev'])
     pairs = add_hard_negatives(
-        pairs, chats,
-        emb_model_name=args.emb_model,
-        top_k=args.top_k,
-        take_k=args.take_k,
-        sim_threshold=args.sim_threshold
+        pairs, [chat],
+        emb_model_name=emb_model_name,
+        top_k=params['top_k'],
+        take_k=params['take_k'],
+        sim_threshold=params['sim_threshold'],
+        model=model
     )
+    pairs = enrich_pair_features(pairs, vectorizer, None)
+
+    shard_path, meta_path = shard_paths(shards_dir, chat["_chat_id"])
+    save_pairs(pairs, shard_path)
+    shard_meta = dict(shard_meta, num_pairs=len(pairs))
+    with open(meta_path, 'w', encoding='utf-8') as f:
+        json.dump(shard_meta, f, ensure_ascii=False, indent=2)
+    return len(pairs)
+
+
+def write_manifest(manifest_path: str, shards: List[Dict[str, Any]], chat_ids: Dict[str, int],
+                   emb_model: str, params: Dict[str, Any], tfidf_version: str):
+    manifest = {
+        "shards": shards,
+        "chat_ids": chat_ids,
+        "embedding_model": emb_model,
+        "params": params,
+        "tfidf_version": tfidf_version,
+        "total_pairs": sum(sh["num_pairs"] for sh in shards),
+        "version": SHARD_VERSION
+    }
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
 
-    # enrich pairs with extra features
-    pairs = enrich_pair_features(pairs, tfidf_vect, tfidf_matrix)
 
-    # save pairs and metadata
-    save_pairs(pairs, args.output)
-    write_meta(out_meta, chat_files, total_messages, args.emb_model, params)
+def assemble_from_manifest(manifest_path: str, out_file: str):
+    """Materializes the manifest into a single JSONL (plain file concatenation of shards)."""
+    manifest = read_meta(manifest_path)
+    shards_dir = os.path.dirname(manifest_path)
+    os.makedirs(os.path.dirname(out_file), exist_ok=True)
+    tmp_file = out_file + ".tmp"
+    with open(tmp_file, 'wb') as out:
+        for sh in manifest["shards"]:
+            with open(os.path.join(shards_dir, sh["path"]), 'rb') as f:
+                shutil.copyfileobj(f, out)
+    os.replace(tmp_file, out_file)
+    print(f"[INFO] Ensamblados {manifest['total_pairs']} pairs de {len(manifest['shards'])} shards → {out_file}")
+
+
+# ---------------- Build (in-process) ----------------
+def dataset_meta_valid(pairs_path: str, emb_model: str = DEFAULT_EMB_MODEL) -> bool:
+    """True si <pairs>.meta.json (write_meta) existe y corresponde a esta versión / modelo de embeddings"""
+    meta = read_meta(pairs_path + ".meta.json")
+    return bool(
+        os.path.exists(pairs_path) and meta
+        and meta.get("version") == 2
+        and meta.get("embedding_model") == emb_model
+        and isinstance(meta.get("chat_files"), list) and meta["chat_files"]
+        and "params" in meta
+    )
+
+
+def build_dataset(input_dir: str, output: str, emb_model: str = DEFAULT_EMB_MODEL, neg_ratio: int = 2,
+                  max_prev: int = 10, top_k: int = 50, take_k: int = 10, sim_threshold: float = 0.35,
+                  force: bool = False, refit_tfidf: bool = False) -> Dict[str, Any]:
+    """Construye (incrementalmente, por shards) el dataset de pares; usable desde otro proceso Python"""
+    # load chats
+    chats = load_chats(input_dir)
+    print(f"[INFO] Loaded {len(chats)} chats")
+
+    out_meta = output + ".meta.json"
+    shards_dir = output + ".shards"
+    manifest_path = os.path.join(shards_dir, "manifest.json")
+    os.makedirs(shards_dir, exist_ok=True)
+
+    params = {
+        'neg_ratio': neg_ratio,
+        'max_prev': max_prev,
+        'top_k': top_k,
+        'take_k': take_k,
+        'sim_threshold': sim_threshold
+    }
+
+    previous_manifest = read_meta(manifest_path)
+    chat_ids = assign_stable_chat_ids(chats, previous_manifest)
+    chat_files, total_messages = compute_chat_signature(chats)
+
+    # TF-IDF vocabulary: reuse the current version unless explicitly refit
+    tfidf_version = (previous_manifest or {}).get("tfidf_version")
+    vocab = None if refit_tfidf else load_tfidf_vocabulary(shards_dir, tfidf_version)
+    if vocab is None:
+        tfidf_version, vocab = fit_tfidf_vocabulary(chats, shards_dir)
+    else:
+        print(f"[TF-IDF] Reutilizando vocabulario v{tfidf_version} ({len(vocab)} términos)")
+    vectorizer = vectorizer_from_vocabulary(vocab)
+
+    # per-chat shards: rebuild only new or changed chats
+    model = None
+    shards = []
+    rebuilt = 0
+    for chat in chats:
+        file_hash = file_sha1(chat["_file_path"])
+        shard_meta = build_shard_meta(chat, file_hash, emb_model, params, tfidf_version)
+        shard_path, meta_path = shard_paths(shards_dir, chat["_chat_id"])
+
+        if not force and is_shard_fresh(shards_dir, shard_meta):
+            print(f"[CACHE HIT] Shard chat {chat['_chat_id']} ({shard_meta['chat_file']})")
+            num_pairs = read_meta(meta_path).get("num_pairs", 0)
+        else:
+            print(f"[INFO] Reconstruyendo shard chat {chat['_chat_id']} ({shard_meta['chat_file']})")
+            if model is None:
+                print("\n[HN] Cargando modelo de embeddings...")
+                # compartido con el resto del proceso (pipeline_runner en un solo proceso)
+                model = shared_sentence_transformer(emb_model)
+                print("[HN] ✅ Modelo listo.\n")
+            num_pairs = build_chat_shard(chat, shards_dir, shard_meta, vectorizer, emb_model, model, params)
+            rebuilt += 1
+
+        shards.append({
+            "chat_file": shard_meta["chat_file"],
+            "chat_id": chat["_chat_id"],
+            "file_hash": file_hash,
+            "path": os.path.basename(shard_path),
+            "num_pairs": num_pairs
+        })
+
+    print(f"[INFO] Shards reconstruidos: {rebuilt}/{len(chats)}")
+
+    # manifest + materialized dataset and metadata
+    write_manifest(manifest_path, shards, chat_ids, emb_model, params, tfidf_version)
+    if rebuilt or not os.path.exists(output) or (previous_manifest or {}).get("shards") != shards:
+        assemble_from_manifest(manifest_path, output)
+    else:
+        print(f"[CACHE HIT] Using cached pairs file: {output}")
+    write_meta(out_meta, chat_files, total_messages, emb_model, params)
     print(f"[INFO] Metadata saved: {out_meta}")
+    return {"pairs": output, "meta": out_meta, "chats": len(chats), "shards_rebuilt": rebuilt,
+            "total_pairs": sum(sh["num_pairs"] for sh in shards)}
+
+
+# ---------------- Main (CLI) ----------------
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--input-dir', type=str, default='threads_analysis_results/train_chats')
+    parser.add_argument('--output', type=str, default='threads_analysis/models/output/pairs_mpnet_hardneg.jsonl')
+    parser.add_argument('--emb-model', type=str, default=DEFAULT_EMB_MODEL)
+    parser.add_argument('--neg-ratio', type=int, default=2)
+    parser.add_argument('--max-prev', type=int, default=10)
+    parser.add_argument('--top-k', type=int, default=50)
+    parser.add_argument('--take-k', type=int, default=10)
+    parser.add_argument('--sim-threshold', type=float, default=0.35)
+    parser.add_argument('--force', action='store_true', help='Force recompute of every shard even if cache matches')
+    parser.add_argument('--refit-tfidf', action='store_true',
+                        help='Fit a new TF-IDF vocabulary version (invalidates every shard)')
+    args = parser.parse_args()
+
+    build_dataset(args.input_dir, args.output, emb_model=args.emb_model, neg_ratio=args.neg_ratio,
+                  max_prev=args.max_prev, top_k=args.top_k, take_k=args.take_k, sim_threshold=args.sim_threshold,
+                  force=args.force, refit_tfidf=args.refit_tfidf)
@@ -0,0 +1,367 @@
+"""
+threads_analysis/models/distillation.py
+
+Destila el mejor cross-encoder (teacher, 12 capas) en un student diminuto para puntuar
+cada mensaje nuevo contra su ventana en tiempo real en CPU.
+
+Student: SmallMLP pequeño (hidden=64/16) sobre [a, b, |a-b|, a*b, extras], donde a/b son
+embeddings de un encoder chico (bi-encoder B / MiniLM, se calculan UNA vez por mensaje) y
+extras son las features baratas de enrich_pair_features. El costo por par es solo el MLP,
+en lugar de un forward completo del cross-encoder por par.
+
+Procedimiento:
+ - Pares de pairs_with_hard_neg.jsonl sin los chats de evaluation_set.jsonl (90/10 por chat)
+ - Logits del teacher sobre esos pares (cacheados en output/distill/teacher_logits.npy)
+ - Entrena el student con alpha * BCE(sigmoid(logit_teacher / T)) + (1 - alpha) * BCE(label)
+ - Guarda el student en output/best/student/ (onnx_export.export_all lo exporta como los demás)
+ - Exporta teacher y student por el mismo camino ONNX y escribe output/distillation_report.json
+   (+ .md) con F1 en evaluation_set y latencia "mensaje nuevo vs ventana" de cada uno
+
+Uso:
+python -m threads_analysis.models.distillation \
+    --pairs threads_analysis/models/output/pairs_with_hard_neg.jsonl \
+    --output-dir threads_analysis/models/output
+"""
+
+from __future__ import annotations
+import os
+import json
+import random
+import datetime
+from collections import Counter
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+import torch
+import torch.nn as nn
+from transformers import AutoTokenizer
+from sklearn.metrics import precision_recall_fscore_support, roc_auc_score
+
+from threads_analysis.models.feature_store import EmbeddingFeatureStore, TokenIdCache, model_fingerprint
+from threads_analysis.models.model_trainer import (
+    BI_ENCODER_B, CROSS_ENCODER, CROSS_MAX_LENGTH, DEVICE, RANDOM_SEED,
+    EmbeddingPairsDataset, LengthBucketBatchSampler, PadCollator, SmallMLP, TokenizedPairsDataset,
+    combine_pair_features, cross_pair_text, get_training_params, load_cross_encoder, load_pairs_jsonl,
+    mlp_extra_features, rows_fingerprint, sample_by_chat, unit_hash,
+)
+from threads_analysis.models import onnx_export
+
+
+def split_distill_rows(pairs_path: str, output_dir: str, max_pairs: int, val_ratio: float = 0.10):
+    """Pares de train/val del student: excluye los chats del conjunto de evaluación y separa val por chat"""
+    rows = load_pairs_jsonl(pairs_path)
+    eval_path = os.path.join(output_dir, "evaluation_set.jsonl")
+    eval_chats = {r.get("chat_id", 0) for r in load_pairs_jsonl(eval_path)} if os.path.exists(eval_path) else set()
+    rows = [r for r in rows if r.get("chat_id", 0) not in eval_chats]
+
+    random.seed(RANDOM_SEED)
+    rows = sample_by_chat(rows, max_pairs)
+
+    per_chat = Counter(r.get("chat_id", 0) for r in rows)
+    chats = sorted(per_chat, key=str)
+    random.Random(RANDOM_SEED).shuffle(chats)
+    val_chats, count = set(), 0
+    for cid in chats:
+        if count >= len(rows) * val_ratio:
+            break
+        val_chats.add(cid)
+        count += per_chat[cid]
+    rows_train = [r for r in rows if r.get("chat_id", 0) not in val_chats]
+    rows_val = [r for r in rows if r.get("chat_id", 0) in val_chats]
+    return rows_train, rows_val
+
+
+def teacher_logits(rows: List[Dict[str, Any]], teacher_dir: str, cache_dir: str, batch_size: int = 64) -> np.ndarray:
+    """Logits del cross-encoder para cada par (en el orden de `rows`), cacheados por datos + modelo"""
+    key = unit_hash(rows_fingerprint(rows, []), "teacher", model=model_fingerprint(teacher_dir), max_length=CROSS_MAX_LENGTH)
+    logits_path = os.path.join(cache_dir, "teacher_logits.npy")
+    meta_path = os.path.join(cache_dir, "teacher_logits.json")
+    if os.path.exists(logits_path) and os.path.exists(meta_path):
+        with open(meta_path, "r", encoding="utf-8") as f:
+            if json.load(f).get("key") == key:
+                print(f"[DISTILL] Logits del teacher desde cache ({logits_path})")
+                return np.load(logits_path)
+
+    print(f"[DISTILL] Puntuando {len(rows)} pares con el teacher {teacher_dir}...")
+    tokenizer = AutoTokenizer.from_pretrained(teacher_dir)
+    model = load_cross_encoder(teacher_dir, device=DEVICE)
+    # mismo tokenizer que el entrenamiento del cross-encoder: reutiliza su cache de token ids
+    ds = TokenizedPairsDataset(rows, TokenIdCache(tokenizer, CROSS_ENCODER, max_length=CROSS_MAX_LENGTH))
+    collate = PadCollator(tokenizer.pad_token_id or 0, "token_type_ids" in tokenizer.model_input_names)
+    logits = np.zeros(len(ds), dtype=np.float32)
+    with torch.no_grad():
+        for idx in LengthBucketBatchSampler(ds.lengths, batch_size, shuffle=False):
+            batch = collate([ds[i] for i in idx])
+            inputs = {k: v.to(DEVICE) for k, v in batch.items() if k != "labels"}
+            with torch.cuda.amp.autocast(enabled=torch.cuda.is_available()):
+                out = model(**inputs).logits.view(-1)
+            logits[idx] = out.float().cpu().numpy()
+
+    os.makedirs(cache_dir, exist_ok=True)
+    np.save(logits_path, logits)
+    with open(meta_path, "w", encoding="utf-8") as f:
+        json.dump({"key": key, "teacher": teacher_dir, "pairs": len(rows)}, f, ensure_ascii=False, indent=2)
+    return logits
+
+
+def _predict(model: nn.Module, X: np.ndarray, batch_size: int = 4096) -> np.ndarray:
+    model.eval()
+    out = []
+    with torch.no_grad():
+        for i in range(0, len(X), batch_size):
+            out.append(model(torch.from_numpy(np.ascontiguousarray(X[i:i + batch_size])).to(DEVICE).float()).cpu().numpy())
+    return np.concatenate(out) if out else np.zeros(0, dtype=np.float32)
+
+
+def train_student(train_ds: EmbeddingPairsDataset, val_ds: EmbeddingPairsDataset, soft_train: np.ndarray,
+                  soft_val: np.ndarray, params: Dict[str, Any], progress_file: str):
+    """Entrena el student con targets blandos del teacher + labels; devuelve (mejor estado, mejor F1)"""
+    student = SmallMLP(train_ds.input_dim, hidden=params["hidden"], hidden2=params["hidden2"],
+                       dropout=params["dropout"]).to(DEVICE)
+    opt = torch.optim.AdamW(student.parameters(), lr=params["lr"], weight_decay=params["weight_decay"])
+    bce = nn.BCELoss()
+    alpha = params["alpha"]
+
+    X_train = torch.from_numpy(train_ds.feature_matrix())
+    y_soft = torch.from_numpy(soft_train.astype(np.float32))
+    y_hard = torch.from_numpy(train_ds.labels)
+    X_val = val_ds.feature_matrix()
+    gen = torch.Generator().manual_seed(RANDOM_SEED)
+
+    progress_data = {"model": "student", "params": params, "training_history": [],
+                     "start_time": datetime.datetime.now().isoformat()}
+    best_f1, best_state = -1.0, None
+    for epoch in range(1, params["epochs"] + 1):
+        student.train()
+        total_loss = 0.0
+        perm = torch.randperm(len(X_train), generator=gen)
+        for i in range(0, len(perm), params["batch_size"]):
+            idx = perm[i:i + params["batch_size"]]
+            xb = X_train[idx].to(DEVICE).float()
+            probs = student(xb)
+            loss = alpha * bce(probs, y_soft[idx].to(DEVICE)) + (1 - alpha) * bce(probs, y_hard[idx].to(DEVICE))
+            opt.zero_grad()
+            loss.backward()
+            opt.step()
+            total_loss += loss.item() * len(idx)
+
+        yps = _predict(student, X_val)
+        p, r, f, _ = precision_recall_fscore_support(val_ds.labels.astype(int), (yps >= 0.5).astype(int),
+                                                     average='binary', zero_division=0)
+        # acuerdo con el teacher: misma decisión (umbral 0.5 <=> logit 0, independiente de T)
+        agreement = float(np.mean((yps >= 0.5) == (soft_val >= 0.5))) if len(yps) else 0.0
+        epoch_data = {
+            "epoch": epoch, "loss": float(total_loss / max(1, len(perm))), "precision": float(p),
+            "recall": float(r), "f1": float(f), "teacher_agreement": agreement,
+            "timestamp": datetime.datetime.now().isoformat()
+        }
+        progress_data["training_history"].append(epoch_data)
+        with open(progress_file, "w", encoding="utf-8") as fh:
+            json.dump(progress_data, fh, ensure_ascii=False, indent=2)
+        print(f"[DISTILL] Epoch {epoch}: loss={epoch_data['loss']:.4f} P={p:.4f} R={r:.4f} F1={f:.4f} "
+              f"acuerdo={agreement:.3f}")
+
+        if f > best_f1:
+            best_f1 = f
+            best_state = {k: v.cpu() for k, v in student.state_dict().items()}
+    return best_state, best_f1
+
+
+# Paridad embeddings ONNX del student vs feature store (encode(), quizá en otro device / batch)
+STORE_PARITY_SAMPLE = 256
+STORE_PARITY_TOL = 1e-3
+
+
+def check_store_parity(onnx_emb: np.ndarray, texts: List[str], encoder: str,
+                       sample_size: int = STORE_PARITY_SAMPLE, tol: float = STORE_PARITY_TOL) -> float:
+    """
+    Verifica que los embeddings del grafo ONNX del student, para una muestra de textos, sean los
+    del EmbeddingFeatureStore con el que se entrenó su MLP. Devuelve la máxima diferencia.
+    """
+    if not texts:
+        return 0.0
+    idx = sorted(random.Random(RANDOM_SEED).sample(range(len(texts)), min(sample_size, len(texts))))
+    store = EmbeddingFeatureStore(encoder, device=DEVICE)
+    reference = np.asarray(store.embeddings[store.rows([texts[i] for i in idx])], dtype=np.float32)
+    max_diff = float(np.abs(onnx_emb[idx] - reference).max())
+    print(f"[DISTILL] Paridad ONNX vs feature store ({len(idx)} textos): max diff = {max_diff:.2e}")
+    if max_diff > tol:
+        raise RuntimeError(f"Los embeddings ONNX del student no coinciden con el feature store de {encoder} "
+                           f"(max diff {max_diff:.2e} > {tol:.0e}): F1/AUC y latencias no serían comparables")
+    return max_diff
+
+
+def _scores(labels: np.ndarray, probs: np.ndarray) -> Dict[str, float]:
+    p, r, f, _ = precision_recall_fscore_support(labels, (probs >= 0.5).astype(int), average='binary', zero_division=0)
+    auc = roc_auc_score(labels, probs) if len(np.unique(labels)) > 1 else 0.0
+    return {"f1": float(f), "precision": float(p), "recall": float(r), "auc": float(auc)}
+
+
+def compare_teacher_student(rows: List[Dict[str, Any]], teacher_dir: str, student_dir: str, onnx_dir: str,
+                            window: int = 32, threads: int = 0) -> List[Dict[str, Any]]:
+    """
+    Exporta teacher y student con onnx_export y los compara en CPU sobre `rows`:
+    F1/P/R/AUC y latencia de puntuar UN mensaje nuevo contra `window` candidatos
+    (teacher: window forwards del cross-encoder; student: 1 embedding + window filas de MLP,
+    con los embeddings de los candidatos ya calculados).
+    """
+    with open(os.path.join(student_dir, "student_config.json"), "r", encoding="utf-8") as f:
+        config = json.load(f)
+    teacher_onnx = os.path.join(onnx_dir, "teacher")
+    student_onnx = os.path.join(onnx_dir, "student")
+    onnx_export.export_cross_encoder(teacher_dir, teacher_onnx)
+    export_student(student_dir, student_onnx)
+
+    labels = np.array([int(r.get("label", 0)) for r in rows])
+    table = []
+
+    # ---------------- teacher ----------------
+    tok_t = AutoTokenizer.from_pretrained(teacher_dir)
+    sess_t = onnx_export._cpu_session(os.path.join(teacher_onnx, "model.onnx"), threads)
+    cross_texts = [cross_pair_text(r) for r in rows]
+    teacher_probs = onnx_export.onnx_cross(sess_t, tok_t, cross_texts)
+    window_texts = [f"{rows[0]['b']['text'] or ''} [SEP] {r['a']['text'] or ''}" for r in rows[:window]] if rows else []
+    lat_t = onnx_export.benchmark(lambda t: onnx_export.onnx_cross(sess_t, tok_t, t), {window: window_texts})
+    table.append({"model": "teacher (cross-encoder)", **_scores(labels, teacher_probs),
+                  "size_mb": onnx_export._file_mb(os.path.join(teacher_onnx, "model.onnx")),
+                  **_window_latency(lat_t[f"batch_{window}"], window)})
+
+    # ---------------- student ----------------
+    tok_s = AutoTokenizer.from_pretrained(student_onnx)
+    sess_enc = onnx_export._cpu_session(os.path.join(student_onnx, "model.onnx"), threads)
+    sess_mlp = onnx_export._cpu_session(os.path.join(student_onnx, "mlp.onnx"), threads)
+    max_len = config.get("max_seq_length", 128)
+    texts = list(dict.fromkeys([r["a"]["text"] or "" for r in rows] + [r["b"]["text"] or "" for r in rows]))
+    row_of = {t: i for i, t in enumerate(texts)}
+    emb = onnx_export.onnx_encode(sess_enc, tok_s, texts, max_length=max_len)
+    # El MLP se entrenó con los vectores del feature store: el grafo debe reproducirlos
+    store_max_diff = check_store_parity(emb, texts, config["encoder"])
+    extras = np.stack([mlp_extra_features(r) for r in rows]) if rows else np.zeros((0, 0), dtype=np.float32)
+    X = combine_pair_features(emb[[row_of[r["a"]["text"] or ""] for r in rows]],
+                              emb[[row_of[r["b"]["text"] or ""] for r in rows]], extras)
+    student_probs = onnx_export.onnx_mlp(sess_mlp, X)
+
+    def student_window(inp):
+        new_text, cand_emb, cand_extras = inp
+        new_emb = onnx_export.onnx_encode(sess_enc, tok_s, [new_text], max_length=max_len)
+        return onnx_export.onnx_mlp(sess_mlp, combine_pair_features(cand_emb, np.repeat(new_emb, len(cand_emb), 0), cand_extras))
+
+    window_inp = (rows[0]["b"]["text"] or "", X[:window, :emb.shape[1]], extras[:window]) if rows else ("", emb[:0], extras[:0])
+    lat_s = onnx_export.benchmark(student_window, {window: window_inp})
+    table.append({"model": "student (MLP destilado)", **_scores(labels, student_probs),
+                  "size_mb": onnx_export._file_mb(os.path.join(student_onnx, "model.onnx"), os.path.join(student_onnx, "mlp.onnx")),
+                  **_window_latency(lat_s[f"batch_{window}"], window)})
+    table[-1]["teacher_agreement"] = float(np.mean((student_probs >= 0.5) == (teacher_probs >= 0.5))) if rows else 0.0
+    table[-1]["speedup"] = float(table[0]["window_p50_ms"] / max(table[-1]["window_p50_ms"], 1e-9))
+    table[-1]["store_max_diff"] = store_max_diff
+    return table
+
+
+def _window_latency(lat: Dict[str, float], window: int) -> Dict[str, float]:
+    return {"window": window, "window_p50_ms": lat["p50_ms"], "window_p95_ms": lat["p95_ms"],
+            "pairs_per_sec": lat["items_per_sec"]}
+
+
+def export_student(student_dir: str, output_dir: str) -> str:
+    """Encoder (grafo autocontenido, = encode()) + mlp.onnx del student, por el mismo camino que los bi-encoders"""
+    with open(os.path.join(student_dir, "student_config.json"), "r", encoding="utf-8") as f:
+        config = json.load(f)
+    onnx_export.export_sentence_transformer(config["encoder"], output_dir)
+    return onnx_export.export_mlp(os.path.join(student_dir, "student_mlp.pth"), config["input_dim"], output_dir,
+                                  hidden=config["hidden"], hidden2=config["hidden2"])
+
+
+def format_table(table: List[Dict[str, Any]]) -> str:
+    header = "| modelo | F1 | P | R | AUC | ventana p50 (ms) | ventana p95 (ms) | pares/s | MB |"
+    lines = [header, "|" + "---|" * 9]
+    for t in table:
+        lines.append(f"| {t['model']} | {t['f1']:.4f} | {t['precision']:.4f} | {t['recall']:.4f} | {t['auc']:.4f} | "
+                     f"{t['window_p50_ms']:.2f} | {t['window_p95_ms']:.2f} | {t['pairs_per_sec']:.0f} | {t['size_mb']:.1f} |")
+    return "\n".join(lines)
+
+
+def distill_student(pairs_path: str, output_dir: str = "threads_analysis/models/output",
+                    teacher_dir: Optional[str] = None, encoder: Optional[str] = None, resume: bool = False,
+                    window: int = 32, sample_size: int = 2000, threads: int = 0) -> Optional[Dict[str, Any]]:
+    teacher_dir = teacher_dir or os.path.join(output_dir, "best", "cross_encoder")
+    if not os.path.isdir(teacher_dir):
+        print(f"[WARN] No hay cross-encoder entrenado en {teacher_dir}; se omite la destilación")
+        return None
+    bi_b_best = os.path.join(output_dir, "best", "bi_encoder_B")
+    encoder = encoder or (bi_b_best if os.path.isdir(bi_b_best) else BI_ENCODER_B)
+    params = get_training_params("distill")
+    distill_dir = os.path.join(output_dir, "distill")
+    student_dir = os.path.join(output_dir, "best", "student")
+    os.makedirs(distill_dir, exist_ok=True)
+    os.makedirs(student_dir, exist_ok=True)
+
+    rows_train, rows_val = split_distill_rows(pairs_path, output_dir, params["max_pairs"])
+    print(f"[DISTILL] Student sobre {encoder}: {len(rows_train)} pares train / {len(rows_val)} val")
+    inputs_hash = unit_hash(rows_fingerprint(rows_train, rows_val), "student", teacher=model_fingerprint(teacher_dir),
+                            encoder=model_fingerprint(encoder), params=params)
+
+    config_path = os.path.join(student_dir, "student_config.json")
+    config = None
+    if resume and os.path.exists(config_path):
+        with open(config_path, "r", encoding="utf-8") as f:
+            config = json.load(f)
+        if config.get("inputs_hash") == inputs_hash:
+            print("[SKIP] Student completo con las mismas entradas")
+        else:
+            config = None
+
+    if config is None:
+        logits = teacher_logits(rows_train + rows_val, teacher_dir, distill_dir, params["teacher_batch_size"])
+        # targets blandos suavizados con temperatura (la decisión a 0.5 no cambia)
+        soft = 1.0 / (1.0 + np.exp(-logits / params["temperature"]))
+        soft_train, soft_val = soft[:len(rows_train)], soft[len(rows_train):]
+
+        store = EmbeddingFeatureStore(encoder, device=DEVICE)
+        train_ds = EmbeddingPairsDataset(rows_train, store, materialize=True)
+        val_ds = EmbeddingPairsDataset(rows_val, store, materialize=True)
+        best_state, best_f1 = train_student(train_ds, val_ds, soft_train, soft_val, params,
+                                            os.path.join(distill_dir, "training_progress.json"))
+        if best_state is None:
+            print("[WARN] El student no se entrenó (sin pares)")
+            return None
+        torch.save(best_state, os.path.join(student_dir, "student_mlp.pth"))
+        config = {
+            "encoder": encoder, "teacher": teacher_dir, "input_dim": train_ds.input_dim, "dim": store.dim,
+            "hidden": params["hidden"], "hidden2": params["hidden2"],
+            "max_seq_length": onnx_export._max_seq_length(encoder) if os.path.isdir(encoder) else 128,
+            "val_f1": float(best_f1), "inputs_hash": inputs_hash, "created_at": datetime.datetime.now().isoformat()
+        }
+        with open(config_path, "w", encoding="utf-8") as f:
+            json.dump(config, f, ensure_ascii=False, indent=2)
+        print(f"[DISTILL] Guardado student en {student_dir} (val F1={best_f1:.4f})")
+        del train_ds, val_ds
+
+    eval_rows = onnx_export.load_eval_sample(os.path.join(output_dir, "evaluation_set.jsonl"), sample_size)
+    table = compare_teacher_student(eval_rows, teacher_dir, student_dir, os.path.join(distill_dir, "onnx"),
+                                    window=window, threads=threads)
+    report = {"created_at": datetime.datetime.now().isoformat(), "teacher": teacher_dir, "encoder": encoder,
+              "eval_pairs": len(eval_rows), "params": params, "table": table}
+    with open(os.path.join(output_dir, "distillation_report.json"), "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    markdown = format_table(table)
+    with open(os.path.join(output_dir, "distillation_report.md"), "w", encoding="utf-8") as f:
+        f.write(markdown + "\n")
+    print("[DISTILL] Teacher vs student (evaluation_set, CPU/ONNX):\n" + markdown)
+    return {"student_dir": student_dir, "val_f1": config["val_f1"], "eval": table}
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pairs", type=str, required=True, help="Ruta a pairs jsonl (output dataset)")
+    parser.add_argument("--output-dir", type=str, default="threads_analysis/models/output")
+    parser.add_argument("--teacher-dir", type=str, default=None, help="Por defecto output/best/cross_encoder")
+    parser.add_argument("--encoder", type=str, default=None, help="Encoder de los embeddings (por defecto best/bi_encoder_B)")
+    parser.add_argument("--window", type=int, default=32, help="Candidatos por mensaje nuevo en el benchmark")
+    parser.add_argument("--sample-size", type=int, default=2000, help="Pares de evaluation_set para la tabla")
+    parser.add_argument("--threads", type=int, default=0, help="intra_op_num_threads de ORT en el benchmark")
+    parser.add_argument("--resume", action="store_true", help="No reentrenar si el student ya existe con las mismas entradas")
+    args = parser.parse_args()
+
+    distill_student(args.pairs, args.output_dir, teacher_dir=args.teacher_dir, encoder=args.encoder,
+                    resume=args.resume, window=args.window, sample_size=args.sample_size, threads=args.threads)
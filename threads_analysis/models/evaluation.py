@@ -3,13 +3,20 @@ threads_analysis/models/evaluation.py
 
 Evalúa:
 - Heurísticas del grafo
-- Bi-encoder A
-- Bi-encoder B
+- Bi-encoder A (+ MLP)
+- Bi-encoder B (+ MLP)
 - Cross-encoder
 
 Usando el dataset generado en dataset_builder.py
 Toma automáticamente el mejor fold desde training_summary.json.
 
+Evaluación por lotes:
+- Los pares se leen en bloques (--chunk-size) sin cargar todo el JSONL en memoria
+- Cada texto único se codifica una sola vez por encoder a través del feature store compartido
+  con el entrenamiento (feature_store.py) y se puntúan miles de pares por forward (--batch-size)
+- Las heurísticas usan textos pre-analizados con nlp.pipe (ConversationGraphBuilder.parse_texts)
+- --threads fija los hilos de torch; --n-process los procesos de spaCy
+
 Uso:
 python -m threads_analysis.models.evaluation \
     --pairs threads_analysis/models/output/pairs_with_hard_neg.jsonl \
@@ -19,18 +26,28 @@ python -m threads_analysis.models.evaluation \
 from __future__ import annotations
 import os
 import json
-from typing import List, Dict, Any
+import time
+from typing import List, Dict, Any, Iterator, Optional
 import numpy as np
 from tqdm import tqdm
 import torch
 from sklearn.metrics import precision_recall_fscore_support, roc_auc_score
 
 from threads_analysis.knowledge_graph import ConversationGraphBuilder
+from threads_analysis.models.feature_store import EmbeddingFeatureStore
 from threads_analysis.models.model_trainer import (
-    EmbeddingCache,
+    BI_ENCODER_A,
+    BI_ENCODER_B,
+    CROSS_ENCODER,
+    CROSS_MAX_LENGTH,
+    DEVICE,
+    MLP_SUBDIRS,
+    N_EXTRA_FEATURES,
+    combine_pair_features,
+    cross_pair_text,
+    load_cross_encoder,
     load_mlp_from_path,
-    make_features,
-    make_cross_features
+    mlp_extra_features
 )
 
 # -------------- Colored logs ----------------------------------
@@ -51,6 +68,7 @@ def log_err(msg): print(f"{Colors.ERR}[ERR]{Colors.END} {msg}")
 # Load best model paths according to training_summary.json
 # ------------------------------------------------------------------------
 def load_best_models(models_dir: str):
+    """Rutas del mejor fold de cada modelo (mismo criterio que export_best en model_trainer)"""
     summary_path = os.path.join(models_dir, "training_summary.json")
 
     if not os.path.exists(summary_path):
@@ -60,62 +78,124 @@ def load_best_models(models_dir: str):
     with open(summary_path, "r", encoding="utf-8") as f:
         summary = json.load(f)
 
-    best = {
-        "biA": summary["bi_encoder_A"]["best_fold"],
-        "biB": summary["bi_encoder_B"]["best_fold"],
-        "cross": summary["cross_encoder"]["best_fold"],
-    }
-
-    # Construimos rutas
-    model_paths = {
-        "biA": os.path.join(models_dir, f"bi_encoder_A_fold{best['biA']}.pth"),
-        "biB": os.path.join(models_dir, f"bi_encoder_B_fold{best['biB']}.pth"),
-        "cross": os.path.join(models_dir, f"cross_encoder_fold{best['cross']}.pth"),
-    }
+    def best_entry(key, metric):
+        entries = [e for e in summary.get(key, []) if e.get(metric) is not None]
+        return max(entries, key=lambda e: e[metric]) if entries else None
+
+    model_paths = {}
+    for name, key, base_model in (("biA", "bi_a", BI_ENCODER_A), ("biB", "bi_b", BI_ENCODER_B)):
+        best = best_entry(key, "mlp_f1")
+        if best is None:
+            log_warn(f"Sin entradas para {key} en training_summary.json")
+            continue
+        fold_dir = os.path.join(models_dir, f"fold_{best['fold']}")
+        encoder_dir = best.get("model_dir")
+        model_paths[name] = {
+            "fold": best["fold"],
+            "encoder": encoder_dir if encoder_dir and os.path.isdir(encoder_dir) else base_model,
+            "mlp": os.path.join(fold_dir, MLP_SUBDIRS[key], "mlp_model.pth"),
+        }
+
+    best = best_entry("cross", "cross_f1")
+    if best is not None:
+        model_paths["cross"] = {"fold": best["fold"], "model_dir": best.get("model_dir")}
+    else:
+        log_warn("Sin entradas para cross en training_summary.json")
 
     return model_paths, summary
 
 
 # ------------------------------------------------------------------------
-# Evaluation function
+# Streaming de pares
 # ------------------------------------------------------------------------
-def evaluate_model(model, featurizer, pairs: str, model_type: str):
-    log_info(f"Evaluando modelo: {model_type}")
-
-    emb_cache = EmbeddingCache()
-    ys = []
-    yps = []
-
+def iter_pair_chunks(pairs: str, chunk_size: int) -> Iterator[List[Dict[str, Any]]]:
+    """Lee el JSONL en bloques de chunk_size pares"""
+    chunk = []
     with open(pairs, "r", encoding="utf-8") as f:
         for line in f:
-            obj = json.loads(line)
-            a = obj["a"]
-            b = obj["b"]
-            label = int(obj["label"])
-
-            ys.append(label)
+            if not line.strip():
+                continue
+            chunk.append(json.loads(line))
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
 
-            emb_a = emb_cache.get(a["text"])
-            emb_b = emb_cache.get(b["text"])
-            time_delta = float(obj.get("time_delta_min", 99999.0))
-            same_author = int(obj.get("same_author", 0))
 
-            if model_type == "cross":
-                X = torch.from_numpy(
-                    featurizer(a["text"], b["text"])
-                ).unsqueeze(0)
-            else:
-                X = torch.from_numpy(
-                    featurizer(emb_a, emb_b, time_delta, same_author)
-                ).unsqueeze(0)
-
-            with torch.no_grad():
-                pred = float(model(X).cpu().numpy().squeeze())
+# ------------------------------------------------------------------------
+# Scorers por lotes
+# ------------------------------------------------------------------------
+class MLPPairScorer:
+    """Bi-encoder + MLP: embeddings desde el feature store, features y forward por lotes"""
+    def __init__(self, encoder: str, mlp_path: str, batch_size: int = 4096):
+        self.store = EmbeddingFeatureStore(encoder, device=DEVICE)
+        self.mlp_path = mlp_path
+        self.batch_size = batch_size
+        self.mlp = None
+
+    def score(self, rows: List[Dict[str, Any]]) -> np.ndarray:
+        idx_a, idx_b = self.store.pair_rows(rows)
+        if self.mlp is None:
+            self.mlp = load_mlp_from_path(self.mlp_path, 4 * self.store.dim + N_EXTRA_FEATURES)
+        extras = np.stack([mlp_extra_features(r) for r in rows])
+        emb = self.store.embeddings
+        out = np.empty(len(rows), dtype=np.float32)
+        with torch.inference_mode():
+            for start in range(0, len(rows), self.batch_size):
+                sl = slice(start, start + self.batch_size)
+                X = combine_pair_features(emb[idx_a[sl]], emb[idx_b[sl]], extras[sl])
+                out[sl] = self.mlp(torch.from_numpy(X).to(DEVICE)).cpu().numpy()
+        return out
+
+
+class CrossPairScorer:
+    """Cross-encoder: pares ordenados por longitud y padding dinámico por lote"""
+    def __init__(self, model_dir: Optional[str], batch_size: int = 256):
+        from transformers import AutoTokenizer
+        self.batch_size = batch_size
+        has_tokenizer = bool(model_dir) and os.path.exists(os.path.join(model_dir, "tokenizer_config.json"))
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir if has_tokenizer else CROSS_ENCODER)
+        self.model = load_cross_encoder(model_dir, device=DEVICE)
+
+    def score(self, rows: List[Dict[str, Any]]) -> np.ndarray:
+        texts = [cross_pair_text(r) for r in rows]
+        order = np.argsort([len(t) for t in texts], kind="stable")
+        out = np.empty(len(rows), dtype=np.float32)
+        with torch.inference_mode():
+            for start in range(0, len(order), self.batch_size):
+                batch_idx = order[start:start + self.batch_size]
+                enc = self.tokenizer([texts[i] for i in batch_idx], truncation=True, max_length=CROSS_MAX_LENGTH,
+                                     padding=True, return_tensors="pt").to(DEVICE)
+                logits = self.model(**enc).logits.view(-1)
+                out[batch_idx] = torch.sigmoid(logits).float().cpu().numpy()
+        return out
+
+
+class HeuristicPairScorer:
+    """Heurísticas del grafo sobre textos pre-analizados (un nlp.pipe por bloque de pares)"""
+    def __init__(self, n_process: int = 1, batch_size: int = 256):
+        self.kg = ConversationGraphBuilder()
+        self.n_process = n_process
+        self.batch_size = batch_size
+
+    def score(self, rows: List[Dict[str, Any]]) -> np.ndarray:
+        parsed = self.kg.parse_texts([r["a"].get("text") or "" for r in rows] + [r["b"].get("text") or "" for r in rows],
+                                     batch_size=self.batch_size, n_process=self.n_process)
+        out = np.empty(len(rows), dtype=np.float32)
+        for i, r in enumerate(rows):
+            try:
+                out[i] = self.kg._calculate_reply_probability(r["a"], r["b"], parsed=parsed)
+            except Exception:
+                out[i] = 0.0
+        return out
 
-            yps.append(pred)
 
-    # Compute metrics
-    preds_bin = [1 if p >= 0.5 else 0 for p in yps]
+# ------------------------------------------------------------------------
+# Evaluation function
+# ------------------------------------------------------------------------
+def compute_metrics(ys: np.ndarray, yps: np.ndarray, name: str) -> Dict[str, float]:
+    preds_bin = (yps >= 0.5).astype(int)
 
     p, r, f1, _ = precision_recall_fscore_support(
         ys, preds_bin, average="binary", zero_division=0
@@ -126,89 +206,97 @@ def evaluate_model(model, featurizer, pairs: str, model_type: str):
     except ValueError:
         auc = 0.0
 
-    log_ok(f"{model_type}: AUC={auc:.4f}  P={p:.4f}  R={r:.4f}  F1={f1:.4f}")
+    log_ok(f"{name}: AUC={auc:.4f}  P={p:.4f}  R={r:.4f}  F1={f1:.4f}")
 
-    return {"auc": auc, "p": p, "r": r, "f1": f1}
+    return {"auc": float(auc), "p": float(p), "r": float(r), "f1": float(f1)}
 
 
-# ------------------------------------------------------------------------
-# Heuristics evaluation
-# ------------------------------------------------------------------------
-def evaluate_heuristics(pairs: str):
-    log_info("Evaluando Heurísticas...")
-
-    kg = ConversationGraphBuilder()
+def evaluate_scorers(scorers: Dict[str, Any], pairs: str, chunk_size: int = 20000) -> Dict[str, Dict[str, float]]:
+    """Una sola pasada por el JSONL: cada bloque se puntúa con todos los scorers"""
     ys = []
-    yps = []
+    yps = {name: [] for name in scorers}
+    seconds = {name: 0.0 for name in scorers}
 
-    with open(pairs, "r", encoding="utf-8") as f:
-        for line in f:
-            obj = json.loads(line)
-            a = obj["a"]
-            b = obj["b"]
-            label = int(obj["label"])
-            ys.append(label)
-
-            try:
-                pred = kg._calculate_reply_probability(a, b)
-            except Exception:
-                pred = 0.0
-            yps.append(pred)
-
-    preds_bin = [1 if p >= 0.5 else 0 for p in yps]
-
-    p, r, f1, _ = precision_recall_fscore_support(
-        ys, preds_bin, average="binary", zero_division=0
-    )
+    for chunk in tqdm(iter_pair_chunks(pairs, chunk_size), desc="[EVAL] bloques"):
+        ys.append(np.array([int(r["label"]) for r in chunk], dtype=np.int64))
+        for name, scorer in scorers.items():
+            t0 = time.perf_counter()
+            yps[name].append(scorer.score(chunk))
+            seconds[name] += time.perf_counter() - t0
 
-    try:
-        auc = roc_auc_score(ys, yps)
-    except ValueError:
-        auc = 0.0
+    y_all = np.concatenate(ys) if ys else np.zeros(0, dtype=np.int64)
+    results = {}
+    for name in scorers:
+        log_info(f"Evaluando modelo: {name}")
+        results[name] = compute_metrics(y_all, np.concatenate(yps[name]) if yps[name] else np.zeros(0), name)
+        results[name]["pairs_per_sec"] = float(len(y_all) / max(seconds[name], 1e-9))
+    return results
 
-    log_ok(f"Heuristicas: AUC={auc:.4f}  P={p:.4f}  R={r:.4f}  F1={f1:.4f}")
 
-    return {"auc": auc, "p": p, "r": r, "f1": f1}
+def evaluate_heuristics(pairs: str, chunk_size: int = 20000, n_process: int = 1):
+    log_info("Evaluando Heurísticas...")
+    return evaluate_scorers({"heuristics": HeuristicPairScorer(n_process=n_process)}, pairs, chunk_size=chunk_size)["heuristics"]
 
 
 # ------------------------------------------------------------------------
 # MAIN
 # ------------------------------------------------------------------------
-def main():
-    import argparse
-    parser = argparse.ArgumentParser()
-    parser.add_argument("--pairs", type=str, required=True)
-    parser.add_argument("--models-dir", type=str, required=True)
-    args = parser.parse_args()
-
-    models_dir = args.models_dir
+def run_evaluation(pairs: str, models_dir: str, chunk_size: int = 20000, batch_size: int = 4096,
+                   cross_batch_size: int = 256, threads: int = 0, n_process: int = 1,
+                   output: Optional[str] = None) -> Dict[str, Dict[str, float]]:
+    """Evalúa heurísticas y el mejor fold de cada modelo sobre `pairs` (usable en proceso desde pipeline_runner)"""
+    if threads > 0:
+        torch.set_num_threads(threads)
 
     # Load best fold models
     model_paths, summary = load_best_models(models_dir)
 
-    # Load PyTorch models
     log_info("Cargando modelos de mejor fold...")
 
-    biA_model = load_mlp_from_path(model_paths["biA"], summary["bi_encoder_A"]["input_dim"])
-    biB_model = load_mlp_from_path(model_paths["biB"], summary["bi_encoder_B"]["input_dim"])
-    cross_model = load_mlp_from_path(model_paths["cross"], summary["cross_encoder"]["input_dim"])
+    scorers = {"heuristics": HeuristicPairScorer(n_process=n_process)}
+    for name in ("biA", "biB"):
+        if name in model_paths and os.path.exists(model_paths[name]["mlp"]):
+            scorers[name] = MLPPairScorer(model_paths[name]["encoder"], model_paths[name]["mlp"], batch_size=batch_size)
+        else:
+            log_warn(f"No se encontró MLP para {name}; se omite")
+    if "cross" in model_paths:
+        scorers["cross"] = CrossPairScorer(model_paths["cross"]["model_dir"], batch_size=cross_batch_size)
 
     # Run evaluations
-    results = {}
-
-    results["heuristics"] = evaluate_heuristics(args.pairs)
-    results["biA"] = evaluate_model(biA_model, make_features, args.pairs, "biA")
-    results["biB"] = evaluate_model(biB_model, make_features, args.pairs, "biB")
-    results["cross"] = evaluate_model(cross_model, make_cross_features, args.pairs, "cross")
+    results = evaluate_scorers(scorers, pairs, chunk_size=chunk_size)
 
     # ---- Summary ----
     print("\n==============================")
     print("📊 RESUMEN FINAL MODELOS")
     print("==============================")
     for k, v in results.items():
-        print(f"{k}: AUC={v['auc']:.4f}  P={v['p']:.4f}  R={v['r']:.4f}  F1={v['f1']:.4f}")
+        print(f"{k}: AUC={v['auc']:.4f}  P={v['p']:.4f}  R={v['r']:.4f}  F1={v['f1']:.4f}  ({v['pairs_per_sec']:.0f} pares/s)")
+
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        log_info(f"Resultados guardados en {output}")
 
     print("\n✅ Evaluación completa.")
+    return results
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pairs", type=str, required=True)
+    parser.add_argument("--models-dir", type=str, required=True)
+    parser.add_argument("--chunk-size", type=int, default=20000, help="Pares leídos por bloque")
+    parser.add_argument("--batch-size", type=int, default=4096, help="Pares por forward del MLP")
+    parser.add_argument("--cross-batch-size", type=int, default=256, help="Pares por forward del cross-encoder")
+    parser.add_argument("--threads", type=int, default=0, help="Hilos de torch (0 = por defecto)")
+    parser.add_argument("--n-process", type=int, default=1, help="Procesos de spaCy para las heurísticas")
+    parser.add_argument("--output", type=str, default=None, help="JSON con los resultados")
+    args = parser.parse_args()
+
+    run_evaluation(args.pairs, args.models_dir, chunk_size=args.chunk_size, batch_size=args.batch_size,
+                   cross_batch_size=args.cross_batch_size, threads=args.threads, n_process=args.n_process,
+                   output=args.output)
 
 
 if __name__ == "__main__":
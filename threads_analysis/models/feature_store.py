@@ -0,0 +1,291 @@
+"""
+threads_analysis/models/feature_store.py
+
+Feature store de embeddings para el entrenamiento por folds.
+
+- Codifica cada texto único UNA sola vez por modelo (base o fine-tuned) y lo guarda en disco:
+    embedding_cache/feature_store/<modelo>/embeddings.npy  (float32, N x dim)
+    embedding_cache/feature_store/<modelo>/texts.json      (texto de cada fila)
+- Las lecturas usan np.load(mmap_mode='r'): los folds indexan por fila sin copiar la matriz.
+- Los textos nuevos (p.ej. aumentados en un fold) se codifican bajo demanda y se agregan al final.
+- Para modelos en disco (fine-tuned por fold) la clave incluye una huella de los archivos del
+  modelo, así un re-entrenamiento no reutiliza embeddings viejos.
+- TokenIdCache hace lo mismo con los token ids del cross-encoder (sin padding), para no
+  re-tokenizar cada par en cada época.
+- shared_sentence_transformer(): un encoder de inferencia por modelo y proceso, compartido por
+  dataset_builder, los stores y evaluation cuando corren en el mismo proceso (pipeline_runner).
+"""
+
+from __future__ import annotations
+import os
+import json
+import hashlib
+from typing import List, Dict, Any, Iterable, Optional
+
+import numpy as np
+from tqdm import tqdm
+
+BASE_STORE_DIR = "threads_analysis/models/embedding_cache/feature_store"
+
+
+def model_fingerprint(model_name_or_path: str) -> str:
+    """Identificador estable del modelo: nombre del hub o huella de los archivos locales"""
+    safe = model_name_or_path.strip("/\\").replace("/", "__").replace("\\", "__").replace(":", "__")
+    if not os.path.isdir(model_name_or_path):
+        return safe
+    h = hashlib.sha1()
+    for root, _, files in sorted(os.walk(model_name_or_path)):
+        for name in sorted(files):
+            if not name.endswith((".bin", ".safetensors", ".json", ".pth")):
+                continue
+            st = os.stat(os.path.join(root, name))
+            h.update(f"{os.path.relpath(os.path.join(root, name), model_name_or_path)}:{st.st_size}:{st.st_mtime_ns}".encode("utf-8"))
+    return f"{safe[-80:]}__{h.hexdigest()[:12]}"
+
+
+_SHARED_ENCODERS: Dict[str, Any] = {}
+
+
+def shared_sentence_transformer(model_name_or_path: str):
+    """
+    SentenceTransformer de solo inferencia cargado UNA vez por proceso (clave: model_fingerprint,
+    así un directorio re-entrenado se recarga) y compartido entre etapas del pipeline en proceso.
+    """
+    key = model_fingerprint(model_name_or_path)
+    if key not in _SHARED_ENCODERS:
+        from sentence_transformers import SentenceTransformer
+        print(f"[STORE] Cargando encoder {model_name_or_path}...")
+        _SHARED_ENCODERS[key] = SentenceTransformer(model_name_or_path)
+    return _SHARED_ENCODERS[key]
+
+
+def release_shared_encoders():
+    """Suelta los encoders compartidos (p.ej. al terminar las etapas que los usan)"""
+    _SHARED_ENCODERS.clear()
+
+
+class EmbeddingFeatureStore:
+    """Embeddings por texto único, persistidos y memory-mapped, indexables por fila"""
+
+    def __init__(self, model_name_or_path: str, encoder=None, store_dir: str = BASE_STORE_DIR,
+                 device: Optional[str] = None, batch_size: int = 64):
+        self.model_name = model_name_or_path
+        self.encoder = encoder
+        self.device = device
+        self.batch_size = batch_size
+        self.dir = os.path.join(store_dir, model_fingerprint(model_name_or_path))
+        os.makedirs(self.dir, exist_ok=True)
+        self.emb_path = os.path.join(self.dir, "embeddings.npy")
+        self.texts_path = os.path.join(self.dir, "texts.json")
+
+        self.texts: List[str] = []
+        self.index: Dict[str, int] = {}
+        self.embeddings = None
+        self._load()
+
+    # ---------------- persistencia ----------------
+    def _load(self):
+        if not (os.path.exists(self.emb_path) and os.path.exists(self.texts_path)):
+            return
+        try:
+            with open(self.texts_path, "r", encoding="utf-8") as f:
+                texts = json.load(f)
+            embeddings = np.load(self.emb_path, mmap_mode="r")
+            if embeddings.shape[0] != len(texts):
+                print(f"[STORE] Cache inconsistente en {self.dir}, se reconstruye.")
+                return
+            self.texts = texts
+            self.index = {t: i for i, t in enumerate(texts)}
+            self.embeddings = embeddings
+            print(f"[STORE] {len(texts)} embeddings cargados (mmap) de {self.dir}")
+        except Exception as e:
+            print(f"[STORE] No se pudo leer el cache {self.dir}: {e}")
+
+    def _append(self, new_texts: List[str], new_embs: np.ndarray):
+        """Agrega filas al final escribiendo un .npy nuevo y reemplazando el anterior"""
+        old_n = len(self.texts)
+        dim = new_embs.shape[1]
+        tmp_path = self.emb_path + ".tmp.npy"
+        out = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.float32, shape=(old_n + len(new_texts), dim))
+        chunk = 65536
+        for start in range(0, old_n, chunk):
+            out[start:start + chunk] = self.embeddings[start:start + chunk]
+        out[old_n:] = new_embs
+        out.flush()
+        del out
+        # liberar el mmap anterior antes de reemplazar (necesario en Windows)
+        self.embeddings = None
+        os.replace(tmp_path, self.emb_path)
+
+        self.texts.extend(new_texts)
+        for i, t in enumerate(new_texts, start=old_n):
+            self.index[t] = i
+        tmp_texts = self.texts_path + ".tmp"
+        with open(tmp_texts, "w", encoding="utf-8") as f:
+            json.dump(self.texts, f, ensure_ascii=False)
+        os.replace(tmp_texts, self.texts_path)
+
+        self.embeddings = np.load(self.emb_path, mmap_mode="r")
+
+    # ---------------- codificación ----------------
+    def _get_encoder(self):
+        if self.encoder is None:
+            self.encoder = shared_sentence_transformer(self.model_name)
+        return self.encoder
+
+    def ensure(self, texts: Iterable[str]) -> int:
+        """Codifica (una vez) los textos que aún no están en el store. Devuelve cuántos se agregaron"""
+        self._ensure_index()
+        missing = list(dict.fromkeys(t or "" for t in texts if (t or "") not in self.index))
+        if not missing:
+            return 0
+        print(f"[STORE] Codificando {len(missing)} textos nuevos con {self.model_name}...")
+        encoder = self._get_encoder()
+        embs = []
+        for i in tqdm(range(0, len(missing), self.batch_size), desc="[STORE ENCODE]"):
+            batch = missing[i:i + self.batch_size]
+            embs.append(encoder.encode(batch, device=self.device, batch_size=self.batch_size,
+                                       convert_to_numpy=True, show_progress_bar=False).astype(np.float32))
+        self._append(missing, np.vstack(embs))
+        return len(missing)
+
+    def rows(self, texts: Iterable[str]) -> np.ndarray:
+        """Índices de fila (int64) de cada texto, codificando los que falten"""
+        texts = [t or "" for t in texts]
+        self.ensure(texts)
+        return np.fromiter((self.index[t] for t in texts), dtype=np.int64, count=len(texts))
+
+    def pair_rows(self, rows: List[Dict[str, Any]]):
+        """Índices (a, b) para una lista de pares del dataset"""
+        self.ensure([r['a']['text'] or "" for r in rows] + [r['b']['text'] or "" for r in rows])
+        idx_a = self.rows(r['a']['text'] for r in rows)
+        idx_b = self.rows(r['b']['text'] for r in rows)
+        return idx_a, idx_b
+
+    # ---------------- workers de DataLoader ----------------
+    def __getstate__(self):
+        """Al enviarse a otro proceso no se serializa la matriz ni el encoder: se reabre el mmap"""
+        state = self.__dict__.copy()
+        state["embeddings"] = None
+        state["encoder"] = None
+        state["texts"] = []
+        state["index"] = {}
+        state["_index_dropped"] = True
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if os.path.exists(self.emb_path):
+            self.embeddings = np.load(self.emb_path, mmap_mode="r")
+
+    def _ensure_index(self):
+        # el índice texto->fila solo se recarga si el proceso lo necesita (no en workers del DataLoader)
+        if self.__dict__.pop("_index_dropped", False):
+            self._load()
+
+    @property
+    def dim(self) -> int:
+        return 0 if self.embeddings is None else int(self.embeddings.shape[1])
+
+    def __len__(self):
+        self._ensure_index()
+        return len(self.texts)
+
+
+class TokenIdCache:
+    """
+    Token ids (sin padding) por texto, tokenizados UNA vez y persistidos en disco:
+        <store_dir>/tokens/<tokenizer>_len<max_length>/ids.npy      (int32, todos los ids concatenados)
+        <store_dir>/tokens/<tokenizer>_len<max_length>/offsets.npy  (int64, N+1)
+        <store_dir>/tokens/<tokenizer>_len<max_length>/keys.json    (sha1 de cada texto)
+    """
+
+    def __init__(self, tokenizer, tokenizer_name: str, max_length: int = 256,
+                 store_dir: str = BASE_STORE_DIR, batch_size: int = 1024):
+        self.tokenizer = tokenizer
+        self.max_length = max_length
+        self.batch_size = batch_size
+        self.dir = os.path.join(store_dir, "tokens", f"{model_fingerprint(tokenizer_name)}_len{max_length}")
+        os.makedirs(self.dir, exist_ok=True)
+        self.ids_path = os.path.join(self.dir, "ids.npy")
+        self.offsets_path = os.path.join(self.dir, "offsets.npy")
+        self.keys_path = os.path.join(self.dir, "keys.json")
+
+        self.keys: List[str] = []
+        self.index: Dict[str, int] = {}
+        self.ids = np.zeros(0, dtype=np.int32)
+        self.offsets = np.zeros(1, dtype=np.int64)
+        self._load()
+
+    @staticmethod
+    def _key(text: str) -> str:
+        return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+    def _load(self):
+        if not all(os.path.exists(p) for p in (self.ids_path, self.offsets_path, self.keys_path)):
+            return
+        try:
+            with open(self.keys_path, "r", encoding="utf-8") as f:
+                keys = json.load(f)
+            offsets = np.load(self.offsets_path)
+            ids = np.load(self.ids_path)
+            if len(offsets) != len(keys) + 1 or offsets[-1] != len(ids):
+                print(f"[TOKENS] Cache inconsistente en {self.dir}, se reconstruye.")
+                return
+            self.keys, self.offsets, self.ids = keys, offsets, ids
+            self.index = {k: i for i, k in enumerate(keys)}
+            print(f"[TOKENS] {len(keys)} secuencias tokenizadas cargadas de {self.dir}")
+        except Exception as e:
+            print(f"[TOKENS] No se pudo leer el cache {self.dir}: {e}")
+
+    def _save(self):
+        for path, arr in ((self.ids_path, self.ids), (self.offsets_path, self.offsets)):
+            tmp = path + ".tmp.npy"
+            np.save(tmp, arr)
+            os.replace(tmp, path)
+        tmp = self.keys_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.keys, f)
+        os.replace(tmp, self.keys_path)
+
+    def ensure(self, texts: Iterable[str]) -> int:
+        """Tokeniza (una vez) los textos que faltan. Devuelve cuántos se agregaron"""
+        missing = {}
+        for t in texts:
+            k = self._key(t or "")
+            if k not in self.index and k not in missing:
+                missing[k] = t or ""
+        if not missing:
+            return 0
+        print(f"[TOKENS] Tokenizando {len(missing)} secuencias nuevas...")
+        items = list(missing.items())
+        chunks, lengths = [], []
+        for i in tqdm(range(0, len(items), self.batch_size), desc="[TOKENIZE]"):
+            batch = [t for _, t in items[i:i + self.batch_size]]
+            enc = self.tokenizer(batch, truncation=True, max_length=self.max_length, padding=False)
+            for seq in enc["input_ids"]:
+                chunks.append(np.asarray(seq, dtype=np.int32))
+                lengths.append(len(seq))
+        new_offsets = self.offsets[-1] + np.cumsum(np.asarray(lengths, dtype=np.int64))
+        self.ids = np.concatenate([self.ids] + chunks)
+        self.offsets = np.concatenate([self.offsets, new_offsets])
+        for k, _ in items:
+            self.index[k] = len(self.keys)
+            self.keys.append(k)
+        self._save()
+        return len(items)
+
+    def rows(self, texts: Iterable[str]) -> np.ndarray:
+        """Índices de fila (int64) de cada texto, tokenizando los que falten"""
+        texts = [t or "" for t in texts]
+        self.ensure(texts)
+        return np.fromiter((self.index[self._key(t)] for t in texts), dtype=np.int64, count=len(texts))
+
+    def lengths(self, rows: np.ndarray) -> np.ndarray:
+        return self.offsets[rows + 1] - self.offsets[rows]
+
+    def get(self, row: int) -> np.ndarray:
+        return self.ids[self.offsets[row]:self.offsets[row + 1]]
+
+    def __len__(self):
+        return len(self.keys)
@@ -17,14 +17,25 @@ Procedimiento:
     * Después de fine-tune para bi-encoders: extraer embeddings y entrenar MLP classifier (opcional)
  - Guarda modelos por fold en: output_dir/fold_{fold}/{model_tag}/
  - Guarda métricas en metrics.json en cada fold dir
+ - Embeddings: cada texto único se codifica una sola vez por modelo en un feature store
+   memory-mapped (feature_store.py); los folds indexan por fila y EmbeddingPairsDataset arma
+   una sola matriz contigua de features (o las calcula al vuelo) compartida por MLP y clásicos
+ - Reanudación (--resume): cada (fold, modelo) se registra en fold_{k}/units.json con el hash de
+   sus entradas y se salta si ya terminó; MLP y cross-encoder guardan checkpoint por época
+   (modelo, optimizer, scheduler, mejor estado). Anomalía y clásicos pueden correr en procesos aparte (--jobs)
+ - Al final destila el mejor cross-encoder en un student diminuto para tiempo real (distillation.py, --no-distill)
 """
 from __future__ import annotations
 import datetime
 import os
+import time
+import hashlib
+import multiprocessing
 import json
 import math
 import random
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+from concurrent.futures import ProcessPoolExecutor
 
 import numpy as np
 from tqdm import tqdm
@@ -32,7 +43,7 @@ from collections import defaultdict
 
 import torch
 import torch.nn as nn
-from torch.utils.data import Dataset, DataLoader
+from torch.utils.data import Dataset, DataLoader, Sampler, BatchSampler, RandomSampler, SequentialSampler
 
 from sklearn.model_selection import GroupKFold, StratifiedKFold, KFold
 from sklearn.metrics import precision_recall_fscore_support, roc_auc_score
@@ -46,6 +57,9 @@ from sentence_transformers.cross_encoder import CrossEncoder
 
 from transformers import AutoTokenizer, AutoModelForSequenceClassification, get_linear_schedule_with_warmup
 
+from threads_analysis.models.feature_store import EmbeddingFeatureStore, TokenIdCache, model_fingerprint
+from threads_analysis.models.pair_features import EXTRA_FEATURE_ORDER, extras_vector
+
 BI_ENCODER_A = "paraphrase-multilingual-mpnet-base-v2"
 BI_ENCODER_B = "sentence-transformers/all-MiniLM-L12-v2"
 CROSS_ENCODER = "cross-encoder/ms-marco-MiniLM-L-12-v2"
@@ -63,8 +77,11 @@ DEFAULT_ACCUM = 2
 DEFAULT_WARMUP_PCT = 0.06
 DEFAULT_FOLDS = 5
 
+# Directorio del MLP de cada bi-encoder (dentro de cada fold y de output/best/<bi_encoder>)
+MLP_SUBDIRS = {"bi_a": "mlp_a", "bi_b": "mlp_b"}
+
 def get_training_params(model_type: str = "default") -> dict:
-    """Devuelve hiperparámetros recomendados para biencoder, cross, mlp, classical o default"""
+    """Devuelve hiperparámetros recomendados para biencoder, cross, mlp, distill, classical o default"""
     base = {"seed": RANDOM_SEED}
 
     if model_type == "biencoder":
@@ -79,7 +96,15 @@ def get_training_params(model_type: str = "default") -> dict:
         })
     elif model_type == "mlp":
         base.update({
-            "lr": 2e-4, "epochs": 3, "batch_size": 256, "weight_decay": 1e-4, "dropout": 0.3
+            "lr": 2e-4, "epochs": 3, "batch_size": 256, "weight_decay": 1e-4, "dropout": 0.3,
+            "num_workers": min(4, max(0, (os.cpu_count() or 1) - 1)),
+            "materialize_features": True, "feature_dtype": "float32"
+        })
+    elif model_type == "distill":
+        base.update({
+            "lr": 1e-3, "epochs": 8, "batch_size": 512, "weight_decay": 1e-4, "dropout": 0.1,
+            "hidden": 64, "hidden2": 16, "temperature": 2.0, "alpha": 0.7,
+            "max_pairs": 300_000, "teacher_batch_size": 64
         })
     elif model_type == "classical":
         base.update({"random_state": RANDOM_SEED, "n_jobs": 4})
@@ -129,16 +154,177 @@ class SmallMLP(nn.Module):
     def forward(self, x):
         return self.net(x).squeeze(-1)
 
+def load_mlp_from_path(path: str, input_dim: int, device: str = DEVICE, hidden: int = 256, hidden2: int = 64) -> SmallMLP:
+    """Carga un MLP guardado por train_mlp_for_fold (o el student de distillation.py) en modo eval"""
+    mlp = SmallMLP(input_dim, hidden=hidden, hidden2=hidden2, dropout=get_training_params("mlp").get("dropout", 0.3))
+    mlp.load_state_dict(torch.load(path, map_location="cpu"))
+    return mlp.to(device).eval()
+
+_SHARED_CROSS_ENCODERS: Dict[Any, Any] = {}
+
+def load_cross_encoder(model_dir: Optional[str], device: str = DEVICE):
+    """
+    Cross-encoder fine-tuneado en modo eval: config.json si existe, si no model.pth (finetune_cross_encoder)
+    sobre el base. Se carga una vez por proceso y (huella del directorio, device): export, destilación y
+    evaluación lo comparten cuando corren en el mismo proceso.
+    """
+    key = (model_fingerprint(model_dir) if model_dir else CROSS_ENCODER, device)
+    if key in _SHARED_CROSS_ENCODERS:
+        return _SHARED_CROSS_ENCODERS[key]
+    if model_dir and os.path.exists(os.path.join(model_dir, "config.json")):
+        model = AutoModelForSequenceClassification.from_pretrained(model_dir)
+    else:
+        model = AutoModelForSequenceClassification.from_pretrained(CROSS_ENCODER, num_labels=1)
+        state_path = os.path.join(model_dir, "model.pth") if model_dir else None
+        if state_path and os.path.exists(state_path):
+            model.load_state_dict(torch.load(state_path, map_location="cpu"))
+        else:
+            print(f"[WARN] No se encontró model.pth del cross-encoder en {model_dir}; se usa el modelo base")
+    model = model.to(device).eval()
+    _SHARED_CROSS_ENCODERS[key] = model
+    return model
+
+def release_cross_encoders():
+    _SHARED_CROSS_ENCODERS.clear()
+
 class EmbeddingPairsDataset(Dataset):
-    def __init__(self, rows: List[Dict[str, Any]]):
-        self.rows = rows
+    """
+    Pares indexados en un EmbeddingFeatureStore.
+
+    - materialize=False: las features MLP se calculan al vuelo desde los índices (idx_a, idx_b).
+    - materialize=True: se construye UNA matriz contigua (N, input_dim) en `dtype` que comparten
+      el DataLoader del MLP y los modelos clásicos (feature_matrix() la devuelve sin copiar).
+    __getitem__ acepta un índice o una lista de índices: con batch_sampler_loader() cada
+    llamada devuelve un batch completo construido con indexado vectorizado.
+    """
+    def __init__(self, rows: List[Dict[str, Any]], store: EmbeddingFeatureStore,
+                 materialize: bool = False, dtype=np.float32):
+        self.store = store
+        self.dtype = np.dtype(dtype)
+        self.idx_a, self.idx_b = store.pair_rows(rows)
+        self.extras = np.stack([mlp_extra_features(r) for r in rows]) if rows else np.zeros((0, N_EXTRA_FEATURES), dtype=np.float32)
+        self.labels = np.array([float(r.get('label', 0)) for r in rows], dtype=np.float32)
+        self.matrix = self._build_matrix(self.dtype) if materialize else None
     def __len__(self):
-        return len(self.rows)
+        return len(self.labels)
+    @property
+    def input_dim(self) -> int:
+        return 4 * self.store.dim + N_EXTRA_FEATURES
+    def features(self, idx) -> np.ndarray:
+        if self.matrix is not None:
+            return self.matrix[idx]
+        emb = self.store.embeddings
+        return combine_pair_features(emb[self.idx_a[idx]], emb[self.idx_b[idx]], self.extras[idx])
+    def _build_matrix(self, dtype) -> np.ndarray:
+        """Matriz (N, input_dim) preasignada y rellenada por bloques"""
+        X = np.empty((len(self), self.input_dim), dtype=dtype)
+        chunk = 8192
+        emb = self.store.embeddings
+        for start in range(0, len(self), chunk):
+            sl = slice(start, start + chunk)
+            X[sl] = combine_pair_features(emb[self.idx_a[sl]], emb[self.idx_b[sl]], self.extras[sl])
+        return X
+    def feature_matrix(self, dtype=np.float32) -> np.ndarray:
+        """Matriz de features para modelos clásicos; si ya está materializada en ese dtype no se copia"""
+        if self.matrix is not None and self.matrix.dtype == np.dtype(dtype):
+            return self.matrix
+        return self._build_matrix(np.dtype(dtype))
+    def release(self):
+        """Libera la matriz materializada (los índices se conservan)"""
+        self.matrix = None
+    def __getstate__(self):
+        # hacia workers/procesos viajan solo índices, extras y labels; la matriz se recalcula allí
+        state = self.__dict__.copy()
+        state["matrix"] = None
+        return state
     def __getitem__(self, idx):
-        r = self.rows[idx]
-        feat = np.array(r['mlp_features'], dtype=np.float32)
-        label = np.float32(r.get('label', 0))
-        return torch.from_numpy(feat), torch.tensor(label, dtype=torch.float32)
+        if not isinstance(idx, (int, np.integer)):
+            idx = np.asarray(idx, dtype=np.int64)
+        feat = np.ascontiguousarray(self.features(idx))
+        return torch.from_numpy(feat), torch.from_numpy(np.asarray(self.labels[idx], dtype=np.float32))
+
+def batch_sampler_loader(ds: Dataset, batch_size: int, shuffle: bool, num_workers: int = 0) -> DataLoader:
+    """
+    DataLoader que pide batches completos al dataset (un __getitem__ por batch, sin collate por fila).
+    Con num_workers>0 el armado de batches corre en procesos aparte y se solapa con el paso de GPU.
+    """
+    if num_workers > 0 and getattr(ds, "matrix", None) is not None and torch.multiprocessing.get_start_method() != "fork":
+        # con spawn la matriz no viaja a los workers (calcularían al vuelo): mejor indexarla aquí
+        num_workers = 0
+    sampler = RandomSampler(ds) if shuffle else SequentialSampler(ds)
+    return DataLoader(
+        ds, sampler=BatchSampler(sampler, batch_size=batch_size, drop_last=False), batch_size=None,
+        num_workers=num_workers, pin_memory=(DEVICE == 'cuda'), persistent_workers=num_workers > 0
+    )
+
+CROSS_MAX_LENGTH = 256
+
+def cross_pair_text(r: Dict[str, Any]) -> str:
+    return (r['a']['text'] or "") + " [SEP] " + (r['b']['text'] or "")
+
+class TokenizedPairsDataset(Dataset):
+    """Pares del cross-encoder como filas de un TokenIdCache (token ids sin padding)"""
+    def __init__(self, rows: List[Dict[str, Any]], cache: TokenIdCache):
+        self.cache = cache
+        self.token_rows = cache.rows(cross_pair_text(r) for r in rows)
+        self.lengths = cache.lengths(self.token_rows)
+        self.labels = np.array([float(r.get('label', 0)) for r in rows], dtype=np.float32)
+    def __len__(self):
+        return len(self.labels)
+    def __getitem__(self, idx):
+        return self.cache.get(self.token_rows[idx]), self.labels[idx]
+
+class PadCollator:
+    """Padding dinámico: cada batch se rellena solo hasta su secuencia más larga"""
+    def __init__(self, pad_id: int, with_token_type_ids: bool = True):
+        self.pad_id = pad_id
+        self.with_token_type_ids = with_token_type_ids
+    def __call__(self, batch):
+        max_len = max(len(ids) for ids, _ in batch)
+        input_ids = np.full((len(batch), max_len), self.pad_id, dtype=np.int64)
+        attention_mask = np.zeros((len(batch), max_len), dtype=np.int64)
+        for i, (ids, _) in enumerate(batch):
+            input_ids[i, :len(ids)] = ids
+            attention_mask[i, :len(ids)] = 1
+        item = {'input_ids': torch.from_numpy(input_ids), 'attention_mask': torch.from_numpy(attention_mask)}
+        if self.with_token_type_ids:
+            item['token_type_ids'] = torch.zeros_like(item['input_ids'])
+        item['labels'] = torch.tensor([label for _, label in batch], dtype=torch.float32)
+        return item
+
+class LengthBucketBatchSampler(Sampler):
+    """
+    Agrupa índices de longitud parecida en el mismo batch para minimizar padding.
+    Con shuffle: baraja, ordena por longitud dentro de ventanas de batch_size*bucket_mult y
+    baraja el orden de los batches (cambia en cada época vía set_epoch).
+    """
+    def __init__(self, lengths: np.ndarray, batch_size: int, shuffle: bool = True,
+                 bucket_mult: int = 50, seed: int = RANDOM_SEED):
+        self.lengths = np.asarray(lengths)
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.bucket_mult = bucket_mult
+        self.seed = seed
+        self.epoch = 0
+    def set_epoch(self, epoch: int):
+        self.epoch = epoch
+    def __len__(self):
+        return math.ceil(len(self.lengths) / self.batch_size)
+    def __iter__(self):
+        n = len(self.lengths)
+        if not self.shuffle:
+            order = np.argsort(self.lengths, kind="stable")
+            return iter([order[i:i + self.batch_size].tolist() for i in range(0, n, self.batch_size)])
+        rng = np.random.default_rng(self.seed + self.epoch)
+        perm = rng.permutation(n)
+        window = self.batch_size * self.bucket_mult
+        batches = []
+        for start in range(0, n, window):
+            chunk = perm[start:start + window]
+            chunk = chunk[np.argsort(self.lengths[chunk], kind="stable")]
+            batches.extend(chunk[i:i + self.batch_size].tolist() for i in range(0, len(chunk), self.batch_size))
+        rng.shuffle(batches)
+        return iter(batches)
 
 def load_pairs_jsonl(path: str) -> List[Dict[str, Any]]:
     rows = []
@@ -252,31 +438,38 @@ def choose_and_build_splits(rows: List[Dict[str, Any]], n_splits: int, dataset_s
     splitter = GroupKFold(n_splits=n_splits)
     return list(splitter.split(np.arange(len(rows)), y, groups))
 
+N_EXTRA_FEATURES = len(EXTRA_FEATURE_ORDER)
+
+def extras_to_array(extras: Dict[str, Any]) -> np.ndarray:
+    """Vector (float32) con las características extra en el orden esperado por el MLP"""
+    return np.array(extras_vector(extras), dtype=np.float32)
+
+def mlp_extra_features(r: Dict[str, Any]) -> np.ndarray:
+    """Características extra de un par (features_extra + time_delta_min + same_author)"""
+    extras = dict(r.get('features_extra', {}))
+    extras['time_delta_min'] = r.get('time_delta_min', 1e6)
+    extras['same_author'] = r.get('same_author', 0)
+    return extras_to_array(extras)
+
+def combine_pair_features(a: np.ndarray, b: np.ndarray, extra: np.ndarray) -> np.ndarray:
+    """[a, b, |a-b|, a*b, extras] sobre el último eje; acepta una fila o un bloque de filas"""
+    a = np.asarray(a, dtype=np.float32)
+    b = np.asarray(b, dtype=np.float32)
+    return np.concatenate([a, b, np.abs(a - b), a * b, np.asarray(extra, dtype=np.float32)], axis=-1)
+
 def build_mlp_features_from_embeddings(emb_a: np.ndarray, emb_b: np.ndarray, extras: Dict[str, Any]) -> np.ndarray:
     """Construye vector de características para MLP concatenando embeddings y características extra"""
-    a = emb_a.astype(np.float32)
-    b = emb_b.astype(np.float32)
-    comb = np.concatenate([a, b, np.abs(a - b), a * b], axis=0).astype(np.float32)
-    extra_list = [
-        float(extras.get('len_a', 0)), float(extras.get('len_b', 0)),
-        float(extras.get('tfidf_jaccard', 0.0)), float(extras.get('seq_ratio', 0.0)),
-        float(extras.get('emoji_diff', 0)), float(extras.get('both_have_url', 0)),
-        float(extras.get('both_all_caps', 0)), float(extras.get('time_delta_min', 1e6)),
-        float(extras.get('same_author', 0))
-    ]
-    extra_arr = np.array(extra_list, dtype=np.float32)
-    feat = np.concatenate([comb, extra_arr], axis=0)
-    return feat
+    return combine_pair_features(emb_a, emb_b, extras_to_array(extras))
 
 def train_anomaly_models_for_fold(rows_train: List[Dict[str, Any]], rows_val: List[Dict[str, Any]], 
-                                  base_encoder: SentenceTransformer, fold_dir: str):
+                                  base_store: EmbeddingFeatureStore, fold_dir: str):
     """
     Entrena modelos One-Class SVM e Isolation Tree solo con ejemplos positivos del train.
     
     Args:
         rows_train: Lista de ejemplos de entrenamiento (todos)
         rows_val: Lista de ejemplos de validación
-        base_encoder: Modelo de sentence transformer para extraer embeddings
+        base_store: Feature store del bi-encoder base (embeddings compartidos entre folds)
         fold_dir: Directorio donde guardar los modelos
     """
     print("[ANOMALY] Entrenando One-Class SVM e Isolation Tree solo con positivos...")
@@ -305,34 +498,15 @@ def train_anomaly_models_for_fold(rows_train: List[Dict[str, Any]], rows_val: Li
     
     print(f"[ANOMALY] {len(positive_rows)} ejemplos positivos para entrenar modelos de anomalía")
     
-    # 2. Extraer embeddings para los positivos (solo texto A, asumiendo que representan la clase "normal")
-    def batch_encode_texts(texts, batch=64):
-        all_embs = []
-        for i in tqdm(range(0, len(texts), batch), desc="[ANOMALY ENCODE]"):
-            batch_texts = texts[i:i+batch]
-            embs = base_encoder.encode(batch_texts, device=DEVICE, batch_size=batch, 
-                                       convert_to_numpy=True, show_progress_bar=False)
-            all_embs.extend(embs)
-        return all_embs
-    
+    # 2. Embeddings de los positivos desde el feature store (solo texto A, asumiendo que representan la clase "normal")
     # Usamos solo el texto A de los pares positivos (asumiendo que son mensajes de referencia)
     positive_texts = [r['a']['text'] or "" for r in positive_rows]
-    positive_embeddings = batch_encode_texts(positive_texts)
-    
-    # Convertir a numpy array
-    X_train_positive = np.array(positive_embeddings)
+    X_train_positive = base_store.embeddings[base_store.rows(positive_texts)]
     
     # 3. Preparar datos de validación (todos los ejemplos de val)
-    val_texts_a = [r['a']['text'] or "" for r in rows_val]
-    val_texts_b = [r['b']['text'] or "" for r in rows_val]
-    
-    # Codificar ambos textos
-    val_embeddings_a = batch_encode_texts(val_texts_a)
-    val_embeddings_b = batch_encode_texts(val_texts_b)
-    
-    # Para validación, podemos usar ambos embeddings o combinarlos
     # Usamos el embedding del texto A como representación del par
-    X_val = np.array(val_embeddings_a)
+    val_texts_a = [r['a']['text'] or "" for r in rows_val]
+    X_val = base_store.embeddings[base_store.rows(val_texts_a)]
     y_val = np.array([int(r.get('label', 0)) for r in rows_val])
     
     # 4. Entrenar One-Class SVM
@@ -427,7 +601,7 @@ def train_anomaly_models_for_fold(rows_train: List[Dict[str, Any]], rows_val: Li
     # 7. Guardar embeddings base para referencia
     embeddings_info = {
         "embedding_dim": X_train_positive.shape[1],
-        "model_used": str(base_encoder),
+        "model_used": base_store.model_name,
         "positive_samples": len(positive_rows)
     }
     
@@ -447,10 +621,106 @@ def train_anomaly_models_for_fold(rows_train: List[Dict[str, Any]], rows_val: Li
         "isolation_forest": {"f1": iso_f, "auc": iso_auc}
     }
 
-def train_mlp_for_fold(rows_train: List[Dict[str, Any]], rows_val: List[Dict[str, Any]], emb_model: SentenceTransformer,
-                       output_dir: str, fold_dir: str, batch_size: int, epochs: int, lr: float, accum_steps: int):
-    print("[MLP] Construyendo embeddings con GPU + codificación por lotes...")
-    mlp_dir = os.path.join(fold_dir, "mlp_on_" + emb_model.__class__.__module__.split(".")[0])
+# ---------------- Reanudación por (fold, modelo) ----------------
+def rows_fingerprint(rows_train: List[Dict[str, Any]], rows_val: List[Dict[str, Any]]) -> str:
+    """Hash de los datos de un fold (textos, label, chat) para decidir si un unit sigue vigente"""
+    h = hashlib.sha1()
+    for tag, rows in (("train", rows_train), ("val", rows_val)):
+        h.update(tag.encode("utf-8"))
+        for r in rows:
+            h.update(json.dumps([r['a']['text'] or "", r['b']['text'] or "", r.get('label', 0), r.get('chat_id', 0)],
+                                ensure_ascii=False).encode("utf-8"))
+    return h.hexdigest()
+
+def unit_hash(data_hash: str, unit: str, **inputs) -> str:
+    """Hash de las entradas de un unit (datos del fold + modelo + hiperparámetros)"""
+    payload = json.dumps({"data": data_hash, "unit": unit, **inputs}, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+class FoldCheckpoint:
+    """units.json del fold: qué units (modelos) terminaron, con qué hash de entradas y su resultado"""
+    def __init__(self, fold_dir: str):
+        self.path = os.path.join(fold_dir, "units.json")
+        os.makedirs(fold_dir, exist_ok=True)
+        self.units = {}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self.units = json.load(f)
+            except Exception as e:
+                print(f"[RESUME] No se pudo leer {self.path}: {e}")
+    def completed(self, unit: str, inputs_hash: str):
+        """Resultado guardado del unit si terminó con las mismas entradas, si no None"""
+        entry = self.units.get(unit)
+        if entry and entry.get("inputs_hash") == inputs_hash:
+            return entry
+        return None
+    def mark_done(self, unit: str, inputs_hash: str, result):
+        self.units[unit] = {"inputs_hash": inputs_hash, "result": result,
+                            "completed_at": datetime.datetime.now().isoformat()}
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.units, f, ensure_ascii=False, indent=2, default=float)
+        os.replace(tmp, self.path)
+
+def save_epoch_checkpoint(path: str, inputs_hash: str, epoch: int, model, optimizer, best_f1: float,
+                          best_state, progress_data: dict, scheduler=None, scaler=None):
+    """Estado completo tras una época (modelo, optimizer, scheduler, mejor estado, progreso)"""
+    state = {
+        "inputs_hash": inputs_hash, "epoch": epoch, "model": model.state_dict(),
+        "optimizer": optimizer.state_dict(), "best_f1": best_f1, "best_state": best_state,
+        "progress_data": progress_data, "torch_rng": torch.get_rng_state(),
+        "scheduler": scheduler.state_dict() if scheduler is not None else None,
+        "scaler": scaler.state_dict() if scaler is not None else None,
+    }
+    tmp = path + ".tmp"
+    torch.save(state, tmp)
+    os.replace(tmp, path)
+
+def load_epoch_checkpoint(path: str, inputs_hash: str):
+    """Checkpoint de época si existe y corresponde a las mismas entradas"""
+    if not inputs_hash or not os.path.exists(path):
+        return None
+    try:
+        state = torch.load(path, map_location="cpu", weights_only=False)
+    except Exception as e:
+        print(f"[RESUME] Checkpoint ilegible {path}: {e}")
+        return None
+    if state.get("inputs_hash") != inputs_hash:
+        print(f"[RESUME] Checkpoint {path} corresponde a otras entradas; se ignora")
+        return None
+    return state
+
+def restore_epoch_checkpoint(state: dict, model, optimizer, scheduler=None, scaler=None) -> int:
+    """Restaura un checkpoint de época y devuelve la época desde la que continuar"""
+    model.load_state_dict(state["model"])
+    optimizer.load_state_dict(state["optimizer"])
+    if scheduler is not None and state.get("scheduler") is not None:
+        scheduler.load_state_dict(state["scheduler"])
+    if scaler is not None and state.get("scaler") is not None:
+        scaler.load_state_dict(state["scaler"])
+    torch.set_rng_state(state["torch_rng"])
+    return state["epoch"] + 1
+
+def default_parallel_jobs() -> int:
+    """Procesos para units independientes (anomalía, clásicos) según los cores disponibles"""
+    cpus = os.cpu_count() or 1
+    return 1 if cpus < 8 else min(3, cpus // 4)
+
+def build_fold_datasets(store: EmbeddingFeatureStore, rows_train: List[Dict[str, Any]], rows_val: List[Dict[str, Any]]):
+    """Datasets de train/val del fold indexados en el feature store (solo codifica textos nuevos)"""
+    mlp_params = get_training_params("mlp")
+    materialize = mlp_params.get("materialize_features", True)
+    dtype = np.dtype(mlp_params.get("feature_dtype", "float32"))
+    print(f"[MLP] Indexando pares del fold en el feature store de {store.model_name} "
+          f"({'matriz ' + dtype.name if materialize else 'features al vuelo'})...")
+    return (EmbeddingPairsDataset(rows_train, store, materialize=materialize, dtype=dtype),
+            EmbeddingPairsDataset(rows_val, store, materialize=materialize, dtype=dtype))
+
+def train_mlp_for_fold(train_ds: EmbeddingPairsDataset, val_ds: EmbeddingPairsDataset,
+                       output_dir: str, fold_dir: str, mlp_dir: str, batch_size: int, epochs: int, lr: float,
+                       accum_steps: int, inputs_hash: Optional[str] = None, resume: bool = False):
+    # Un directorio por bi-encoder: modelo, checkpoint y progreso de A y B no se pisan
     os.makedirs(mlp_dir, exist_ok=True)
     
     progress_file = os.path.join(mlp_dir, "training_progress.json")
@@ -459,56 +729,32 @@ def train_mlp_for_fold(rows_train: List[Dict[str, Any]], rows_val: List[Dict[str
         "learning_rate": lr, "training_history": [], "start_time": datetime.datetime.now().isoformat()
     }
 
-    def batch_encode_texts(texts, batch=64):
-        all_embs = []
-        for i in tqdm(range(0, len(texts), batch), desc="[ENCODE GPU]"):
-            batch_texts = texts[i:i+batch]
-            embs = emb_model.encode(batch_texts, device=DEVICE, batch_size=batch, convert_to_numpy=True, show_progress_bar=False)
-            all_embs.extend(embs)
-        return all_embs
-
-    train_a = [r['a']['text'] or "" for r in rows_train]
-    train_b = [r['b']['text'] or "" for r in rows_train]
-    val_a   = [r['a']['text'] or "" for r in rows_val]
-    val_b   = [r['b']['text'] or "" for r in rows_val]
-
-    emb_train_a = batch_encode_texts(train_a)
-    emb_train_b = batch_encode_texts(train_b)
-    emb_val_a   = batch_encode_texts(val_a)
-    emb_val_b   = batch_encode_texts(val_b)
-
-    for i, r in enumerate(rows_train):
-        extras = r.get('features_extra', {})
-        extras['time_delta_min'] = r.get('time_delta_min', 1e6)
-        extras['same_author'] = r.get('same_author', 0)
-        r['mlp_features'] = build_mlp_features_from_embeddings(emb_train_a[i], emb_train_b[i], extras)
-
-    for i, r in enumerate(rows_val):
-        extras = r.get('features_extra', {})
-        extras['time_delta_min'] = r.get('time_delta_min', 1e6)
-        extras['same_author'] = r.get('same_author', 0)
-        r['mlp_features'] = build_mlp_features_from_embeddings(emb_val_a[i], emb_val_b[i], extras)
-
     mlp_params = get_training_params("mlp")
-    input_dim = rows_train[0]['mlp_features'].shape[0]
+    input_dim = train_ds.input_dim
     mlp = SmallMLP(input_dim, hidden=256, hidden2=64, dropout=mlp_params.get("dropout", 0.3)).to(DEVICE)
     opt = torch.optim.AdamW(mlp.parameters(), lr=mlp_params.get("lr", lr), weight_decay=mlp_params.get("weight_decay", 1e-4))
     loss_fn = nn.BCELoss()
 
-    train_ds = EmbeddingPairsDataset(rows_train)
-    val_ds   = EmbeddingPairsDataset(rows_val)
-    train_loader = DataLoader(train_ds, batch_size=batch_size, shuffle=True)
-    val_loader   = DataLoader(val_ds, batch_size=batch_size, shuffle=False)
+    num_workers = mlp_params.get("num_workers", 0)
+    train_loader = batch_sampler_loader(train_ds, batch_size, shuffle=True, num_workers=num_workers)
+    val_loader   = batch_sampler_loader(val_ds, batch_size, shuffle=False, num_workers=num_workers)
 
     best_f1 = -1
     best_state = None
-
-    for epoch in range(1, epochs + 1):
+    start_epoch = 1
+    checkpoint_path = os.path.join(mlp_dir, "checkpoint.pt")
+    ckpt = load_epoch_checkpoint(checkpoint_path, inputs_hash) if resume else None
+    if ckpt is not None:
+        start_epoch = restore_epoch_checkpoint(ckpt, mlp, opt)
+        best_f1, best_state, progress_data = ckpt["best_f1"], ckpt["best_state"], ckpt["progress_data"]
+        print(f"[MLP] Reanudando desde checkpoint (época {start_epoch}/{epochs}, mejor F1={best_f1:.4f})")
+
+    for epoch in range(start_epoch, epochs + 1):
         mlp.train()
         total_loss = 0
         for Xb, yb in train_loader:
-            Xb = Xb.to(DEVICE)
-            yb = yb.to(DEVICE)
+            Xb = Xb.to(DEVICE, non_blocking=True).float()
+            yb = yb.to(DEVICE, non_blocking=True)
             opt.zero_grad()
             preds = mlp(Xb)
             loss = loss_fn(preds, yb)
@@ -521,7 +767,7 @@ def train_mlp_for_fold(rows_train: List[Dict[str, Any]], rows_val: List[Dict[str
         ys, yps = [], []
         with torch.no_grad():
             for Xv, yv in val_loader:
-                Xv = Xv.to(DEVICE)
+                Xv = Xv.to(DEVICE, non_blocking=True).float()
                 pv = mlp(Xv).detach().cpu().numpy().tolist()
                 ys.extend(yv.numpy().tolist())
                 yps.extend(pv)
@@ -543,6 +789,8 @@ def train_mlp_for_fold(rows_train: List[Dict[str, Any]], rows_val: List[Dict[str
         if f > best_f1:
             best_f1 = f
             best_state = {k: v.cpu() for k, v in mlp.state_dict().items()}
+        if inputs_hash:
+            save_epoch_checkpoint(checkpoint_path, inputs_hash, epoch, mlp, opt, best_f1, best_state, progress_data)
 
     if best_state is not None:
         model_path = os.path.join(mlp_dir, "mlp_model.pth")
@@ -554,12 +802,14 @@ def train_mlp_for_fold(rows_train: List[Dict[str, Any]], rows_val: List[Dict[str
             json.dump(progress_data, f, ensure_ascii=False, indent=2)
             
         print(f"[MLP] Guardado mejor mlp en {model_path} (F1={best_f1:.4f}) - Progreso final guardado")
+        if os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
 
     return best_f1
 
 def finetune_bi_encoder(model_name: str, rows_train: List[Dict[str, Any]], rows_val: List[Dict[str, Any]],
                         output_dir: str, fold: int, epochs: int = 3, batch_size: int = 32, lr: float = 2e-5,
-                        warmup_pct: float = 0.06, accum_steps: int = 1):
+                        warmup_pct: float = 0.06, accum_steps: int = 1, resume: bool = False):
     model_tag = model_name.split("/")[-1]
     print(f"[BI] Fine-tuning bi-encoder {model_name} (tag={model_tag}) fold={fold}")
 
@@ -572,7 +822,22 @@ def finetune_bi_encoder(model_name: str, rows_train: List[Dict[str, Any]], rows_
         "learning_rate": lr, "training_history": [], "start_time": datetime.datetime.now().isoformat()
     }
 
-    model = SentenceTransformer(model_name)
+    # model.fit guarda un checkpoint por época en checkpoints/run_<épocas previas>/<step>;
+    # al reanudar se parte del más avanzado y se entrenan solo las épocas restantes
+    checkpoint_root = os.path.join(model_save_path, "checkpoints")
+    last_ckpt, prev_epochs, done_steps = None, 0, 0
+    if resume and os.path.isdir(checkpoint_root):
+        found = []
+        for run in os.listdir(checkpoint_root):
+            run_dir = os.path.join(checkpoint_root, run)
+            if not (run.startswith("run_") and run[4:].isdigit() and os.path.isdir(run_dir)):
+                continue
+            found.extend((int(run[4:]), int(d)) for d in os.listdir(run_dir) if d.isdigit())
+        if found:
+            prev_epochs, done_steps = max(found)
+            last_ckpt = os.path.join(checkpoint_root, f"run_{prev_epochs}", str(done_steps))
+
+    model = SentenceTransformer(last_ckpt or model_name)
     train_examples = []
     for r in rows_train:
         if r.get('label', 0) == 1:
@@ -598,6 +863,10 @@ def finetune_bi_encoder(model_name: str, rows_train: List[Dict[str, Any]], rows_
     evaluator = BinaryClassificationEvaluator(val_a, val_b, val_labels, show_progress_bar=False)
 
     warmup_steps = math.ceil(len(train_dataloader) * epochs * warmup_pct)
+    done_epochs = min(epochs, prev_epochs + done_steps // max(1, len(train_dataloader)))
+    if last_ckpt:
+        print(f"[BI] Reanudando desde {last_ckpt} ({done_epochs}/{epochs} épocas hechas)")
+        warmup_steps = 0 if done_epochs else warmup_steps
     
     class ProgressCallback:
         def __init__(self, progress_file, progress_data):
@@ -615,19 +884,27 @@ def finetune_bi_encoder(model_name: str, rows_train: List[Dict[str, Any]], rows_
     
     progress_callback = ProgressCallback(progress_file, progress_data)
     
-    model.fit(
-        train_objectives=[(train_dataloader, train_loss)],
-        evaluator=evaluator,
-        epochs=epochs,
-        evaluation_steps=max(1, len(train_dataloader)),
-        output_path=model_save_path,
-        warmup_steps=warmup_steps,
-        optimizer_params={'lr': lr},
-        use_amp=torch.cuda.is_available(),
-        callback=progress_callback
-    )
+    if done_epochs < epochs:
+        model.fit(
+            train_objectives=[(train_dataloader, train_loss)],
+            evaluator=evaluator,
+            epochs=epochs - done_epochs,
+            evaluation_steps=max(1, len(train_dataloader)),
+            output_path=model_save_path,
+            warmup_steps=warmup_steps,
+            optimizer_params={'lr': lr},
+            use_amp=torch.cuda.is_available(),
+            callback=progress_callback,
+            checkpoint_path=os.path.join(checkpoint_root, f"run_{done_epochs}"),
+            checkpoint_save_steps=max(1, len(train_dataloader)),
+            checkpoint_save_total_limit=1
+        )
+    else:
+        model.save(model_save_path)
 
     final_score = evaluator(model)
+    import shutil
+    shutil.rmtree(checkpoint_root, ignore_errors=True)
     progress_data["final_score"] = float(final_score)
     progress_data["end_time"] = datetime.datetime.now().isoformat()
     with open(progress_file, 'w', encoding='utf-8') as f:
@@ -638,7 +915,8 @@ def finetune_bi_encoder(model_name: str, rows_train: List[Dict[str, Any]], rows_
 
 def finetune_cross_encoder(model_name: str, rows_train: List[Dict[str, Any]], rows_val: List[Dict[str, Any]], 
                            output_dir: str, fold: int, epochs: int = 3, batch_size: int = 16, lr: float = 2e-5,
-                           warmup_pct: float = 0.06, accum_steps: int = 1):
+                           warmup_pct: float = 0.06, accum_steps: int = 1,
+                           inputs_hash: Optional[str] = None, resume: bool = False):
     model_tag = model_name.split("/")[-1]
     print(f"[CE] Fine-tuning cross-encoder {model_name} fold={fold}")
 
@@ -678,23 +956,15 @@ def finetune_cross_encoder(model_name: str, rows_train: List[Dict[str, Any]], ro
     tokenizer = AutoTokenizer.from_pretrained(model_name)
     model = AutoModelForSequenceClassification.from_pretrained(model_name, num_labels=1).to(DEVICE)
 
-    class SeqDataset(Dataset):
-        def __init__(self, rows):
-            self.rows = rows
-        def __len__(self): return len(self.rows)
-        def __getitem__(self, idx):
-            r = self.rows[idx]
-            text = (r['a']['text'] or "") + " [SEP] " + (r['b']['text'] or "")
-            label = float(r.get('label', 0))
-            enc = tokenizer(text, truncation=True, padding='max_length', max_length=256, return_tensors='pt')
-            item = {k: v.squeeze(0) for k,v in enc.items()}
-            item['labels'] = torch.tensor(label, dtype=torch.float32)
-            return item
-
-    train_ds = SeqDataset(rows_train)
-    val_ds = SeqDataset(rows_val)
-    train_loader = DataLoader(train_ds, batch_size=batch_size, shuffle=True)
-    val_loader = DataLoader(val_ds, batch_size=batch_size, shuffle=False)
+    token_cache = TokenIdCache(tokenizer, model_name, max_length=CROSS_MAX_LENGTH)
+    train_ds = TokenizedPairsDataset(rows_train, token_cache)
+    val_ds = TokenizedPairsDataset(rows_val, token_cache)
+    collate = PadCollator(tokenizer.pad_token_id or 0, "token_type_ids" in tokenizer.model_input_names)
+    train_sampler = LengthBucketBatchSampler(train_ds.lengths, batch_size, shuffle=True)
+    train_loader = DataLoader(train_ds, batch_sampler=train_sampler, collate_fn=collate)
+    val_loader = DataLoader(val_ds, batch_sampler=LengthBucketBatchSampler(val_ds.lengths, batch_size, shuffle=False), collate_fn=collate)
+    progress_data["max_length"] = CROSS_MAX_LENGTH
+    progress_data["mean_tokens_per_pair"] = float(train_ds.lengths.mean()) if len(train_ds) else 0.0
 
     no_decay = ["bias", "LayerNorm.weight"]
     optimizer_grouped_parameters = [
@@ -714,11 +984,20 @@ def finetune_cross_encoder(model_name: str, rows_train: List[Dict[str, Any]], ro
     best_f1 = -1.0
     best_state = None
     clip_value = get_training_params("cross").get("grad_clip", 0.5)
-
-    for epoch in range(1, epochs+1):
+    start_epoch = 1
+    checkpoint_path = os.path.join(model_dir, "checkpoint.pt")
+    ckpt = load_epoch_checkpoint(checkpoint_path, inputs_hash) if resume else None
+    if ckpt is not None:
+        start_epoch = restore_epoch_checkpoint(ckpt, model, optimizer, scheduler, scaler)
+        best_f1, best_state, progress_data = ckpt["best_f1"], ckpt["best_state"], ckpt["progress_data"]
+        print(f"[CE] Reanudando desde checkpoint (época {start_epoch}/{epochs}, mejor F1={best_f1:.4f})")
+
+    for epoch in range(start_epoch, epochs+1):
         model.train()
         total_loss = 0.0
         optimizer.zero_grad()
+        train_sampler.set_epoch(epoch)
+        epoch_start = time.perf_counter()
         for step, batch in enumerate(train_loader, 1):
             inputs = {k: v.to(DEVICE) for k,v in batch.items() if k != 'labels'}
             labels = batch['labels'].to(DEVICE)
@@ -737,6 +1016,10 @@ def finetune_cross_encoder(model_name: str, rows_train: List[Dict[str, Any]], ro
                 optimizer.zero_grad()
             total_loss += (loss.item() * accum_steps)
 
+        if device_type == "cuda":
+            torch.cuda.synchronize()
+        train_seconds = time.perf_counter() - epoch_start
+        pairs_per_sec = len(train_ds) / max(train_seconds, 1e-9)
         avg_loss = total_loss / max(1, len(train_loader))
         model.eval()
         ys, yps = [], []
@@ -757,6 +1040,7 @@ def finetune_cross_encoder(model_name: str, rows_train: List[Dict[str, Any]], ro
         epoch_data = {
             "epoch": epoch, "loss": float(avg_loss), "auc": float(auc),
             "precision": float(p), "recall": float(r), "f1": float(f),
+            "train_seconds": float(train_seconds), "pairs_per_sec": float(pairs_per_sec),
             "timestamp": datetime.datetime.now().isoformat()
         }
         progress_data["training_history"].append(epoch_data)
@@ -764,11 +1048,15 @@ def finetune_cross_encoder(model_name: str, rows_train: List[Dict[str, Any]], ro
         with open(progress_file, 'w', encoding='utf-8') as f:
             json.dump(progress_data, f, ensure_ascii=False, indent=2)
         
-        print(f"[CE] Epoch {epoch}: loss={avg_loss:.4f} val_AUC={auc:.4f} P={p:.4f} R={r:.4f} F1={f:.4f} - Progreso guardado")
+        print(f"[CE] Epoch {epoch}: loss={avg_loss:.4f} val_AUC={auc:.4f} P={p:.4f} R={r:.4f} F1={f:.4f} "
+              f"({pairs_per_sec:.1f} pares/s) - Progreso guardado")
         
         if f > best_f1:
             best_f1 = f
             best_state = {k: v.cpu() for k,v in model.state_dict().items()}
+        if inputs_hash:
+            save_epoch_checkpoint(checkpoint_path, inputs_hash, epoch, model, optimizer, best_f1, best_state,
+                                  progress_data, scheduler=scheduler, scaler=scaler)
 
     if best_state is not None:
         torch.save(best_state, os.path.join(model_dir, "model.pth"))
@@ -780,9 +1068,11 @@ def finetune_cross_encoder(model_name: str, rows_train: List[Dict[str, Any]], ro
             json.dump(progress_data, f, ensure_ascii=False, indent=2)
             
         print(f"[CE] Guardado mejor cross-encoder en {model_dir} (F1={best_f1:.4f}) - Progreso final guardado")
+        if os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
     return model_dir, best_f1
 
-def train_classical_models(rows_train: List[Dict[str, Any]], rows_val: List[Dict[str, Any]], fold_dir: str):
+def train_classical_models(train_ds: EmbeddingPairsDataset, val_ds: EmbeddingPairsDataset, fold_dir: str):
     """Entrena y guarda modelos clasicos: GaussianNB, LogisticRegression, LightGBM y RandomForest"""
     try:
         import joblib
@@ -799,15 +1089,10 @@ def train_classical_models(rows_train: List[Dict[str, Any]], rows_val: List[Dict
     except Exception:
         has_lgb = False
 
-    X_train = [r['mlp_features'].astype(float) if isinstance(r['mlp_features'], np.ndarray) else np.array(r['mlp_features'], dtype=float) for r in rows_train]
-    y_train = [int(r.get('label', 0)) for r in rows_train]
-    X_val = [r['mlp_features'].astype(float) if isinstance(r['mlp_features'], np.ndarray) else np.array(r['mlp_features'], dtype=float) for r in rows_val]
-    y_val = [int(r.get('label', 0)) for r in rows_val]
-
-    X_train = np.vstack(X_train)
-    X_val = np.vstack(X_val)
-    y_train = np.array(y_train)
-    y_val = np.array(y_val)
+    X_train = train_ds.feature_matrix()
+    X_val = val_ds.feature_matrix()
+    y_train = train_ds.labels.astype(int)
+    y_val = val_ds.labels.astype(int)
 
     results = {}
     os.makedirs(fold_dir, exist_ok=True)
@@ -903,7 +1188,7 @@ def train_classical_models(rows_train: List[Dict[str, Any]], rows_val: List[Dict
 
 def train_all_models(pairs_path: str, output_dir: str = "threads_analysis/models/output", n_splits: int = DEFAULT_FOLDS,
                      epochs: int = DEFAULT_EPOCHS, batch_size: int = DEFAULT_BATCH, lr: float = DEFAULT_LR,
-                     accum_steps: int = DEFAULT_ACCUM):
+                     accum_steps: int = DEFAULT_ACCUM, resume: bool = False, jobs: int = 0, distill: bool = True):
     os.makedirs(output_dir, exist_ok=True)
     rows = load_pairs_jsonl(pairs_path)
     print(f"[INFO] Cargados {len(rows)} pares de {pairs_path}")
@@ -957,12 +1242,27 @@ def train_all_models(pairs_path: str, output_dir: str = "threads_analysis/models
 
     summary = {"bi_a": [], "bi_b": [], "cross": [], "anomaly": []}
 
+    # Feature stores de los encoders base: cada texto único se codifica una sola vez
+    # y todos los folds indexan la misma matriz memory-mapped
+    base_store_a = EmbeddingFeatureStore(BI_ENCODER_A, device=DEVICE)
+    base_store_a.ensure([r['a']['text'] or "" for r in rows] + [r['b']['text'] or "" for r in rows])
+    base_store_b = None
+
+    jobs = jobs or default_parallel_jobs()
+    # spawn: los procesos no heredan el estado CUDA/hilos del proceso principal
+    pool = ProcessPoolExecutor(max_workers=jobs - 1, mp_context=multiprocessing.get_context("spawn")) if jobs > 1 else None
+    if pool is not None:
+        print(f"[INFO] Units independientes (anomalía, clásicos) en {jobs - 1} procesos aparte")
+    if resume:
+        print("[RESUME] Modo reanudación: se saltan los units completos con las mismas entradas")
+
     fold_idx = 0
     for train_idx, val_idx in splits:
         fold_idx += 1
         print(f"\n===== Comenzando fold {fold_idx}/{len(splits)} =====")
 
         fold_summary = {"fold": fold_idx, "bi_a": {}, "bi_b": {}, "cross": {}, "anomaly": {}}
+        fold_dir = os.path.join(output_dir, f"fold_{fold_idx}")
 
         rows_train = [rows[i] for i in train_idx]
         rows_train = augment_rows(rows_train, p_swap=0.05, p_punct_noise=0.10, p_case_noise=0.05, seed=RANDOM_SEED + fold_idx)
@@ -974,23 +1274,41 @@ def train_all_models(pairs_path: str, output_dir: str = "threads_analysis/models
         rows_train = sample_by_chat(rows_train, MAX_TRAIN)
         rows_val   = sample_by_chat(rows_val, MAX_VAL)
 
-        force_retrain = True
+        # Units del fold: se registran en fold_dir/units.json con el hash de sus entradas
+        fold_ckpt = FoldCheckpoint(fold_dir)
+        data_hash = rows_fingerprint(rows_train, rows_val)
+        pending = []
+
+        def run_unit(unit, inputs_hash, fn, *args, parallel=False, **kwargs):
+            """Ejecuta un unit (o lo salta si ya terminó con esas entradas). Devuelve su resultado o un future"""
+            done = fold_ckpt.completed(unit, inputs_hash) if resume else None
+            if done is not None:
+                print(f"[SKIP] fold {fold_idx} / {unit}: completo con las mismas entradas")
+                return done["result"]
+            if parallel and pool is not None:
+                fut = pool.submit(fn, *args, **kwargs)
+                pending.append((unit, inputs_hash, fut))
+                return fut
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                print(f"[ERROR] {unit} fold {fold_idx} failed: {e}")
+                return None
+            fold_ckpt.mark_done(unit, inputs_hash, result)
+            return result
 
         # 1. ENTRENAR MODELOS DE ANOMALÍA PRIMERO (solo con positivos)
         print("\n=== Entrenando modelos de anomalía (One-Class SVM e Isolation Tree) ===")
         
-        # Usar el bi-encoder A base (sin fine-tune) para extraer embeddings
-        base_bi_encoder = SentenceTransformer(BI_ENCODER_A)
-        
-        # Entrenar modelos de anomalía
-        anomaly_results = train_anomaly_models_for_fold(
-            rows_train, rows_val, base_encoder=base_bi_encoder, fold_dir=os.path.join(output_dir, f"fold_{fold_idx}")
+        # Usar el bi-encoder A base (sin fine-tune) desde el feature store compartido;
+        # se codifica aquí lo que falte para que un proceso aparte solo lea el store
+        base_store_a.ensure([r[k]['text'] or "" for rs in (rows_train, rows_val) for r in rs for k in ('a', 'b')])
+        anomaly_results = run_unit(
+            "anomaly", unit_hash(data_hash, "anomaly", model=BI_ENCODER_A, params=get_training_params("anomaly")),
+            train_anomaly_models_for_fold, [r for r in rows_train if r.get('label', 0) == 1], rows_val,
+            base_store=base_store_a, fold_dir=fold_dir, parallel=True
         )
         
-        if anomaly_results:
-            fold_summary["anomaly"] = anomaly_results
-            summary["anomaly"].append({"fold": fold_idx, **anomaly_results})
-        
         print("\n=== Continuando con modelos supervisados ===")
         
         # 2. CONTINUAR CON MODELOS SUPERVISADOS
@@ -1003,32 +1321,43 @@ def train_all_models(pairs_path: str, output_dir: str = "threads_analysis/models
         bi_a_tag = BI_ENCODER_A.split("/")[-1]
         bi_a_out = os.path.join(output_dir, f"fold_{fold_idx}", bi_a_tag)
 
-        if not force_retrain and os.path.exists(bi_a_out):
-            print(f"[SKIP] Bi-encoder A ya existe → {bi_a_out}")
-            bi_a_model = SentenceTransformer(bi_a_out)
+        def finetune_unit(model_name):
+            bi_dir, _ = finetune_bi_encoder(
+                model_name, rows_train, rows_val, output_dir,
+                fold=fold_idx, epochs=epochs, batch_size=batch_size,
+                lr=lr, warmup_pct=DEFAULT_WARMUP_PCT, accum_steps=accum_steps, resume=resume
+            )
+            return {"model_dir": bi_dir}
+
+        bi_params = {"epochs": epochs, "batch_size": batch_size, "lr": lr, "accum_steps": accum_steps}
+        bi_a_result = run_unit("bi_a", unit_hash(data_hash, "bi_a", model=BI_ENCODER_A, params=bi_params),
+                               finetune_unit, BI_ENCODER_A)
+        bi_a_dir = (bi_a_result or {}).get("model_dir")
+        bi_a_store = EmbeddingFeatureStore(bi_a_dir, device=DEVICE) if bi_a_dir and os.path.isdir(bi_a_dir) else base_store_a
+
+        mlp_params = get_training_params("mlp")
+        mlp_inputs = {"store": os.path.basename(bi_a_store.dir), "params": mlp_params,
+                      "epochs": epochs, "batch_size": batch_size}
+        mlp_hash_a = unit_hash(data_hash, "mlp_a", **mlp_inputs)
+        classical_hash_a = unit_hash(data_hash, "classical_a", store=mlp_inputs["store"], params=get_training_params("classical"))
+        classical_a_dir = os.path.join(output_dir, f"fold_{fold_idx}", "classical_a")
+        mlp_f1_a = None
+        if not (resume and fold_ckpt.completed("mlp_a", mlp_hash_a) and fold_ckpt.completed("classical_a", classical_hash_a)):
+            train_ds_a, val_ds_a = build_fold_datasets(bi_a_store, rows_train, rows_val)
+            # los clásicos corren en otro proceso (si hay cores) mientras el MLP entrena aquí
+            run_unit("classical_a", classical_hash_a, train_classical_models, train_ds_a, val_ds_a, classical_a_dir, parallel=True)
+            mlp_f1_a = run_unit("mlp_a", mlp_hash_a, train_mlp_for_fold,
+                train_ds_a, val_ds_a, output_dir, fold_dir, os.path.join(fold_dir, MLP_SUBDIRS["bi_a"]),
+                batch_size=batch_size, epochs=epochs, lr=1e-3, accum_steps=1, inputs_hash=mlp_hash_a, resume=resume
+            )
+            del train_ds_a, val_ds_a
         else:
-            try:
-                bi_a_dir, _ = finetune_bi_encoder(
-                    BI_ENCODER_A, rows_train, rows_val, output_dir,
-                    fold=fold_idx, epochs=epochs, batch_size=batch_size,
-                    lr=lr, warmup_pct=DEFAULT_WARMUP_PCT, accum_steps=accum_steps
-                )
-                bi_a_model = SentenceTransformer(bi_a_dir)
-            except Exception as e:
-                print(f"[ERROR] bi-encoder A fold {fold_idx} failed: {e}")
-                bi_a_model = SentenceTransformer(BI_ENCODER_A)
-
-        mlp_f1_a = train_mlp_for_fold(
-            rows_train, rows_val, bi_a_model, output_dir, os.path.join(output_dir, f"fold_{fold_idx}"),
-            batch_size=batch_size, epochs=epochs, lr=1e-3, accum_steps=1
-        )
+            mlp_f1_a = fold_ckpt.completed("mlp_a", mlp_hash_a)["result"]
+            print(f"[SKIP] fold {fold_idx} / mlp_a y classical_a: completos con las mismas entradas")
 
         fold_summary["bi_a"] = {"mlp_f1": mlp_f1_a, "model_dir": bi_a_out}
         summary["bi_a"].append({"fold": fold_idx, "mlp_f1": mlp_f1_a, "model_dir": bi_a_out})
 
-        classical_a_dir = os.path.join(output_dir, f"fold_{fold_idx}", "classical_a")
-        train_classical_models(rows_train, rows_val, classical_a_dir)
-
         params = get_training_params()
         epochs = params["epochs"]
         batch_size = params["batch_size"]
@@ -1038,61 +1367,85 @@ def train_all_models(pairs_path: str, output_dir: str = "threads_analysis/models
         bi_b_tag = BI_ENCODER_B.split("/")[-1]
         bi_b_out = os.path.join(output_dir, f"fold_{fold_idx}", bi_b_tag)
 
-        if not force_retrain and os.path.exists(bi_b_out):
-            print(f"[SKIP] Bi-encoder B ya existe → {bi_b_out}")
-            bi_b_model = SentenceTransformer(bi_b_out)
+        bi_b_result = run_unit("bi_b", unit_hash(data_hash, "bi_b", model=BI_ENCODER_B, params=bi_params),
+                               finetune_unit, BI_ENCODER_B)
+        bi_b_dir = (bi_b_result or {}).get("model_dir")
+
+        if bi_b_dir and os.path.isdir(bi_b_dir):
+            bi_b_store = EmbeddingFeatureStore(bi_b_dir, device=DEVICE)
         else:
-            try:
-                bi_b_dir, _ = finetune_bi_encoder(
-                    BI_ENCODER_B, rows_train, rows_val, output_dir,
-                    fold=fold_idx, epochs=epochs, batch_size=batch_size,
-                    lr=lr, warmup_pct=DEFAULT_WARMUP_PCT, accum_steps=accum_steps
-                )
-                bi_b_model = SentenceTransformer(bi_b_dir)
-            except Exception as e:
-                print(f"[ERROR] bi-encoder B fold {fold_idx} failed: {e}")
-                bi_b_model = SentenceTransformer(BI_ENCODER_B)
+            if base_store_b is None:
+                base_store_b = EmbeddingFeatureStore(BI_ENCODER_B, device=DEVICE)
+            bi_b_store = base_store_b
 
-        mlp_f1_b = train_mlp_for_fold(
-            rows_train, rows_val, bi_b_model, output_dir, os.path.join(output_dir, f"fold_{fold_idx}"),
-            batch_size=batch_size, epochs=epochs, lr=1e-3, accum_steps=1
-        )
+        mlp_inputs["store"] = os.path.basename(bi_b_store.dir)
+        mlp_hash_b = unit_hash(data_hash, "mlp_b", **mlp_inputs)
+        classical_hash_b = unit_hash(data_hash, "classical_b", store=mlp_inputs["store"], params=get_training_params("classical"))
+        classical_b_dir = os.path.join(output_dir, f"fold_{fold_idx}", "classical_b")
+        mlp_f1_b = None
+        if not (resume and fold_ckpt.completed("mlp_b", mlp_hash_b) and fold_ckpt.completed("classical_b", classical_hash_b)):
+            train_ds_b, val_ds_b = build_fold_datasets(bi_b_store, rows_train, rows_val)
+            run_unit("classical_b", classical_hash_b, train_classical_models, train_ds_b, val_ds_b, classical_b_dir, parallel=True)
+            mlp_f1_b = run_unit("mlp_b", mlp_hash_b, train_mlp_for_fold,
+                train_ds_b, val_ds_b, output_dir, fold_dir, os.path.join(fold_dir, MLP_SUBDIRS["bi_b"]),
+                batch_size=batch_size, epochs=epochs, lr=1e-3, accum_steps=1, inputs_hash=mlp_hash_b, resume=resume
+            )
+            del train_ds_b, val_ds_b
+        else:
+            mlp_f1_b = fold_ckpt.completed("mlp_b", mlp_hash_b)["result"]
+            print(f"[SKIP] fold {fold_idx} / mlp_b y classical_b: completos con las mismas entradas")
 
         fold_summary["bi_b"] = {"mlp_f1": mlp_f1_b, "model_dir": bi_b_out}
         summary["bi_b"].append({"fold": fold_idx, "mlp_f1": mlp_f1_b, "model_dir": bi_b_out})
 
-        classical_b_dir = os.path.join(output_dir, f"fold_{fold_idx}", "classical_b")
-        train_classical_models(rows_train, rows_val, classical_b_dir)
-
         ce_tag = CROSS_ENCODER.split("/")[-1]
         ce_out = os.path.join(output_dir, f"fold_{fold_idx}", ce_tag)
 
-        if not force_retrain and os.path.exists(ce_out):
-            print(f"[SKIP] Cross-encoder ya existe → {ce_out}")
-            ce_f1 = None
-        else:
-            try:
-                cross_params = get_training_params("cross")
-                ce_dir, ce_f1 = finetune_cross_encoder(
-                    CROSS_ENCODER, rows_train, rows_val, output_dir,
-                    fold=fold_idx, epochs=cross_params.get("epochs", epochs),
-                    batch_size=cross_params.get("batch_size", max(8, batch_size//2)),
-                    lr=cross_params.get("lr", lr), warmup_pct=cross_params.get("warmup_pct", DEFAULT_WARMUP_PCT),
-                    accum_steps=cross_params.get("accum_steps", accum_steps)
-                )
-            except Exception as e:
-                print(f"[ERROR] cross-encoder fold {fold_idx} failed: {e}")
-                ce_f1 = None
+        cross_params = get_training_params("cross")
+        ce_kwargs = dict(
+            fold=fold_idx, epochs=cross_params.get("epochs", epochs),
+            batch_size=cross_params.get("batch_size", max(8, batch_size//2)),
+            lr=cross_params.get("lr", lr), warmup_pct=cross_params.get("warmup_pct", DEFAULT_WARMUP_PCT),
+            accum_steps=cross_params.get("accum_steps", accum_steps)
+        )
+        ce_hash = unit_hash(data_hash, "cross", model=CROSS_ENCODER, max_length=CROSS_MAX_LENGTH, params=ce_kwargs)
+
+        def cross_unit():
+            _, f1 = finetune_cross_encoder(CROSS_ENCODER, rows_train, rows_val, output_dir, **ce_kwargs,
+                                           inputs_hash=ce_hash, resume=resume)
+            return f1
+
+        ce_f1 = run_unit("cross", ce_hash, cross_unit)
 
         fold_summary["cross"] = {"cross_f1": ce_f1, "model_dir": ce_out}
         summary["cross"].append({"fold": fold_idx, "cross_f1": ce_f1, "model_dir": ce_out})
 
+        # Esperar los units que corrieron en procesos aparte
+        for unit, inputs_hash, fut in pending:
+            try:
+                result = fut.result()
+            except Exception as e:
+                print(f"[ERROR] {unit} fold {fold_idx} failed: {e}")
+                continue
+            fold_ckpt.mark_done(unit, inputs_hash, result)
+            if unit == "anomaly":
+                anomaly_results = result
+        if not isinstance(anomaly_results, dict):
+            anomaly_results = None
+
+        if anomaly_results:
+            fold_summary["anomaly"] = anomaly_results
+            summary["anomaly"].append({"fold": fold_idx, **anomaly_results})
+
         fold_summary_path = os.path.join(output_dir, f"fold_{fold_idx}", f"training_summary_fold_{fold_idx}.json")
         with open(fold_summary_path, "w", encoding="utf-8") as f:
             json.dump(fold_summary, f, ensure_ascii=False, indent=2)
 
         print(f"[INFO] Guardado resumen fold → {fold_summary_path}")
 
+    if pool is not None:
+        pool.shutdown()
+
     with open(os.path.join(output_dir, "training_summary.json"), "w", encoding="utf-8") as f:
         json.dump(summary, f, ensure_ascii=False, indent=2)
     print("[INFO] Entrenamiento completo. Resumen guardado en training_summary.json")
@@ -1155,6 +1508,12 @@ def train_all_models(pairs_path: str, output_dir: str = "threads_analysis/models
 
         import shutil
         shutil.copytree(model_dir, dest, dirs_exist_ok=True)
+        if is_bi_encoder:
+            mlp_src = os.path.join(output_dir, f"fold_{best['fold']}", MLP_SUBDIRS[summary_key])
+            if os.path.isdir(mlp_src):
+                shutil.copytree(mlp_src, os.path.join(dest, MLP_SUBDIRS[summary_key]), dirs_exist_ok=True)
+            else:
+                print(f"[WARN] No se encontró el MLP de {summary_key} en fold {best['fold']}")
         print(f"[BEST] Copiado mejor modelo {summary_key} a {dest}")
 
     export_best("bi_a", "bi_encoder_A", is_bi_encoder=True)
@@ -1162,6 +1521,14 @@ def train_all_models(pairs_path: str, output_dir: str = "threads_analysis/models
     export_best("cross", "cross_encoder", is_bi_encoder=False)
     export_best("anomaly", "anomaly_models", is_bi_encoder=False, is_anomaly=True)
 
+    if distill:
+        # student diminuto destilado del mejor cross-encoder (best/student + distillation_report.json)
+        from threads_analysis.models.distillation import distill_student
+        try:
+            summary["distill"] = distill_student(pairs_path, output_dir, resume=resume)
+        except Exception as e:
+            print(f"[ERROR] Destilación falló: {e}")
+
     return summary
 
 if __name__ == "__main__":
@@ -1174,7 +1541,11 @@ if __name__ == "__main__":
     parser.add_argument('--batch-size', type=int, default=32)
     parser.add_argument('--lr', type=float, default=2e-5)
     parser.add_argument('--accum', type=int, default=2)
+    parser.add_argument('--resume', action='store_true', help='Salta los (fold, modelo) ya completos con las mismas entradas y reanuda desde checkpoints')
+    parser.add_argument('--jobs', type=int, default=0, help='Procesos para units independientes (0 = según cores)')
+    parser.add_argument('--no-distill', action='store_true', help='No entrenar el student destilado del cross-encoder')
     args = parser.parse_args()
 
     train_all_models(args.pairs, output_dir=args.output_dir, n_splits=args.folds,
-                     epochs=args.epochs, batch_size=args.batch_size, lr=args.lr, accum_steps=args.accum)
\ No newline at end of file
+                     epochs=args.epochs, batch_size=args.batch_size, lr=args.lr, accum_steps=args.accum,
+                     resume=args.resume, jobs=args.jobs, distill=not args.no_distill)
\ No newline at end of file
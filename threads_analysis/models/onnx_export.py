@@ -6,106 +6,180 @@ Exporta a ONNX el MEJOR fold de cada modelo:
  - Bi-encoder B (SentenceTransformer)
  - Cross-encoder (AutoModelForSequenceClassification)
  - MLP asociado a cada bi-encoder
+ - Student destilado (best/student, ver distillation.py): encoder chico + MLP
 
 Asume que train_all_models() ya copió los mejores en:
     output/best/
         bi_encoder_A/
         bi_encoder_B/
         cross_encoder/
+        student/        (opcional)
+
+El bi-encoder se exporta como grafo autocontenido: input_ids + attention_mask ->
+sentence_embedding (mean pooling + los módulos posteriores del SentenceTransformer, p.ej.
+Dense / Normalize: lo mismo que encode()) y embeddings (sentence_embedding + L2), con
+tokenizer.json y embedding_config.json al lado para usarlo sin torch
+(threads_analysis.inference.OnnxEmbedder). La exportación falla si sentence_embedding no
+coincide con SentenceTransformer.encode() (tolerancia ST_PARITY_TOL).
+
+Además del grafo fp32 genera, por modelo:
+ - <modelo>.opt.onnx : optimizado con onnxruntime (fusión de atención / LayerNorm / GELU)
+ - <modelo>.int8.onnx: cuantización dinámica INT8 de pesos (sobre el optimizado si existe)
+y escribe onnx/variants_report.json con paridad contra fp32 (coseno de embeddings en una
+muestra de evaluation_set.jsonl y delta de F1 de MLP / cross-encoder) y latencia/throughput
+por variante en CPU.
 """
 
 import os
+import time
+import random
 import torch
+import torch.nn as nn
 import json
 import numpy as np
 from pathlib import Path
+from typing import List, Dict, Any, Optional, Callable
 from sentence_transformers import SentenceTransformer
-from transformers import AutoTokenizer, AutoModelForSequenceClassification
-
-# === MLP definition (same as training) ===
-import torch.nn as nn
+from transformers import AutoTokenizer
 
-class SmallMLP(nn.Module):
-    def __init__(self, input_dim: int, hidden: int = 512, hidden2: int = 128, dropout: float = 0.2):
-        super().__init__()
-        self.net = nn.Sequential(
-            nn.Linear(input_dim, hidden),
-            nn.ReLU(),
-            nn.Dropout(dropout),
-            nn.Linear(hidden, hidden2),
-            nn.ReLU(),
-            nn.Dropout(dropout),
-            nn.Linear(hidden2, 1),
-            nn.Sigmoid()
-        )
-    def forward(self, x):
-        return self.net(x).squeeze(-1)
+from threads_analysis.models.model_trainer import (
+    CROSS_MAX_LENGTH, MLP_SUBDIRS, N_EXTRA_FEATURES, load_cross_encoder, load_mlp_from_path, mlp_extra_features, cross_pair_text
+)
+from threads_analysis.inference.runtime import build_feeds, select_embeddings
 
 
 DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
+# Máxima diferencia absoluta admitida entre sentence_embedding y SentenceTransformer.encode()
+ST_PARITY_TOL = 1e-4
 
 
 # ------------------------------------------------------------
 # ✅ Utility: export SentenceTransformer to ONNX
 # ------------------------------------------------------------
+class PooledSentenceEncoder(nn.Module):
+    """
+    Transformer + mean pooling + módulos posteriores del SentenceTransformer en un solo grafo:
+    entradas input_ids / attention_mask, salidas
+      - embeddings:         sentence_embedding normalizado (similitud coseno = producto punto)
+      - sentence_embedding: lo mismo que SentenceTransformer.encode() (lo que ven el feature
+                            store y el MLP): mean pooling y luego Dense / Normalize si el modelo
+                            los tiene
+    """
+    def __init__(self, st_model: SentenceTransformer):
+        super().__init__()
+        self.transformer = st_model[0].auto_model
+        # Módulos después de Transformer y Pooling, en orden: ("dense", módulo) o ("normalize", None)
+        self.tail_kinds = []
+        tail = []
+        for module in list(st_model)[2:]:
+            kind = type(module).__name__
+            if kind == "Normalize":
+                self.tail_kinds.append("normalize")
+            elif kind == "Dense":
+                self.tail_kinds.append("dense")
+                tail.append(module)
+            else:
+                raise ValueError(f"Módulo {kind} del SentenceTransformer no soportado en la exportación ONNX")
+        self.dense = nn.ModuleList(tail)
+
+    def forward(self, input_ids, attention_mask):
+        token_embeddings = self.transformer(input_ids=input_ids, attention_mask=attention_mask)[0]
+        mask = attention_mask.unsqueeze(-1).to(token_embeddings.dtype)
+        sentence = (token_embeddings * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)
+        dense = iter(self.dense)
+        for kind in self.tail_kinds:
+            if kind == "normalize":
+                sentence = torch.nn.functional.normalize(sentence, p=2, dim=1)
+            else:
+                layer = next(dense)
+                sentence = layer.activation_function(layer.linear(sentence))
+        normalized = torch.nn.functional.normalize(sentence, p=2, dim=1)
+        return normalized, sentence
+
+
 def export_sentence_transformer(model_dir: str, output_dir: str):
     print(f"[ONNX] Exporting SentenceTransformer: {model_dir}")
 
-    model = SentenceTransformer(model_dir).to(DEVICE)
+    model = SentenceTransformer(model_dir, device="cpu")
+    model.eval()
     os.makedirs(output_dir, exist_ok=True)
 
-    # Prepare dummy inputs
-    text = ["example text for onnx export"]
-    inputs = model.tokenize(text)
-    input_ids = inputs["input_ids"].to(DEVICE)
-    attention_mask = inputs["attention_mask"].to(DEVICE)
+    pooling = model[1] if len(model) > 1 else None
+    if pooling is not None and not getattr(pooling, "pooling_mode_mean_tokens", False):
+        print(f"[WARN] {model_dir} no usa mean pooling; el grafo exportado aplica mean pooling")
 
-    # Run once to get shape
-    with torch.no_grad():
-        model_output = model({"input_ids": input_ids, "attention_mask": attention_mask})
-        emb_dim = model_output.shape[-1]
+    encoder = PooledSentenceEncoder(model).eval()
 
-    print(f"[ONNX] Embedding dim = {emb_dim}")
+    # Prepare dummy inputs (2 textos de distinto largo para que el padding quede en el trazado)
+    inputs = model.tokenize(["example text for onnx export", "hola"])
+    input_ids = inputs["input_ids"]
+    attention_mask = inputs["attention_mask"]
 
-    dummy_input = {
-        "input_ids": input_ids,
-        "attention_mask": attention_mask,
-    }
+    # Run once to get shape (y paridad con encode(), que es lo que llenó el feature store)
+    with torch.no_grad():
+        _, sentence = encoder(input_ids, attention_mask)
+        emb_dim = sentence.shape[-1]
+        reference = model.encode(["example text for onnx export", "hola"], convert_to_numpy=True)
+        max_diff = float(np.abs(sentence.numpy() - reference).max())
+
+    print(f"[ONNX] Embedding dim = {emb_dim} (max |sentence_embedding - SentenceTransformer.encode| = {max_diff:.2e})")
+    if max_diff > ST_PARITY_TOL:
+        raise RuntimeError(f"El grafo de {model_dir} no reproduce SentenceTransformer.encode() "
+                           f"(max diff {max_diff:.2e} > {ST_PARITY_TOL:.0e}); módulos: "
+                           f"{[type(m).__name__ for m in model]}")
 
     onnx_path = os.path.join(output_dir, "model.onnx")
 
     torch.onnx.export(
-        model,
-        (dummy_input,),
+        encoder,
+        (input_ids, attention_mask),
         onnx_path,
-        input_names=["input"],
-        output_names=["embeddings"],
+        input_names=["input_ids", "attention_mask"],
+        output_names=["embeddings", "sentence_embedding"],
         opset_version=17,
         dynamic_axes={
-            "input": {0: "batch", 1: "seq"},
+            "input_ids": {0: "batch", 1: "seq"},
+            "attention_mask": {0: "batch", 1: "seq"},
             "embeddings": {0: "batch"},
+            "sentence_embedding": {0: "batch"},
         }
     )
 
+    # Tokenizer + config junto al grafo: el runtime (threads_analysis.inference) no necesita torch
+    model.tokenizer.save_pretrained(output_dir)
+    write_embedding_config(output_dir, max_seq_length=model.max_seq_length, dim=int(emb_dim),
+                           pad_token_id=model.tokenizer.pad_token_id)
+
     print(f"[ONNX] Saved ONNX bi-encoder → {onnx_path}")
     return emb_dim
 
 
+def write_embedding_config(output_dir: str, max_seq_length: int, dim: int, pad_token_id: Optional[int]):
+    config = {
+        "inputs": ["input_ids", "attention_mask"],
+        "outputs": {"embeddings": "sentence_embedding + L2",
+                    "sentence_embedding": "SentenceTransformer.encode (mean pooling + Dense/Normalize)"},
+        "max_seq_length": int(max_seq_length), "dim": dim,
+        "pad_token_id": int(pad_token_id) if pad_token_id is not None else 0,
+    }
+    with open(os.path.join(output_dir, "embedding_config.json"), "w", encoding="utf-8") as f:
+        json.dump(config, f, ensure_ascii=False, indent=2)
+
+
 # ------------------------------------------------------------
 # ✅ Utility: export MLP classifier to ONNX
 # ------------------------------------------------------------
-def export_mlp(mlp_path: str, input_dim: int, output_dir: str):
+def export_mlp(mlp_path: str, input_dim: int, output_dir: str, hidden: int = 256, hidden2: int = 64,
+               filename: str = "mlp.onnx"):
     print(f"[ONNX] Exporting MLP: {mlp_path}")
 
-    mlp = SmallMLP(input_dim=input_dim)
-    mlp.load_state_dict(torch.load(mlp_path, map_location="cpu"))
-    mlp = mlp.to(DEVICE)
-    mlp.eval()
+    # misma arquitectura que en el entrenamiento (train_mlp_for_fold / student destilado)
+    mlp = load_mlp_from_path(mlp_path, input_dim, device=DEVICE, hidden=hidden, hidden2=hidden2)
 
     os.makedirs(output_dir, exist_ok=True)
     dummy = torch.randn(1, input_dim).to(DEVICE)
 
-    onnx_path = os.path.join(output_dir, "mlp.onnx")
+    onnx_path = os.path.join(output_dir, filename)
 
     torch.onnx.export(
         mlp,
@@ -118,6 +192,7 @@ def export_mlp(mlp_path: str, input_dim: int, output_dir: str):
     )
 
     print(f"[ONNX] Saved ONNX MLP → {onnx_path}")
+    return onnx_path
 
 
 # ------------------------------------------------------------
@@ -129,8 +204,8 @@ def export_cross_encoder(model_dir: str, output_dir: str):
     os.makedirs(output_dir, exist_ok=True)
 
     tokenizer = AutoTokenizer.from_pretrained(model_dir)
-    model = AutoModelForSequenceClassification.from_pretrained(model_dir).to(DEVICE)
-    model.eval()
+    # finetune_cross_encoder guarda solo model.pth + tokenizer
+    model = load_cross_encoder(model_dir, device=DEVICE)
 
     dummy_text = "This is example text A [SEP] and example text B"
     enc = tokenizer(dummy_text, truncation=True, padding="max_length",
@@ -154,48 +229,271 @@ def export_cross_encoder(model_dir: str, output_dir: str):
         }
     )
 
+    tokenizer.save_pretrained(output_dir)
     print(f"[ONNX] Saved ONNX cross-encoder → {onnx_path}")
 
 
+# ------------------------------------------------------------
+# ✅ Variants: ORT-optimized and dynamic INT8
+# ------------------------------------------------------------
+def variant_paths(onnx_path: str) -> Dict[str, str]:
+    base, ext = os.path.splitext(onnx_path)
+    return {"fp32": onnx_path, "opt": f"{base}.opt{ext}", "int8": f"{base}.int8{ext}"}
+
+
+def optimize_onnx(onnx_path: str, out_path: str, model_dir: Optional[str] = None) -> Optional[str]:
+    """Fusiona atención/LayerNorm/GELU con el optimizer de onnxruntime (fallback: optimización offline de ORT)"""
+    num_heads, hidden_size = 0, 0
+    config_path = os.path.join(model_dir, "config.json") if model_dir else None
+    if config_path and os.path.exists(config_path):
+        with open(config_path, "r", encoding="utf-8") as f:
+            cfg = json.load(f)
+        num_heads, hidden_size = cfg.get("num_attention_heads", 0), cfg.get("hidden_size", 0)
+    try:
+        from onnxruntime.transformers import optimizer
+        opt = optimizer.optimize_model(onnx_path, model_type="bert", num_heads=num_heads, hidden_size=hidden_size)
+        opt.save_model_to_file(out_path)
+        print(f"[ONNX] Optimized (fused) → {out_path} ({opt.get_fused_operator_statistics()})")
+        return out_path
+    except Exception as e:
+        print(f"[ONNX] Transformer optimizer failed ({e}); using ORT offline optimization")
+    try:
+        import onnxruntime as ort
+        so = ort.SessionOptions()
+        so.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED
+        so.optimized_model_filepath = out_path
+        ort.InferenceSession(onnx_path, so, providers=["CPUExecutionProvider"])
+        print(f"[ONNX] Optimized (ORT offline) → {out_path}")
+        return out_path
+    except Exception as e:
+        print(f"[WARN] Could not optimize {onnx_path}: {e}")
+        return None
+
+
+def quantize_onnx(src_path: str, out_path: str) -> Optional[str]:
+    """Cuantización dinámica INT8 de los pesos (activaciones cuantizadas en runtime)"""
+    try:
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        quantize_dynamic(src_path, out_path, weight_type=QuantType.QInt8)
+        print(f"[ONNX] Quantized INT8 → {out_path}")
+        return out_path
+    except Exception as e:
+        print(f"[WARN] Could not quantize {src_path}: {e}")
+        return None
+
+
+def build_variants(onnx_path: str, model_dir: Optional[str] = None, transformer: bool = True) -> Dict[str, str]:
+    """Genera .opt.onnx (solo transformers) e .int8.onnx; devuelve las variantes que existen"""
+    paths = variant_paths(onnx_path)
+    out = {"fp32": onnx_path}
+    if transformer and optimize_onnx(onnx_path, paths["opt"], model_dir):
+        out["opt"] = paths["opt"]
+    # cuantizar sobre el grafo ya fusionado; si falla, sobre el fp32
+    if quantize_onnx(out.get("opt", onnx_path), paths["int8"]) or \
+            ("opt" in out and quantize_onnx(onnx_path, paths["int8"])):
+        out["int8"] = paths["int8"]
+    return out
+
+
+# ------------------------------------------------------------
+# ✅ Parity check and latency report
+# ------------------------------------------------------------
+def _cpu_session(path: str, threads: int = 0):
+    import onnxruntime as ort
+    so = ort.SessionOptions()
+    so.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    if threads:
+        so.intra_op_num_threads = threads
+    return ort.InferenceSession(path, so, providers=["CPUExecutionProvider"])
+
+
+def _max_seq_length(model_dir: str, default: int = 128) -> int:
+    cfg = os.path.join(model_dir, "sentence_bert_config.json")
+    if os.path.exists(cfg):
+        with open(cfg, "r", encoding="utf-8") as f:
+            return int(json.load(f).get("max_seq_length", default))
+    return default
+
+
+def onnx_encode(sess, tokenizer, texts: List[str], max_length: int = 128, batch_size: int = 64) -> np.ndarray:
+    input_names = [i.name for i in sess.get_inputs()]
+    output_names = [o.name for o in sess.get_outputs()]
+    out = []
+    for i in range(0, len(texts), batch_size):
+        enc = tokenizer(texts[i:i + batch_size], truncation=True, max_length=max_length, padding=True, return_tensors="np")
+        ids, mask = enc["input_ids"].astype(np.int64), enc["attention_mask"].astype(np.int64)
+        out.append(select_embeddings(sess.run(None, build_feeds(input_names, ids, mask)), output_names, mask))
+    return np.concatenate(out) if out else np.zeros((0, 0), dtype=np.float32)
+
+
+def onnx_cross(sess, tokenizer, texts: List[str], batch_size: int = 64) -> np.ndarray:
+    input_names = [i.name for i in sess.get_inputs()]
+    out = []
+    for i in range(0, len(texts), batch_size):
+        enc = tokenizer(texts[i:i + batch_size], truncation=True, max_length=CROSS_MAX_LENGTH, padding=True, return_tensors="np")
+        logits = sess.run(None, build_feeds(input_names, enc["input_ids"].astype(np.int64),
+                                            enc["attention_mask"].astype(np.int64)))[0].reshape(-1)
+        out.append(1.0 / (1.0 + np.exp(-logits)))
+    return np.concatenate(out) if out else np.zeros(0, dtype=np.float32)
+
+
+def onnx_mlp(sess, X: np.ndarray) -> np.ndarray:
+    return sess.run(None, {sess.get_inputs()[0].name: X.astype(np.float32)})[0].reshape(-1)
+
+
+def load_eval_sample(eval_set: str, n: int, seed: int = 42) -> List[Dict[str, Any]]:
+    """Muestra fija (semilla) de pares del conjunto de evaluación (chats nunca vistos en train)"""
+    if not eval_set or not os.path.exists(eval_set):
+        print(f"[WARN] evaluation set not found: {eval_set}; parity check uses a synthetic sample")
+        return [{"a": {"text": f"mensaje de ejemplo {i}"}, "b": {"text": f"respuesta {i}"}, "label": i % 2} for i in range(64)]
+    with open(eval_set, "r", encoding="utf-8") as f:
+        rows = [json.loads(line) for line in f if line.strip()]
+    random.Random(seed).shuffle(rows)
+    return rows[:n]
+
+
+def benchmark(fn: Callable[[Any], Any], inputs_by_batch: Dict[int, Any], warmup: int = 3, repeats: int = 20) -> Dict[str, Any]:
+    """Latencia p50/p95 (ms) y throughput (items/s) por tamaño de batch"""
+    report = {}
+    for bs, inputs in inputs_by_batch.items():
+        for _ in range(warmup):
+            fn(inputs)
+        times = []
+        for _ in range(repeats):
+            t0 = time.perf_counter()
+            fn(inputs)
+            times.append(time.perf_counter() - t0)
+        times = np.array(times) * 1000.0
+        report[f"batch_{bs}"] = {
+            "p50_ms": float(np.percentile(times, 50)), "p95_ms": float(np.percentile(times, 95)),
+            "items_per_sec": float(bs / (np.median(times) / 1000.0))
+        }
+    return report
+
+
+def binary_f1(labels: np.ndarray, probs: np.ndarray) -> float:
+    from sklearn.metrics import f1_score
+    return float(f1_score(labels, (probs >= 0.5).astype(int), zero_division=0))
+
+
+def _file_mb(*paths: Optional[str]) -> float:
+    return float(sum(os.path.getsize(p) for p in paths if p and os.path.exists(p)) / 2**20)
+
+
+def report_bi_encoder(onnx_dir: str, model_dir: str, rows: List[Dict[str, Any]], cos_threshold: float,
+                      max_f1_drop: float, threads: int = 0) -> Dict[str, Any]:
+    """Paridad (coseno vs fp32, delta F1 del MLP) y latencia de cada variante de un bi-encoder"""
+    tokenizer = AutoTokenizer.from_pretrained(model_dir)
+    max_len = _max_seq_length(model_dir)
+    enc_variants = {k: v for k, v in variant_paths(os.path.join(onnx_dir, "model.onnx")).items() if os.path.exists(v)}
+    mlp_variants = {k: v for k, v in variant_paths(os.path.join(onnx_dir, "mlp.onnx")).items() if os.path.exists(v)}
+
+    texts = list(dict.fromkeys([r["a"]["text"] or "" for r in rows] + [r["b"]["text"] or "" for r in rows]))
+    row_of = {t: i for i, t in enumerate(texts)}
+    idx_a = np.array([row_of[r["a"]["text"] or ""] for r in rows])
+    idx_b = np.array([row_of[r["b"]["text"] or ""] for r in rows])
+    extras = np.stack([mlp_extra_features(r) for r in rows])
+    labels = np.array([int(r.get("label", 0)) for r in rows])
+
+    def mlp_probs(emb, mlp_path):
+        a, b = emb[idx_a], emb[idx_b]
+        X = np.concatenate([a, b, np.abs(a - b), a * b, extras], axis=1)
+        return onnx_mlp(_cpu_session(mlp_path, threads), X)
+
+    report = {"sample_texts": len(texts), "sample_pairs": len(rows), "variants": {}}
+    ref_emb, ref_f1 = None, None
+    for name, path in enc_variants.items():
+        sess = _cpu_session(path, threads)
+        emb = onnx_encode(sess, tokenizer, texts, max_length=max_len)
+        entry = {"files": {"encoder": path}}
+        if name == "fp32":
+            ref_emb = emb
+        cos = np.sum(emb * ref_emb, axis=1) / np.clip(np.linalg.norm(emb, axis=1) * np.linalg.norm(ref_emb, axis=1), 1e-12, None)
+        entry["parity"] = {"cosine_mean": float(cos.mean()), "cosine_min": float(cos.min())}
+        passed = bool(cos.mean() >= cos_threshold)
+
+        mlp_path = mlp_variants.get("int8" if name == "int8" else "fp32")
+        if mlp_path:
+            entry["files"]["mlp"] = mlp_path
+            f1 = binary_f1(labels, mlp_probs(emb, mlp_path))
+            if name == "fp32":
+                ref_f1 = f1
+            entry["parity"].update({"f1": f1, "f1_delta": f1 - ref_f1})
+            passed = passed and (f1 - ref_f1) >= -max_f1_drop
+        entry["passed"] = passed
+        entry["size_mb"] = _file_mb(path, mlp_path)
+        entry["latency"] = benchmark(lambda t: onnx_encode(sess, tokenizer, t, max_length=max_len),
+                                     {1: texts[:1], 32: texts[:32]})
+        report["variants"][name] = entry
+        print(f"[PARITY] {os.path.basename(onnx_dir)}/{name}: {entry['parity']} passed={passed}")
+    return report
+
+
+def report_cross_encoder(onnx_dir: str, model_dir: str, rows: List[Dict[str, Any]], max_f1_drop: float,
+                         threads: int = 0) -> Dict[str, Any]:
+    """Paridad (delta F1 y diferencia de probabilidades vs fp32) y latencia del cross-encoder"""
+    tokenizer = AutoTokenizer.from_pretrained(model_dir)
+    texts = [cross_pair_text(r) for r in rows]
+    labels = np.array([int(r.get("label", 0)) for r in rows])
+    report = {"sample_pairs": len(rows), "variants": {}}
+    ref_probs, ref_f1 = None, None
+    for name, path in variant_paths(os.path.join(onnx_dir, "model.onnx")).items():
+        if not os.path.exists(path):
+            continue
+        sess = _cpu_session(path, threads)
+        probs = onnx_cross(sess, tokenizer, texts)
+        f1 = binary_f1(labels, probs)
+        if name == "fp32":
+            ref_probs, ref_f1 = probs, f1
+        entry = {
+            "files": {"model": path}, "size_mb": _file_mb(path),
+            "parity": {"f1": f1, "f1_delta": f1 - ref_f1, "max_abs_prob_diff": float(np.max(np.abs(probs - ref_probs)))},
+        }
+        entry["passed"] = bool(f1 - ref_f1 >= -max_f1_drop)
+        entry["latency"] = benchmark(lambda t: onnx_cross(sess, tokenizer, t), {1: texts[:1], 32: texts[:32]})
+        report["variants"][name] = entry
+        print(f"[PARITY] cross_encoder/{name}: {entry['parity']} passed={entry['passed']}")
+    return report
+
+
 # ------------------------------------------------------------
 # ✅ MAIN EXPORTER
 # ------------------------------------------------------------
 def export_all(best_dir="threads_analysis/models/output/best",
-               output_onnx="threads_analysis/models/output/onnx"):
+               output_onnx="threads_analysis/models/output/onnx",
+               eval_set="threads_analysis/models/output/evaluation_set.jsonl",
+               variants: bool = True, sample_size: int = 1000, cos_threshold: float = 0.99,
+               max_f1_drop: float = 0.01, threads: int = 0):
 
     print(f"[INFO] Exporting ONNX from best models in: {best_dir}")
 
     os.makedirs(output_onnx, exist_ok=True)
+    report = {"created_at": time.strftime("%Y-%m-%dT%H:%M:%S"), "eval_set": eval_set,
+              "cos_threshold": cos_threshold, "max_f1_drop": max_f1_drop, "models": {}}
+    rows = load_eval_sample(eval_set, sample_size) if variants else []
 
     # ------------------------------------------------------------
-    # ✅ BI-ENCODER A
+    # ✅ BI-ENCODERS A / B
     # ------------------------------------------------------------
-    bi_a_dir = os.path.join(best_dir, "bi_encoder_A")
-    if os.path.exists(bi_a_dir):
-        out_a = os.path.join(output_onnx, "bi_encoder_A")
-        emb_dim_a = export_sentence_transformer(bi_a_dir, out_a)
+    for sub, mlp_subdir in (("bi_encoder_A", MLP_SUBDIRS["bi_a"]), ("bi_encoder_B", MLP_SUBDIRS["bi_b"])):
+        bi_dir = os.path.join(best_dir, sub)
+        if not os.path.exists(bi_dir):
+            continue
+        out = os.path.join(output_onnx, sub)
+        emb_dim = export_sentence_transformer(bi_dir, out)
 
         # Load MLP for this bi-encoder
-        mlp_path = os.path.join(bi_a_dir, "mlp_on_sentence_transformers", "mlp_model.pth")
+        mlp_path = os.path.join(bi_dir, mlp_subdir, "mlp_model.pth")
         if os.path.exists(mlp_path):
-            export_mlp(mlp_path, input_dim=emb_dim_a*4 + 9, output_dir=out_a)
+            export_mlp(mlp_path, input_dim=emb_dim*4 + N_EXTRA_FEATURES, output_dir=out)
         else:
-            print("[WARN] MLP for bi-encoder A not found.")
-
-    # ------------------------------------------------------------
-    # ✅ BI-ENCODER B
-    # ------------------------------------------------------------
-    bi_b_dir = os.path.join(best_dir, "bi_encoder_B")
-    if os.path.exists(bi_b_dir):
-        out_b = os.path.join(output_onnx, "bi_encoder_B")
-        emb_dim_b = export_sentence_transformer(bi_b_dir, out_b)
+            print(f"[WARN] MLP for {sub} not found.")
 
-        # Load MLP for this bi-encoder
-        mlp_path = os.path.join(bi_b_dir, "mlp_on_sentence_transformers", "mlp_model.pth")
-        if os.path.exists(mlp_path):
-            export_mlp(mlp_path, input_dim=emb_dim_b*4 + 9, output_dir=out_b)
-        else:
-            print("[WARN] MLP for bi-encoder B not found.")
+        if variants:
+            build_variants(os.path.join(out, "model.onnx"), model_dir=bi_dir, transformer=True)
+            if os.path.exists(os.path.join(out, "mlp.onnx")):
+                build_variants(os.path.join(out, "mlp.onnx"), transformer=False)
+            report["models"][sub] = report_bi_encoder(out, bi_dir, rows, cos_threshold, max_f1_drop, threads)
 
     # ------------------------------------------------------------
     # ✅ CROSS-ENCODER
@@ -204,10 +502,31 @@ def export_all(best_dir="threads_analysis/models/output/best",
     if os.path.exists(cross_dir):
         out_c = os.path.join(output_onnx, "cross_encoder")
         export_cross_encoder(cross_dir, out_c)
+        if variants:
+            build_variants(os.path.join(out_c, "model.onnx"), model_dir=cross_dir, transformer=True)
+            report["models"]["cross_encoder"] = report_cross_encoder(out_c, cross_dir, rows, max_f1_drop, threads)
     else:
         print("[WARN] Cross-encoder best fold not found.")
 
+    # ------------------------------------------------------------
+    # ✅ STUDENT (distillation.py): encoder chico + MLP destilado
+    # ------------------------------------------------------------
+    student_dir = os.path.join(best_dir, "student")
+    if os.path.exists(os.path.join(student_dir, "student_config.json")):
+        from threads_analysis.models.distillation import export_student
+        out_s = os.path.join(output_onnx, "student")
+        export_student(student_dir, out_s)
+        if variants:
+            build_variants(os.path.join(out_s, "mlp.onnx"), transformer=False)
+
+    if variants:
+        report_path = os.path.join(output_onnx, "variants_report.json")
+        with open(report_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"[INFO] Variants report → {report_path}")
+
     print(f"[DONE] ✅ ONNX export completed. Saved in: {output_onnx}")
+    return report
 
 
 # CLI
@@ -218,6 +537,15 @@ if __name__ == "__main__":
                         default="threads_analysis/models/output/best")
     parser.add_argument("--out", type=str,
                         default="threads_analysis/models/output/onnx")
+    parser.add_argument("--eval-set", type=str,
+                        default="threads_analysis/models/output/evaluation_set.jsonl")
+    parser.add_argument("--no-variants", action="store_true", help="Solo exportar fp32 (sin opt/int8 ni reporte)")
+    parser.add_argument("--sample-size", type=int, default=1000, help="Pares de evaluation_set para la paridad")
+    parser.add_argument("--cos-threshold", type=float, default=0.99)
+    parser.add_argument("--max-f1-drop", type=float, default=0.01)
+    parser.add_argument("--threads", type=int, default=0, help="intra_op_num_threads de ORT en el benchmark")
     args = parser.parse_args()
 
-    export_all(best_dir=args.best_dir, output_onnx=args.out)
+    export_all(best_dir=args.best_dir, output_onnx=args.out, eval_set=args.eval_set,
+               variants=not args.no_variants, sample_size=args.sample_size,
+               cos_threshold=args.cos_threshold, max_f1_drop=args.max_f1_drop, threads=args.threads)
@@ -0,0 +1,124 @@
+"""
+threads_analysis/models/pair_features.py
+
+Features léxicas/estructurales de un par de mensajes, sin dependencias pesadas
+(solo re/difflib): las usan dataset_builder.py al construir el dataset y el runtime
+de inferencia (threads_analysis.inference) al puntuar pares en vivo.
+"""
+
+from __future__ import annotations
+import re
+from difflib import SequenceMatcher
+from typing import Dict, Any, Iterable, List, Optional
+
+# emoji regex covering common ranges
+EMOJI_RE = re.compile(
+    '['
+    '\U0001F300-\U0001F5FF'  # symbols & pictographs
+    '\U0001F600-\U0001F64F'  # emoticons
+    '\U0001F680-\U0001F6FF'  # transport & map symbols
+    '\U0001F700-\U0001F77F'  # alchemical symbols
+    '\U0001F780-\U0001F7FF'  # Geometric Shapes Extended
+    '\U0001F800-\U0001F8FF'  # Supplemental Arrows-C
+    '\U0001F900-\U0001F9FF'  # Supplemental Symbols and Pictographs
+    '\U0001FA00-\U0001FA6F'  # Chess etc
+    '\U00002702-\U000027B0'  # Dingbats
+    '\U000024C2-\U0001F251'
+    ']+', flags=re.UNICODE
+)
+
+URL_RE = re.compile(r'https?://\S+|www\.\S+', re.IGNORECASE)
+
+# ---------------- Helpers ----------------
+def _parse_iso(ts: str):
+    from datetime import datetime
+    if not ts:
+        return None
+    try:
+        return datetime.fromisoformat(ts.replace('Z', '+00:00'))
+    except Exception:
+        try:
+            return datetime.fromisoformat(ts)
+        except Exception:
+            return None
+
+def _compute_time_delta_min(t1: str, t2: str) -> float:
+    dt1 = _parse_iso(t1)
+    dt2 = _parse_iso(t2)
+    if not dt1 or not dt2:
+        return 1e6
+    return abs((dt2 - dt1).total_seconds()) / 60.0
+
+# ---------------- Feature extraction utilities ----------------
+def count_emojis(text: str) -> int:
+    if not text:
+        return 0
+    return len(EMOJI_RE.findall(text))
+
+def has_url(text: str) -> bool:
+    if not text:
+        return False
+    return bool(URL_RE.search(text))
+
+def is_all_caps(text: str) -> bool:
+    if not text:
+        return False
+    letters = [c for c in text if c.isalpha()]
+    if not letters:
+        return False
+    return all(c.isupper() for c in letters)
+
+def seq_similarity(a: str, b: str) -> float:
+    if not a or not b:
+        return 0.0
+    return SequenceMatcher(None, a, b).ratio()
+
+
+TOKEN_RE = re.compile(r'\w+')
+
+# Orden de las características extra tal como las consume el MLP
+EXTRA_FEATURE_ORDER = [
+    ('len_a', 0), ('len_b', 0), ('tfidf_jaccard', 0.0), ('seq_ratio', 0.0),
+    ('emoji_diff', 0), ('both_have_url', 0), ('both_all_caps', 0),
+    ('time_delta_min', 1e6), ('same_author', 0)
+]
+
+
+def extras_vector(extras: Dict[str, Any]) -> List[float]:
+    """Características extra en el orden esperado por el MLP"""
+    return [float(extras.get(key, default)) for key, default in EXTRA_FEATURE_ORDER]
+
+
+def token_jaccard(a: str, b: str, vocab: Optional[Iterable[str]] = None) -> float:
+    """
+    Jaccard sobre los tokens (\\w+, minúsculas) de ambos textos, restringidos al vocabulario
+    TF-IDF si se da: equivale al tfidf_jaccard del dataset (términos non-zero de cada fila).
+    """
+    set_a = set(TOKEN_RE.findall((a or "").lower()))
+    set_b = set(TOKEN_RE.findall((b or "").lower()))
+    if vocab is not None:
+        if not isinstance(vocab, (set, frozenset)):
+            vocab = frozenset(vocab)
+        set_a &= vocab
+        set_b &= vocab
+    if not set_a and not set_b:
+        return 1.0
+    union = len(set_a | set_b)
+    return float(len(set_a & set_b)) / float(union) if union else 0.0
+
+
+def pair_extra_features(a: Dict[str, Any], b: Dict[str, Any], vocab: Optional[set] = None) -> Dict[str, Any]:
+    """features_extra + time_delta_min + same_author para un par (a = padre candidato, b = mensaje)"""
+    a_text = a.get('text') or ""
+    b_text = b.get('text') or ""
+    return {
+        'len_a': len(a_text),
+        'len_b': len(b_text),
+        'tfidf_jaccard': token_jaccard(a_text, b_text, vocab),
+        'seq_ratio': float(seq_similarity(a_text, b_text)),
+        'emoji_diff': abs(count_emojis(a_text) - count_emojis(b_text)),
+        'both_have_url': int(has_url(a_text) and has_url(b_text)),
+        'both_all_caps': int(is_all_caps(a_text) and is_all_caps(b_text)),
+        'time_delta_min': _compute_time_delta_min(a.get('date'), b.get('date')),
+        'same_author': int(a.get('sender_id') == b.get('sender_id'))
+    }
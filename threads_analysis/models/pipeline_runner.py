@@ -1,27 +1,45 @@
 """
 pipeline_runner.py
-Ejecuta TODO el pipeline de principio a fin:
+Ejecuta TODO el pipeline de principio a fin, en un solo proceso:
 
 1. Construcción de dataset + hard negatives
-2. Entrenamiento de los tres modelos (K-fold):
-   - bi-encoder A (MiniLM)
-   - bi-encoder B (MPNet)
+2. Entrenamiento de los tres modelos (K-fold) + selección del mejor fold + student destilado:
+   - bi-encoder A (MPNet multilingüe)
+   - bi-encoder B (MiniLM)
    - cross-encoder (MiniLM-cross)
-3. Selección del mejor fold por F1
-4. Exportación ONNX para cada modelo
-5. Evaluación final:
+3. Exportación ONNX de los mejores modelos (output/best)
+4. Evaluación final:
    - heurísticas
    - bi-encoder A
    - bi-encoder B
    - cross-encoder
+
+Las etapas forman un DAG: cada una declara sus entradas y salidas (archivos o directorios) y
+se identifica por el hash de CONTENIDO de sus entradas + sus parámetros. Si coinciden con la
+última ejecución exitosa y sus salidas siguen intactas, la etapa se salta (estado en
+output/.pipeline/state.json). Todo corre en este proceso: torch / transformers se importan una
+vez y los encoders y el cross-encoder ya cargados se comparten entre etapas
+(feature_store.shared_sentence_transformer, model_trainer.load_cross_encoder).
+
+Cada ejecución escribe output/pipeline_report.json (y una copia en output/.pipeline/runs/) con,
+por etapa: estado (ran / skipped / failed), tiempo de pared y pico de RSS.
+
+Uso:
+python -m threads_analysis.models.pipeline_runner --train-chats threads_analysis_results/train_chats
+python -m threads_analysis.models.pipeline_runner --force evaluate   # rehace solo la evaluación
 """
 
 import argparse
-import subprocess
-import sys
+import datetime
+import hashlib
+import json
 import os
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
 from pathlib import Path
-from time import sleep
+from typing import Any, Callable, Dict, List, Optional
 
 # -------- Colored logs ----------
 class Colors:
@@ -44,31 +62,6 @@ def log_err(msg):
     print(f"{Colors.ERR}[ERR]{Colors.END} {msg}", flush=True)
 
 
-# -------- Runner helper ----------
-def run(cmd: list):
-    log_info(f"Ejecutando comando: {' '.join(cmd)}")
-    result = subprocess.run(cmd, stdout=sys.stdout, stderr=sys.stderr)
-    if result.returncode != 0:
-        log_err(f"Fallo ejecutando: {' '.join(cmd)}")
-        raise SystemExit(result.returncode)
-
-
-# -------- Auto detect input_dim --------
-def auto_input_dim(model_name):
-    """
-    Obtiene input_dim basado en el bi-encoder elegido.
-    """
-    from sentence_transformers import SentenceTransformer
-    model = SentenceTransformer(model_name)
-    emb_dim = model.get_sentence_embedding_dimension()
-
-    # 4 concatenaciones + 2 features adicionales
-    input_dim = 4 * emb_dim + 2
-
-    log_info(f"Detectado emb_dim={emb_dim}, input_dim={input_dim}")
-    return input_dim
-
-
 # -------- Global progress bar -------
 def progress_bar(step, total):
     bar_len = 40
@@ -79,6 +72,312 @@ def progress_bar(step, total):
         print("\n")
 
 
+# ===============================================================
+# ===================== Hash de contenido ========================
+# ===============================================================
+class ContentHasher:
+    """
+    sha1 del contenido de archivos y directorios. Los hashes por archivo se recuerdan por
+    (ruta, tamaño, mtime) en un JSON, así los artefactos grandes (pairs, pesos) no se releen
+    si no cambiaron.
+    """
+
+    def __init__(self, cache_path: str):
+        self.cache_path = cache_path
+        self.cache: Dict[str, Dict[str, Any]] = {}
+        if os.path.exists(cache_path):
+            try:
+                with open(cache_path, "r", encoding="utf-8") as f:
+                    self.cache = json.load(f)
+            except Exception:
+                self.cache = {}
+
+    def file_hash(self, path: str) -> str:
+        st = os.stat(path)
+        key = os.path.abspath(path)
+        entry = self.cache.get(key)
+        if entry and entry["size"] == st.st_size and entry["mtime_ns"] == st.st_mtime_ns:
+            return entry["sha1"]
+        h = hashlib.sha1()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        self.cache[key] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha1": h.hexdigest()}
+        return h.hexdigest()
+
+    def path_hash(self, path: str) -> Optional[str]:
+        """Hash de un archivo o de un directorio (rutas relativas + contenido); None si no existe"""
+        if os.path.isfile(path):
+            return self.file_hash(path)
+        if not os.path.isdir(path):
+            return None
+        h = hashlib.sha1()
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                full = os.path.join(root, name)
+                h.update(os.path.relpath(full, path).replace("\\", "/").encode("utf-8"))
+                h.update(self.file_hash(full).encode("ascii"))
+        return h.hexdigest()
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+        tmp = self.cache_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.cache, f)
+        os.replace(tmp, self.cache_path)
+
+
+# ===============================================================
+# ======================== Memoria (RSS) =========================
+# ===============================================================
+def current_rss_mb() -> float:
+    """RSS actual del proceso (MB): /proc en Linux, psutil si está, ru_maxrss como último recurso"""
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / 2**20
+    except Exception:
+        pass
+    return max_rss_mb()
+
+
+def max_rss_mb(children: bool = False) -> float:
+    """Pico de RSS de todo el proceso (o de sus hijos ya terminados) según getrusage"""
+    try:
+        import resource
+    except ImportError:
+        return 0.0
+    who = resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF
+    peak = resource.getrusage(who).ru_maxrss
+    # Linux reporta KB, macOS bytes
+    return peak / 2**20 if sys.platform == "darwin" else peak / 1024.0
+
+
+class PeakRSSMonitor:
+    """Muestrea el RSS en un hilo mientras corre una etapa para obtener SU pico (no el del proceso)"""
+
+    def __init__(self, interval: float = 0.2):
+        self.interval = interval
+        self.start_mb = 0.0
+        self.peak_mb = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            self.peak_mb = max(self.peak_mb, current_rss_mb())
+
+    def __enter__(self):
+        self.start_mb = self.peak_mb = current_rss_mb()
+        self._thread = threading.Thread(target=self._loop, name="rss-monitor", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.end_mb = current_rss_mb()
+        self.peak_mb = max(self.peak_mb, self.end_mb)
+        return False
+
+
+# ===============================================================
+# ============================ DAG ===============================
+# ===============================================================
+@dataclass
+class Stage:
+    name: str
+    fn: Callable[[], Any]
+    inputs: List[str]
+    outputs: List[str]
+    params: Dict[str, Any] = field(default_factory=dict)
+    deps: List[str] = field(default_factory=list)
+    # chequeo extra de validez de las salidas (p.ej. el .meta.json del dataset)
+    validate: Optional[Callable[[], bool]] = None
+
+
+class PipelineDAG:
+    def __init__(self, state_dir: str):
+        self.state_dir = state_dir
+        self.state_path = os.path.join(state_dir, "state.json")
+        self.hasher = ContentHasher(os.path.join(state_dir, "hash_cache.json"))
+        self.stages: Dict[str, Stage] = {}
+        self.state: Dict[str, Any] = {}
+        if os.path.exists(self.state_path):
+            try:
+                with open(self.state_path, "r", encoding="utf-8") as f:
+                    self.state = json.load(f)
+            except Exception as e:
+                log_warn(f"No se pudo leer {self.state_path}: {e}")
+
+    def add(self, stage: Stage):
+        self.stages[stage.name] = stage
+
+    def order(self) -> List[Stage]:
+        """Orden topológico: dependencias explícitas + etapas que producen las entradas de otra"""
+        producers = {os.path.normpath(o): s.name for s in self.stages.values() for o in s.outputs}
+        deps = {
+            s.name: set(s.deps) | {producers[os.path.normpath(i)] for i in s.inputs
+                                   if os.path.normpath(i) in producers and producers[os.path.normpath(i)] != s.name}
+            for s in self.stages.values()
+        }
+        ordered, done = [], set()
+        while len(ordered) < len(self.stages):
+            ready = [n for n in self.stages if n not in done and deps[n] <= done]
+            if not ready:
+                raise RuntimeError(f"Ciclo en el pipeline: {sorted(set(self.stages) - done)}")
+            for n in ready:
+                ordered.append(self.stages[n])
+                done.add(n)
+        return ordered
+
+    def _hashes(self, paths: List[str]) -> Dict[str, Optional[str]]:
+        return {p: self.hasher.path_hash(p) for p in paths}
+
+    @staticmethod
+    def _params_hash(params: Dict[str, Any]) -> str:
+        return hashlib.sha1(json.dumps(params, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+    def is_fresh(self, stage: Stage, input_hashes: Dict[str, Optional[str]]) -> bool:
+        prev = self.state.get(stage.name)
+        if not prev or prev.get("inputs") != input_hashes or prev.get("params") != self._params_hash(stage.params):
+            return False
+        outputs = self._hashes(stage.outputs)
+        if any(h is None for h in outputs.values()) or prev.get("outputs") != outputs:
+            return False
+        return stage.validate() if stage.validate else True
+
+    def _save_state(self):
+        os.makedirs(self.state_dir, exist_ok=True)
+        tmp = self.state_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, self.state_path)
+        self.hasher.save()
+
+    def run(self, force: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        force = set(force or [])
+        stages = self.order()
+        report = []
+        for step, stage in enumerate(stages, 1):
+            progress_bar(step - 1, len(stages))
+            print()
+            entry = {"stage": stage.name, "started_at": datetime.datetime.now().isoformat()}
+            input_hashes = self._hashes(stage.inputs)
+            missing = [p for p, h in input_hashes.items() if h is None]
+            # lo que dependa de una etapa re-ejecutada se decide por el hash de sus entradas
+            forced = "all" in force or stage.name in force
+            if missing:
+                log_err(f"[{stage.name}] Faltan entradas: {missing}")
+                report.append({**entry, "status": "failed", "error": f"missing inputs: {missing}"})
+                break
+            if not forced and self.is_fresh(stage, input_hashes):
+                log_ok(f"[{stage.name}] Al día (mismas entradas y parámetros); se salta.")
+                report.append({**entry, "status": "skipped", "wall_seconds": 0.0})
+                continue
+
+            log_info(f"[{stage.name}] Ejecutando...")
+            t0 = time.perf_counter()
+            try:
+                with PeakRSSMonitor() as mem:
+                    result = stage.fn()
+            except (Exception, SystemExit) as e:
+                log_err(f"[{stage.name}] Falló: {e}")
+                report.append({**entry, "status": "failed", "error": str(e),
+                               "wall_seconds": time.perf_counter() - t0})
+                break
+            wall = time.perf_counter() - t0
+            output_hashes = self._hashes(stage.outputs)
+            missing_out = [p for p, h in output_hashes.items() if h is None]
+            if missing_out:
+                log_warn(f"[{stage.name}] No generó: {missing_out}")
+            self.state[stage.name] = {
+                "inputs": input_hashes, "outputs": output_hashes, "params": self._params_hash(stage.params),
+                "completed_at": datetime.datetime.now().isoformat(),
+            }
+            self._save_state()
+            report.append({
+                **entry, "status": "ran", "wall_seconds": wall,
+                "rss_start_mb": mem.start_mb, "rss_end_mb": mem.end_mb, "peak_rss_mb": mem.peak_mb,
+                "children_peak_rss_mb": max_rss_mb(children=True),
+                "result": result if isinstance(result, (dict, list, str, int, float, type(None))) else str(result),
+            })
+            log_ok(f"[{stage.name}] Completado en {wall:.1f}s (pico RSS {mem.peak_mb:.0f} MB)")
+        progress_bar(len(stages), len(stages))
+        return report
+
+
+# ===============================================================
+# ====================== Etapas del pipeline =====================
+# ===============================================================
+def build_pipeline(args, output_dir: Path) -> PipelineDAG:
+    pairs_path = str(output_dir / "pairs_with_hard_neg.jsonl")
+    summary_path = str(output_dir / "training_summary.json")
+    eval_set = str(output_dir / "evaluation_set.jsonl")
+    best_dir = str(output_dir / "best")
+    onnx_dir = str(output_dir / "onnx")
+    results_path = str(output_dir / "evaluation_results.json")
+
+    dag = PipelineDAG(str(output_dir / ".pipeline"))
+
+    # imports pesados dentro de cada etapa: una etapa saltada no paga torch/transformers
+    def dataset():
+        from threads_analysis.models.dataset_builder import build_dataset
+        return build_dataset(args.train_chats, pairs_path)
+
+    def dataset_valid():
+        from threads_analysis.models.dataset_builder import dataset_meta_valid
+        return dataset_meta_valid(pairs_path)
+
+    def train():
+        from threads_analysis.models.model_trainer import train_all_models
+        summary = train_all_models(pairs_path, output_dir=str(output_dir), n_splits=args.folds,
+                                   epochs=args.epochs, batch_size=args.batch_size, resume=args.resume,
+                                   distill=not args.no_distill)
+        return {k: len(v) for k, v in summary.items() if isinstance(v, list)}
+
+    def export():
+        from threads_analysis.models.onnx_export import export_all
+        report = export_all(best_dir=best_dir, output_onnx=onnx_dir, eval_set=eval_set)
+        return {"models": sorted(report.get("models", {}))}
+
+    def evaluate():
+        from threads_analysis.models.evaluation import run_evaluation
+        results = run_evaluation(pairs_path, str(output_dir), output=results_path)
+        return {k: {"f1": v["f1"], "auc": v["auc"]} for k, v in results.items()}
+
+    dag.add(Stage("dataset", dataset, inputs=[args.train_chats],
+                  outputs=[pairs_path, pairs_path + ".meta.json"], validate=dataset_valid))
+    dag.add(Stage("train", train, inputs=[pairs_path], outputs=[summary_path, eval_set, best_dir],
+                  params={"folds": args.folds, "epochs": args.epochs, "batch_size": args.batch_size,
+                          "distill": not args.no_distill}))
+    dag.add(Stage("export", export, inputs=[best_dir, eval_set], outputs=[onnx_dir]))
+    dag.add(Stage("evaluate", evaluate, inputs=[pairs_path, summary_path, best_dir], outputs=[results_path]))
+    return dag
+
+
+def write_run_report(output_dir: Path, report: List[Dict[str, Any]], started_at: str, wall: float) -> str:
+    run = {
+        "started_at": started_at, "wall_seconds": wall, "python": sys.version.split()[0],
+        "peak_rss_mb": max_rss_mb(), "children_peak_rss_mb": max_rss_mb(children=True),
+        "stages": report,
+    }
+    runs_dir = output_dir / ".pipeline" / "runs"
+    runs_dir.mkdir(parents=True, exist_ok=True)
+    stamp = started_at.replace(":", "").replace("-", "").split(".")[0]
+    for path in (runs_dir / f"run_{stamp}.json", output_dir / "pipeline_report.json"):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(run, f, ensure_ascii=False, indent=2, default=str)
+    return str(output_dir / "pipeline_report.json")
+
+
 # ===============================================================
 # ============================ MAIN ==============================
 # ===============================================================
@@ -90,159 +389,34 @@ def main():
     parser.add_argument("--epochs", type=int, default=10)
     parser.add_argument("--batch-size", type=int, default=32)
     parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--resume", action="store_true", help="Reanuda el entrenamiento desde units/checkpoints")
+    parser.add_argument("--no-distill", action="store_true", help="No entrenar el student destilado")
+    parser.add_argument("--force", nargs="*", default=[], metavar="STAGE",
+                        help="Rehace estas etapas (o 'all') aunque estén al día")
     args = parser.parse_args()
 
-    TOTAL_STEPS = 5
-    current_step = 0
-
     output_dir = Path(args.output_dir)
     output_dir.mkdir(parents=True, exist_ok=True)
 
-    pairs_path = str(output_dir / "pairs_with_hard_neg.jsonl")
+    started_at = datetime.datetime.now().isoformat()
+    t0 = time.perf_counter()
+    dag = build_pipeline(args, output_dir)
+    report = dag.run(force=args.force)
 
-    # ============================================================
-    # STEP 1) Build dataset (solo si no existe dataset preconstruido)
-    # ============================================================
-    current_step += 1
-    progress_bar(current_step, TOTAL_STEPS)
-
-    meta_path = Path(pairs_path + ".meta")
-    dataset_exists = Path(pairs_path).exists() and meta_path.exists()
-
-    if dataset_exists:
-        try:
-            import json
-            with open(meta_path, "r", encoding="utf-8") as f:
-                meta = json.load(f)
-
-            valid = True
-            if meta.get("version") != 2:
-                valid = False
-            if meta.get("embedding_model") != "sentence-transformers/all-mpnet-base-v2":
-                valid = False
-            if not isinstance(meta.get("chat_files"), list) or len(meta["chat_files"]) == 0:
-                valid = False
-            if "params" not in meta:
-                valid = False
-
-            if valid:
-                log_ok("Dataset detectado y válido. Se usará el dataset existente.")
-            else:
-                log_warn("Dataset existente pero meta inválido. Se reconstruirá.")
-                dataset_exists = False
-
-        except Exception as e:
-            log_warn(f"No se pudo leer el meta. Se reconstruirá. Error: {e}")
-            dataset_exists = False
-
-    if not dataset_exists:
-        log_info("Construyendo dataset desde cero...")
-        run([
-            sys.executable, "-m", "threads_analysis.models.dataset_builder",
-            "--input-dir", args.train_chats,
-            "--output", pairs_path
-        ])
-        log_ok("Dataset construido.")
-    else:
-        log_info("Saltando construcción de dataset (ya existe).")
-
-
-    # ============================================================
-    # STEP 2) Train models
-    # ============================================================
-    current_step += 1
-    progress_bar(current_step, TOTAL_STEPS)
-
-    log_info("Entrenando los modelos (model_trainer.py)...")
-
-    run([
-        sys.executable, "-m", "threads_analysis.models.model_trainer",
-        "--pairs", pairs_path,
-        "--output-dir", str(output_dir),
-        # "--epochs", str(args.epochs),
-        # "--batch-size", str(args.batch_size),
-        # "--folds", str(args.folds)
-    ])
-
-    log_ok("Modelos entrenados exitosamente.")
-
-    # ============================================================
-    # STEP 3) Export best fold to ONNX
-    # ============================================================
-    current_step += 1
-    progress_bar(current_step, TOTAL_STEPS)
-
-    log_info("Buscando el mejor fold de cada modelo...")
-
-    # -------- Load f1 summary ----------
-    summary_path = output_dir / "training_summary.json"
-    if not summary_path.exists():
-        log_err("No existe training_summary.json. Algo falló en el entrenamiento.")
-        raise SystemExit(1)
+    # soltar los modelos compartidos entre etapas (solo si alguna etapa llegó a cargarlos)
+    if "threads_analysis.models.feature_store" in sys.modules:
+        sys.modules["threads_analysis.models.feature_store"].release_shared_encoders()
+    if "threads_analysis.models.model_trainer" in sys.modules:
+        sys.modules["threads_analysis.models.model_trainer"].release_cross_encoders()
 
-    import json
-    with open(summary_path, "r", encoding="utf-8") as f:
-        summary = json.load(f)
-
-    best_fold_mini = summary["bi_encoder_A"]["best_fold"]
-    best_fold_mpnet = summary["bi_encoder_B"]["best_fold"]
-    best_fold_cross = summary["cross_encoder"]["best_fold"]
-
-    log_ok(f"Mejor fold MiniLM-bi-encoder: {best_fold_mini}")
-    log_ok(f"Mejor fold MPNet-bi-encoder: {best_fold_mpnet}")
-    log_ok(f"Mejor fold Cross-Encoder: {best_fold_cross}")
-
-    # --- Exportación ONNX de cada modelo ---
-    log_info("Exportando modelos a ONNX...")
-
-    # A) Bi-encoder A
-    run([
-        sys.executable, "-m", "threads_analysis.models.onnx_export",
-        "--model-type", "biA",
-        "--fold", str(best_fold_mini),
-        "--output-dir", str(output_dir)
-    ])
-
-    # B) Bi-encoder B
-    run([
-        sys.executable, "-m", "threads_analysis.models.onnx_export",
-        "--model-type", "biB",
-        "--fold", str(best_fold_mpnet),
-        "--output-dir", str(output_dir)
-    ])
-
-    # C) Cross-encoder
-    run([
-        sys.executable, "-m", "threads_analysis.models.onnx_export",
-        "--model-type", "cross",
-        "--fold", str(best_fold_cross),
-        "--output-dir", str(output_dir)
-    ])
-
-    log_ok("ONNX exportado para los 3 modelos.")
-
-    # ============================================================
-    # STEP 4) Evaluate models vs heuristics
-    # ============================================================
-    current_step += 1
-    progress_bar(current_step, TOTAL_STEPS)
-
-    log_info("Evaluando heurísticas y los 3 modelos...")
-
-    run([
-        sys.executable, "-m", "threads_analysis.models.evaluation",
-        "--pairs", pairs_path,
-        "--models-dir", str(output_dir)
-    ])
-
-    log_ok("Evaluación completada.")
-
-    # ============================================================
-    # DONE
-    # ============================================================
-    current_step += 1
-    progress_bar(current_step, TOTAL_STEPS)
+    report_path = write_run_report(output_dir, report, started_at, time.perf_counter() - t0)
+    log_info(f"Reporte de ejecución → {report_path}")
+    for r in report:
+        extra = f" {r.get('wall_seconds', 0):.1f}s" + (f" pico {r['peak_rss_mb']:.0f} MB" if "peak_rss_mb" in r else "")
+        print(f"  - {r['stage']}: {r['status']}{extra}")
 
+    if any(r["status"] == "failed" for r in report):
+        raise SystemExit(1)
     print(f"\n{Colors.OK}✅ Pipeline completado con éxito.{Colors.END}")
 
 
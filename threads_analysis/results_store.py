@@ -0,0 +1,216 @@
+# threads_analysis/results_store.py
+"""
+Capa de datos de los resultados del análisis de hilos.
+
+ - Índice pequeño (threads_analysis_results/index.json) con lo que necesita la pestaña de
+   resumen: conteos, metadata del chat y nombres de usuarios. Se actualiza al procesar cada
+   chat; las entradas que falten (resultados viejos) se reconstruyen una vez.
+ - ChatResultsStore: carga bajo demanda los archivos grandes de UN chat (hilos, grafo,
+   análisis, patrones, tendencias) y mantiene en memoria un número acotado de chats (LRU).
+"""
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+RESULTS_DIR = "threads_analysis_results"
+INDEX_FILENAME = "index.json"
+INDEX_VERSION = 1
+
+# sufijo del archivo -> clave en los datos del chat ('threads' es el archivo base)
+CHAT_FILES = {
+    "graph": "graph_data",
+    "analysis": "analysis_data",
+    "patterns": "patterns_data",
+    "trends": "trends_data",
+}
+
+_INDEX_LOCK = threading.Lock()
+
+
+def chat_file(output_dir: str, archivo: str, kind: str) -> str:
+    base_name = os.path.splitext(archivo)[0]
+    return os.path.join(output_dir, f"{base_name}_{kind}.json")
+
+
+def _read_json(path: str, default=None):
+    if not os.path.exists(path):
+        return default
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _mtime(path: str) -> float:
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return 0.0
+
+
+# ================================================================
+#  ÍNDICE
+# ================================================================
+
+def user_display_names(graph_data: Dict[str, Any]) -> Dict[str, str]:
+    """user_id -> nombre para mostrar, desde los nodos 'user' del grafo"""
+    names = {}
+    for node_id, node_info in graph_data.get("nodes", {}).items():
+        if node_info.get("node_type") != "user":
+            continue
+        user_id = node_id.replace("user_", "")
+        name = node_info.get("name", "")
+        username = node_info.get("username", "")
+
+        if name and username:
+            display_name = f"{name} @{username}"
+        elif name:
+            display_name = name
+        elif username:
+            display_name = f"@{username}"
+        else:
+            display_name = f"Usuario {user_id}"
+        names.setdefault(user_id, display_name)
+    return names
+
+
+def summarize_chat(graph_data: Dict[str, Any], threads_count: int, analysis_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Entrada del índice de un chat (mismo formato que 'resultados_detallados' + usuarios)"""
+    return {
+        "graph_info": {
+            "total_nodos": len(graph_data.get("nodes", {})),
+            "total_aristas": len(graph_data.get("edges", [])),
+            "metadata": graph_data.get("metadata", {}),
+        },
+        "threads_count": threads_count,
+        "analysis_summary": {
+            "total_hilos": analysis_data.get("thread_metrics", {}).get("total_threads", 0),
+            "hilo_promedio": analysis_data.get("thread_metrics", {}).get("avg_thread_length", 0),
+            "usuarios_activos": len(analysis_data.get("user_engagement", {}).get("most_active_users", [])),
+            "patrones_detectados": analysis_data.get("conversation_patterns", {}).get("total_conversation_patterns", 0),
+        },
+        "users": user_display_names(graph_data),
+    }
+
+
+def load_index(output_dir: str = RESULTS_DIR) -> Dict[str, Any]:
+    try:
+        index = _read_json(os.path.join(output_dir, INDEX_FILENAME), {})
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(index, dict) or index.get("version") != INDEX_VERSION:
+        return {}
+    return index.get("chats", {})
+
+
+def save_index(chats: Dict[str, Any], output_dir: str = RESULTS_DIR):
+    os.makedirs(output_dir, exist_ok=True)
+    path = os.path.join(output_dir, INDEX_FILENAME)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"version": INDEX_VERSION, "chats": chats}, f, ensure_ascii=False, indent=2, default=str)
+    os.replace(tmp, path)
+
+
+def update_index(archivo: str, entry: Dict[str, Any], output_dir: str = RESULTS_DIR):
+    """Agrega/actualiza la entrada de un chat (al terminar de procesarlo)"""
+    with _INDEX_LOCK:
+        chats = load_index(output_dir)
+        chats[archivo] = {**entry, "mtime": _mtime(chat_file(output_dir, archivo, "analysis"))}
+        save_index(chats, output_dir)
+
+
+def build_index_entry(archivo: str, output_dir: str = RESULTS_DIR) -> Dict[str, Any]:
+    """Reconstruye la entrada de un chat leyendo sus archivos (solo para resultados sin índice)"""
+    analysis_data = _read_json(chat_file(output_dir, archivo, "analysis"), {})
+    threads_data = _read_json(chat_file(output_dir, archivo, "threads"), {})
+    graph_data = _read_json(chat_file(output_dir, archivo, "graph"), {})
+    return summarize_chat(graph_data, len(threads_data.get("threads", {})), analysis_data)
+
+
+def load_results_index(output_dir: str = RESULTS_DIR) -> Dict[str, Any]:
+    """
+    Entradas del índice de todos los chats con *_analysis.json en output_dir.
+    Solo se leen los archivos de los chats sin entrada o con análisis más nuevo que la entrada.
+    """
+    if not os.path.isdir(output_dir):
+        return {}
+    archivos = sorted(
+        name[:-len("_analysis.json")] + ".json"
+        for name in os.listdir(output_dir) if name.endswith("_analysis.json")
+    )
+    with _INDEX_LOCK:
+        chats = load_index(output_dir)
+        stale = [a for a in archivos
+                 if a not in chats or chats[a].get("mtime", 0) < _mtime(chat_file(output_dir, a, "analysis"))]
+        for archivo in stale:
+            print(f"📖 Indexando análisis: {archivo}")
+            try:
+                chats[archivo] = {**build_index_entry(archivo, output_dir),
+                                  "mtime": _mtime(chat_file(output_dir, archivo, "analysis"))}
+            except Exception as e:
+                print(f"❌ Error indexando {archivo}: {e}")
+        removed = [a for a in chats if a not in archivos]
+        for archivo in removed:
+            del chats[archivo]
+        if stale or removed:
+            save_index(chats, output_dir)
+    return {a: chats[a] for a in archivos if a in chats}
+
+
+# ================================================================
+#  DATOS POR CHAT (BAJO DEMANDA)
+# ================================================================
+
+class ChatResultsStore:
+    """
+    Datos completos de cada chat, cargados al pedirlos y guardados en un LRU de
+    `max_chats` entradas. Seguro para usar desde un hilo de carga en segundo plano.
+    """
+
+    def __init__(self, output_dir: str = RESULTS_DIR, max_chats: int = 4):
+        self.output_dir = output_dir
+        self.max_chats = max_chats
+        self._cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_cached(self, archivo: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            data = self._cache.get(archivo)
+            if data is not None:
+                self._cache.move_to_end(archivo)
+            return data
+
+    def load(self, archivo: str) -> Optional[Dict[str, Any]]:
+        """
+        Datos del chat: el contenido de *_threads.json más 'graph_data', 'analysis_data',
+        'patterns_data' y 'trends_data' ({} si falta el archivo) y 'users' (id -> nombre).
+        None si no hay hilos.
+        """
+        data = self.get_cached(archivo)
+        if data is not None:
+            return data
+
+        threads_file = chat_file(self.output_dir, archivo, "threads")
+        if not os.path.exists(threads_file):
+            print(f"Archivo no encontrado: {threads_file}")
+            return None
+        try:
+            data = _read_json(threads_file, {})
+            for kind, key in CHAT_FILES.items():
+                data[key] = _read_json(chat_file(self.output_dir, archivo, kind), {})
+            data["users"] = user_display_names(data["graph_data"])
+        except Exception as e:
+            print(f"Error cargando {threads_file}: {e}")
+            return None
+
+        with self._lock:
+            self._cache[archivo] = data
+            self._cache.move_to_end(archivo)
+            while len(self._cache) > self.max_chats:
+                self._cache.popitem(last=False)
+        return data
+
+    def __contains__(self, archivo: str) -> bool:
+        with self._lock:
+            return archivo in self._cache
@@ -27,6 +27,7 @@ from telegram.async_worker import AsyncWorker
 from telegram.alarm_manager import AlarmManager
 from config.settings import API_ID, API_HASH, SESSION_NAME
 from ui.threads_results_view import ThreadsAnalysisResults
+from threads_analysis.results_store import load_results_index
 from ui.dialogs import DateRangeDialog, MediaSelectionDialog
 from ui.alarm_configuration_dialog import AlarmConfigurationDialog
 
@@ -942,11 +943,10 @@ class TelegramApp(QWidget):
             # Habilitar botones
             self.set_analysis_buttons_enabled(True)
             
-            # Buscar todos los archivos de análisis en threads_analysis_results/
-            import glob
-            analysis_files = glob.glob("threads_analysis_results/*_analysis.json")
+            # Resumen de cada chat desde el índice (los archivos grandes se cargan bajo demanda)
+            resultados = load_results_index()
             
-            if not analysis_files:
+            if not resultados:
                 QMessageBox.warning(
                     self, 
                     "Análisis Completo", 
@@ -954,64 +954,15 @@ class TelegramApp(QWidget):
                 )
                 return
             
-            print(f"📊 Encontrados {len(analysis_files)} archivos de análisis")
+            print(f"📊 Encontrados {len(resultados)} archivos de análisis")
             
-            # Construir resultados leyendo los archivos existentes
             results = {
-                "archivos_procesados": len(analysis_files),
-                "archivos_totales": len(analysis_files),
-                "resultados_detallados": {},
+                "archivos_procesados": len(resultados),
+                "archivos_totales": len(resultados),
+                "resultados_detallados": resultados,
                 "timestamp": datetime.now(timezone.utc).isoformat()
             }
             
-            for analysis_file in analysis_files:
-                try:
-                    # Obtener el nombre base del archivo (sin _analysis.json)
-                    base_name = os.path.basename(analysis_file).replace('_analysis.json', '')
-                    print(f"📖 Leyendo análisis: {base_name}")
-                    
-                    # Cargar archivo de análisis
-                    with open(analysis_file, 'r', encoding='utf-8') as f:
-                        analysis_data = json.load(f)
-                    
-                    # Cargar archivo de hilos para contar hilos
-                    threads_file = analysis_file.replace('_analysis.json', '_threads.json')
-                    threads_count = 0
-                    if os.path.exists(threads_file):
-                        with open(threads_file, 'r', encoding='utf-8') as f:
-                            threads_data = json.load(f)
-                            threads_count = len(threads_data.get('threads', {}))
-                    
-                    # Cargar archivo de grafo para obtener metadata
-                    graph_file = analysis_file.replace('_analysis.json', '_graph.json')
-                    graph_info = {}
-                    if os.path.exists(graph_file):
-                        with open(graph_file, 'r', encoding='utf-8') as f:
-                            graph_data = json.load(f)
-                            graph_info = {
-                                'total_nodos': len(graph_data.get('nodes', {})),
-                                'total_aristas': len(graph_data.get('edges', [])),
-                                'metadata': graph_data.get('metadata', {})
-                            }
-                    
-                    # Construir resultado para este archivo
-                    results["resultados_detallados"][f"{base_name}.json"] = {
-                        "graph_info": graph_info,
-                        "threads_count": threads_count,
-                        "analysis_summary": {
-                            "total_hilos": analysis_data.get('thread_metrics', {}).get('total_threads', 0),
-                            "hilo_promedio": analysis_data.get('thread_metrics', {}).get('avg_thread_length', 0),
-                            "usuarios_activos": len(analysis_data.get('user_engagement', {}).get('most_active_users', [])),
-                            "patrones_detectados": analysis_data.get('conversation_patterns', {}).get('total_conversation_patterns', 0)
-                        }
-                    }
-                    
-                    print(f"✅ Procesado: {base_name} - {threads_count} hilos")
-                    
-                except Exception as e:
-                    print(f"❌ Error procesando {analysis_file}: {e}")
-                    continue
-            
             # Mostrar la ventana de resultados
             print("🪟 Abriendo ventana de resultados...")
             try:
@@ -1185,11 +1136,10 @@ class TelegramApp(QWidget):
         """Cargar análisis de hilos existentes sin procesar chats nuevos"""
         print("🧵 Cargando análisis de hilos existentes...")
         
-        # Buscar todos los archivos de análisis en threads_analysis_results/
-        import glob
-        analysis_files = glob.glob("threads_analysis_results/*_analysis.json")
+        # Resumen de cada chat desde el índice (los archivos grandes se cargan bajo demanda)
+        resultados = load_results_index()
         
-        if not analysis_files:
+        if not resultados:
             QMessageBox.warning(
                 self, 
                 "Análisis Completo", 
@@ -1197,13 +1147,12 @@ class TelegramApp(QWidget):
             )
             return
         
-        print(f"📊 Encontrados {len(analysis_files)} archivos de análisis")
+        print(f"📊 Encontrados {len(resultados)} archivos de análisis")
         
-        # Construir resultados leyendo los archivos existentes
         results = {
-            "archivos_procesados": len(analysis_files),
-            "archivos_totales": len(analysis_files),
-            "resultados_detallados": {},
+            "archivos_procesados": len(resultados),
+            "archivos_totales": len(resultados),
+            "resultados_detallados": resultados,
             "timestamp": datetime.now(timezone.utc).isoformat()
         }
         
@@ -1235,54 +1184,6 @@ class TelegramApp(QWidget):
         # Agregar el resumen a los resultados
         results["resumen_sentimientos"] = summary
         
-        for analysis_file in analysis_files:
-            try:
-                # Obtener el nombre base del archivo (sin _analysis.json)
-                base_name = os.path.basename(analysis_file).replace('_analysis.json', '')
-                print(f"📖 Leyendo análisis: {base_name}")
-                
-                # Cargar archivo de análisis
-                with open(analysis_file, 'r', encoding='utf-8') as f:
-                    analysis_data = json.load(f)
-                
-                # Cargar archivo de hilos para contar hilos
-                threads_file = analysis_file.replace('_analysis.json', '_threads.json')
-                threads_count = 0
-                if os.path.exists(threads_file):
-                    with open(threads_file, 'r', encoding='utf-8') as f:
-                        threads_data = json.load(f)
-                        threads_count = len(threads_data.get('threads', {}))
-                
-                # Cargar archivo de grafo para obtener metadata
-                graph_file = analysis_file.replace('_analysis.json', '_graph.json')
-                graph_info = {}
-                if os.path.exists(graph_file):
-                    with open(graph_file, 'r', encoding='utf-8') as f:
-                        graph_data = json.load(f)
-                        graph_info = {
-                            'total_nodos': len(graph_data.get('nodes', {})),
-                            'total_aristas': len(graph_data.get('edges', [])),
-                            'metadata': graph_data.get('metadata', {})
-                        }
-                
-                # Construir resultado para este archivo
-                results["resultados_detallados"][f"{base_name}.json"] = {
-                    "graph_info": graph_info,
-                    "threads_count": threads_count,
-                    "analysis_summary": {
-                        "total_hilos": analysis_data.get('thread_metrics', {}).get('total_threads', 0),
-                        "hilo_promedio": analysis_data.get('thread_metrics', {}).get('avg_thread_length', 0),
-                        "usuarios_activos": len(analysis_data.get('user_engagement', {}).get('most_active_users', [])),
-                        "patrones_detectados": analysis_data.get('conversation_patterns', {}).get('total_conversation_patterns', 0)
-                    }
-                }
-                
-                print(f"✅ Procesado: {base_name} - {threads_count} hilos")
-                
-            except Exception as e:
-                print(f"❌ Error procesando {analysis_file}: {e}")
-                continue
-        
         # Mostrar la ventana de resultados
         print("🪟 Abriendo ventana de resultados...")
         try:
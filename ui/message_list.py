@@ -0,0 +1,244 @@
+"""
+Lista virtualizada de mensajes para la pestaña de Hilos.
+
+Un QListView + QAbstractListModel con un delegate que pinta las burbujas: solo se
+dibujan las filas visibles y no se crea ningún widget por mensaje. Las alturas se
+calculan con QFontMetrics y se cachean en cada fila para el ancho actual de la vista.
+"""
+from datetime import datetime
+
+from PyQt6.QtWidgets import QListView, QStyledItemDelegate, QAbstractItemView, QApplication, QMenu
+from PyQt6.QtGui import QColor, QFont, QFontMetrics, QPainter, QPainterPath, QPen
+from PyQt6.QtCore import Qt, QAbstractListModel, QModelIndex, QRect, QRectF, QSize
+
+SYSTEM_COLOR = "#fff9c4"
+SYSTEM_BORDER = "#ffd54f"
+BUBBLE_BORDER = "#c8c8c8"
+MAX_BUBBLE_WIDTH = 500
+ROW_MARGIN_X, ROW_MARGIN_Y = 10, 5
+PAD_X, PAD_Y = 16, 12
+HEADER_SPACING = 4
+
+MessageRole = Qt.ItemDataRole.UserRole
+
+
+def parse_timestamp(ts):
+    """datetime del timestamp (ISO o '%Y-%m-%d %H:%M:%S'); datetime.min si no se puede leer"""
+    try:
+        if "T" in ts:
+            if ts.endswith("Z"):
+                return datetime.fromisoformat(ts.replace("Z", "+00:00"))
+            return datetime.fromisoformat(ts)
+        return datetime.strptime(ts, "%Y-%m-%d %H:%M:%S")
+    except Exception:
+        return datetime.min
+
+
+def prepare_messages(messages):
+    """
+    Filtra los mensajes vacíos y los ordena por fecha, parseando cada timestamp una sola
+    vez. Devuelve dicts con 'user_id', 'text', 'time' (texto a mostrar) y 'sort_key'.
+    """
+    prepared = []
+    for msg in messages:
+        text = (msg.get("text") or "").strip()
+        if len(text) <= 1:
+            continue
+        ts = msg.get("timestamp", "") or ""
+        dt = parse_timestamp(ts) if isinstance(ts, str) else datetime.min
+        if "T" in str(ts) and dt is not datetime.min:
+            time_display = dt.strftime("%H:%M • %d/%m")
+        else:
+            time_display = ts
+        prepared.append({
+            "user_id": msg.get("user_id", "Sistema"),
+            "text": text,
+            "time": time_display,
+            # Fechas con y sin zona horaria no se comparan: se ordena por timestamp POSIX
+            "sort_key": _sort_key(dt),
+        })
+    prepared.sort(key=lambda m: m["sort_key"])
+    return prepared
+
+
+def _sort_key(dt):
+    if dt is datetime.min:
+        return float("-inf")
+    try:
+        return dt.timestamp()
+    except (OverflowError, OSError, ValueError):
+        return float("-inf")
+
+
+class MessageListModel(QAbstractListModel):
+    """
+    Filas ya preparadas para pintar: dicts con 'user', 'text', 'time', 'color',
+    'alignment' ('left' / 'right' / 'center') e 'is_system'.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.rows = []
+
+    def set_rows(self, rows):
+        self.beginResetModel()
+        self.rows = rows
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        row = self.rows[index.row()]
+        if role == MessageRole:
+            return row
+        if role == Qt.ItemDataRole.DisplayRole:
+            return row["text"]
+        return None
+
+
+class MessageBubbleDelegate(QStyledItemDelegate):
+    """Pinta cada mensaje como una burbuja (mismo estilo que las burbujas de widgets anteriores)"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.text_font = QFont()
+        self.text_font.setPixelSize(14)
+        self.user_font = QFont()
+        self.user_font.setPixelSize(12)
+        self.user_font.setBold(True)
+        self.time_font = QFont()
+        self.time_font.setPixelSize(10)
+        self.text_metrics = QFontMetrics(self.text_font)
+        self.user_metrics = QFontMetrics(self.user_font)
+        self.time_metrics = QFontMetrics(self.time_font)
+
+    def _bubble_layout(self, row, view_width):
+        """(ancho de la burbuja, alto del texto), cacheado en la fila para ese ancho de vista"""
+        cached = row.get("_layout")
+        if cached is not None and cached[0] == view_width:
+            return cached[1]
+
+        max_width = max(120, min(MAX_BUBBLE_WIDTH, int(view_width * 0.8)) - 2 * PAD_X)
+        flags = int(Qt.TextFlag.TextWordWrap)
+        text_rect = self.text_metrics.boundingRect(QRect(0, 0, max_width, 100000), flags, row["text"])
+        content_width = text_rect.width()
+        if not row["is_system"]:
+            header_width = (self.user_metrics.horizontalAdvance(row["user"]) + 20
+                            + self.time_metrics.horizontalAdvance(row["time"]))
+            content_width = max(content_width, min(header_width, max_width))
+        result = (content_width + 2 * PAD_X, text_rect.height())
+        row["_layout"] = (view_width, result)
+        return result
+
+    def _header_height(self, row):
+        if row["is_system"]:
+            return 0
+        return max(self.user_metrics.height(), self.time_metrics.height()) + HEADER_SPACING
+
+    def sizeHint(self, option, index):
+        row = index.data(MessageRole)
+        view = self.parent()
+        view_width = view.viewport().width() if view is not None else option.rect.width()
+        view_width = view_width or MAX_BUBBLE_WIDTH
+        _, text_height = self._bubble_layout(row, view_width)
+        height = self._header_height(row) + text_height + 2 * PAD_Y + 2 * ROW_MARGIN_Y
+        return QSize(view_width, height)
+
+    def paint(self, painter, option, index):
+        row = index.data(MessageRole)
+        rect = option.rect
+        view = self.parent()
+        view_width = (view.viewport().width() if view is not None else rect.width()) or MAX_BUBBLE_WIDTH
+        bubble_width, text_height = self._bubble_layout(row, view_width)
+        bubble_height = self._header_height(row) + text_height + 2 * PAD_Y
+
+        if row["alignment"] == "right":
+            x = rect.right() - ROW_MARGIN_X - bubble_width
+        elif row["alignment"] == "center":
+            x = rect.left() + (rect.width() - bubble_width) // 2
+        else:
+            x = rect.left() + ROW_MARGIN_X
+        bubble = QRectF(x, rect.top() + ROW_MARGIN_Y, bubble_width, bubble_height)
+
+        painter.save()
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        painter.setPen(QPen(QColor(SYSTEM_BORDER if row["is_system"] else BUBBLE_BORDER), 1))
+        painter.setBrush(QColor(SYSTEM_COLOR if row["is_system"] else row["color"]))
+        painter.drawPath(self._bubble_path(bubble, row["alignment"], row["is_system"]))
+
+        inner = bubble.adjusted(PAD_X, PAD_Y, -PAD_X, -PAD_Y)
+        top = inner.top()
+        if not row["is_system"]:
+            header_height = self._header_height(row) - HEADER_SPACING
+            header = QRectF(inner.left(), top, inner.width(), header_height)
+            painter.setFont(self.user_font)
+            painter.setPen(QColor("#1b4d6b"))
+            painter.drawText(header, int(Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter), row["user"])
+            painter.setFont(self.time_font)
+            painter.setPen(QColor("#666666"))
+            painter.drawText(header, int(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter), row["time"])
+            top += header_height + HEADER_SPACING
+
+        painter.setFont(self.text_font)
+        painter.setPen(QColor("#222222"))
+        painter.drawText(QRectF(inner.left(), top, inner.width(), text_height),
+                         int(Qt.TextFlag.TextWordWrap), row["text"])
+        painter.restore()
+
+    @staticmethod
+    def _bubble_path(rect, alignment, is_system):
+        """Rectángulo redondeado con la esquina de la 'cola' más cerrada (como los chats)"""
+        path = QPainterPath()
+        if is_system:
+            path.addRoundedRect(rect, 16, 16)
+            return path
+        radius, tail = 18.0, 4.0
+        # Esquinas: sup-izq, sup-der, inf-der, inf-izq
+        corners = (radius, radius, tail, radius) if alignment == "right" else (radius, radius, radius, tail)
+        tl, tr, br, bl = corners
+        path.moveTo(rect.left() + tl, rect.top())
+        path.lineTo(rect.right() - tr, rect.top())
+        path.quadTo(rect.right(), rect.top(), rect.right(), rect.top() + tr)
+        path.lineTo(rect.right(), rect.bottom() - br)
+        path.quadTo(rect.right(), rect.bottom(), rect.right() - br, rect.bottom())
+        path.lineTo(rect.left() + bl, rect.bottom())
+        path.quadTo(rect.left(), rect.bottom(), rect.left(), rect.bottom() - bl)
+        path.lineTo(rect.left(), rect.top() + tl)
+        path.quadTo(rect.left(), rect.top(), rect.left() + tl, rect.top())
+        return path
+
+
+class MessageListView(QListView):
+    """QListView configurado para la conversación: scroll por píxel y layout por lotes"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.message_model = MessageListModel(self)
+        self.bubble_delegate = MessageBubbleDelegate(self)
+        self.setModel(self.message_model)
+        self.setItemDelegate(self.bubble_delegate)
+
+        self.setVerticalScrollMode(QAbstractItemView.ScrollMode.ScrollPerPixel)
+        self.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
+        self.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection)
+        self.setResizeMode(QListView.ResizeMode.Adjust)
+        # Alturas calculadas por lotes: hilos enormes no bloquean al cambiar de hilo
+        self.setLayoutMode(QListView.LayoutMode.Batched)
+        self.setBatchSize(200)
+        self.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
+        self.customContextMenuRequested.connect(self._show_context_menu)
+
+    def set_rows(self, rows):
+        self.message_model.set_rows(rows)
+
+    def _show_context_menu(self, pos):
+        index = self.indexAt(pos)
+        if not index.isValid():
+            return
+        menu = QMenu(self)
+        copy_action = menu.addAction("📋 Copiar texto")
+        if menu.exec(self.viewport().mapToGlobal(pos)) == copy_action:
+            QApplication.clipboard().setText(index.data(MessageRole)["text"])
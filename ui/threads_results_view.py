@@ -1,8 +1,8 @@
 import os
 import json
 import math
+import queue
 from datetime import datetime
-import networkx as nx
 
 from PyQt6.QtWidgets import (
     QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
@@ -10,17 +10,47 @@ from PyQt6.QtWidgets import (
     QScrollArea, QComboBox, QGraphicsView, QGraphicsScene,
     QGraphicsEllipseItem, QGraphicsLineItem, QGraphicsTextItem, QTextEdit,
     QSizePolicy, QFrame, QGraphicsPolygonItem, QLineEdit, QGridLayout,
-    QGroupBox
+    QGroupBox, QGraphicsPathItem, QGraphicsItem
 )
 
 from PyQt6.QtGui import (
-    QIcon, QFont, QPen, QBrush, QColor, QPainter, QPolygonF
+    QIcon, QFont, QPen, QBrush, QColor, QPainter, QPolygonF, QPainterPath
 )
 
 from PyQt6.QtCore import (
-    Qt, QTimer, QRectF, QPointF
+    Qt, QTimer, QRectF, QPointF, QThread, pyqtSignal
 )
 
+from threads_analysis.results_store import ChatResultsStore, RESULTS_DIR
+from threads_analysis.graph_layout import get_layout
+from ui.message_list import MessageListView, prepare_messages
+
+
+class ChatDataLoader(QThread):
+    """Hilo de fondo que carga los archivos de un chat (uno a la vez, en orden de pedido)"""
+    chat_loaded = pyqtSignal(str, object)   # archivo, datos (None si no se pudo cargar)
+
+    def __init__(self, store, parent=None):
+        super().__init__(parent)
+        self.store = store
+        self._requests = queue.Queue()
+
+    def request(self, archivo):
+        self._requests.put(archivo)
+        if not self.isRunning():
+            self.start()
+
+    def stop(self):
+        self._requests.put(None)
+        self.wait()
+
+    def run(self):
+        while True:
+            archivo = self._requests.get()
+            if archivo is None:
+                break
+            self.chat_loaded.emit(archivo, self.store.load(archivo))
+
 
 class ThreadsAnalysisResults(QMainWindow):
     def __init__(self, results, parent=None):
@@ -35,7 +65,19 @@ class ThreadsAnalysisResults(QMainWindow):
         self.user_id_to_name = {}  # Mapeo de ID a nombre de usuario
         self.current_chat_index = 0
         self.current_thread_index = 0
-        self.chat_data = self.load_chat_data()
+        self.threads = {}
+        self.thread_ids = []
+        self.total_threads = 0
+        # thread_id -> filas ya preparadas de la lista de mensajes (del chat actual)
+        self._thread_rows = {}
+        
+        # Datos por chat: se cargan al seleccionarlos, en segundo plano (LRU de pocos chats)
+        self.chat_store = ChatResultsStore(RESULTS_DIR, max_chats=4)
+        self.chat_loader = ChatDataLoader(self.chat_store, self)
+        self.chat_loader.chat_loaded.connect(self.on_chat_data_loaded)
+        self._pending_chat_callbacks = {}
+        for datos in self.results.get('resultados_detallados', {}).values():
+            self.register_user_names(datos.get('users', {}))
         self.setWindowTitle("🔮 Análisis de Conversaciones - Vista de Hilos")
         self.setGeometry(100, 50, 1400, 900)
         self.setWindowIcon(QIcon("telegram_icon.png"))
@@ -376,27 +418,20 @@ class ThreadsAnalysisResults(QMainWindow):
         center_layout = QHBoxLayout(center_widget)
         center_layout.setContentsMargins(0, 0, 0, 0)
         
-        # Área de conversación
-        self.conversation_area = QScrollArea()
-        self.conversation_area.setWidgetResizable(True)
-        self.conversation_area.setMaximumWidth(800)
-        self.conversation_area.setStyleSheet("""
-            QScrollArea {
+        # Área de conversación: lista virtualizada (solo se pintan los mensajes visibles)
+        self.message_view = MessageListView()
+        self.message_view.setMaximumWidth(800)
+        self.message_view.setStyleSheet("""
+            QListView {
                 background: #e5ddd5;
                 border: none;
+                padding: 10px 10px;
             }
         """)
         
-        self.conversation_widget = QWidget()
-        self.conversation_layout = QVBoxLayout(self.conversation_widget)
-        self.conversation_layout.setSpacing(8)
-        self.conversation_layout.setContentsMargins(20, 10, 20, 10)
-        
-        self.conversation_area.setWidget(self.conversation_widget)
-        
         # Centrar el área de conversación
         center_layout.addStretch()
-        center_layout.addWidget(self.conversation_area)
+        center_layout.addWidget(self.message_view)
         center_layout.addStretch()
         
         layout.addWidget(control_bar)
@@ -414,164 +449,70 @@ class ThreadsAnalysisResults(QMainWindow):
 
     def load_thread(self, thread_index):
         """Carga un hilo con color único por usuario"""
-        self.clear_conversation()
-
-        if thread_index >= len(self.threads):
+        if thread_index >= len(self.thread_ids):
+            self.clear_conversation()
             return
 
-        thread_id = list(self.threads.keys())[thread_index]
-        thread = self.threads[thread_id]
-        messages = thread.get('messages', [])
+        thread_id = self.thread_ids[thread_index]
+        rows = self._thread_rows.get(thread_id)
+        if rows is None:
+            rows = self._thread_rows[thread_id] = self.build_thread_rows(self.threads[thread_id])
+        self.message_view.set_rows(rows)
 
-        # Filtrar mensajes vacíos
-        valid_messages = [
-            msg for msg in messages
-            if msg.get("text") and msg["text"].strip() and len(msg["text"].strip()) > 1
-        ]
-        messages = valid_messages
+        # Navegación
+        self.thread_info.setText(f"Hilo {thread_index + 1} de {self.total_threads}")
+        self.prev_btn.setEnabled(thread_index > 0)
+        self.next_btn.setEnabled(thread_index < self.total_threads - 1)
 
-        # Ordenar mensajes
-        def parse_timestamp(ts):
-            try:
-                if "T" in ts:
-                    if ts.endswith("Z"):
-                        return datetime.fromisoformat(ts.replace("Z", "+00:00"))
-                    return datetime.fromisoformat(ts)
-                return datetime.strptime(ts, "%Y-%m-%d %H:%M:%S")
-            except:
-                return datetime.min
+        QTimer.singleShot(0, self.scroll_to_bottom)
 
-        messages.sort(key=lambda x: parse_timestamp(x.get("timestamp", "")))
-
-        # Color único por usuario
-        user_colors = {}
-        next_color_index = 0
+    def build_thread_rows(self, thread):
+        """Filas de la lista de mensajes de un hilo (se calculan una vez por hilo)"""
+        # Filtra mensajes vacíos y ordena por fecha (cada timestamp se parsea una vez)
+        messages = prepare_messages(thread.get('messages', []))
 
         # Determinar el usuario principal
         if not hasattr(self, "primary_user_id") or self.primary_user_id is None:
-            ids = [m.get("user_id") for m in messages if m.get("user_id") not in ("Sistema", None)]
+            ids = [m["user_id"] for m in messages if m["user_id"] not in ("Sistema", None)]
             if ids:
                 self.primary_user_id = max(set(ids), key=ids.count)
             else:
                 self.primary_user_id = None
 
-        for i, msg in enumerate(messages):
-            user_id = msg.get("user_id", "Sistema")
+        # Color único por usuario
+        user_colors = {}
+        next_color_index = 0
+        rows = []
+        for msg in messages:
+            user_id = msg["user_id"]
 
             if user_id not in user_colors and user_id != "Sistema":
                 user_colors[user_id] = self.USER_COLORS[next_color_index % len(self.USER_COLORS)]
                 next_color_index += 1
 
-            bubble_color = user_colors.get(user_id, "#fff9c4")
-
-            # Alineación correcta
-            if user_id == "Sistema":
+            # Nombre y alineación
+            if user_id == "Sistema" or "Empresa" in str(user_id):
+                user_display = "Sistema"
+                is_system = True
                 alignment = "center"
-            elif user_id == self.primary_user_id:
-                alignment = "right"
             else:
-                alignment = "left"
-
-            self.add_message_bubble(msg, alignment, True, bubble_color)
-
-        # Navegación
-        self.thread_info.setText(f"Hilo {thread_index + 1} de {self.total_threads}")
-        self.prev_btn.setEnabled(thread_index > 0)
-        self.next_btn.setEnabled(thread_index < self.total_threads - 1)
-
-        QTimer.singleShot(100, self.scroll_to_bottom)
-
-    def add_message_bubble(self, msg, alignment, show_username=True, bubble_color="#ffffff"):
-        """Añade una burbuja con color único por usuario."""
-        user_id = msg.get("user_id", "Sistema")
-        text = msg.get("text", "Sin texto") or "Sin texto"
-        text = text.strip()
-        timestamp = msg.get("timestamp", "")
-
-        # Nombre
-        if user_id == "Sistema" or "Empresa" in str(user_id):
-            user_display = "Sistema"
-            is_system = True
-        else:
-            try: 
-                uid_int = int(user_id)
-            except: 
-                uid_int = user_id
-            user_display = self.user_id_to_name.get(uid_int, f"Usuario {user_id}")
-            is_system = False
-
-        # Widget contenedor
-        bubble_widget = QWidget()
-        bubble_layout = QHBoxLayout(bubble_widget)
-        bubble_layout.setContentsMargins(10, 5, 10, 5)
-
-        # Estilo REAL según usuario
-        if is_system:
-            style = """
-                QWidget {
-                    background: #fff9c4;
-                    border-radius: 16px;
-                    padding: 12px 18px;
-                    border: 1px solid #ffd54f;
-                    max-width: 500px;
-                }
-            """
-            alignment = "center"
-        else:
-            if alignment == "right":
-                radius = "18px 18px 4px 18px"
-            else:
-                radius = "18px 18px 18px 4px"
-
-            style = f"""
-                QWidget {{
-                    background: {bubble_color};
-                    border-radius: {radius};
-                    padding: 12px 16px;
-                    border: 1px solid #c8c8c8;
-                    max-width: 500px;
-                }}
-            """
-
-        bubble = QWidget()
-        bubble.setStyleSheet(style)
-        inner = QVBoxLayout(bubble)
-        inner.setSpacing(4)
-
-        # Header
-        if not is_system:
-            header = QHBoxLayout()
-            user_label = QLabel(f"<b>{user_display}</b>")
-            user_label.setStyleSheet("color: #1b4d6b; font-size: 12px")
-
-            time_label = QLabel(self.format_timestamp(timestamp))
-            time_label.setStyleSheet("color: #666; font-size: 10px")
-
-            header.addWidget(user_label)
-            header.addStretch()
-            header.addWidget(time_label)
-            inner.addLayout(header)
-
-        # Texto mensaje
-        t = QLabel(text)
-        t.setWordWrap(True)
-        t.setStyleSheet("color: #222; font-size: 14px;")
-        t.setTextInteractionFlags(Qt.TextInteractionFlag.TextSelectableByMouse)
-        inner.addWidget(t)
-
-        # Alineación física en el layout
-        if alignment == "center":
-            bubble_layout.addStretch()
-            bubble_layout.addWidget(bubble)
-            bubble_layout.addStretch()
-        elif alignment == "left":
-            bubble_layout.addWidget(bubble)
-            bubble_layout.addStretch()
-        else:  # right
-            bubble_layout.addStretch()
-            bubble_layout.addWidget(bubble)
-
-        self.conversation_layout.addWidget(bubble_widget)
+                try:
+                    uid_int = int(user_id)
+                except (TypeError, ValueError):
+                    uid_int = user_id
+                user_display = self.user_id_to_name.get(uid_int, f"Usuario {user_id}")
+                is_system = False
+                alignment = "right" if user_id == self.primary_user_id else "left"
+
+            rows.append({
+                "user": user_display,
+                "text": msg["text"],
+                "time": msg["time"],
+                "color": user_colors.get(user_id, "#fff9c4"),
+                "alignment": alignment,
+                "is_system": is_system,
+            })
+        return rows
 
     def load_chat_selector(self):
         """Carga la lista de chats en el selector"""
@@ -593,15 +534,30 @@ class ThreadsAnalysisResults(QMainWindow):
             self.load_chat_threads()
 
     def load_chat_threads(self):
-        """Carga los hilos del chat seleccionado"""
+        """Carga los hilos del chat seleccionado (sus archivos se leen en segundo plano)"""
         archivo = self.chat_selector.currentData()
-        if not archivo or archivo not in self.chat_data:
+        if not archivo:
             self.thread_info.setText("No hay hilos disponibles")
             return
-            
-        chat_info = self.chat_data[archivo]
+        
+        if archivo not in self.chat_store:
+            self.thread_info.setText("⏳ Cargando hilos...")
+            self.prev_btn.setEnabled(False)
+            self.next_btn.setEnabled(False)
+        self.request_chat_data(archivo, lambda chat_info, archivo=archivo: self.show_chat_threads(archivo, chat_info))
+
+    def show_chat_threads(self, archivo, chat_info):
+        """Muestra los hilos de un chat ya cargado (si sigue siendo el seleccionado)"""
+        if archivo != self.chat_selector.currentData():
+            return
+        if not chat_info:
+            self.thread_info.setText("No hay hilos disponibles")
+            return
+        
         self.threads = chat_info.get('threads', {})
-        self.total_threads = len(self.threads)
+        self.thread_ids = list(self.threads.keys())
+        self.total_threads = len(self.thread_ids)
+        self._thread_rows = {}
 
         if self.total_threads > 0:
             self.load_thread(self.current_thread_index)
@@ -611,25 +567,11 @@ class ThreadsAnalysisResults(QMainWindow):
 
     def clear_conversation(self):
         """Limpia la conversación actual"""
-        for i in reversed(range(self.conversation_layout.count())):
-            item = self.conversation_layout.itemAt(i)
-            if item.widget():
-                item.widget().deleteLater()
-
-    def format_timestamp(self, timestamp):
-        """Formatea el timestamp para mostrar"""
-        try:
-            if 'T' in timestamp:
-                dt = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
-                return dt.strftime("%H:%M • %d/%m")
-            return timestamp
-        except:
-            return timestamp
+        self.message_view.set_rows([])
 
     def scroll_to_bottom(self):
         """Desplaza al final de la conversación"""
-        scrollbar = self.conversation_area.verticalScrollBar()
-        scrollbar.setValue(scrollbar.maximum())
+        self.message_view.scrollToBottom()
 
     def previous_thread(self):
         """Navega al hilo anterior"""
@@ -692,8 +634,8 @@ class ThreadsAnalysisResults(QMainWindow):
         widget = QWidget()
         layout = QVBoxLayout(widget)
         
-        # Información del grafo reducido
-        info_label = QLabel("🔍 <b>Vista Reducida:</b> Máximo 12 nodos (mínimo 2 usuarios) mostrando relaciones principales")
+        # Información del grafo completo con nivel de detalle
+        info_label = QLabel("🔍 <b>Grafo completo:</b> al alejar, cada hilo se muestra como un círculo 🧵; acerca el zoom para ver sus mensajes")
         info_label.setStyleSheet("background: #e3f2fd; padding: 10px; border-radius: 8px; color: #1565c0;")
         info_label.setWordWrap(True)
         layout.addWidget(info_label)
@@ -819,19 +761,23 @@ class ThreadsAnalysisResults(QMainWindow):
         """Cuando se selecciona un chat para visualizar el grafo"""
         if index >= 0:
             archivo = self.graph_selector.currentData()
-            
-            if archivo not in self.chat_data:
+            if not archivo:
                 return
-                
-            chat_info = self.chat_data[archivo]
-            graph_data = chat_info.get('graph_data', {})
-            
-            # Actualizar vista visual con grafo reducido
-            self.graph_view.graph_data = graph_data
-            self.graph_view.draw_reduced_graph()
             
-            # Actualizar vista textual con grafo enriquecido
-            self.update_textual_graph_info(chat_info)
+            if archivo not in self.chat_store:
+                self.graph_info_label.setText("<div style='background: white; padding: 20px; border-radius: 10px;'><h4>⏳ Cargando grafo...</h4></div>")
+            self.request_chat_data(archivo, lambda chat_info, archivo=archivo: self.show_chat_graph(archivo, chat_info))
+
+    def show_chat_graph(self, archivo, chat_info):
+        """Dibuja el grafo de un chat ya cargado (si sigue siendo el seleccionado)"""
+        if archivo != self.graph_selector.currentData() or not chat_info:
+            return
+        
+        # Vista visual: grafo completo (layout en segundo plano, hilos agregados al alejar)
+        self.graph_view.set_graph(chat_info.get('graph_data', {}), chat_info.get('threads', {}), archivo)
+        
+        # Actualizar vista textual con grafo enriquecido
+        self.update_textual_graph_info(chat_info)
 
     def update_textual_graph_info(self, chat_info):
         """Actualiza la información textual del grafo con hasta 100 nodos y mínimo 10 usuarios"""
@@ -1262,85 +1208,46 @@ class ThreadsAnalysisResults(QMainWindow):
                 chat_name = archivo.replace('.json', '').replace('_', ' ')
             self.graph_selector.addItem(f"💬 {chat_name}", archivo)
 
-    def load_chat_data(self):
-        """Carga todos los datos de los chats procesados"""
-        chat_data = {}
+    def request_chat_data(self, archivo, callback):
+        """
+        Llama a callback(datos) con los datos completos del chat: enseguida si ya están en
+        memoria, o cuando el hilo de carga termine de leer sus archivos
+        """
+        datos = self.chat_store.get_cached(archivo)
+        if datos is not None:
+            callback(datos)
+            return
         
-        for archivo in self.results.get('resultados_detallados', {}).keys():
-            base_name = os.path.splitext(archivo)[0]
-            threads_file = f"threads_analysis_results/{base_name}_threads.json"
-            graph_file = f"threads_analysis_results/{base_name}_graph.json"
-            analysis_file = f"threads_analysis_results/{base_name}_analysis.json"
-            patterns_file = f"threads_analysis_results/{base_name}_patterns.json"  
-            trends_file = f"threads_analysis_results/{base_name}_trends.json"  
-            
-            # Cargar datos de hilos
-            if os.path.exists(threads_file):
-                try:
-                    with open(threads_file, 'r', encoding='utf-8') as f:
-                        chat_data[archivo] = json.load(f)
-                    
-                    # Cargar información de usuarios desde el grafo
-                    if os.path.exists(graph_file):
-                        with open(graph_file, 'r', encoding='utf-8') as f:
-                            graph_data = json.load(f)
-                            nodes = graph_data.get('nodes', {})
-                            
-                            chat_data[archivo]['graph_data'] = graph_data
-                            
-                            for node_id, node_info in nodes.items():
-                                if node_info.get('node_type') == 'user':
-                                    user_id = node_id.replace('user_', '')
-                                    try:
-                                        user_id_int = int(user_id)
-                                    except ValueError:
-                                        user_id_int = user_id
-                                    
-                                    name = node_info.get('name', '')
-                                    username = node_info.get('username', '')
-                                    
-                                    if name and username:
-                                        display_name = f"{name} @{username}"
-                                    elif name:
-                                        display_name = name
-                                    elif username:
-                                        display_name = f"@{username}"
-                                    else:
-                                        display_name = f"Usuario {user_id}"
-                                    
-                                    if user_id_int not in self.user_id_to_name:
-                                        self.user_id_to_name[user_id_int] = display_name
-                    
-                    # Cargar datos de análisis avanzado
-                    if os.path.exists(analysis_file):
-                        with open(analysis_file, 'r', encoding='utf-8') as f:
-                            analysis_data = json.load(f)
-                            chat_data[archivo]['analysis_data'] = analysis_data
-                    else:
-                        chat_data[archivo]['analysis_data'] = {}
-                    
-                    # NUEVO: Cargar datos de patrones
-                    if os.path.exists(patterns_file):
-                        with open(patterns_file, 'r', encoding='utf-8') as f:
-                            patterns_data = json.load(f)
-                            chat_data[archivo]['patterns_data'] = patterns_data
-                    else:
-                        chat_data[archivo]['patterns_data'] = {}
-                    
-                    # NUEVO: Cargar datos de tendencias
-                    if os.path.exists(trends_file):
-                        with open(trends_file, 'r', encoding='utf-8') as f:
-                            trends_data = json.load(f)
-                            chat_data[archivo]['trends_data'] = trends_data
-                    else:
-                        chat_data[archivo]['trends_data'] = {}
-                                                
-                except Exception as e:
-                    print(f"Error cargando {threads_file}: {e}")
-            else:
-                print(f"Archivo no encontrado: {threads_file}")
+        callbacks = self._pending_chat_callbacks.setdefault(archivo, [])
+        callbacks.append(callback)
+        if len(callbacks) == 1:
+            self.chat_loader.request(archivo)
+
+    def on_chat_data_loaded(self, archivo, datos):
+        """Recibe (en el hilo de la GUI) los datos cargados en segundo plano"""
+        callbacks = self._pending_chat_callbacks.pop(archivo, [])
+        if datos is None:
+            datos = {}
+        self.register_user_names(datos.get('users', {}))
         
-        return chat_data
+        for callback in callbacks:
+            callback(datos)
+
+    def register_user_names(self, names):
+        """Agrega nombres de usuario (id -> nombre) sin pisar los ya conocidos"""
+        for user_id, display_name in names.items():
+            try:
+                user_id_int = int(user_id)
+            except ValueError:
+                user_id_int = user_id
+            
+            if user_id_int not in self.user_id_to_name:
+                self.user_id_to_name[user_id_int] = display_name
+
+    def closeEvent(self, event):
+        self.chat_loader.stop()
+        self.graph_view.stop_layout_workers()
+        super().closeEvent(event)
 
     def create_analisis_tab(self):
         """Crea la pestaña de análisis con buscador y secciones mejoradas"""
@@ -1378,23 +1285,10 @@ class ThreadsAnalysisResults(QMainWindow):
         self.analysis_layout = QVBoxLayout(self.analysis_content)
         self.analysis_layout.setSpacing(15)
         
-        # Crear todas las tarjetas de análisis
+        # Crear las tarjetas de análisis (solo encabezados: el detalle se carga al abrirlas)
         self.analysis_cards = []
-        for archivo in self.chat_data.keys():
-            resultados_detallados = self.results.get('resultados_detallados', {})
-            datos_resultados = resultados_detallados.get(archivo, {})
-            datos_chat = self.chat_data.get(archivo, {})
-            
-            datos_combinados = {
-                'graph_info': datos_resultados.get('graph_info', {}),
-                'analysis_summary': datos_resultados.get('analysis_summary', {}),
-                'analysis_data': datos_chat.get('analysis_data', {}),
-                'graph_data': datos_chat.get('graph_data', {}),
-                'patterns_data': datos_chat.get('patterns_data', {}),  # NUEVO
-                'trends_data': datos_chat.get('trends_data', {})      # NUEVO
-            }
-            
-            analysis_card = self.create_detailed_analysis_card(archivo, datos_combinados)
+        for archivo, datos_resultados in self.results.get('resultados_detallados', {}).items():
+            analysis_card = self.create_detailed_analysis_card(archivo, datos_resultados)
             self.analysis_layout.addWidget(analysis_card)
             self.analysis_cards.append(analysis_card)
         
@@ -1457,10 +1351,44 @@ class ThreadsAnalysisResults(QMainWindow):
         """)
         go_to_chat_btn.clicked.connect(lambda: self.go_to_chat(archivo))
         
+        # Botón para cargar el análisis detallado (archivos grandes, bajo demanda)
+        details_btn = QPushButton("📈 Ver Análisis")
+        details_btn.setStyleSheet(go_to_chat_btn.styleSheet())
+        details_btn.clicked.connect(lambda: self.load_analysis_card(card, archivo, datos))
+        card.details_btn = details_btn
+        
         header_layout.addWidget(title)
         header_layout.addStretch()
+        header_layout.addWidget(details_btn)
         header_layout.addWidget(go_to_chat_btn)
         
+        layout.addWidget(header)
+        
+        return card
+
+    def load_analysis_card(self, card, archivo, datos_resultados):
+        """Carga los datos del chat y agrega las pestañas de análisis a la tarjeta"""
+        if getattr(card, 'details_loaded', False):
+            return
+        card.details_loaded = True
+        card.details_btn.setEnabled(False)
+        card.details_btn.setText("⏳ Cargando...")
+        
+        def on_loaded(datos_chat):
+            datos_combinados = {
+                'graph_info': datos_resultados.get('graph_info', {}),
+                'analysis_summary': datos_resultados.get('analysis_summary', {}),
+                'analysis_data': datos_chat.get('analysis_data', {}),
+                'graph_data': datos_chat.get('graph_data', {}),
+                'patterns_data': datos_chat.get('patterns_data', {}),
+                'trends_data': datos_chat.get('trends_data', {})
+            }
+            card.layout().addWidget(self.create_analysis_tabs(datos_combinados))
+            card.details_btn.hide()
+        
+        self.request_chat_data(archivo, on_loaded)
+
+    def create_analysis_tabs(self, datos):
         # Tabs para diferentes tipos de análisis
         tabs = QTabWidget()
         
@@ -1476,10 +1404,7 @@ class ThreadsAnalysisResults(QMainWindow):
         tendencias_tab = self.create_tendencias_tab(datos.get('trends_data', {}))
         tabs.addTab(tendencias_tab, "📈 Tendencias")
         
-        layout.addWidget(header)
-        layout.addWidget(tabs)
-        
-        return card
+        return tabs
 
     def go_to_chat(self, archivo):
         """Navega al chat específico en la pestaña de hilos"""
@@ -3085,10 +3010,38 @@ class ThreadsAnalysisResults(QMainWindow):
         return threads_by_time
 
 
+class GraphLayoutWorker(QThread):
+    """Calcula (o lee del disco) el layout del grafo fuera del hilo de la GUI"""
+    layout_ready = pyqtSignal(int, object)   # token del pedido, layout (None si falló)
+
+    def __init__(self, token, graph_data, threads=None, archivo=None, parent=None):
+        super().__init__(parent)
+        self.token = token
+        self.graph_data = graph_data
+        self.threads = threads
+        self.archivo = archivo
+
+    def run(self):
+        try:
+            layout = get_layout(self.graph_data, self.threads, self.archivo, RESULTS_DIR)
+        except Exception as e:
+            print(f"❌ Error calculando el layout del grafo: {e}")
+            layout = None
+        self.layout_ready.emit(self.token, layout)
+
+
 class GraphVisualization(QGraphicsView):
-    def __init__(self, graph_data, parent=None):
+    # Por debajo de esta escala los hilos se dibujan como un solo nodo agregado
+    LOD_SCALE = 0.35
+    # Grafos con hasta tantos nodos se dibujan siempre completos
+    LOD_MIN_NODES = 400
+    NODE_RADIUS = 20
+
+    def __init__(self, graph_data, parent=None, threads=None, archivo=None):
         super().__init__(parent)
         self.graph_data = graph_data
+        self.threads = threads
+        self.archivo = archivo
 
         # Scene
         self.scene = QGraphicsScene()
@@ -3114,8 +3067,33 @@ class GraphVisualization(QGraphicsView):
         # Zoom state
         self.initial_fit_done = False
 
+        # Layout en segundo plano (solo se usa el resultado del último pedido)
+        self._layout_token = 0
+        self._layout_workers = []
+        self._reset_items()
+
+        # Nivel de detalle: se recalcula con un pequeño retardo al hacer zoom, desplazar o redimensionar
+        self._lod_timer = QTimer(self)
+        self._lod_timer.setSingleShot(True)
+        self._lod_timer.setInterval(50)
+        self._lod_timer.timeout.connect(self._update_lod)
+        self.horizontalScrollBar().valueChanged.connect(self._schedule_lod_update)
+        self.verticalScrollBar().valueChanged.connect(self._schedule_lod_update)
+
         if graph_data:
-            self.draw_reduced_graph()
+            self.draw_graph()
+
+    def _reset_items(self):
+        self.graph_layout = None
+        self.positions = {}
+        self.node_cluster = {}
+        self.cluster_edges = {}
+        self.cluster_rects = {}
+        self.cluster_items = {}     # hilo -> (círculo, etiqueta) de la vista agregada
+        self.detail_items = {}      # hilo -> items de sus nodos y aristas (creados al acercarse)
+        self.overview_edges = None
+        self.detail_all = True
+        self.user_names = None
 
     def wheelEvent(self, event):
         zoom_in = 1.15
@@ -3131,40 +3109,81 @@ class GraphVisualization(QGraphicsView):
         delta = new_pos - old_pos
         self.translate(delta.x(), delta.y())
 
-    def draw_reduced_graph(self):
-        self.scene.clear()
-        if not self.graph_data:
-            return
-
-        G = nx.DiGraph()
-        nodes_data = self.graph_data.get("nodes", {})
-        edges_data = self.graph_data.get("edges", [])
-
-        selected_nodes = self.select_nodes_for_reduced_graph(nodes_data, edges_data)
-        if not selected_nodes:
-            return
+    def scale(self, sx, sy):
+        super().scale(sx, sy)
+        self._schedule_lod_update()
 
-        for n in selected_nodes:
-            if n in nodes_data:
-                G.add_node(n, **nodes_data[n])
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self._schedule_lod_update()
 
-        for e in edges_data:
-            if e["source"] in selected_nodes and e["target"] in selected_nodes:
-                G.add_edge(e["source"], e["target"], **e.get("data", {}))
+    def set_graph(self, graph_data, threads=None, archivo=None):
+        """Cambia el grafo mostrado; `threads` agrupa los mensajes y `archivo` permite guardar el layout"""
+        self.graph_data = graph_data
+        self.threads = threads
+        self.archivo = archivo
+        self.initial_fit_done = False
+        self.draw_graph()
 
-        if not G.nodes():
+    def draw_graph(self):
+        """Pide el layout del grafo en segundo plano; se dibuja al recibirlo (on_layout_ready)"""
+        self.scene.clear()
+        self._reset_items()
+        self._layout_token += 1
+        if not self.graph_data or not self.graph_data.get("nodes"):
             return
 
-        # Layout
-        try:
-            pos = nx.spring_layout(G, k=150, iterations=80)
-        except Exception:
-            pos = nx.circular_layout(G)
-
-        pos = {n: (p[0] * 800, p[1] * 800) for n, p in pos.items()}
+        loading = self.scene.addText("⏳ Calculando disposición del grafo...")
+        loading.setFont(QFont("Arial", 12))
+        self.centerOn(loading)
+
+        worker = GraphLayoutWorker(self._layout_token, self.graph_data, self.threads, self.archivo, self)
+        worker.layout_ready.connect(self.on_layout_ready)
+        worker.finished.connect(lambda worker=worker: self._on_layout_worker_finished(worker))
+        self._layout_workers.append(worker)
+        worker.start()
+
+    def _on_layout_worker_finished(self, worker):
+        if worker in self._layout_workers:
+            self._layout_workers.remove(worker)
+        worker.deleteLater()
+
+    def stop_layout_workers(self):
+        """Espera a los cálculos de layout en curso (al cerrar la ventana)"""
+        self._layout_token += 1
+        for worker in list(self._layout_workers):
+            worker.wait()
+
+    def on_layout_ready(self, token, layout):
+        if token != self._layout_token:
+            return
+        self.scene.clear()
+        self._reset_items()
+        if not layout:
+            self.scene.addText("❌ No se pudo calcular la disposición del grafo")
+            return
 
-        xs = [p[0] for p in pos.values()]
-        ys = [p[1] for p in pos.values()]
+        nodes_data = self.graph_data.get("nodes", {})
+        self.graph_layout = layout
+        self.positions = {n: tuple(p) for n, p in layout.get("positions", {}).items() if n in nodes_data}
+        if not self.positions:
+            return
+        clusters = layout.get("clusters", {})
+        self.node_cluster = {m: cid for cid, info in clusters.items() for m in info["members"]}
+        for cid, info in clusters.items():
+            (cx, cy), r = info["center"], info["radius"]
+            self.cluster_rects[cid] = QRectF(cx - r, cy - r, 2 * r, 2 * r)
+
+        # Cada arista se dibuja con el hilo de su destino (o de su origen); None = entre usuarios
+        for e in self.graph_data.get("edges", []):
+            src, tgt = e.get("source"), e.get("target")
+            if src == tgt or src not in self.positions or tgt not in self.positions:
+                continue
+            owner = self.node_cluster.get(tgt) or self.node_cluster.get(src)
+            self.cluster_edges.setdefault(owner, []).append((src, tgt, e.get("data", {})))
+
+        xs = [p[0] for p in self.positions.values()]
+        ys = [p[1] for p in self.positions.values()]
 
         min_x, max_x = min(xs), max(xs)
         min_y, max_y = min(ys), max(ys)
@@ -3179,8 +3198,12 @@ class GraphVisualization(QGraphicsView):
 
         self.scene.setSceneRect(scene_rect.adjusted(-2000, -2000, 2000, 2000))
 
-        self._draw_edges(G, pos)
-        self._draw_nodes(G, pos, nodes_data)
+        self.user_names = self._find_user_names()
+        self.detail_all = len(self.positions) <= self.LOD_MIN_NODES
+        self._draw_overview(clusters)
+        # Los usuarios son pocos: se dibujan siempre
+        users = [n for n in self.positions if n not in self.node_cluster]
+        self._draw_nodes(users, self.positions, nodes_data)
 
         if not self.initial_fit_done:
             self.fitInView(scene_rect, Qt.AspectRatioMode.KeepAspectRatio)
@@ -3188,21 +3211,113 @@ class GraphVisualization(QGraphicsView):
             self.initial_fit_done = True
         
         self.graph_rect = scene_rect
+        self._update_lod()
 
     def reset_view(self):
         if hasattr(self, "graph_rect"):
             self.resetTransform()
             self.fitInView(self.graph_rect, Qt.AspectRatioMode.KeepAspectRatio)
             self.centerOn(self.graph_rect.center())
+            self._schedule_lod_update()
+
+    # ---------------- Nivel de detalle ----------------
+
+    def _schedule_lod_update(self):
+        if self.graph_layout is not None:
+            self._lod_timer.start()
+
+    def _update_lod(self):
+        """
+        Lejos: cada hilo es un círculo y las aristas entre hilos/usuarios una sola ruta.
+        Cerca: se crean (una vez) y muestran los nodos y aristas de los hilos en pantalla.
+        """
+        if self.graph_layout is None:
+            return
+        detail = self.detail_all or self.transform().m11() >= self.LOD_SCALE
+        visible_rect = self.mapToScene(self.viewport().rect()).boundingRect()
+
+        if self.overview_edges is not None:
+            self.overview_edges.setVisible(not detail)
+        self._set_detail_visible(None, detail)
+
+        for cid, rect in self.cluster_rects.items():
+            expand = detail and (self.detail_all or rect.intersects(visible_rect))
+            for item in self.cluster_items[cid]:
+                item.setVisible(not expand)
+            self._set_detail_visible(cid, expand)
+
+    def _set_detail_visible(self, cid, visible):
+        items = self.detail_items.get(cid)
+        if items is None:
+            if not visible:
+                return
+            nodes_data = self.graph_data.get("nodes", {})
+            members = self.graph_layout["clusters"][cid]["members"] if cid is not None else []
+            items = self.detail_items[cid] = (
+                self._draw_edges(self.cluster_edges.get(cid, []), self.positions)
+                + self._draw_nodes(members, self.positions, nodes_data)
+            )
+        for item in items:
+            item.setVisible(visible)
+
+    def _draw_overview(self, clusters):
+        """Vista agregada: un círculo por hilo y una sola ruta con las aristas entre hilos/usuarios"""
+        def anchor(node_id):
+            cid = self.node_cluster.get(node_id)
+            return tuple(clusters[cid]["center"]) if cid is not None else self.positions[node_id]
+
+        path = QPainterPath()
+        seen = set()
+        for cid, edges in self.cluster_edges.items():
+            for u, v, _ in edges:
+                a, b = anchor(u), anchor(v)
+                if a == b or (a, b) in seen or (b, a) in seen:
+                    continue
+                seen.add((a, b))
+                path.moveTo(*a)
+                path.lineTo(*b)
+        pen = QPen(QColor(108, 117, 125, 120), 1)
+        pen.setCosmetic(True)
+        self.overview_edges = QGraphicsPathItem(path)
+        self.overview_edges.setPen(pen)
+        self.overview_edges.setZValue(-1)
+        self.scene.addItem(self.overview_edges)
+
+        for cid, info in clusters.items():
+            rect = self.cluster_rects[cid]
+            count = len(info["members"])
+            ellipse = QGraphicsEllipseItem(rect)
+            ellipse.setBrush(QBrush(QColor(40, 167, 69, 90)))
+            pen = QPen(QColor("#28a745"), 2)
+            pen.setCosmetic(True)
+            ellipse.setPen(pen)
+            if cid.startswith("sueltos_"):
+                owner = self._user_display_name("user_" + cid[len("sueltos_"):], {})
+                ellipse.setToolTip(f"Mensajes sin hilo de {owner}\nMensajes: {count}")
+            else:
+                ellipse.setToolTip(f"Hilo: {cid}\nMensajes: {count}\n(acercar para ver los mensajes)")
+            ellipse.setData(0, cid)
+            self.scene.addItem(ellipse)
 
-    def _draw_edges(self, G, pos):
-        for u, v, data in G.edges(data=True):
+            label = QGraphicsTextItem(f"🧵 {count}")
+            label.setDefaultTextColor(QColor("#1e5b2c"))
+            label.setFont(QFont("Arial", 9, QFont.Weight.Bold))
+            label.setFlag(QGraphicsItem.GraphicsItemFlag.ItemIgnoresTransformations)
+            label.setPos(rect.center())
+            self.scene.addItem(label)
+            self.cluster_items[cid] = (ellipse, label)
+
+    # ---------------- Dibujo de nodos y aristas ----------------
+
+    def _draw_edges(self, edges, pos):
+        items = []
+        for u, v, data in edges:
             x1, y1 = pos[u]
             x2, y2 = pos[v]
 
             line_item = QGraphicsLineItem(x1, y1, x2, y2)
             line_item.setPen(QPen(Qt.GlobalColor.black, 2))
-            self.scene.addItem(line_item)
+            items.append(line_item)
 
             dx = x2 - x1
             dy = y2 - y1
@@ -3226,7 +3341,7 @@ class GraphVisualization(QGraphicsView):
             arrow_item = QGraphicsPolygonItem(polygon)
             arrow_item.setBrush(Qt.GlobalColor.black)
             arrow_item.setPen(QPen(Qt.GlobalColor.black))
-            self.scene.addItem(arrow_item)
+            items.append(arrow_item)
 
             w = data.get("weight", data.get("w", None))
             if w is not None:
@@ -3254,28 +3369,40 @@ class GraphVisualization(QGraphicsView):
                 text_item.setPos(mid_x - brect.width() / 2,
                                  mid_y - brect.height() / 2)
 
-                self.scene.addItem(text_item)
+                items.append(text_item)
+
+        for item in items:
+            self.scene.addItem(item)
+        return items
 
-    def _draw_nodes(self, G, pos, nodes_data):
-        node_radius = 20
-        for node_id, (x, y) in pos.items():
+    def _find_user_names(self):
+        """Mapeo id -> nombre de la ventana de resultados (None si no hay)"""
+        parent = self.parent()
+        while parent and not hasattr(parent, "user_id_to_name"):
+            parent = parent.parent()
+        return parent.user_id_to_name if parent else None
+
+    def _user_display_name(self, node_id, node_info):
+        names = self.user_names
+        if names is None:
+            return node_info.get("name", "Usuario")
+        user_id = node_id.replace("user_", "")
+        try:
+            return names.get(int(user_id), "Usuario")
+        except Exception:
+            return "Usuario"
+
+    def _draw_nodes(self, node_ids, pos, nodes_data):
+        node_radius = self.NODE_RADIUS
+        items = []
+        for node_id in node_ids:
+            x, y = pos[node_id]
             node_info = nodes_data.get(node_id, {})
             node_type = node_info.get("node_type", "unknown")
 
             if node_type == "user":
                 color = QColor("#2C6E91")
-                parent = self.parent()
-                while parent and not hasattr(parent, "user_id_to_name"):
-                    parent = parent.parent()
-                if parent and hasattr(parent, "user_id_to_name"):
-                    user_id = node_id.replace("user_", "")
-                    try:
-                        uid = int(user_id)
-                        display_name = parent.user_id_to_name.get(uid, "Usuario")
-                    except Exception:
-                        display_name = "Usuario"
-                else:
-                    display_name = node_info.get("name", "Usuario")
+                display_name = self._user_display_name(node_id, node_info)
                 label_text = (display_name[:3] if display_name else "Usr")
                 tooltip = f"Usuario: {display_name}\nID: {node_id}"
             else:
@@ -3291,6 +3418,7 @@ class GraphVisualization(QGraphicsView):
             ellipse.setPos(x, y)
             ellipse.setToolTip(tooltip)
             ellipse.setData(0, node_id)
+            ellipse.setZValue(1)
             self.scene.addItem(ellipse)
 
             text_item = QGraphicsTextItem(label_text)
@@ -3299,39 +3427,7 @@ class GraphVisualization(QGraphicsView):
             tw = text_item.boundingRect().width()
             th = text_item.boundingRect().height()
             text_item.setPos(x - tw / 2, y - th / 2)
+            text_item.setZValue(2)
             self.scene.addItem(text_item)
-
-    def select_nodes_for_reduced_graph(self, nodes_data, edges_data):
-        user_nodes = []
-        message_nodes = []
-        for node_id, node_info in nodes_data.items():
-            if node_info.get("node_type") == "user":
-                user_nodes.append(node_id)
-            elif node_info.get("node_type") == "message":
-                message_nodes.append(node_id)
-
-        selected_users = user_nodes[:max(2, min(4, len(user_nodes)))]
-
-        selected_messages = []
-        for edge in edges_data:
-            src = edge.get("source")
-            tgt = edge.get("target")
-            if src in selected_users and tgt in message_nodes and tgt not in selected_messages:
-                selected_messages.append(tgt)
-
-        if len(selected_messages) < 8:
-            message_scores = {}
-            for edge in edges_data:
-                s, t = edge.get("source"), edge.get("target")
-                w = edge.get("data", {}).get("weight", 1.0)
-                if s in message_nodes:
-                    message_scores[s] = message_scores.get(s, 0) + w
-                if t in message_nodes:
-                    message_scores[t] = message_scores.get(t, 0) + w
-            sorted_msgs = sorted(message_scores.items(), key=lambda x: x[1], reverse=True)
-            additional = [m for m, _ in sorted_msgs[:8] if m not in selected_messages]
-            selected_messages.extend(additional)
-
-        selected_messages = selected_messages[:8]
-        all_selected = selected_users + selected_messages
-        return all_selected[:12]
\ No newline at end of file
+            items.extend((ellipse, text_item))
+        return items
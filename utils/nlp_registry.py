@@ -0,0 +1,133 @@
+"""
+Registro compartido y perezoso de modelos spaCy.
+
+El modelo se carga una sola vez por proceso, en el primer uso (no al importar), protegido
+con un lock. Cada consumidor recibe una vista (NLPPipe) sobre el mismo modelo con solo los
+pipes que necesita habilitados:
+
+    nlp = get_nlp("sentiment")   # no carga nada todavía
+    doc = nlp("texto")           # aquí se carga es_core_news_md (una vez)
+"""
+import threading
+
+DEFAULT_MODEL = "es_core_news_md"
+
+# Pipes deshabilitados por consumidor (el resto del pipeline queda activo)
+PIPE_PROFILES = {
+    # morfología + lemas + parser (oraciones y dependencias), sin NER
+    "sentiment": ("ner",),
+    "patterns": ("ner",),
+    # solo lemas / stopwords: el lematizador usa el POS del morphologizer, no el parser
+    "lemmas": ("parser", "ner"),
+    # pipeline completo (entidades y dependencias)
+    "full": (),
+}
+
+_MODELS = {}
+_ERRORS = {}
+_LOCK = threading.Lock()
+
+
+def load_model(model_name=DEFAULT_MODEL):
+    """
+    Devuelve el modelo spaCy compartido (lo carga la primera vez).
+    Lanza la excepción original si no se puede cargar (y la recuerda para no reintentar).
+    """
+    model = _MODELS.get(model_name)
+    if model is not None:
+        return model
+    with _LOCK:
+        model = _MODELS.get(model_name)
+        if model is not None:
+            return model
+        if model_name in _ERRORS:
+            raise _ERRORS[model_name]
+        try:
+            import spacy
+            model = spacy.load(model_name)
+        except Exception as e:
+            _ERRORS[model_name] = e
+            raise
+        _MODELS[model_name] = model
+        return model
+
+
+def is_loaded(model_name=DEFAULT_MODEL):
+    return model_name in _MODELS
+
+
+class NLPPipe:
+    """
+    Vista perezosa de un consumidor sobre el modelo compartido.
+    Se usa como un `Language`: nlp(text), nlp.pipe(texts, ...), nlp.pipe_names.
+
+    Si el modelo no se puede cargar y hay `fallback` (fábrica sin argumentos), se usa
+    ese reemplazo; si no, se propaga el error de carga.
+    """
+
+    def __init__(self, profile, model_name=DEFAULT_MODEL, fallback=None):
+        self.profile = profile
+        self.model_name = model_name
+        self.fallback = fallback
+        self._fallback_nlp = None
+        self._disable = None
+
+    def _model(self):
+        if self._fallback_nlp is not None:
+            return None
+        try:
+            return load_model(self.model_name)
+        except Exception as e:
+            if self.fallback is None:
+                raise
+            if self._fallback_nlp is None:
+                print(f"⚠️  No se pudo cargar spaCy {self.model_name}: {e}")
+                print("ℹ️  Usando tokenizador simple")
+                self._fallback_nlp = self.fallback()
+            return None
+
+    def _disabled(self, model, extra=()):
+        if self._disable is None:
+            self._disable = [p for p in PIPE_PROFILES.get(self.profile, ()) if p in model.pipe_names]
+        return self._disable + [p for p in extra if p in model.pipe_names and p not in self._disable]
+
+    @property
+    def available(self):
+        """True si el modelo spaCy real está disponible (lo carga si hace falta)"""
+        return self._model() is not None
+
+    @property
+    def pipe_names(self):
+        model = self._model()
+        if model is None:
+            return []
+        disabled = self._disabled(model)
+        return [p for p in model.pipe_names if p not in disabled]
+
+    def __call__(self, text, disable=()):
+        model = self._model()
+        if model is None:
+            return self._fallback_nlp(text)
+        return model(text, disable=self._disabled(model, disable))
+
+    def pipe(self, texts, batch_size=256, n_process=1, disable=()):
+        model = self._model()
+        if model is None:
+            return (self._fallback_nlp(t) for t in texts)
+        return model.pipe(texts, batch_size=batch_size, n_process=n_process,
+                          disable=self._disabled(model, disable))
+
+
+_PIPES = {}
+
+
+def get_nlp(profile="full", model_name=DEFAULT_MODEL, fallback=None):
+    """Vista compartida (una por perfil y modelo); no carga el modelo hasta el primer uso"""
+    key = (profile, model_name)
+    with _LOCK:
+        nlp = _PIPES.get(key)
+        if nlp is None:
+            nlp = _PIPES[key] = NLPPipe(profile, model_name, fallback)
+        elif fallback is not None and nlp.fallback is None:
+            nlp.fallback = fallback
+        return nlp
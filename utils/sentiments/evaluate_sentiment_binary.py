@@ -3,8 +3,7 @@ import pandas as pd
 from sklearn.metrics import accuracy_score, precision_recall_fscore_support, confusion_matrix, classification_report
 import matplotlib.pyplot as plt
 import seaborn as sns
-from utils.sentiments.sentiment_rules import analyze_sentiment
-import time
+from utils.sentiments.evaluation_harness import ANALYZERS, run_evaluation, format_stats
 from typing import Optional, Callable, List, Any
 
 def load_test_data(
@@ -56,116 +55,38 @@ def load_test_data(
 
     return texts, true_labels
 
-def load_existing_results(output_file: str, text_col: str = 'texto', pred_col: str = 'prediccion'):
-    """Load existing results from file if it exists.
-
-    Returns lists (texts, predictions) or empty lists if file not present or columns missing.
-    """
-    try:
-        df = pd.read_csv(output_file)
-        return df[text_col].tolist(), df[pred_col].tolist()
-    except (FileNotFoundError, KeyError):
-        return [], []
-
-def save_results_incrementally(
-    text,
-    prediction,
-    output_file: str,
-    text_col: str = 'texto',
-    pred_col: str = 'prediccion',
-):
-    """Save a single prediction result to the output file.
-
-    Writes header if file does not exist. Column names configurable to allow using different CSV schemas.
-    """
-    import os
-    file_exists = os.path.isfile(output_file)
-
-    with open(output_file, 'a', newline='', encoding='utf-8') as f:
-        writer = csv.writer(f)
-        if not file_exists:
-            writer.writerow([text_col, pred_col])
-        writer.writerow([text, prediction])
-
 def predict_sentiment(
     texts,
     output_file: str = 'resultados_sentimiento_temp.csv',
-    retry_forever: bool = True,
-    max_retries: Optional[int] = None,
-    initial_backoff: float = 1.0,
-    max_backoff: float = 60.0,
+    analyzers=('rules',),
+    chunk_size: int = 512,
+    n_workers: Optional[int] = None,
+    true_labels: Optional[List[int]] = None,
     output_text_col: str = 'texto',
-    output_pred_col: str = 'prediccion',
 ):
     """Predict sentiment for a list of texts using binary classification.
-    
+
+    Runs the chunked, resumable evaluation harness (process pool + checkpoint) and
+    returns the predictions of every requested analyzer.
+
     Args:
         texts: List of texts to analyze
         output_file: File to save incremental results
-        
+        analyzers: Registered analyzer names (e.g. 'rules', 'markov')
+        chunk_size: Texts per chunk sent to a worker
+        n_workers: Worker processes (default: CPU count)
+        true_labels: Optional labels written next to the predictions
+
     Returns:
-        List of predicted labels (0 for negative, 1 for positive)
+        (predictions, stats): {analyzer: list of 0/1 labels} and throughput/latency stats
     """
-    # Load existing results
-    processed_texts, pred_labels = load_existing_results(output_file, text_col=output_text_col, pred_col=output_pred_col)
-    
-    # Skip already processed texts
-    start_idx = len(processed_texts)
-    
-    print(f"Found {start_idx} previously processed texts. Resuming from index {start_idx}...")
-    
-    def _is_connection_error(exc: Exception) -> bool:
-        msg = str(exc).lower()
-        return isinstance(exc, (ConnectionError, OSError, IOError)) or 'connection' in msg
-
-    # Process remaining texts
-    for i in range(start_idx, len(texts)):
-        text = texts[i]
-
-        attempt = 0
-        backoff = initial_backoff
-
-        while True:
-            try:
-                result = analyze_sentiment(text)
-                # Binary classification: positive if score > 0, negative otherwise
-                pred = 1 if result['score'] > 0 else 0
-                pred_labels.append(pred)
-
-                # Save result immediately
-                save_results_incrementally(text, pred, output_file, text_col=output_text_col, pred_col=output_pred_col)
-                break
-
-            except KeyboardInterrupt:
-                # Allow user to cancel
-                raise
-            except Exception as e:
-                # Only retry on connection-related problems
-                if _is_connection_error(e):
-                    attempt += 1
-                    will_retry = retry_forever or (max_retries is not None and attempt <= max_retries)
-                    print(f"[Warning] Error de conexión en el análisis (texto index {i}): {e}")
-                    if not will_retry:
-                        print(f"[Error] Se alcanzó el máximo de reintentos ({max_retries}). Saltando este texto.")
-                        pred_labels.append(None)
-                        break
-
-                    # Sleep with exponential backoff
-                    sleep_time = min(backoff, max_backoff)
-                    print(f"Reintentando en {sleep_time:.1f}s (intento {attempt})...")
-                    try:
-                        time.sleep(sleep_time)
-                    except KeyboardInterrupt:
-                        raise
-                    backoff *= 2
-                    continue
-                else:
-                    # Non-connection error: log and append None to keep indices aligned
-                    print(f"[Error] Error al analizar el texto index {i}: {e}")
-                    # pred_labels.append(None)
-                    # break
-
-    return pred_labels
+    result = run_evaluation(
+        texts, true_labels, analyzers=analyzers, output_file=output_file,
+        chunk_size=chunk_size, n_workers=n_workers, text_col=output_text_col,
+    )
+    print("\nRendimiento:")
+    print(format_stats(result['stats']))
+    return result['predictions'], result['stats']
 
 def evaluate(true_labels, pred_labels):
     """Calculate and return evaluation metrics for binary classification.
@@ -214,7 +135,7 @@ def evaluate(true_labels, pred_labels):
         'confusion_matrix': cm,
     }
 
-def plot_confusion_matrix(cm, labels):
+def plot_confusion_matrix(cm, labels, output_path: str = 'confusion_matrix.png'):
     """Plot confusion matrix."""
     plt.figure(figsize=(8, 6))
     sns.heatmap(
@@ -229,7 +150,7 @@ def plot_confusion_matrix(cm, labels):
     plt.ylabel('Etiqueta Verdadera')
     plt.xlabel('Predicción')
     plt.tight_layout()
-    plt.savefig('confusion_matrix.png')
+    plt.savefig(output_path)
     plt.close()
 
 def main():
@@ -267,51 +188,43 @@ def main():
             # For now, no interactive arbitrary lambda; user can later edit this file to provide a custom mapping
             print("No se proporcionó método 'custom' interactivo. Si necesita una conversión compleja, modifique el código y pase `label_map_fn`.")
 
-    # Optional: columns used in the incremental output file
-    print("\nColumnas para el archivo de resultados incrementales:")
+    # Analyzers to compare side by side
+    available = ", ".join(sorted(ANALYZERS))
+    analyzers = [a.strip() for a in (input(f"Analizadores a evaluar, separados por coma ({available}; default 'rules'): ") or 'rules').split(',') if a.strip()]
     out_text_col = input("Columna texto en archivo temporal (default 'texto'): ") or 'texto'
-    out_pred_col = input("Columna predicción en archivo temporal (default 'prediccion'): ") or 'prediccion'
 
     # Load test data
     print("\nCargando datos de prueba...")
     texts, true_labels = load_test_data(test_file, text_col=text_col, label_col=label_col, label_map_fn=label_map_fn)
 
-    # Make predictions with incremental saving
-    print("\nIniciando predicciones (se guardarán incrementalmente)...")
-    pred_labels = predict_sentiment(texts, temp_output, output_text_col=out_text_col, output_pred_col=out_pred_col)
-    
-    # Filter out any None values from failed predictions
-    valid_indices = [i for i, pred in enumerate(pred_labels) if pred is not None]
-    valid_texts = [texts[i] for i in valid_indices]
-    valid_true_labels = [true_labels[i] for i in valid_indices]
-    valid_pred_labels = [pred_labels[i] for i in valid_indices]
-    
+    # Make predictions with chunked, resumable saving
+    print("\nIniciando predicciones (se guardarán por bloques, reanudables)...")
+    predictions, _ = predict_sentiment(texts, temp_output, analyzers=analyzers, true_labels=true_labels,
+                                       output_text_col=out_text_col)
+
     # Save final results with true labels
-    final_results = pd.DataFrame({
-        'texto': valid_texts,
-        'etiqueta_real': valid_true_labels,
-        'prediccion': valid_pred_labels,
-    })
+    final_results = pd.DataFrame({'texto': texts, 'etiqueta_real': true_labels})
+    for name in analyzers:
+        final_results[f'prediccion_{name}'] = predictions[name]
     final_results.to_csv(final_output, index=False, encoding='utf-8')
-    
-    # Only evaluate if we have valid predictions
-    if valid_pred_labels:
-        print("\nEvaluando resultados...")
-        metrics = evaluate(valid_true_labels, valid_pred_labels)
-        
+
+    for name in analyzers:
+        print(f"\n===== {name} =====")
+        metrics = evaluate(true_labels, predictions[name])
+
         # Print results
         print("\nMétricas de evaluación:")
         print(f"Exactitud (Accuracy): {metrics['accuracy']:.4f}")
         print(f"Precisión (Precision): {metrics['precision']:.4f}")
         print(f"Sensibilidad (Recall): {metrics['recall']:.4f}")
         print(f"F1-Score: {metrics['f1']:.4f}")
-        
+
         print("\nReporte de clasificación:")
         print(metrics['report'])
-        
+
         # Plot confusion matrix
-        plot_confusion_matrix(metrics['confusion_matrix'], ['Negativo', 'Positivo'])
-        print("\nMatriz de confusión guardada como 'confusion_matrix.png'")
+        plot_confusion_matrix(metrics['confusion_matrix'], ['Negativo', 'Positivo'], f'confusion_matrix_{name}.png')
+        print(f"\nMatriz de confusión guardada como 'confusion_matrix_{name}.png'")
     
     print(f"\nResultados finales guardados en '{final_output}'")
     print("Proceso completado.")
@@ -0,0 +1,324 @@
+import csv
+import hashlib
+import json
+import math
+import multiprocessing
+import os
+import time
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+# ================================================================
+#  ANALYZER REGISTRY
+# ================================================================
+
+# name -> factory(**options) returning a batch predictor: texts -> list of 0/1
+ANALYZERS: Dict[str, Callable[..., Callable[[List[str]], List[int]]]] = {}
+
+
+def register_analyzer(name: str):
+    """Register a binary analyzer factory under `name`.
+
+    The factory is called once per worker process (with the harness `options`)
+    and must return a function mapping a list of texts to a list of 0/1 labels.
+    """
+    def decorator(factory):
+        ANALYZERS[name] = factory
+        return factory
+    return decorator
+
+
+@register_analyzer("rules")
+def _rules_analyzer(batch_size: int = 256, **_):
+    from utils.sentiments.sentiment_rules import analyze_sentiments
+
+    def predict(texts):
+        # Binary classification: positive if score > 0, negative otherwise
+        return [1 if r['score'] > 0 else 0 for r in analyze_sentiments(texts, batch_size=batch_size)]
+    return predict
+
+
+@register_analyzer("markov")
+def _markov_analyzer(markov_model: str = 'utils/sentiments/models/sentiment_markov_chain.npz', **_):
+    from utils.sentiments.sentiment_markov_chain_binary import SentimentMarkovChain
+
+    chain = SentimentMarkovChain()
+    chain.load_model(markov_model)
+
+    def predict(texts):
+        return chain.predict_batch(texts).tolist()
+    return predict
+
+
+# ================================================================
+#  WORKERS
+# ================================================================
+
+_WORKER_PREDICTORS: Dict[str, Callable[[List[str]], List[int]]] = {}
+
+
+def _init_worker(analyzers: Sequence[str], options: dict):
+    global _WORKER_PREDICTORS
+    _WORKER_PREDICTORS = {name: ANALYZERS[name](**options) for name in analyzers}
+
+
+def _run_chunk(task):
+    """Run every analyzer over one chunk. Returns (start, {name: preds}, {name: seconds})."""
+    start, texts = task
+    preds, seconds = {}, {}
+    for name, predict in _WORKER_PREDICTORS.items():
+        t0 = time.perf_counter()
+        preds[name] = [int(p) for p in predict(texts)]
+        seconds[name] = time.perf_counter() - t0
+    return start, preds, seconds
+
+
+# ================================================================
+#  CHECKPOINT
+# ================================================================
+
+# Latency sketch: fixed log-spaced histogram (seconds), so the checkpoint size does
+# not grow with the number of chunks. Percentiles are accurate to one bin (~12%).
+LATENCY_MIN_SECONDS = 1e-6
+LATENCY_DECADES = 10
+LATENCY_BINS_PER_DECADE = 20
+LATENCY_BINS = LATENCY_DECADES * LATENCY_BINS_PER_DECADE
+
+
+def _checkpoint_path(output_file: str) -> str:
+    return f"{output_file}.ckpt.json"
+
+
+def texts_key(texts: List[str]) -> str:
+    """Hash of the texts, so a checkpoint is only reused for the same dataset."""
+    h = hashlib.sha1()
+    for text in texts:
+        h.update(str(text).encode('utf-8', 'replace'))
+        h.update(b'\0')
+    return h.hexdigest()
+
+
+def _new_timing() -> dict:
+    return {'chunks': 0, 'texts': 0, 'seconds': 0.0,
+            'chunk_min': None, 'chunk_max': 0.0, 'text_min': None, 'text_max': 0.0,
+            'chunk_hist': [0] * LATENCY_BINS, 'text_hist': [0] * LATENCY_BINS}
+
+
+def _latency_bin(seconds: float) -> int:
+    if seconds <= LATENCY_MIN_SECONDS:
+        return 0
+    b = int(math.log10(seconds / LATENCY_MIN_SECONDS) * LATENCY_BINS_PER_DECADE)
+    return min(b, LATENCY_BINS - 1)
+
+
+def record_timing(timing: dict, seconds: float, n: int):
+    """Add one chunk (analyzer `seconds` for `n` texts) to the running totals and sketches."""
+    per_text = seconds / max(n, 1)
+    timing['chunks'] += 1
+    timing['texts'] += n
+    timing['seconds'] += seconds
+    for kind, value in (('chunk', seconds), ('text', per_text)):
+        low = timing[f'{kind}_min']
+        timing[f'{kind}_min'] = value if low is None else min(low, value)
+        timing[f'{kind}_max'] = max(timing[f'{kind}_max'], value)
+        timing[f'{kind}_hist'][_latency_bin(value)] += 1
+
+
+def _sketch_percentile(timing: dict, kind: str, q: float) -> float:
+    """Percentile `q` (seconds) from the histogram: geometric center of the bin, clamped to min/max."""
+    hist = timing[f'{kind}_hist']
+    count = sum(hist)
+    if not count:
+        return 0.0
+    cumulative = np.cumsum(hist)
+    b = int(np.searchsorted(cumulative, q / 100 * count))
+    value = LATENCY_MIN_SECONDS * 10 ** ((b + 0.5) / LATENCY_BINS_PER_DECADE)
+    return float(min(max(value, timing[f'{kind}_min']), timing[f'{kind}_max']))
+
+
+def load_checkpoint(output_file: str, analyzers: Sequence[str], texts: List[str]) -> dict:
+    """Return the checkpoint for this run, or a fresh one if it does not match.
+
+    The checkpoint only stores the next index to process, the byte offset of the
+    results file after the last committed chunk, a hash of the texts and the
+    running timings (fixed size, see record_timing). It is discarded when the
+    texts or analyzers changed, or when the results file is shorter than the
+    committed offset (truncated or rewritten by someone else).
+    """
+    key = texts_key(texts)
+    fresh = {'next_index': 0, 'offset': 0, 'analyzers': list(analyzers), 'total': len(texts),
+             'texts_key': key, 'timings': {name: _new_timing() for name in analyzers}}
+    path = _checkpoint_path(output_file)
+    if not os.path.exists(path) or not os.path.exists(output_file):
+        return fresh
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            ckpt = json.load(f)
+    except (OSError, ValueError):
+        return fresh
+    if (ckpt.get('analyzers') != list(analyzers) or ckpt.get('total') != len(texts)
+            or ckpt.get('texts_key') != key or 'timings' not in ckpt):
+        print("[Warning] El checkpoint no corresponde a este dataset/analizadores. Empezando de cero.")
+        return fresh
+    if os.path.getsize(output_file) < ckpt.get('offset', 0):
+        print("[Warning] El archivo de resultados es más corto que el checkpoint. Empezando de cero.")
+        return fresh
+    return ckpt
+
+
+def save_checkpoint(output_file: str, ckpt: dict):
+    path = _checkpoint_path(output_file)
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(ckpt, f)
+    os.replace(tmp, path)
+
+
+# ================================================================
+#  HARNESS
+# ================================================================
+
+def _chunks(texts: List[str], start: int, chunk_size: int):
+    for i in range(start, len(texts), chunk_size):
+        yield i, texts[i:i + chunk_size]
+
+
+def run_evaluation(
+    texts: List[str],
+    true_labels: Optional[List[int]] = None,
+    analyzers: Sequence[str] = ('rules',),
+    output_file: str = 'resultados_sentimiento_temp.csv',
+    chunk_size: int = 512,
+    n_workers: Optional[int] = None,
+    options: Optional[dict] = None,
+    text_col: str = 'texto',
+    label_col: str = 'etiqueta_real',
+) -> dict:
+    """Evaluate several analyzers side by side in one pass over the data.
+
+    Chunks of `chunk_size` texts are processed across a process pool (results are
+    consumed in order). Each finished chunk is appended to `output_file` with a single
+    buffered write and the checkpoint (next index + file offset) is updated, so an
+    interrupted run resumes exactly after the last committed chunk.
+
+    Args:
+        texts: texts to analyze
+        true_labels: optional ground-truth labels (written next to the predictions)
+        analyzers: registered analyzer names (see ANALYZERS)
+        output_file: CSV with one row per text and one `pred_<analyzer>` column each
+        chunk_size: texts per task sent to a worker
+        n_workers: worker processes (default: CPU count; 1 = run in this process)
+        options: keyword options passed to every analyzer factory
+        text_col, label_col: column names for the text and the label
+
+    Returns:
+        dict with `predictions` ({name: list}) and `stats` (throughput and latencies)
+    """
+    unknown = [a for a in analyzers if a not in ANALYZERS]
+    if unknown:
+        raise ValueError(f"Analizadores no registrados: {unknown} (disponibles: {sorted(ANALYZERS)})")
+
+    analyzers = list(analyzers)
+    options = options or {}
+    n_workers = n_workers or os.cpu_count() or 1
+    ckpt = load_checkpoint(output_file, analyzers, texts)
+    start = ckpt['next_index']
+    if start:
+        print(f"Found {start} previously processed texts. Resuming from index {start}...")
+
+    header = ['index', text_col] + ([label_col] if true_labels is not None else []) + [f'pred_{a}' for a in analyzers]
+    mode = 'r+' if start and os.path.exists(output_file) else 'w'
+
+    wall0 = time.perf_counter()
+    with open(output_file, mode, newline='', encoding='utf-8') as f:
+        if mode == 'r+':
+            # Drop anything written after the last committed chunk
+            f.seek(ckpt['offset'])
+            f.truncate()
+        else:
+            csv.writer(f).writerow(header)
+            f.flush()
+            ckpt['offset'] = f.tell()
+
+        tasks = _chunks(texts, start, chunk_size)
+        if n_workers > 1:
+            pool = multiprocessing.Pool(n_workers, initializer=_init_worker, initargs=(analyzers, options))
+            results = pool.imap(_run_chunk, tasks)
+        else:
+            pool = None
+            _init_worker(analyzers, options)
+            results = map(_run_chunk, tasks)
+
+        try:
+            for chunk_start, preds, seconds in results:
+                n = len(preds[analyzers[0]]) if analyzers else 0
+                rows = []
+                for j in range(n):
+                    i = chunk_start + j
+                    row = [i, texts[i]] + ([true_labels[i]] if true_labels is not None else [])
+                    rows.append(row + [preds[a][j] for a in analyzers])
+
+                # One buffered append per chunk, then commit the checkpoint
+                csv.writer(f).writerows(rows)
+                f.flush()
+                os.fsync(f.fileno())
+                ckpt['offset'] = f.tell()
+                ckpt['next_index'] = chunk_start + n
+                for a in analyzers:
+                    record_timing(ckpt['timings'][a], seconds[a], n)
+                save_checkpoint(output_file, ckpt)
+                print(f"   {ckpt['next_index']}/{len(texts)} textos")
+        finally:
+            if pool is not None:
+                pool.terminate()
+                pool.join()
+
+    wall = time.perf_counter() - wall0
+    predictions = load_predictions(output_file, analyzers)
+    stats = summarize_timings(ckpt, analyzers, wall, len(texts) - start)
+    return {'predictions': predictions, 'stats': stats}
+
+
+def load_predictions(output_file: str, analyzers: Sequence[str]) -> Dict[str, List[int]]:
+    """Read the `pred_<analyzer>` columns of a results file (in index order)."""
+    preds = {a: [] for a in analyzers}
+    with open(output_file, 'r', newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            for a in analyzers:
+                preds[a].append(int(row[f'pred_{a}']))
+    return preds
+
+
+def summarize_timings(ckpt: dict, analyzers: Sequence[str], wall_seconds: float, processed: int) -> dict:
+    """Throughput and latency percentiles per analyzer.
+
+    Chunk latency is the analyzer time for a whole chunk; per-text latency is that
+    time amortized over the chunk size. Percentiles come from the checkpoint sketch.
+    """
+    stats = {'wall_seconds': wall_seconds,
+             'wall_throughput': processed / wall_seconds if wall_seconds > 0 else 0.0,
+             'analyzers': {}}
+    for a in analyzers:
+        timing = ckpt['timings'][a]
+        total = timing['seconds']
+        stats['analyzers'][a] = {
+            'texts': timing['texts'],
+            'seconds': total,
+            'throughput': float(timing['texts'] / total) if total > 0 else 0.0,
+            'chunk_latency_ms': {f'p{q}': _sketch_percentile(timing, 'chunk', q) * 1000 for q in (50, 95, 99)},
+            'text_latency_ms': {f'p{q}': _sketch_percentile(timing, 'text', q) * 1000 for q in (50, 95, 99)},
+        }
+    return stats
+
+
+def format_stats(stats: dict) -> str:
+    lines = [f"Tiempo total: {stats['wall_seconds']:.1f}s ({stats['wall_throughput']:.1f} textos/s en esta corrida)"]
+    for name, s in stats['analyzers'].items():
+        cl, tl = s['chunk_latency_ms'], s['text_latency_ms']
+        lines.append(
+            f"  {name:<10} {s['throughput']:9.1f} textos/s por worker | "
+            f"bloque p50/p95/p99: {cl['p50']:.1f}/{cl['p95']:.1f}/{cl['p99']:.1f} ms | "
+            f"texto p50/p95/p99: {tl['p50']:.3f}/{tl['p95']:.3f}/{tl['p99']:.3f} ms"
+        )
+    return "\n".join(lines)
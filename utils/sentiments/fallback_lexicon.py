@@ -0,0 +1,240 @@
+# fallback_lexicon.py
+"""
+Léxico de fallback precalculado (fuera de línea) para palabras que no están en LEXICON.
+
+Paso de construcción (una vez, sin red):
+    python -m utils.sentiments.fallback_lexicon threads_analysis_results/train_chats \
+        utils/sentiments/datasets/dataset.csv -o utils/sentiments/datasets/fallback_lexicon.bin
+
+ - Recorre el vocabulario completo de los chats (JSON) y datasets (CSV con columna 'texto')
+ - Lematiza por lotes con spaCy si está disponible (si no, palabras en minúscula)
+ - Puntúa cada lema: diccionario manual -> SentiWordNet local (WordNet multilingüe 'spa')
+   -> heurística de sufijos -> 0.0
+ - Escribe un archivo binario compacto que en tiempo de ejecución se abre con mmap
+
+En tiempo de ejecución la búsqueda es un dict (lema -> índice) + un arreglo float32 mapeado
+en memoria: sin escrituras, sin red y sin NLTK.
+"""
+import csv
+import json
+import mmap
+import os
+import re
+import struct
+import sys
+from array import array
+
+from utils.nlp_registry import get_nlp, load_model
+
+# Diccionario manual básico de palabras comunes en español
+MANUAL_SCORES = {
+    # Positivos
+    'bueno': 0.5, 'buena': 0.5, 'excelente': 0.8, 'genial': 0.7,
+    'fantástico': 0.8, 'perfecto': 0.9, 'maravilloso': 0.8,
+    'increíble': 0.7, 'mejor': 0.6, 'útil': 0.5,
+
+    # Negativos
+    'malo': -0.5, 'mala': -0.5, 'terrible': -0.8, 'horrible': -0.9,
+    'pésimo': -0.9, 'fatal': -0.8, 'decepcionante': -0.7,
+    'inútil': -0.6, 'peor': -0.7, 'problemático': -0.6,
+
+    # Neutrales/contextuales
+    'normal': 0.0, 'regular': -0.1, 'aceptable': 0.2,
+    'suficiente': 0.1, 'adecuado': 0.3, 'correcto': 0.3,
+}
+
+# Sufijos comunes (los positivos se revisan primero: 'oso/osa' queda positivo)
+POSITIVE_SUFFIXES = ('able', 'ible', 'oso', 'osa', 'ivo', 'iva')   # amable, maravillosa, creativo
+NEGATIVE_SUFFIXES = ('ante', 'or', 'ora')                          # decepcionante, traidor
+
+MAGIC = b"FBLX"
+VERSION = 1
+# magic, versión, nº de lemas, bytes de claves (16 bytes: los float32 quedan alineados)
+HEADER = struct.Struct("<4sIII")
+
+WORD_RE = re.compile(r"\b\w+\b")
+
+
+def suffix_score(lemma):
+    """Heurística de sufijos (sin E/S): 0.3, -0.3 o 0.0"""
+    if lemma.endswith(POSITIVE_SUFFIXES):
+        return 0.3
+    if lemma.endswith(NEGATIVE_SUFFIXES):
+        return -0.3
+    return 0.0
+
+
+# ================================================================
+#  LÉXICO BINARIO (RUNTIME)
+# ================================================================
+
+class FallbackLexicon:
+    """
+    Léxico lema -> puntaje respaldado por un archivo binario mapeado en memoria.
+
+    Formato (little-endian):
+        HEADER | float32[n] puntajes | claves utf-8 separadas por '\\n' (ordenadas)
+    """
+
+    def __init__(self, index=None, scores=None, mm=None):
+        self.index = index or {}
+        self.scores = scores if scores is not None else array("f")
+        self._mm = mm
+
+    @classmethod
+    def open(cls, path):
+        """Abre el archivo con mmap; si no existe devuelve un léxico vacío"""
+        if not path or not os.path.exists(path) or os.path.getsize(path) < HEADER.size:
+            return cls()
+        with open(path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, n, keys_len = HEADER.unpack_from(mm, 0)
+        if magic != MAGIC or version != VERSION:
+            mm.close()
+            print(f"⚠️  Léxico de fallback con formato desconocido: {path}")
+            return cls()
+
+        start = HEADER.size
+        end = start + 4 * n
+        if sys.byteorder == "little":
+            scores = memoryview(mm)[start:end].cast("f")
+        else:
+            scores = array("f", mm[start:end])
+            scores.byteswap()
+        keys = mm[end:end + keys_len].decode("utf-8").split("\n") if n else []
+        return cls({k: i for i, k in enumerate(keys)}, scores, mm)
+
+    def get(self, lemma, default=None):
+        i = self.index.get(lemma)
+        # float32 -> los puntajes se construyen con 4 decimales
+        return default if i is None else round(self.scores[i], 4)
+
+    def __contains__(self, lemma):
+        return lemma in self.index
+
+    def __len__(self):
+        return len(self.index)
+
+
+def write_lexicon(scores, path):
+    """Escribe {lema: puntaje} en formato binario (escritura atómica)"""
+    keys = sorted(k for k in scores if k and "\n" not in k)
+    blob = "\n".join(keys).encode("utf-8")
+    values = array("f", (float(scores[k]) for k in keys))
+    if sys.byteorder != "little":
+        values.byteswap()
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(keys), len(blob)))
+        f.write(values.tobytes())
+        f.write(blob)
+    os.replace(tmp, path)
+    return len(keys)
+
+
+# ================================================================
+#  CONSTRUCCIÓN FUERA DE LÍNEA
+# ================================================================
+
+def iter_texts(paths):
+    """Textos de chats JSON (archivo o carpeta) y CSV con columna 'texto'"""
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                if name.endswith((".json", ".csv")):
+                    yield from iter_texts([os.path.join(path, name)])
+            continue
+        if path.endswith(".csv"):
+            with open(path, "r", encoding="utf-8") as f:
+                for row in csv.DictReader(f):
+                    yield row.get("texto") or ""
+            continue
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception as e:
+            print(f"⚠️  No se pudo leer {path}: {e}")
+            continue
+        messages = data.get("messages", []) if isinstance(data, dict) else data
+        for msg in messages if isinstance(messages, list) else []:
+            if isinstance(msg, dict) and isinstance(msg.get("text"), str):
+                yield msg["text"]
+
+
+def collect_vocabulary(texts, batch_size=512, n_process=1):
+    """Conjunto de lemas (en minúscula) de todos los textos, lematizando por lotes"""
+    texts = [t for t in texts if t and t.strip()]
+    nlp = get_nlp("lemmas")
+    try:
+        load_model(nlp.model_name)
+    except Exception as e:
+        print(f"⚠️  spaCy no disponible ({e}), usando palabras en minúscula")
+        return {w.lower() for t in texts for w in WORD_RE.findall(t)}
+
+    vocab = set()
+    for doc in nlp.pipe(texts, batch_size=batch_size, n_process=n_process):
+        for token in doc:
+            if token.is_alpha:
+                vocab.add(token.lemma_.lower())
+    return vocab
+
+
+def load_local_sentiwordnet():
+    """(swn, wn) si los corpus ya están instalados localmente; nunca descarga"""
+    try:
+        import nltk
+        for resource in ("corpora/sentiwordnet", "corpora/wordnet", "corpora/omw-1.4"):
+            nltk.data.find(resource)
+        from nltk.corpus import sentiwordnet as swn, wordnet as wn
+        return swn, wn
+    except Exception as e:
+        print(f"ℹ️  SentiWordNet local no disponible ({e}), solo manual + sufijos")
+        return None, None
+
+
+def score_lemma(lemma, swn=None, wn=None):
+    """Manual -> SentiWordNet (synset español más común) -> sufijos -> 0.0"""
+    if lemma in MANUAL_SCORES:
+        return MANUAL_SCORES[lemma]
+
+    if swn is not None:
+        try:
+            synsets = wn.synsets(lemma, lang="spa")
+            if synsets:
+                synset = swn.senti_synset(synsets[0].name())
+                return round((synset.pos_score() - synset.neg_score()) * 0.5, 4)
+        except Exception:
+            pass
+
+    return suffix_score(lemma)
+
+
+def build_fallback_lexicon(paths, output_path, exclude=(), batch_size=512, n_process=1):
+    """Puntúa en bloque el vocabulario de los textos y escribe el léxico binario"""
+    vocab = collect_vocabulary(iter_texts(paths), batch_size, n_process)
+    vocab.difference_update(exclude)
+    print(f"📚 Vocabulario: {len(vocab)} lemas")
+
+    swn, wn = load_local_sentiwordnet()
+    scores = {lemma: score_lemma(lemma, swn, wn) for lemma in vocab}
+    n = write_lexicon(scores, output_path)
+    print(f"✅ Léxico de fallback: {n} lemas -> {output_path}")
+    return n
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Construye el léxico de fallback binario")
+    parser.add_argument("paths", nargs="+", help="Chats JSON / carpetas / CSV con columna 'texto'")
+    parser.add_argument("-o", "--output",
+                        default=os.path.join(os.path.dirname(__file__), "datasets", "fallback_lexicon.bin"))
+    parser.add_argument("--batch-size", type=int, default=512)
+    parser.add_argument("--n-process", type=int, default=1)
+    args = parser.parse_args()
+
+    from utils.sentiments.sentiment_lexicon import LEXICON
+    build_fallback_lexicon(args.paths, args.output, exclude=LEXICON,
+                           batch_size=args.batch_size, n_process=args.n_process)
@@ -1,6 +1,6 @@
-import spacy
 from  utils.sentiments.sentiment_lexicon import LEXICON
-nlp = spacy.load("es_core_news_md")
+from utils.nlp_registry import get_nlp
+nlp = get_nlp("patterns")  # compartido, se carga en el primer uso
 
 # ==========================================================
 # CONFIGURACIONES IMPORTANTES
@@ -1,14 +1,16 @@
 import pandas as pd
 from collections import Counter
-from  utils.sentiments.sentiment_rules import analyze_sentiment  # Importa la función existente
+from  utils.sentiments.sentiment_rules import analyze_sentiments  # Versión por lotes (nlp.pipe + cache)
 
-def get_sentiment_summary(messages: list) -> dict:
+def get_sentiment_summary(messages: list, n_process: int = 1, batch_size: int = 256) -> dict:
     """
     Calcula un resumen general de sentimiento para una lista de mensajes,
     incluyendo análisis por participante.
     
     Args:
         messages (list): Lista de mensajes (cada uno como dict con 'text' y otros campos).
+        n_process (int): Procesos de spaCy para nlp.pipe.
+        batch_size (int): Textos por lote de nlp.pipe.
         
     Returns:
         dict: Resumen con métricas agregadas y por usuario.
@@ -20,13 +22,12 @@ def get_sentiment_summary(messages: list) -> dict:
     scores = []
     user_data = {}  # Para agrupar por usuario
     
-    for msg in messages:
-        text = msg.get('text', '')
+    # Un solo pase por lotes sobre todos los textos no vacíos (textos repetidos se analizan una vez)
+    valid = [msg for msg in messages if (msg.get('text') or '').strip()]
+    results = analyze_sentiments([msg['text'] for msg in valid], n_process=n_process, batch_size=batch_size)
+    
+    for msg, result in zip(valid, results):
         sender = msg.get('sender_name', 'Unknown')
-        if not text.strip():
-            continue
-        
-        result = analyze_sentiment(text)
         label = result['sentiment']
         score = result['score']
         
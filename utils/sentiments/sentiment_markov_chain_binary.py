@@ -3,45 +3,67 @@ import pandas as pd
 import numpy as np
 import re
 import nltk
-from nltk.tokenize import word_tokenize
+import hashlib
+import multiprocessing
 from nltk.stem import SnowballStemmer
 from nltk.corpus import stopwords
-from gensim.models import Word2Vec
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import accuracy_score, classification_report
-from collections import defaultdict, Counter
-import pickle
+from collections import Counter
 import os
 from typing import List, Dict, Tuple, Optional
 
+# Tokenizador precompilado (equivale a los dos re.sub + word_tokenize sobre texto ya limpio:
+# solo quedan caracteres de palabra y espacios, así que basta con separar por espacios)
+NON_WORD_RE = re.compile(r'[^\w\sáéíóúñ]')
+DIGITS_RE = re.compile(r'\d+')
+
+# Versión del preprocesamiento: invalida los corpus tokenizados persistidos si cambia
+PREPROCESS_VERSION = 1
+
+_WORKER_CHAIN = None
+
+
+def _init_preprocess_worker():
+    global _WORKER_CHAIN
+    _WORKER_CHAIN = SentimentMarkovChain()
+
+
+def _preprocess_chunk(texts: List[str]) -> List[List[str]]:
+    return [_WORKER_CHAIN.preprocess_text(text) for text in texts]
+
+
 class SentimentMarkovChain:
     """
-    Cadena de Markov para análisis de sentimientos usando Word2Vec para vectorización.
+    Cadena de Markov (bigramas de stems) para análisis de sentimientos binario.
+
+    Representación compacta:
+     - vocabulario -> ids enteros (stems con frecuencia >= min_count)
+     - por clase, matriz de transición dispersa CSR (indptr, indices, data) con
+       log-probabilidades float32 suavizadas (Laplace con `alpha`)
+     - predicción vectorizada por lotes sobre arreglos de ids
     """
 
-    def __init__(self, vector_size=100, window=5, min_count=2, workers=4):
+    def __init__(self, min_count=2, alpha=1.0):
         """
         Inicializar la cadena de Markov.
 
         Args:
-            vector_size: Dimensión de los vectores de Word2Vec
-            window: Ventana de contexto para Word2Vec
-            min_count: Mínima frecuencia de palabras para incluir en el modelo
-            workers: Número de hilos para entrenamiento
+            min_count: Mínima frecuencia de un stem para incluirlo en el vocabulario
+            alpha: Suavizado aditivo de las probabilidades de transición (> 0)
         """
-        self.vector_size = vector_size
-        self.window = window
         self.min_count = min_count
-        self.workers = workers
+        self.alpha = alpha
 
         # Inicializar componentes
         self.stemmer = SnowballStemmer('spanish')
         self.stop_words = set(stopwords.words('spanish'))
+        self._stem_cache = {}           # token -> stem (None si se descarta: corto o stopword)
 
         # Modelos y estructuras de datos
-        self.word2vec_model = None
-        self.transition_matrices = {}
-        self.vocabulary = set()
+        self.vocabulary = {}            # stem -> id
+        self.transition_matrices = {}   # sentimiento -> {'indptr', 'indices', 'data', 'row_default'}
+        self._keys = {}                 # sentimiento -> fila * V + columna (ordenado), para búsquedas por lote
         self.sentiment_mapping = { 0: 'negativo', 1: 'positivo'}
 
     def preprocess_text(self, text: str) -> List[str]:
@@ -57,102 +79,201 @@ class SentimentMarkovChain:
         if not isinstance(text, str):
             return []
 
-        # Convertir a minúsculas
-        text = text.lower()
-
-        # Eliminar caracteres especiales y números
-        text = re.sub(r'[^\w\sáéíóúñ]', ' ', text)
-        text = re.sub(r'\d+', '', text)
+        # Minúsculas, sin caracteres especiales ni números; separar por espacios
+        tokens = DIGITS_RE.sub('', NON_WORD_RE.sub(' ', text.lower())).split()
 
-        # Tokenizar
-        tokens = word_tokenize(text, language='spanish')
-
-        # Filtrar stopwords y palabras cortas, aplicar stemming
+        # Filtrar stopwords y palabras cortas, aplicar stemming (memoizado por token)
+        cache = self._stem_cache
         processed_tokens = []
         for token in tokens:
-            if len(token) > 2 and token not in self.stop_words:
-                stemmed_token = self.stemmer.stem(token)
+            stemmed_token = cache.get(token, False)
+            if stemmed_token is False:
+                keep = len(token) > 2 and token not in self.stop_words
+                stemmed_token = cache[token] = self.stemmer.stem(token) if keep else None
+            if stemmed_token is not None:
                 processed_tokens.append(stemmed_token)
 
         return processed_tokens
 
-    def train_word2vec(self, texts: List[List[str]]) -> None:
+    def preprocess_batch(self, texts: List[str], n_jobs: int = 1, chunk_size: int = 2000) -> List[List[str]]:
+        """
+        Preprocesar muchos textos; con n_jobs > 1 reparte bloques entre procesos.
+
+        Args:
+            texts: Lista de textos
+            n_jobs: Procesos (1 = en este proceso, con la cache de stems compartida)
+            chunk_size: Textos por bloque enviado a cada proceso
+
+        Returns:
+            Lista de listas de tokens procesados (mismo orden que texts)
+        """
+        if n_jobs <= 1 or len(texts) <= chunk_size:
+            return [self.preprocess_text(text) for text in texts]
+
+        chunks = [texts[i:i + chunk_size] for i in range(0, len(texts), chunk_size)]
+        with multiprocessing.Pool(n_jobs, initializer=_init_preprocess_worker) as pool:
+            results = pool.map(_preprocess_chunk, chunks)
+        return [tokens for chunk in results for tokens in chunk]
+
+    @staticmethod
+    def corpus_key(texts: List[str]) -> str:
+        """Hash del corpus (textos + versión del preprocesamiento)"""
+        h = hashlib.sha1(f"v{PREPROCESS_VERSION}".encode())
+        for text in texts:
+            h.update(str(text).encode("utf-8", "replace"))
+            h.update(b"\0")
+        return h.hexdigest()
+
+    def load_or_preprocess(self, texts: List[str], cache_path: Optional[str] = None,
+                           n_jobs: int = 1) -> List[List[str]]:
+        """
+        Corpus tokenizado, reutilizando el persistido en cache_path (.npz) si corresponde
+        a los mismos textos; así reentrenar con otros hiperparámetros no vuelve a tokenizar.
+        """
+        key = self.corpus_key(texts) if cache_path else None
+        if cache_path and os.path.exists(cache_path):
+            with np.load(cache_path, allow_pickle=False) as data:
+                # caches viejos (tokens como arreglo de strings) no tienen 'ids': se re-tokeniza
+                if 'ids' in data.files and str(data['key']) == key:
+                    stems = self._decode_stems(data['stems_utf8'], data['stem_lengths'])
+                    flat = [stems[i] for i in data['ids'].tolist()]
+                    offsets = np.concatenate([[0], np.cumsum(data['lengths'])])
+                    print(f"Corpus tokenizado reutilizado: {cache_path}")
+                    return [flat[offsets[i]:offsets[i + 1]] for i in range(len(offsets) - 1)]
+
+        processed = self.preprocess_batch(texts, n_jobs=n_jobs)
+
+        if cache_path:
+            # Vocabulario de stems (ordenado, como build_vocabulary) + ids int32 por token:
+            # un arreglo de strings de ancho fijo costaría 4 × (stem más largo) bytes por token
+            stems = sorted({t for tokens in processed for t in tokens})
+            index = {w: i for i, w in enumerate(stems)}
+            encoded = [w.encode('utf-8') for w in stems]
+            os.makedirs(os.path.dirname(os.path.abspath(cache_path)), exist_ok=True)
+            np.savez(cache_path, key=np.array(key),
+                     stems_utf8=np.frombuffer(b"".join(encoded), dtype=np.uint8),
+                     stem_lengths=np.array([len(e) for e in encoded], dtype=np.int32),
+                     ids=np.array([index[t] for tokens in processed for t in tokens], dtype=np.int32),
+                     lengths=np.array([len(tokens) for tokens in processed], dtype=np.int64))
+            print(f"Corpus tokenizado guardado en: {cache_path}")
+        return processed
+
+    @staticmethod
+    def _decode_stems(blob: np.ndarray, stem_lengths: np.ndarray) -> List[str]:
+        """Stems guardados como bytes UTF-8 concatenados + largo en bytes de cada uno"""
+        raw = blob.tobytes()
+        ends = np.cumsum(stem_lengths, dtype=np.int64).tolist()
+        starts = [0] + ends[:-1]
+        return [raw[a:b].decode('utf-8') for a, b in zip(starts, ends)]
+
+    def build_vocabulary(self, texts: List[List[str]]) -> None:
         """
-        Entrenar modelo Word2Vec con los textos procesados.
+        Construir el vocabulario (stem -> id) con los stems de frecuencia >= min_count.
 
         Args:
             texts: Lista de listas de tokens
         """
-        print("Entrenando modelo Word2Vec...")
-
-        # Crear modelo Word2Vec
-        self.word2vec_model = Word2Vec(
-            sentences=texts,
-            vector_size=self.vector_size,
-            window=self.window,
-            min_count=self.min_count,
-            workers=self.workers,
-            sg=1,  # Skip-gram
-            hs=0,  # Negative sampling
-            negative=10,
-            epochs=30
-        )
-
-        # Construir vocabulario
-        self.vocabulary = set(self.word2vec_model.wv.index_to_key)
-        print(f"Modelo Word2Vec entrenado con vocabulario de {len(self.vocabulary)} palabras")
-
-    def build_transition_matrices(self, texts: List[List[str]], sentiments: List[int]) -> None:
+        counts = Counter(token for tokens in texts for token in tokens)
+        words = sorted(w for w, c in counts.items() if c >= self.min_count)
+        self.vocabulary = {w: i for i, w in enumerate(words)}
+        print(f"Vocabulario de {len(self.vocabulary)} palabras")
+
+    def encode(self, tokens: List[str]) -> np.ndarray:
+        """Ids de los tokens (-1 para los que no están en el vocabulario)"""
+        vocab = self.vocabulary
+        return np.fromiter((vocab.get(t, -1) for t in tokens), dtype=np.int64, count=len(tokens))
+
+    @staticmethod
+    def _bigrams(encoded: List[np.ndarray]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(actual, siguiente, índice de texto) de todos los bigramas con ambos ids en vocabulario"""
+        lengths = np.fromiter((len(ids) for ids in encoded), dtype=np.int64, count=len(encoded))
+        if lengths.sum() == 0:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty, empty
+        flat = np.concatenate(encoded).astype(np.int64, copy=False)
+        doc = np.repeat(np.arange(len(encoded)), lengths)
+        same_doc = doc[:-1] == doc[1:]
+        cur, nxt, doc = flat[:-1], flat[1:], doc[:-1]
+        keep = same_doc & (cur >= 0) & (nxt >= 0)
+        return cur[keep], nxt[keep], doc[keep]
+
+    def build_transition_matrices(self, encoded: List[np.ndarray], sentiments: List[int]) -> None:
         """
-        Construir matrices de transición para cada sentimiento usando vectores Word2Vec.
+        Construir las matrices de transición CSR (log-probabilidades) para cada sentimiento.
 
         Args:
-            texts: Lista de listas de tokens procesados
+            encoded: Lista de arreglos de ids (salida de encode)
             sentiments: Lista de sentimientos correspondientes
         """
         print("Construyendo matrices de transición...")
+        V = len(self.vocabulary)
+        sentiments = np.asarray(sentiments)
+        cur, nxt, doc = self._bigrams(encoded)
 
-        # Inicializar matrices de transición para cada sentimiento
-        sentiment_matrices = {0: defaultdict(Counter), 1: defaultdict(Counter)}
-
-        for tokens, sentiment in zip(texts, sentiments):
-            if len(tokens) < 2:
-                continue
-
-            for i in range(len(tokens) - 1):
-                current_word = tokens[i]
-                next_word = tokens[i + 1]
-
-                if current_word in self.vocabulary and next_word in self.vocabulary:
-                    sentiment_matrices[sentiment][current_word][next_word] += 1
-
-        # Normalizar matrices de transición
+        self.transition_matrices = {}
+        self._keys = {}
         for sentiment in [0, 1]:
-            total_transitions = sum(sum(word_counts.values()) for word_counts in sentiment_matrices[sentiment].values())
-            if total_transitions > 0:
-                for current_word in sentiment_matrices[sentiment]:
-                    total_from_current = sum(sentiment_matrices[sentiment][current_word].values())
-                    for next_word in sentiment_matrices[sentiment][current_word]:
-                        sentiment_matrices[sentiment][current_word][next_word] /= total_from_current
-
-        self.transition_matrices = sentiment_matrices
+            mask = sentiments[doc] == sentiment
+            keys, counts = np.unique(cur[mask] * V + nxt[mask], return_counts=True)
+            rows, cols = keys // V, keys % V
+
+            row_totals = np.bincount(rows, weights=counts, minlength=V)
+            denom = row_totals + self.alpha * V
+            indptr = np.zeros(V + 1, dtype=np.int64)
+            np.cumsum(np.bincount(rows, minlength=V), out=indptr[1:])
+
+            self.transition_matrices[sentiment] = {
+                'indptr': indptr,
+                'indices': cols.astype(np.int32),
+                'data': np.log((counts + self.alpha) / denom[rows]).astype(np.float32),
+                # log-probabilidad de una transición no observada desde cada fila
+                'row_default': np.log(self.alpha / denom).astype(np.float32),
+            }
+            self._keys[sentiment] = keys
+
         print("Matrices de transición construidas para todos los sentimientos")
 
-    def get_word_vector(self, word: str) -> np.ndarray:
+    def _transition_keys(self, sentiment: int) -> np.ndarray:
+        keys = self._keys.get(sentiment)
+        if keys is None:
+            m = self.transition_matrices[sentiment]
+            rows = np.repeat(np.arange(len(m['indptr']) - 1), np.diff(m['indptr']))
+            keys = self._keys[sentiment] = rows * len(self.vocabulary) + m['indices']
+        return keys
+
+    def log_likelihoods(self, encoded: List[np.ndarray]) -> np.ndarray:
         """
-        Obtener vector Word2Vec de una palabra.
+        Log-verosimilitud de cada texto bajo cada sentimiento, vectorizada por lotes.
 
         Args:
-            word: Palabra para la que obtener el vector
+            encoded: Lista de arreglos de ids
 
         Returns:
-            Vector de la palabra o vector de ceros si no existe
+            Arreglo (n_textos, 2); 0 donde el texto no tiene bigramas en vocabulario
         """
-        if word in self.vocabulary:
-            return self.word2vec_model.wv[word]
-        return np.zeros(self.vector_size)
+        scores = np.zeros((len(encoded), 2), dtype=np.float64)
+        if not self.transition_matrices or not encoded:
+            return scores
+
+        V = len(self.vocabulary)
+        cur, nxt, doc = self._bigrams(encoded)
+        if not len(cur):
+            return scores
 
-    def predict_sentiment_sequence(self, tokens: List[str]) -> Dict[str, float]:
+        query = cur * V + nxt
+        for sentiment in [0, 1]:
+            m = self.transition_matrices[sentiment]
+            keys = self._transition_keys(sentiment)
+            logp = m['row_default'][cur].astype(np.float64)
+            if len(keys):
+                # Búsqueda binaria de cada (actual, siguiente) entre los no-ceros de la CSR
+                pos = np.minimum(np.searchsorted(keys, query), len(keys) - 1)
+                found = keys[pos] == query
+                logp[found] = m['data'][pos[found]]
+            scores[:, sentiment] = np.bincount(doc, weights=logp, minlength=len(encoded))
+        return scores
+
+    def predict_sentiment_sequence(self, tokens: List[str]) -> Dict[int, float]:
         """
         Predecir sentimiento basado en la secuencia de palabras usando cadena de Markov.
 
@@ -165,30 +286,25 @@ class SentimentMarkovChain:
         if len(tokens) < 2 or not self.transition_matrices:
             return {0: 0.50, 1: 0.50}
 
-        sentiment_scores = { 0: 0.0, 1: 0.0}
-
-        # Calcular probabilidad basada en transiciones
-        for i in range(len(tokens) - 1):
-            current_word = tokens[i]
-            next_word = tokens[i + 1]
+        ll = self.log_likelihoods([self.encode(tokens)])[0]
+        # Probabilidades a posteriori con priors uniformes (softmax estable)
+        p = np.exp(ll - ll.max())
+        p /= p.sum()
+        return {0: float(p[0]), 1: float(p[1])}
 
-            if current_word in self.vocabulary and next_word in self.vocabulary:
-                for sentiment in [ 0, 1]:
-                    if current_word in self.transition_matrices[sentiment]:
-                        prob = self.transition_matrices[sentiment][current_word].get(next_word, 0)
-                        sentiment_scores[sentiment] += prob
+    def predict_batch(self, texts: List[str], n_jobs: int = 1) -> np.ndarray:
+        """
+        Predecir el sentimiento de muchos textos (una sola pasada vectorizada).
 
-        # Normalizar probabilidades
-        total = sum(sentiment_scores.values())
-        if total > 0:
-            for sentiment in sentiment_scores:
-                sentiment_scores[sentiment] /= total
-        else:
-            # Si no hay transiciones válidas, asignar probabilidades uniformes
-            for sentiment in sentiment_scores:
-                sentiment_scores[sentiment] = 1/2
+        Args:
+            texts: Lista de textos
+            n_jobs: Procesos para el preprocesamiento
 
-        return sentiment_scores
+        Returns:
+            Arreglo de sentimientos predichos (0 / 1); empates (sin bigramas conocidos) -> 0
+        """
+        encoded = [self.encode(tokens) for tokens in self.preprocess_batch(texts, n_jobs=n_jobs)]
+        return self.log_likelihoods(encoded).argmax(axis=1)
 
     def predict_sentiment(self, text: str) -> int:
         """
@@ -198,34 +314,23 @@ class SentimentMarkovChain:
             text: Texto a clasificar
 
         Returns:
-            Sentimiento predicho (-1, 0, 1)
+            Sentimiento predicho (0, 1)
         """
-        tokens = self.preprocess_text(text)
-        scores = self.predict_sentiment_sequence(tokens)
+        return int(self.predict_batch([text])[0])
 
-        # También considerar palabras individuales usando vectores Word2Vec
-        word_sentiments = []
-        for token in tokens:
-            if token in self.vocabulary:
-                # Calcular similitud con palabras de entrenamiento positivas/negativas
-                vector = self.get_word_vector(token)
-                # Aquí podrías implementar una clasificación basada en vectores vecinos
-                # Por simplicidad, usaremos solo la cadena de Markov
-                pass
-
-        # Retornar el sentimiento con mayor probabilidad
-        return max(scores, key=scores.get)
-
-    def train(self, texts: List[str], sentiments: List[int]) -> None:
+    def train(self, texts: List[str], sentiments: List[int], n_jobs: int = 1,
+              corpus_cache: Optional[str] = None) -> None:
         """
         Entrenar el modelo completo.
 
         Args:
             texts: Lista de textos
             sentiments: Lista de sentimientos correspondientes
+            n_jobs: Procesos para el preprocesamiento
+            corpus_cache: Ruta .npz del corpus tokenizado (se reutiliza si coincide)
         """
         print("Procesando textos...")
-        processed_texts = [self.preprocess_text(text) for text in texts]
+        processed_texts = self.load_or_preprocess(texts, corpus_cache, n_jobs=n_jobs)
 
         # Filtrar textos vacíos
         valid_indices = [i for i, tokens in enumerate(processed_texts) if len(tokens) > 0]
@@ -234,29 +339,30 @@ class SentimentMarkovChain:
 
         print(f"Procesados {len(processed_texts)} textos válidos")
 
-        # Entrenar Word2Vec
-        self.train_word2vec(processed_texts)
+        # Vocabulario e ids
+        self.build_vocabulary(processed_texts)
+        encoded = [self.encode(tokens) for tokens in processed_texts]
 
         # Construir matrices de transición
-        self.build_transition_matrices(processed_texts, sentiments)
+        self.build_transition_matrices(encoded, sentiments)
 
     def save_model(self, filepath: str) -> None:
         """
-        Guardar el modelo entrenado.
+        Guardar el modelo entrenado (np.savez, sin pickle).
 
         Args:
-            filepath: Ruta donde guardar el modelo
+            filepath: Ruta donde guardar el modelo (.npz)
         """
-        model_data = {
-            'transition_matrices': self.transition_matrices,
-            'vocabulary': self.vocabulary,
-            'vector_size': self.vector_size,
-            'word2vec_model': self.word2vec_model
+        words = sorted(self.vocabulary, key=self.vocabulary.get)
+        arrays = {
+            'vocabulary': np.array(words, dtype=str),
+            'params': np.array([self.min_count, self.alpha], dtype=np.float64),
         }
+        for sentiment, m in self.transition_matrices.items():
+            for name, arr in m.items():
+                arrays[f'{sentiment}_{name}'] = arr
 
-        with open(filepath, 'wb') as f:
-            pickle.dump(model_data, f)
-
+        np.savez(filepath, **arrays)
         print(f"Modelo guardado en: {filepath}")
 
     def load_model(self, filepath: str) -> None:
@@ -264,15 +370,17 @@ class SentimentMarkovChain:
         Cargar modelo entrenado.
 
         Args:
-            filepath: Ruta del modelo guardado
+            filepath: Ruta del modelo guardado (.npz)
         """
-        with open(filepath, 'rb') as f:
-            model_data = pickle.load(f)
-
-        self.transition_matrices = model_data['transition_matrices']
-        self.vocabulary = model_data['vocabulary']
-        self.vector_size = model_data['vector_size']
-        self.word2vec_model = model_data['word2vec_model']
+        with np.load(filepath, allow_pickle=False) as data:
+            self.vocabulary = {w: i for i, w in enumerate(data['vocabulary'].tolist())}
+            min_count, alpha = data['params']
+            self.min_count, self.alpha = int(min_count), float(alpha)
+            self.transition_matrices = {
+                sentiment: {name: data[f'{sentiment}_{name}'] for name in ('indptr', 'indices', 'data', 'row_default')}
+                for sentiment in [0, 1] if f'{sentiment}_indptr' in data
+            }
+        self._keys = {}
 
         print(f"Modelo cargado desde: {filepath}")
 
@@ -305,17 +413,15 @@ def main():
     print(f"Datos de prueba: {len(test_texts)}")
 
     # Crear y entrenar modelo
-    markov_chain = SentimentMarkovChain(vector_size=100, window=5, min_count=2)
+    markov_chain = SentimentMarkovChain(min_count=2)
 
     print("Entrenando modelo...")
-    markov_chain.train(train_texts, train_sentiments)
+    markov_chain.train(train_texts, train_sentiments, n_jobs=os.cpu_count() or 1,
+                       corpus_cache='utils/sentiments/models/filmaffinity_train_tokens.npz')
 
     # Evaluar modelo
     print("Evaluando modelo...")
-    predictions = []
-    for text in test_texts:
-        pred = markov_chain.predict_sentiment(text)
-        predictions.append(pred)
+    predictions = markov_chain.predict_batch(test_texts)
 
     # Calcular métricas
     accuracy = accuracy_score(test_sentiments, predictions)
@@ -328,7 +434,7 @@ def main():
 
     # Guardar modelo
     os.makedirs('utils/sentiments/models', exist_ok=True)
-    markov_chain.save_model('utils/sentiments/models/sentiment_markov_chain.pkl')
+    markov_chain.save_model('utils/sentiments/models/sentiment_markov_chain.npz')
 
     # Ejemplo de uso
     test_text = "Este proyecto está increíble, me encanta trabajar en él"
@@ -337,13 +443,11 @@ def main():
     print(f"Predicción: {markov_chain.sentiment_mapping[prediction]}")
 
 if __name__ == "__main__":
-    # Descargar recursos de NLTK si es necesario
+    # Descargar recursos de NLTK si es necesario (la tokenización ya no usa Punkt)
     try:
-        nltk.data.find('tokenizers/punkt')
         nltk.data.find('corpora/stopwords')
     except LookupError:
         print("Descargando recursos de NLTK...")
-        nltk.download('punkt')
         nltk.download('stopwords')
 
     main()
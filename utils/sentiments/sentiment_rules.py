@@ -1,5 +1,4 @@
 # sentiment_rules.py
-import spacy
 from utils.sentiments.sentiment_lexicon import (
     LEXICON,
     NEGATORS,
@@ -8,219 +7,98 @@ from utils.sentiments.sentiment_lexicon import (
     POSITIVE_WORDS,
     NEGATIVE_WORDS
 )
+from utils.sentiments.fallback_lexicon import FallbackLexicon, MANUAL_SCORES, suffix_score
+from utils.nlp_registry import get_nlp
 from pprint import pprint
-import json
+from collections import OrderedDict
 import os
 import re
+import threading
 
 # ================================================================
-#  CONFIGURACIÓN DE TRADUCTOR CON FALLBACK
+#  LÉXICO DE FALLBACK (PRECALCULADO, MMAP)
 # ================================================================
 
-# Intentar importar googletrans con fallback
-try:
-    from googletrans import Translator
-    translator = Translator()
-    GOOGLETRANS_AVAILABLE = True
-except ImportError:
-    print("⚠️  googletrans no disponible, usando traducción manual limitada")
-    GOOGLETRANS_AVAILABLE = False
-    translator = None
+# Construido fuera de línea con: python -m utils.sentiments.fallback_lexicon <chats...>
+FALLBACK_LEXICON_FILE = os.path.join(os.path.dirname(__file__), "datasets", "fallback_lexicon.bin")
+FALLBACK_LEXICON = None   # se abre en la primera consulta (no al importar)
 
-# ================================================================
-#  CARGAR NLTK CON FALLBACK
-# ================================================================
-
-SENTIWORDNET_AVAILABLE = False
-FALLBACK_CACHE_FILE = "fallback_cache.json"
-
-# Cargar la caché si existe
-if os.path.exists(FALLBACK_CACHE_FILE):
-    with open(FALLBACK_CACHE_FILE, "r", encoding="utf-8") as f:
-        FALLBACK_CACHE = json.load(f)
-else:
-    FALLBACK_CACHE = {}  # cache vacía
-
-# Intentar cargar NLTK y SentiWordNet
-try:
-    import nltk
-    # Verificar si tenemos los recursos necesarios
-    try:
-        nltk.data.find('corpora/sentiwordnet')
-    except LookupError:
-        print("⚠️  SentiWordNet no encontrado, descargando...")
-        try:
-            nltk.download('sentiwordnet', quiet=True)
-        except:
-            print("❌ No se pudo descargar SentiWordNet")
-            raise
-    
-    from nltk.corpus import sentiwordnet as swn
-    SENTIWORDNET_AVAILABLE = True
-    print("✅ SentiWordNet cargado correctamente")
-except Exception as e:
-    print(f"⚠️  NLTK/SentiWordNet no disponible: {e}")
-    print("ℹ️  Usando análisis léxico simplificado")
-    SENTIWORDNET_AVAILABLE = False
-    swn = None
-
-def save_fallback_cache():
-    """Guarda la caché de fallback en disco."""
-    try:
-        with open(FALLBACK_CACHE_FILE, "w", encoding="utf-8") as f:
-            json.dump(FALLBACK_CACHE, f, ensure_ascii=False, indent=2)
-    except Exception as e:
-        print(f"⚠️  Error guardando caché: {e}")
+# Lemas fuera del léxico precalculado: heurística de sufijos memoizada en memoria
+_FALLBACK_MISSES = {}
 
 def get_fallback_score(lemma):
     """
     Obtiene el puntaje de una palabra que no está en el léxico:
-    - Usa la caché si ya existe
-    - Si no, intenta usar SentiWordNet si está disponible
-    - Si no, usa un diccionario manual básico
+    - Busca en el léxico de fallback precalculado (dict + arreglo mapeado en memoria)
+    - Si no está, usa la heurística de sufijos (memoizada, sin E/S ni red)
     """
+    global FALLBACK_LEXICON
     lemma = lemma.lower()
 
-    # 1. Revisar caché primero
-    if lemma in FALLBACK_CACHE:
-        return FALLBACK_CACHE[lemma]
-
-    # Diccionario manual básico de palabras comunes en español
-    MANUAL_SCORES = {
-        # Positivos
-        'bueno': 0.5, 'buena': 0.5, 'excelente': 0.8, 'genial': 0.7,
-        'fantástico': 0.8, 'perfecto': 0.9, 'maravilloso': 0.8,
-        'increíble': 0.7, 'mejor': 0.6, 'útil': 0.5,
-        
-        # Negativos
-        'malo': -0.5, 'mala': -0.5, 'terrible': -0.8, 'horrible': -0.9,
-        'pésimo': -0.9, 'fatal': -0.8, 'decepcionante': -0.7,
-        'inútil': -0.6, 'peor': -0.7, 'problemático': -0.6,
-        
-        # Neutrales/contextuales
-        'normal': 0.0, 'regular': -0.1, 'aceptable': 0.2,
-        'suficiente': 0.1, 'adecuado': 0.3, 'correcto': 0.3,
-    }
-
-    # 2. Verificar si está en el diccionario manual
-    if lemma in MANUAL_SCORES:
-        score = MANUAL_SCORES[lemma]
-        FALLBACK_CACHE[lemma] = score
-        save_fallback_cache()
+    if FALLBACK_LEXICON is None:
+        FALLBACK_LEXICON = FallbackLexicon.open(FALLBACK_LEXICON_FILE)
+    score = FALLBACK_LEXICON.get(lemma)
+    if score is not None:
         return score
 
-    # 3. Intentar usar SentiWordNet si está disponible
-    if SENTIWORDNET_AVAILABLE and GOOGLETRANS_AVAILABLE:
-        try:
-            # Traducir al inglés
-            translated = translator.translate(lemma, src='es', dest='en').text.lower()
-            
-            # Obtener synsets en inglés
-            synsets = list(swn.senti_synsets(translated))
-            
-            if synsets:
-                synset = synsets[0]  # el más común
-                # Score neto = positivo - negativo
-                net_score = synset.pos_score() - synset.neg_score()
-                scaled_score = round(net_score * 0.5, 4)
-                
-                FALLBACK_CACHE[lemma] = scaled_score
-                save_fallback_cache()
-                return scaled_score
-        except Exception as e:
-            print(f"⚠️  Error usando SentiWordNet para '{lemma}': {e}")
-
-    # 4. Fallback: análisis léxico básico
-    # Buscar patrones de sufijos comunes
-    positive_patterns = [
-        r'.*(able|ible)$',  # amable, posible
-        r'.*(oso|osa)$',    # amoroso, maravillosa
-        r'.*(ivo|iva)$',    # creativo, positiva
-    ]
-    
-    negative_patterns = [
-        r'.*(oso|osa)$',    # peligroso, asquerosa (algunos son negativos)
-        r'.*(ante)$',       # decepcionante
-        r'.*(or|ora)$',     # traidor, vengadora (contextual)
-    ]
-    
-    for pattern in positive_patterns:
-        if re.match(pattern, lemma):
-            score = 0.3
-            FALLBACK_CACHE[lemma] = score
-            save_fallback_cache()
-            return score
-    
-    for pattern in negative_patterns:
-        if re.match(pattern, lemma):
-            score = -0.3
-            FALLBACK_CACHE[lemma] = score
-            save_fallback_cache()
-            return score
-
-    # 5. Final fallback: neutro
-    FALLBACK_CACHE[lemma] = 0.0
-    save_fallback_cache()
-    return 0.0
+    score = _FALLBACK_MISSES.get(lemma)
+    if score is None:
+        score = MANUAL_SCORES.get(lemma, suffix_score(lemma))
+        _FALLBACK_MISSES[lemma] = score
+    return score
 
 # ================================================================
-#  CARGAR SPACY CON FALLBACK
+#  SPACY (PEREZOSO) CON FALLBACK
 # ================================================================
 
-try:
-    nlp = spacy.load("es_core_news_md")
-    SPACY_AVAILABLE = True
-except Exception as e:
-    print(f"⚠️  No se pudo cargar spaCy es_core_news_md: {e}")
-    print("ℹ️  Usando tokenizador simple")
-    SPACY_AVAILABLE = False
-    
-    class SimpleTokenizer:
-        """Tokenizador simple para cuando spaCy no está disponible"""
-        def __init__(self):
-            self.stemmer = None
-            # Diccionario simple de categorías gramaticales
-            self.pos_tags = {}
+class SimpleTokenizer:
+    """Tokenizador simple para cuando spaCy no está disponible"""
+    def __init__(self):
+        self.stemmer = None
+        # Diccionario simple de categorías gramaticales
+        self.pos_tags = {}
+    
+    def __call__(self, text):
+        # Tokenización simple por espacios y puntuación
+        import re
+        tokens = re.findall(r'\b\w+\b', text.lower())
+        return SimpleDoc(tokens)
+
+class SimpleDoc:
+    """Documento simple para simular spaCy"""
+    def __init__(self, tokens):
+        self.tokens = [SimpleToken(tok) for tok in tokens]
+        self.sents = [SimpleSent(self.tokens)]
+
+class SimpleToken:
+    """Token simple para simular spaCy"""
+    def __init__(self, text):
+        self.text = text
+        self.lemma_ = text.lower()
+        self.lower_ = text.lower()
+        self.pos_ = 'NOUN'  # Asumimos sustantivo por defecto
+        self.dep_ = 'dep'   # Dependencia desconocida
+        self.head = self     # Auto-referencia
+        self.children = []   # Sin hijos
+        self.i = 0           # Índice
         
-        def __call__(self, text):
-            # Tokenización simple por espacios y puntuación
-            import re
-            tokens = re.findall(r'\b\w+\b', text.lower())
-            return SimpleDoc(tokens)
-    
-    class SimpleDoc:
-        """Documento simple para simular spaCy"""
-        def __init__(self, tokens):
-            self.tokens = [SimpleToken(tok) for tok in tokens]
-            self.sents = [SimpleSent(self.tokens)]
-    
-    class SimpleToken:
-        """Token simple para simular spaCy"""
-        def __init__(self, text):
-            self.text = text
-            self.lemma_ = text.lower()
-            self.lower_ = text.lower()
-            self.pos_ = 'NOUN'  # Asumimos sustantivo por defecto
-            self.dep_ = 'dep'   # Dependencia desconocida
-            self.head = self     # Auto-referencia
-            self.children = []   # Sin hijos
-            self.i = 0           # Índice
-            
-            # Estimar categoría gramatical simple
-            if text.endswith(('ar', 'er', 'ir')):
-                self.pos_ = 'VERB'
-            elif text.endswith(('o', 'a', 'os', 'as')):
-                self.pos_ = 'ADJ'
-            elif text.endswith(('mente')):
-                self.pos_ = 'ADV'
-    
-    class SimpleSent:
-        """Oración simple"""
-        def __init__(self, tokens):
-            self.text = ' '.join(t.text for t in tokens)
-            self.tokens = tokens
-    
-    nlp = SimpleTokenizer()
+        # Estimar categoría gramatical simple
+        if text.endswith(('ar', 'er', 'ir')):
+            self.pos_ = 'VERB'
+        elif text.endswith(('o', 'a', 'os', 'as')):
+            self.pos_ = 'ADJ'
+        elif text.endswith(('mente')):
+            self.pos_ = 'ADV'
+
+class SimpleSent:
+    """Oración simple"""
+    def __init__(self, tokens):
+        self.text = ' '.join(t.text for t in tokens)
+        self.tokens = tokens
+
+
+# Modelo compartido y perezoso: se carga en el primer análisis, no al importar
+nlp = get_nlp("sentiment", fallback=SimpleTokenizer)
 
 # ================================================================
 #  FUNCIONES AUXILIARES DE DEPENDENCIAS
@@ -236,7 +114,7 @@ def has_negation(token):
     NO revisa lefts arbitrarios.
     NO sube varios niveles.
     """
-    if not SPACY_AVAILABLE:
+    if not nlp.available:
         # Versión simple sin spaCy
         text = token.text.lower()
         return text in NEGATORS or any(child.text.lower() in NEGATORS for child in token.children)
@@ -265,7 +143,7 @@ def get_intensity_multiplier(token):
     """
     mult = 1.0
     
-    if not SPACY_AVAILABLE:
+    if not nlp.available:
         # Versión simple
         text = token.text.lower()
         if text in INTENSIFIERS:
@@ -292,7 +170,7 @@ def detect_adversative_clauses(sent):
     """
     Detecta si hay conjunciones adversativas (ej. 'pero', 'aunque') en la oración.
     """
-    if not SPACY_AVAILABLE:
+    if not nlp.available:
         # Versión simple por texto
         text = sent.text.lower()
         for conj in ADVERSATIVE_CONJUNCTIONS:
@@ -309,6 +187,32 @@ def detect_adversative_clauses(sent):
     return False, None
 
 
+# Clave en doc.user_data para los lemas del subárbol de cada token (token.i -> frozenset)
+SUBTREE_LEMMAS_KEY = "subtree_lemmas"
+
+def subtree_lemmas(token):
+    """
+    Conjunto de lemas del subárbol de un token, calculado una sola vez por token
+    y memoizado en el Doc (de abajo hacia arriba: lema propio ∪ subárboles de los hijos).
+    """
+    doc = getattr(token, "doc", None)
+    if doc is None:
+        return {t.lemma_ for t in token.subtree}
+
+    memo = doc.user_data.get(SUBTREE_LEMMAS_KEY)
+    if memo is None:
+        memo = doc.user_data[SUBTREE_LEMMAS_KEY] = {}
+
+    lemmas = memo.get(token.i)
+    if lemmas is None:
+        lemmas = {token.lemma_}
+        for child in token.children:
+            lemmas |= subtree_lemmas(child)
+        lemmas = frozenset(lemmas)
+        memo[token.i] = lemmas
+    return lemmas
+
+
 # ================================================================
 #  APLICACIÓN DE REGLAS GRAMATICALES
 # ================================================================
@@ -316,8 +220,8 @@ def detect_adversative_clauses(sent):
 def rule_dejar_mucho_que_desear(token):
     # buscamos "dejar" con intensificación + desear en subtree
     if token.lemma_ == "dejar":
-        subtree_lemmas = {t.lemma_ for t in token.subtree}
-        if "mucho" in subtree_lemmas and "desear" in subtree_lemmas:
+        lemmas = subtree_lemmas(token)
+        if "mucho" in lemmas and "desear" in lemmas:
             return -3.0  # muy negativo
     return 0
 
@@ -347,9 +251,9 @@ def rule_negation_with_intensifiers(token):
     (realmente, correctamente) → más negativo.
     """
     intensifiers = {"realmente", "correctamente"}
-    subtree_lemmas = {t.lemma_ for t in token.subtree}
+    lemmas = subtree_lemmas(token)
 
-    if "no" in subtree_lemmas and subtree_lemmas.intersection(intensifiers):
+    if "no" in lemmas and lemmas.intersection(intensifiers):
         return -1.5
     return 0
 
@@ -361,8 +265,8 @@ def rule_facil_intuitivo_usar(token):
     target_adjs = {"fácil", "intuitivo"}
 
     if token.lemma_ in target_adjs:
-        subtree_lemmas = {t.lemma_ for t in token.subtree}
-        if "usar" in subtree_lemmas:
+        lemmas = subtree_lemmas(token)
+        if "usar" in lemmas:
             return +2.0
     return 0
 
@@ -375,9 +279,9 @@ def rule_verbs_appreciation(token):
     appreciation = {"encantar", "gustar", "superar"}
 
     if token.lemma_ in appreciation:
-        subtree_lemmas = {t.lemma_ for t in token.subtree}
+        lemmas = subtree_lemmas(token)
 
-        if token.lemma_ == "superar" and "expectativa" in subtree_lemmas:
+        if token.lemma_ == "superar" and "expectativa" in lemmas:
             return +3.0
         return +2.5
     return 0
@@ -499,11 +403,11 @@ def rule_visitado_cerrado(token):
     if token.lemma_ not in {"visitar", "visité", "visite"}:
         return 0
     
-    subtree_lemmas = {t.lemma_ for t in token.subtree}
+    lemmas = subtree_lemmas(token)
     
     negative_states = {"cerrado", "completo", "incompleto", "vacío", "dañado"}
 
-    if subtree_lemmas.intersection(negative_states):
+    if lemmas.intersection(negative_states):
         return -2.0
 
     return 0
@@ -533,9 +437,8 @@ def rule_nada_bueno_pattern(token):
                 return -2.0 * abs(base)
 
     # Caso 3: 'nada' en el subtree del adjetivo (frases largas)
-    subtree_lemmas = {t.lemma_ for t in token.subtree}
     if token.pos_ == "ADJ" and token.lemma_.lower() in POSITIVE_WORDS:
-        if "nada" in subtree_lemmas:
+        if "nada" in subtree_lemmas(token):
             return -2.0 * abs(POSITIVE_WORDS[token.lemma_.lower()])
 
     return 0
@@ -582,6 +485,47 @@ def rule_verb_with_negative_object(token):
     return 0
 
 
+# Reglas en su orden de aplicación: (función, nombre, lemas disparadores, POS disparadores).
+# Una regla sin lemas ni POS se evalúa en todos los tokens.
+GRAMMATICAL_RULES = [
+    (rule_dejar_mucho_que_desear, "dejar_mucho_que_desear", {"dejar"}, None),
+    (rule_bien_mucho, "bien_mucho", {"bien"}, None),
+    (rule_negated_performance_verbs, "neg_performance_verbs",
+     {"tener", "cumplir", "lograr", "preparar", "reflejar", "disponible"}, None),
+    (rule_negation_with_intensifiers, "neg_intensifiers", None, None),
+    (rule_facil_intuitivo_usar, "facil_intuitivo_usar", {"fácil", "intuitivo"}, None),
+    (rule_verbs_appreciation, "verbs_appreciation", {"encantar", "gustar", "superar"}, None),
+    (rule_contento_intensified, "contento_intensified", {"contento"}, None),
+    (rule_bien_usage_context, "bien_usage_context", {"bien"}, None),
+
+    (rule_no_tener_complement, "no_tener_complement", {"tener"}, None),
+    (rule_calidad_baja, "calidad_baja", {"bajo", "baja"}, None),
+    (rule_no_lograr, "no_lograr", {"lograr"}, None),
+    (rule_decepcionante_bastante, "decepcionante_bastante", {"decepcionante"}, None),
+    (rule_visitado_cerrado, "visitado_cerrado", {"visitar", "visité", "visite"}, None),
+    (rule_nada_bueno_pattern, "nada_bueno_pattern", {"nada"}, {"ADJ"}),
+    (rule_verb_with_negative_object, "verb_with_negative_object", None, {"VERB"}),
+]
+
+# (lema, POS) -> reglas aplicables, en el mismo orden que GRAMMATICAL_RULES
+_RULE_DISPATCH = {}
+
+def rules_for(token):
+    """Reglas cuyo disparador (lema o POS) coincide con el token; se resuelve una vez por (lema, POS)"""
+    key = (token.lemma_, token.pos_)
+    rules = _RULE_DISPATCH.get(key)
+    if rules is None:
+        rules = tuple(
+            (rule_fn, rule_name)
+            for rule_fn, rule_name, lemmas, pos in GRAMMATICAL_RULES
+            if (lemmas is None and pos is None)
+            or (lemmas is not None and key[0] in lemmas)
+            or (pos is not None and key[1] in pos)
+        )
+        _RULE_DISPATCH[key] = rules
+    return rules
+
+
 def apply_grammatical_rules(token, base_score, debug_info):
     """
     Aplica reglas gramaticales (dependientes del árbol de dependencias)
@@ -604,32 +548,14 @@ def apply_grammatical_rules(token, base_score, debug_info):
     # --- (Hook para futuras reglas) ---
     # Ejemplo futuro: cláusulas concesivas, sarcasmo, modales, etc.
 
-    for rule_fn, rule_name in [
-        (rule_dejar_mucho_que_desear, "dejar_mucho_que_desear"),
-        (rule_bien_mucho, "bien_mucho"),
-        (rule_negated_performance_verbs, "neg_performance_verbs"),
-        (rule_negation_with_intensifiers, "neg_intensifiers"),
-        (rule_facil_intuitivo_usar, "facil_intuitivo_usar"),
-        (rule_verbs_appreciation, "verbs_appreciation"),
-        (rule_contento_intensified, "contento_intensified"),
-        (rule_bien_usage_context, "bien_usage_context"),
-
-        (rule_no_tener_complement, "no_tener_complement"),
-        (rule_calidad_baja, "calidad_baja"),
-        (rule_no_lograr, "no_lograr"),
-        (rule_decepcionante_bastante, "decepcionante_bastante"),
-        (rule_visitado_cerrado, "visitado_cerrado"),
-        (rule_nada_bueno_pattern, "nada_bueno_pattern"),
-        (rule_verb_with_negative_object, "verb_with_negative_object"),
-
-        ]:
-
+    for rule_fn, rule_name in rules_for(token):
         adjustment = rule_fn(token)
         if adjustment != 0:
             score += adjustment   # o multiplicar según el caso
             applied_rules.append(rule_name)
 
-    debug_info.extend(applied_rules)
+    if debug_info is not None:
+        debug_info.extend(applied_rules)
     return score
 
 # ================================================================
@@ -695,7 +621,7 @@ def _analyze_sentiment(text, debug=True):
     Función principal de análisis con fallback automático.
     Usa spaCy si está disponible, si no usa el método simple.
     """
-    if not SPACY_AVAILABLE:
+    if not nlp.available:
         print("⚠️  Usando análisis de sentimientos simplificado (spaCy no disponible)")
         return analyze_sentiment_simple(text, debug)
     
@@ -834,13 +760,110 @@ def analyze_sentence_tree(sent):
 
     return score, debug
 
-def analyze_sentiment(text, debug=True):
+def _subtree_score(token):
     """
-    VERSIÓN PARALELA:
-    Analiza sentimiento usando recorrido postorder del árbol.
-    NO reemplaza la versión original.
+    Mismo puntaje que compute_subtree_sentiment (mismo orden de sumas, postorder) pero sin
+    set de visitados, lista de scores de hijos ni debug: solo aritmética sobre el árbol.
     """
-    doc = nlp(text)
+    child_sum = 0
+    has_children = False
+    for child in token.children:
+        child_sum += _subtree_score(child)
+        has_children = True
+    lemma = token.lemma_.lower()
+    token_score = apply_grammatical_rules(token, LEXICON[lemma], None) if lemma in LEXICON else 0
+    return token_score + child_sum if has_children else token_score
+
+
+def score_doc(doc):
+    """Puntaje total de un Doc ya analizado (equivalente a analyze_sentiment sin construir detalles)"""
+    total_score = 0.0
+    for sent in doc.sents:
+        root = None
+        for t in sent:
+            if t.dep_ == "ROOT":
+                root = t
+                break
+        if root is None:
+            continue
+        score = _subtree_score(root)
+        has_adv, conj = detect_adversative_clauses(sent)
+        if has_adv:
+            score *= ADVERSATIVE_CONJUNCTIONS.get(conj, 1.0)
+        total_score += score
+    return total_score
+
+
+def _polarity(total_score):
+    return "positivo" if total_score > 0 else "negativo" if total_score < 0 else "neutro"
+
+
+# Cache por texto normalizado -> (score redondeado, polaridad); acotado y seguro entre hilos
+SENTIMENT_CACHE_SIZE = 200_000
+_SENTIMENT_CACHE = OrderedDict()
+_SENTIMENT_CACHE_LOCK = threading.Lock()
+
+
+def normalize_text(text):
+    """Clave de cache: espacios colapsados (el mismo texto con distinto espaciado se analiza una vez)"""
+    return " ".join(text.split()) if isinstance(text, str) else ""
+
+
+def analyze_sentiments(texts, n_process=1, batch_size=256, debug=False):
+    """
+    Versión por lotes de analyze_sentiment para muchos textos:
+     - nlp.pipe (n_process procesos, batch_size textos por lote) con el perfil "sentiment" (sin NER)
+     - cada texto normalizado distinto se analiza UNA vez (y se recuerda entre llamadas); se
+       analiza el texto original, la versión normalizada es solo la clave del cache
+     - sin debug devuelve [{"score", "sentiment"}] y no construye detalles por oración
+
+    Con debug=True devuelve lo mismo que analyze_sentiment(text, True) para cada texto.
+    """
+    texts = [t if isinstance(t, str) else "" for t in texts]
+    if debug:
+        if not nlp.available:
+            return [analyze_sentiment_simple(t, True) for t in texts]
+        uniq = list(dict.fromkeys(texts))
+        docs = nlp.pipe(uniq, batch_size=batch_size, n_process=n_process)
+        by_text = {t: _doc_result(t, doc, True) for t, doc in zip(uniq, docs)}
+        return [by_text[t] for t in texts]
+
+    # El texto normalizado es solo la clave del cache: se analiza el primer original de cada
+    # clave (los saltos de línea cambian la segmentación en oraciones de spaCy)
+    keys = [normalize_text(t) for t in texts]
+    results = {}
+    with _SENTIMENT_CACHE_LOCK:
+        for k in keys:
+            hit = _SENTIMENT_CACHE.get(k)
+            if hit is not None:
+                _SENTIMENT_CACHE.move_to_end(k)
+                results[k] = hit
+    originals = {}
+    for k, t in zip(keys, texts):
+        if k not in results:
+            originals.setdefault(k, t)
+    missing = list(originals)
+
+    if missing:
+        if nlp.available:
+            docs = nlp.pipe([originals[k] for k in missing], batch_size=batch_size, n_process=n_process)
+            for k, doc in zip(missing, docs):
+                total = score_doc(doc)
+                results[k] = (round(total, 3), _polarity(total))
+        else:
+            for k in missing:
+                r = analyze_sentiment_simple(originals[k], True)
+                results[k] = (r["score"], r["sentiment"])
+        with _SENTIMENT_CACHE_LOCK:
+            for k in missing:
+                _SENTIMENT_CACHE[k] = results[k]
+            while len(_SENTIMENT_CACHE) > SENTIMENT_CACHE_SIZE:
+                _SENTIMENT_CACHE.popitem(last=False)
+
+    return [{"score": results[k][0], "sentiment": results[k][1]} for k in keys]
+
+
+def _doc_result(text, doc, debug):
     total_score = 0.0
     details = []
 
@@ -854,11 +877,7 @@ def analyze_sentiment(text, debug=True):
             "rules": sent_debug
         })
 
-    polarity = (
-        "positivo" if total_score > 0
-        else "negativo" if total_score < 0
-        else "neutro"
-    )
+    polarity = _polarity(total_score)
 
     if debug:
         return {
@@ -871,8 +890,46 @@ def analyze_sentiment(text, debug=True):
         return polarity
 
 
+def analyze_sentiment(text, debug=True):
+    """
+    VERSIÓN PARALELA:
+    Analiza sentimiento usando recorrido postorder del árbol.
+    NO reemplaza la versión original.
+    Para muchos textos usar analyze_sentiments (nlp.pipe + cache).
+    """
+    return _doc_result(text, nlp(text), debug)
+
+
+def verify_rule_dispatch(csv_path="utils/sentiments/datasets/dataset.csv"):
+    """
+    Compara, token a token, el despacho indexado (rules_for) contra aplicar TODAS las reglas
+    en secuencia sobre los textos del dataset. Devuelve la lista de discrepancias.
+    """
+    import csv
+
+    with open(csv_path, "r", encoding="utf-8") as f:
+        texts = [row["texto"] for row in csv.DictReader(f)]
+
+    mismatches = []
+    for doc in nlp.pipe(texts):
+        for token in doc:
+            if token.lemma_.lower() not in LEXICON:
+                continue
+            indexed = [name for fn, name in rules_for(token) if fn(token) != 0]
+            sequential = [name for fn, name, _, _ in GRAMMATICAL_RULES if fn(token) != 0]
+            if indexed != sequential:
+                mismatches.append((doc.text, token.text, sequential, indexed))
+
+    print(f"[RULES] {len(texts)} textos, {len(mismatches)} discrepancias entre despacho indexado y secuencial")
+    return mismatches
+
 
 if __name__ == "__main__":
+    import sys
+
+    if "--verify-rules" in sys.argv:
+        sys.exit(1 if verify_rule_dispatch() else 0)
+
     examples = [
         "Me gusta mucho esto, es excelente 👍",
         "No me gustó, estuvo terrible",
@@ -885,9 +942,8 @@ if __name__ == "__main__":
     print("=" * 80)
     print("PRUEBAS DE ANÁLISIS DE SENTIMIENTOS")
     print("=" * 80)
-    print(f"spaCy disponible: {SPACY_AVAILABLE}")
-    print(f"SentiWordNet disponible: {SENTIWORDNET_AVAILABLE}")
-    print(f"googletrans disponible: {GOOGLETRANS_AVAILABLE}")
+    print(f"spaCy disponible: {nlp.available}")
+    print(f"Léxico de fallback: {len(FallbackLexicon.open(FALLBACK_LEXICON_FILE))} lemas")
     print("=" * 80)
     
     for ex in examples:
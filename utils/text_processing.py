@@ -3,9 +3,20 @@ import os
 import markdown
 from bs4 import BeautifulSoup
 from link_processor.main import LinkProcessor
+from link_processor.enrichment import get_metadata_cache
 
 os.makedirs('chats', exist_ok=True)
 
+# Un solo procesador por proceso: su caché LRU se reutiliza entre mensajes.
+# Los títulos de las páginas salen del caché de metadatos (solo lectura, sin red);
+# se llena después de exportar con link_processor.enrichment.
+_LINK_PROCESSOR = LinkProcessor(metadata_cache=get_metadata_cache())
+URL_PATTERN = re.compile(r'https?://[^\s]+')
+
+def extract_links(text: str) -> list:
+    """URLs originales del texto (antes de reemplazarlas), para enriquecerlas luego"""
+    return URL_PATTERN.findall(text) if text else []
+
 def clean_message_text(text: str) -> str:
     """Limpia el texto de un mensaje reemplazando enlaces por descripciones detalladas"""
 
@@ -15,9 +26,7 @@ def clean_message_text(text: str) -> str:
         cleaned = soup.get_text(separator=" ", strip=True)
         return cleaned
 
-    link_processor = LinkProcessor()
-    url_pattern = re.compile(r'https?://[^\s]+')
-    cleaned = re.sub(url_pattern, link_processor.replace_link, text)
+    cleaned = URL_PATTERN.sub(_LINK_PROCESSOR.replace_link, text)
     raw = strip_markdown(cleaned)
 
     return raw.strip()